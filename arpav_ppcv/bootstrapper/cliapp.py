@@ -104,7 +104,11 @@ def bootstrap_municipalities(
                     print("About to delete pre-existing municipalities...")
                     database.delete_all_municipalities(session)
                 print(f"About to save {len(to_create)} municipalities...")
-                database.create_many_municipalities(session, to_create)
+                database.create_many_municipalities(
+                    session,
+                    to_create,
+                    batch_size=ctx.obj["settings"].db_bulk_insert_batch_size,
+                )
                 if has_centroid_info:
                     print("About to (re)create municipality centroids DB view...")
                     ctx.invoke(bootstrap_municipality_centroids, ctx)
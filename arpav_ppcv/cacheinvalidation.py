@@ -0,0 +1,191 @@
+"""Cross-worker invalidation of in-process caches.
+
+Each web worker process keeps its own in-memory caches of coverage metadata.
+Whenever this metadata is modified, `database.bump_coverage_metadata_version()`
+increments a version counter and broadcasts it via Postgres' NOTIFY, in the same
+transaction as the modification. Each worker runs a listener thread, which
+invalidates the local caches upon being notified.
+
+Modules which keep caches of coverage metadata register a callback with
+`register_invalidation_callback()`.
+
+The same listener is also notified by `database.notify_observation_data_changed()`
+whenever observation measurements are harvested. Modules which keep observation
+data register a callback for it with `register_observation_data_callback()`.
+"""
+
+import logging
+import select
+import threading
+from collections.abc import Callable
+from typing import Optional
+
+import sqlalchemy
+
+from . import (
+    config,
+    database,
+)
+from .schemas import coverages
+
+logger = logging.getLogger(__name__)
+
+_INVALIDATION_CALLBACKS: list[Callable[[], None]] = []
+_OBSERVATION_DATA_CALLBACKS: list[Callable[[], None]] = []
+_LISTENER: Optional["CoverageMetadataListener"] = None
+
+
+def register_invalidation_callback(callback: Callable[[], None]) -> None:
+    if callback not in _INVALIDATION_CALLBACKS:
+        _INVALIDATION_CALLBACKS.append(callback)
+
+
+def register_observation_data_callback(callback: Callable[[], None]) -> None:
+    if callback not in _OBSERVATION_DATA_CALLBACKS:
+        _OBSERVATION_DATA_CALLBACKS.append(callback)
+
+
+# cached record counts include coverage metadata tables
+register_invalidation_callback(database.invalidate_record_counts)
+
+
+def invalidate_local_caches() -> None:
+    """Invalidate all of the current worker's caches of coverage metadata."""
+    for callback in _INVALIDATION_CALLBACKS:
+        try:
+            callback()
+        except Exception:
+            logger.exception(f"Could not invalidate cache with {callback!r}")
+
+
+def handle_observation_data_change() -> None:
+    """Let the current worker's modules know that observation data changed."""
+    for callback in _OBSERVATION_DATA_CALLBACKS:
+        try:
+            callback()
+        except Exception:
+            logger.exception(f"Could not handle observation data with {callback!r}")
+
+
+class CoverageMetadataListener(threading.Thread):
+    """Background thread that listens for changes to coverage metadata.
+
+    The thread uses a dedicated database connection, which is not taken from the
+    engine's pool. If the connection is lost, the thread reconnects and compares
+    the current metadata version with the last one it has seen, invalidating
+    caches if any notification may have been missed in the meantime. Since there
+    is no version of observation data, observation data callbacks are always
+    run upon reconnecting.
+
+    The thread also listens for changes to observation data, which are handled
+    in the same thread.
+    """
+
+    def __init__(
+        self,
+        engine: sqlalchemy.Engine,
+        poll_interval_seconds: float = 5.0,
+    ):
+        super().__init__(name="coverage-metadata-listener", daemon=True)
+        self.engine = engine
+        self.poll_interval_seconds = poll_interval_seconds
+        self.last_seen_version: Optional[int] = None
+        self.has_connected = False
+        self.connected = threading.Event()
+        self._stop_event = threading.Event()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop_event.set()
+        self.join(timeout)
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception(
+                    "Coverage metadata listener failed - reconnecting shortly..."
+                )
+                self._stop_event.wait(self.poll_interval_seconds)
+
+    def handle_version(self, version: int) -> None:
+        if version != self.last_seen_version:
+            if self.last_seen_version is not None:
+                logger.info(
+                    f"Coverage metadata changed (version {version}) - invalidating "
+                    f"local caches..."
+                )
+                invalidate_local_caches()
+            self.last_seen_version = version
+
+    def _listen(self) -> None:
+        raw_connection = self.engine.raw_connection()
+        # keep the connection out of the engine's pool, as it is modified below
+        # and it is going to be in use for the whole lifetime of the thread
+        raw_connection.detach()
+        try:
+            connection = raw_connection.driver_connection
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {database.COVERAGE_METADATA_CHANNEL}")
+                cursor.execute(f"LISTEN {database.OBSERVATION_DATA_CHANNEL}")
+                cursor.execute(
+                    f"SELECT version FROM "
+                    f"{coverages.CoverageMetadataVersion.__tablename__} "
+                    f"WHERE id = 1"
+                )
+                row = cursor.fetchone()
+            self.handle_version(row[0] if row is not None else 0)
+            if self.has_connected:
+                handle_observation_data_change()
+            self.has_connected = True
+            self.connected.set()
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select(
+                    [connection], [], [], self.poll_interval_seconds
+                )
+                if readable:
+                    connection.poll()
+                    notified_versions = []
+                    observation_data_changed = False
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        if notify.channel == database.OBSERVATION_DATA_CHANNEL:
+                            observation_data_changed = True
+                            continue
+                        try:
+                            notified_versions.append(int(notify.payload))
+                        except ValueError:
+                            logger.warning(
+                                f"Ignoring invalid payload {notify.payload!r}"
+                            )
+                    if len(notified_versions) > 0:
+                        self.handle_version(max(notified_versions))
+                    # notifications received together are handled only once
+                    if observation_data_changed:
+                        handle_observation_data_change()
+        finally:
+            self.connected.clear()
+            raw_connection.close()
+
+
+def start_listener(settings: config.ArpavPpcvSettings) -> CoverageMetadataListener:
+    global _LISTENER
+    if _LISTENER is None or not _LISTENER.is_alive():
+        _LISTENER = CoverageMetadataListener(
+            database.get_engine(settings),
+            poll_interval_seconds=settings.metadata_listener_poll_interval_seconds,
+        )
+        _LISTENER.start()
+        # give the listener a chance to connect before callers populate their
+        # caches, otherwise changes made in the meantime could go unnoticed
+        if not _LISTENER.connected.wait(_LISTENER.poll_interval_seconds):
+            logger.warning("Coverage metadata listener is not connected yet")
+    return _LISTENER
+
+
+def stop_listener() -> None:
+    global _LISTENER
+    if _LISTENER is not None:
+        _LISTENER.stop(timeout=_LISTENER.poll_interval_seconds * 2)
+        _LISTENER = None
@@ -1,4 +1,5 @@
 import decimal
+import functools
 import logging
 from decimal import Decimal
 from pathlib import Path
@@ -41,6 +42,9 @@ class PrefectSettings(pydantic.BaseModel):
     station_variables_refresher_flow_cron_schedule: str = (
         "0 5 * * 1"  # run once every week, at 05:00 on monday
     )
+    climate_barometer_refresher_flow_cron_schedule: str = (
+        "0 6 * * *"  # run once every day, at 06:00
+    )
 
 
 class ThreddsServerSettings(pydantic.BaseModel):
@@ -48,9 +52,20 @@ class ThreddsServerSettings(pydantic.BaseModel):
     wms_service_url_fragment: str = "wms"
     netcdf_subset_service_url_fragment: str = "ncss/grid"  # noqa
     opendap_service_url_fragment: str = "dodsC"  # noqa
+    file_server_url_fragment: str = "fileServer"  # noqa
     uncertainty_visualization_scale_range: tuple[float, float] = pydantic.Field(
         default=(0, 9)
     )
+    # settings for the pooled HTTP client that is shared by all requests made to
+    # the THREDDS server by a single worker process
+    http_client_max_connections: int = 100
+    http_client_max_keepalive_connections: int = 20
+    http_client_keepalive_expiry_seconds: float = 30.0
+    # enabling HTTP/2 requires the `h2` package to be installed
+    http_client_use_http2: bool = False
+    # whether to expose the http client's connection pool statistics in the API -
+    # this is meant for monitoring and should not be enabled on public deployments
+    expose_http_client_stats: bool = False
 
     @pydantic.model_validator(mode="after")
     def strip_slashes_from_urls(self):
@@ -59,6 +74,7 @@ class ThreddsServerSettings(pydantic.BaseModel):
         self.netcdf_subset_service_url_fragment = (
             self.netcdf_subset_service_url_fragment.strip("/")
         )
+        self.file_server_url_fragment = self.file_server_url_fragment.strip("/")
         return self
 
 
@@ -95,6 +111,56 @@ class CoverageDownloadSettings(pydantic.BaseModel):
     cache_dir: Optional[Path] = (
         Path(__file__).parents[1] / "arpav-cache/coverage-downloads"
     )
+    # when the cache grows beyond this size, the least recently used files get
+    # evicted until it fits again
+    cache_max_size_bytes: int = 10 * 1024**3
+    # cached files which have not been used for longer than this are evicted
+    cache_max_age_days: Optional[int] = 30
+    # minimum time between two consecutive cache eviction runs
+    cache_eviction_interval_seconds: float = 60.0
+    # how long a request waits for a concurrent download of the same data to
+    # finish before querying THREDDS itself
+    cache_in_flight_wait_timeout_seconds: float = 120.0
+
+
+class LocalDatasetsSettings(pydantic.BaseModel):
+    # base directory of the local mirror of THREDDS datasets, as created by the
+    # `import-thredds-datasets` CLI command. Time series of coverages whose
+    # archive is listed in `time_series_archives` are read directly from there,
+    # falling back to THREDDS NCSS if the dataset is not available locally
+    base_dir: Optional[Path] = None
+    time_series_archives: list[str] = []
+    max_open_datasets: int = 64
+
+
+class TimeSeriesCacheSettings(pydantic.BaseModel):
+    # in-memory cache of coverage time series, keyed by the dataset's grid cell
+    # which is nearest to the requested point
+    enabled: bool = True
+    ttl_seconds: float = 6 * 60 * 60
+    max_size_bytes: int = 256 * 1024**2
+
+
+class ObservationStoreSettings(pydantic.BaseModel):
+    # keep all observation measurements in the memory of each web worker and
+    # serve observation time series from there - the store is refreshed when
+    # notified of newly harvested measurements, which requires each worker to
+    # `listen_for_metadata_changes`
+    enabled: bool = False
+
+
+class ObservationsHarvesterSettings(pydantic.BaseModel):
+    base_url: str = "https://api.arpa.veneto.it/REST/v1/clima_indicatori"
+    # maximum number of requests to the remote API that are in flight at once
+    max_concurrent_requests: int = 10
+    # token bucket rate limit for the remote API - requests are issued at most at
+    # this rate, but up to `max_burst_requests` may be issued at once when idle
+    max_requests_per_second: float = 10.0
+    max_burst_requests: int = 10
+    # failed requests are retried with an exponential backoff, starting at
+    # `retry_backoff_seconds`
+    num_request_retries: int = 5
+    retry_backoff_seconds: float = 1.0
 
 
 class ArpavPpcvSettings(BaseSettings):  # noqa
@@ -121,6 +187,10 @@ class ArpavPpcvSettings(BaseSettings):  # noqa
     prefect: PrefectSettings = PrefectSettings()
     martin_tile_server_base_url: str = "http://localhost:3000"
     nearest_station_radius_meters: int = 1000
+    # maximum number of points that can be requested at once for multi-point time
+    # series and the margin that is added around them when retrieving their area
+    multi_point_time_series_max_points: int = 200
+    multi_point_time_series_bbox_margin_degrees: float = 0.2
     v2_api_mount_prefix: str = "/api/v2"
     log_config_file: Path | None = None
     session_secret_key: str = "changeme"
@@ -129,9 +199,25 @@ class ArpavPpcvSettings(BaseSettings):  # noqa
     cors_methods: list[str] = []
     allow_cors_credentials: bool = False
     coverage_download_settings: CoverageDownloadSettings = CoverageDownloadSettings()
+    local_datasets: LocalDatasetsSettings = LocalDatasetsSettings()
+    time_series_cache: TimeSeriesCacheSettings = TimeSeriesCacheSettings()
+    observations_harvester: ObservationsHarvesterSettings = (
+        ObservationsHarvesterSettings()
+    )
+    observation_store: ObservationStoreSettings = ObservationStoreSettings()
     variable_stations_db_schema: str = "stations"
     num_uvicorn_worker_processes: int = 1
     http_client_timeout_seconds: float = 30.0
+    # maximum number of worker threads that async path operations use for running
+    # database queries concurrently - this should not exceed the size of the
+    # database engine's connection pool (including its overflow)
+    db_thread_limiter_capacity: int = 15
+    # number of rows inserted by each statement when bulk creating records
+    db_bulk_insert_batch_size: int = 1000
+    # whether each web worker listens for changes to coverage metadata made by
+    # other processes, in order to invalidate its in-memory caches
+    listen_for_metadata_changes: bool = True
+    metadata_listener_poll_interval_seconds: float = 5.0
 
     @pydantic.model_validator(mode="after")
     def ensure_test_db_dsn(self):
@@ -146,6 +232,12 @@ def get_settings() -> ArpavPpcvSettings:
     return ArpavPpcvSettings()
 
 
+@functools.cache
 def get_translations(locale: babel.Locale) -> babel.support.NullTranslations:
+    """Get the translations catalog for a locale.
+
+    Catalogs are loaded from disk only once per locale and then shared, so they
+    must not be modified by callers.
+    """
     base_dir = Path(__file__).parent / "translations"
     return babel.support.Translations.load(dirname=base_dir, locales=[locale])
@@ -0,0 +1,281 @@
+"""In-memory registry of all valid coverage identifiers.
+
+Coverage identifiers are not stored in the database - they are derived from the
+cartesian product of each coverage configuration's possible values. Expanding
+them is relatively expensive, so this module builds a process-wide registry once
+and keeps it around until it is explicitly invalidated, which must be done
+whenever coverage configurations or configuration parameters are modified.
+
+The registry only stores plain data, not ORM instances, which means it can be
+safely shared between threads and database sessions. Functions which need to
+return coverages fetch their configuration from the current session by primary
+key, which is cheap.
+"""
+
+import dataclasses
+import logging
+import threading
+import uuid
+from collections.abc import Iterable, Sequence
+from typing import Optional
+
+import sqlmodel
+
+from . import (
+    cacheinvalidation,
+    database,
+    exceptions,
+)
+from .schemas import coverages
+
+logger = logging.getLogger(__name__)
+
+_REGISTRY: Optional["CoverageRegistry"] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+@dataclasses.dataclass(frozen=True)
+class CoverageRegistryEntry:
+    identifier: str
+    configuration_id: uuid.UUID
+    configuration_name: str
+    parameter_values: dict[str, str]
+    thredds_url_fragment: Optional[str]
+    netcdf_variable_name: Optional[str]
+
+
+class CoverageRegistry:
+    """Lookup structure for coverage identifiers.
+
+    Entries are kept in the same order as the one produced by
+    `database.collect_all_coverages()`, which is ordered by configuration name
+    and then by the order in which identifiers are generated.
+    """
+
+    def __init__(self, entries: Iterable[CoverageRegistryEntry]):
+        self._entries: dict[str, CoverageRegistryEntry] = {}
+        self._positions: dict[str, int] = {}
+        # maps (parameter name, parameter value) to the identifiers which use it
+        self._identifiers_by_value: dict[tuple[str, str], set[str]] = {}
+        # maps (parameter name, parameter value) to the names of the coverage
+        # configurations which list it as a possible value
+        self._configurations_by_value: dict[tuple[str, str], set[str]] = {}
+        for entry in entries:
+            self._positions[entry.identifier] = len(self._entries)
+            self._entries[entry.identifier] = entry
+            for param_value in entry.parameter_values.items():
+                self._identifiers_by_value.setdefault(param_value, set()).add(
+                    entry.identifier
+                )
+                self._configurations_by_value.setdefault(param_value, set()).add(
+                    entry.configuration_name
+                )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, coverage_identifier: str) -> bool:
+        return coverage_identifier in self._entries
+
+    def get(self, coverage_identifier: str) -> Optional[CoverageRegistryEntry]:
+        return self._entries.get(coverage_identifier)
+
+    def filter(
+        self,
+        *,
+        name_filter: Optional[Sequence[str]] = None,
+        parameter_values_filter: Optional[Sequence[tuple[str, str]]] = None,
+    ) -> list[CoverageRegistryEntry]:
+        """Return entries which match all of the provided filters.
+
+        Filtering by parameter values mirrors the behavior of
+        `database.collect_all_coverages()`: the coverage configuration must list
+        all of the requested values as possible values and, for each filtered
+        parameter, the identifier must use one of the requested values.
+        """
+        if parameter_values_filter:
+            allowed_values = {}
+            for param_name, param_value in parameter_values_filter:
+                allowed_values.setdefault(param_name, set()).add(param_value)
+            allowed_conf_names = set.intersection(
+                *(
+                    self._configurations_by_value.get(pv, set())
+                    for pv in parameter_values_filter
+                )
+            )
+            candidates = None
+            for param_name, values in allowed_values.items():
+                matching = set()
+                for value in values:
+                    matching.update(
+                        self._identifiers_by_value.get((param_name, value), set())
+                    )
+                candidates = matching if candidates is None else candidates & matching
+            candidates = [
+                self._entries[i]
+                for i in sorted(candidates, key=self._positions.__getitem__)
+                if self._entries[i].configuration_name in allowed_conf_names
+            ]
+        else:
+            candidates = list(self._entries.values())
+        for fragment in name_filter or []:
+            candidates = [
+                e for e in candidates if fragment.lower() in e.identifier.lower()
+            ]
+        return candidates
+
+    @classmethod
+    def from_coverage_configurations(
+        cls, coverage_configurations: Iterable[coverages.CoverageConfiguration]
+    ) -> "CoverageRegistry":
+        entries = []
+        for cov_conf in coverage_configurations:
+            for identifier in database.generate_coverage_identifiers(cov_conf):
+                entries.append(_build_entry(cov_conf, identifier))
+        return cls(entries)
+
+
+def get_registry(session: sqlmodel.Session) -> CoverageRegistry:
+    # This function implements caching of the registry, relying on the value of
+    # the module global `_REGISTRY` variable, in a similar way to what
+    # `database.get_engine()` does
+    global _REGISTRY
+    if (registry := _REGISTRY) is None:
+        with _REGISTRY_LOCK:
+            if (registry := _REGISTRY) is None:
+                registry = _REGISTRY = _build_registry(session)
+    return registry
+
+
+def refresh_registry(session: sqlmodel.Session) -> CoverageRegistry:
+    """Rebuild the registry from the database."""
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        _REGISTRY = _build_registry(session)
+    return _REGISTRY
+
+
+def invalidate_registry() -> None:
+    """Discard the registry, which gets rebuilt the next time it is needed."""
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        _REGISTRY = None
+
+
+cacheinvalidation.register_invalidation_callback(invalidate_registry)
+
+
+def get_coverage(
+    session: sqlmodel.Session, coverage_identifier: str
+) -> Optional[coverages.CoverageInternal]:
+    """Get a coverage by its identifier.
+
+    This is equivalent to `database.get_coverage()` but it avoids expanding the
+    coverage configuration's identifiers.
+    """
+    result = None
+    if (entry := get_registry(session).get(coverage_identifier)) is not None:
+        cov_conf = database.get_coverage_configuration(session, entry.configuration_id)
+        if cov_conf is not None:
+            result = coverages.CoverageInternal(
+                identifier=coverage_identifier, configuration=cov_conf
+            )
+    return result
+
+
+def list_coverage_identifiers(
+    session: sqlmodel.Session,
+    *,
+    limit: int = 20,
+    offset: int = 0,
+    include_total: bool = False,
+    name_filter: list[str] | None = None,
+    configuration_parameter_values_filter: Optional[
+        list[coverages.ConfigurationParameterValue]
+    ] = None,
+) -> tuple[list[coverages.CoverageInternal], Optional[int]]:
+    """List coverages, in the same way as `database.list_coverage_identifiers()`."""
+    entries = get_registry(session).filter(
+        name_filter=name_filter,
+        parameter_values_filter=[
+            (cpv.configuration_parameter.name, cpv.name)
+            for cpv in configuration_parameter_values_filter or []
+        ],
+    )
+    items = []
+    for entry in entries[offset : (offset + limit)]:
+        cov_conf = database.get_coverage_configuration(session, entry.configuration_id)
+        items.append(
+            coverages.CoverageInternal(
+                identifier=entry.identifier, configuration=cov_conf
+            )
+        )
+    return items, len(entries) if include_total else None
+
+
+def get_thredds_url_fragment(coverage: coverages.CoverageInternal) -> str:
+    """Return the coverage's THREDDS URL fragment, as rendered by the registry.
+
+    Falls back to rendering it from the coverage configuration if the registry
+    has not been built yet.
+    """
+    entry = _REGISTRY.get(coverage.identifier) if _REGISTRY is not None else None
+    if entry is not None and entry.thredds_url_fragment is not None:
+        result = entry.thredds_url_fragment
+    else:
+        result = coverage.configuration.get_thredds_url_fragment(coverage.identifier)
+    return result
+
+
+def get_main_netcdf_variable_name(coverage: coverages.CoverageInternal) -> str:
+    """Return the coverage's NetCDF variable name, as rendered by the registry.
+
+    Falls back to rendering it from the coverage configuration if the registry
+    has not been built yet.
+    """
+    entry = _REGISTRY.get(coverage.identifier) if _REGISTRY is not None else None
+    if entry is not None and entry.netcdf_variable_name is not None:
+        result = entry.netcdf_variable_name
+    else:
+        result = coverage.configuration.get_main_netcdf_variable_name(
+            coverage.identifier
+        )
+    return result
+
+
+def _build_registry(session: sqlmodel.Session) -> CoverageRegistry:
+    logger.debug("Building coverage identifier registry...")
+    registry = CoverageRegistry.from_coverage_configurations(
+        database.collect_all_coverage_configurations(session)
+    )
+    logger.debug(f"Coverage identifier registry has {len(registry)} entries")
+    return registry
+
+
+def _build_entry(
+    coverage_configuration: coverages.CoverageConfiguration, identifier: str
+) -> CoverageRegistryEntry:
+    parameter_values = coverage_configuration.retrieve_configuration_parameters(
+        identifier
+    )
+    try:
+        thredds_url_fragment = coverage_configuration.get_thredds_url_fragment(
+            identifier
+        )
+        netcdf_variable_name = coverage_configuration.get_main_netcdf_variable_name(
+            identifier
+        )
+    except (ValueError, exceptions.InvalidCoverageIdentifierException):
+        # the coverage configuration is not fully configured yet, which can
+        # happen while it is being edited
+        logger.warning(f"Could not render templated values for {identifier!r}")
+        thredds_url_fragment = None
+        netcdf_variable_name = None
+    return CoverageRegistryEntry(
+        identifier=identifier,
+        configuration_id=coverage_configuration.id,
+        configuration_name=coverage_configuration.name,
+        parameter_values=parameter_values,
+        thredds_url_fragment=thredds_url_fragment,
+        netcdf_variable_name=netcdf_variable_name,
+    )
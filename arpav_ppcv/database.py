@@ -1,21 +1,35 @@
 """Database utilities."""
 
+import datetime as dt
 import itertools
 import logging
+import math
 import re
+import threading
+import time
 import uuid
+from collections.abc import (
+    Callable,
+    Iterator,
+)
 from typing import (
+    Final,
     Optional,
     Sequence,
+    TypeVar,
 )
 
+import anyio
+import anyio.to_thread
 import geojson_pydantic
 import shapely
 import shapely.io
 import sqlalchemy.exc
+import sqlalchemy.orm
 import sqlmodel
 from geoalchemy2.shape import from_shape
 from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
 
 from . import config
 from .schemas import (
@@ -29,6 +43,24 @@ logger = logging.getLogger(__name__)
 
 _DB_ENGINE = None
 _TEST_DB_ENGINE = None
+_DB_THREAD_LIMITER: Optional[anyio.CapacityLimiter] = None
+
+T = TypeVar("T")
+
+# Postgres NOTIFY channels used for broadcasting changes to coverage metadata and
+# to observation measurements
+COVERAGE_METADATA_CHANNEL: Final[str] = "coverage_metadata_changed"
+OBSERVATION_DATA_CHANNEL: Final[str] = "observation_data_changed"
+
+# Cache of unfiltered table record counts, as used by `count_all_records()`. It
+# maps table names to a tuple of (number of records, monotonic time of counting)
+_RECORD_COUNTS: dict[str, tuple[int, float]] = {}
+_RECORD_COUNTS_LOCK = threading.Lock()
+_RECORD_COUNT_MAX_AGE_SECONDS: Final[float] = 60
+_RECORD_COUNTS_CHANGED_KEY: Final[str] = "arpav_ppcv_record_counts_changed"
+
+# Number of rows that the `create_many_*()` functions insert with each statement
+DEFAULT_BULK_INSERT_BATCH_SIZE: Final[int] = 1000
 
 
 def get_engine(settings: config.ArpavPpcvSettings, use_test_db: Optional[bool] = False):
@@ -59,6 +91,26 @@ def get_engine(settings: config.ArpavPpcvSettings, use_test_db: Optional[bool] =
     return result
 
 
+async def run_in_db_thread(
+    settings: config.ArpavPpcvSettings,
+    func: Callable[..., T],
+    *args,
+) -> T:
+    """Run a blocking function that queries the database in a worker thread.
+
+    Threads are bounded by a dedicated capacity limiter, which keeps async code
+    from using more concurrent database connections than the engine's pool is
+    able to provide, without competing for the default thread limiter.
+    """
+    # The limiter is cached in the module global `_DB_THREAD_LIMITER` variable,
+    # in a similar way to what `get_engine()` does. It is created lazily because
+    # anyio requires an event loop to be running in order to create it
+    global _DB_THREAD_LIMITER
+    if _DB_THREAD_LIMITER is None:
+        _DB_THREAD_LIMITER = anyio.CapacityLimiter(settings.db_thread_limiter_capacity)
+    return await anyio.to_thread.run_sync(func, *args, limiter=_DB_THREAD_LIMITER)
+
+
 def create_variable(
     session: sqlmodel.Session, variable_create: observations.VariableCreate
 ) -> observations.Variable:
@@ -142,7 +194,7 @@ def delete_variable(session: sqlmodel.Session, variable_id: uuid.UUID) -> None:
 def list_variables(
     session: sqlmodel.Session,
     *,
-    limit: int = 20,
+    limit: Optional[int] = 20,
     offset: int = 0,
     include_total: bool = False,
     name_filter: Optional[str] = None,
@@ -155,16 +207,16 @@ def list_variables(
         statement = _add_substring_filter(
             statement, name_filter, observations.Variable.name
         )
-    items = session.exec(statement.offset(offset).limit(limit)).all()
-    num_items = _get_total_num_records(session, statement) if include_total else None
+    items, num_items = _get_page(
+        session, statement, limit=limit, offset=offset, include_total=include_total
+    )
     return items, num_items
 
 
 def collect_all_variables(
     session: sqlmodel.Session,
 ) -> Sequence[observations.Variable]:
-    _, num_total = list_variables(session, limit=1, include_total=True)
-    result, _ = list_variables(session, limit=num_total, include_total=False)
+    result, _ = list_variables(session, limit=None, include_total=False)
     return result
 
 
@@ -191,26 +243,32 @@ def create_station(
 def create_many_stations(
     session: sqlmodel.Session,
     stations_to_create: Sequence[observations.StationCreate],
-) -> list[observations.Station]:
-    """Create several stations."""
-    db_records = []
-    for station_create in stations_to_create:
-        geom = shapely.io.from_geojson(station_create.geom.model_dump_json())
-        wkbelement = from_shape(geom)
-        db_station = observations.Station(
-            **station_create.model_dump(exclude={"geom"}),
-            geom=wkbelement,
-        )
-        db_records.append(db_station)
-        session.add(db_station)
-    try:
-        session.commit()
-    except sqlalchemy.exc.DBAPIError:
-        raise
-    else:
-        for db_record in db_records:
-            session.refresh(db_record)
-        return db_records
+    batch_size: int = DEFAULT_BULK_INSERT_BATCH_SIZE,
+) -> list[sqlalchemy.Row]:
+    """Create several stations.
+
+    Stations are inserted in batches of multi-row INSERT statements and the
+    returned rows only hold their `id`, `code` and `name`.
+    """
+    return _bulk_insert(
+        session,
+        sqlalchemy.insert(observations.Station).returning(
+            observations.Station.id,
+            observations.Station.code,
+            observations.Station.name,
+        ),
+        [
+            {
+                **station_create.model_dump(exclude={"geom"}),
+                "id": uuid.uuid4(),
+                "geom": from_shape(
+                    shapely.io.from_geojson(station_create.geom.model_dump_json())
+                ),
+            }
+            for station_create in stations_to_create
+        ],
+        batch_size=batch_size,
+    )
 
 
 def get_station(
@@ -263,7 +321,7 @@ def delete_station(session: sqlmodel.Session, station_id: uuid.UUID) -> None:
 def list_stations(
     session: sqlmodel.Session,
     *,
-    limit: int = 20,
+    limit: Optional[int] = 20,
     offset: int = 0,
     include_total: bool = False,
     name_filter: Optional[str] = None,
@@ -272,14 +330,19 @@ def list_stations(
     variable_aggregation_type: Optional[
         base.ObservationAggregationType
     ] = base.ObservationAggregationType.SEASONAL,
+    cursor: Optional[tuple[str, uuid.UUID]] = None,
 ) -> tuple[Sequence[observations.Station], Optional[int]]:
     """List existing stations.
 
     The ``polygon_intersection_filter`` parameter is expected to be a polygon
     geometry in the EPSG:4326 CRS.
+
+    The ``cursor`` parameter enables keyset pagination. It is expected to be the
+    ``(code, id)`` of the last station of the previous page, and it replaces
+    ``offset``.
     """
     statement = sqlmodel.select(observations.Station).order_by(
-        observations.Station.code
+        observations.Station.code, observations.Station.id
     )
     if name_filter is not None:
         statement = _add_substring_filter(
@@ -305,11 +368,12 @@ def list_stations(
             raise RuntimeError(
                 f"variable filtering for {variable_aggregation_type} is not supported"
             )
-        statement = (
-            statement.join(instance_class)
-            .join(observations.Variable)
-            .where(observations.Variable.id == variable_id_filter)
-            .distinct()
+        statement = statement.where(
+            observations.Station.id.in_(
+                sqlmodel.select(instance_class.station_id).where(
+                    instance_class.variable_id == variable_id_filter
+                )
+            )
         )
 
     else:
@@ -317,8 +381,15 @@ def list_stations(
             "Did not perform variable filter as not all related parameters have been "
             "provided"
         )
-    items = session.exec(statement.offset(offset).limit(limit)).all()
-    num_items = _get_total_num_records(session, statement) if include_total else None
+    items, num_items = _get_page(
+        session,
+        statement,
+        limit=limit,
+        offset=offset,
+        include_total=include_total,
+        keyset=(observations.Station.code, observations.Station.id),
+        cursor=cursor,
+    )
     return items, num_items
 
 
@@ -331,15 +402,9 @@ def collect_all_stations(
     The ``polygon_intersetion_filter`` parameter is expected to be a polygon
     geometry in the EPSG:4326 CRS.
     """
-    _, num_total = list_stations(
-        session,
-        limit=1,
-        include_total=True,
-        polygon_intersection_filter=polygon_intersection_filter,
-    )
     result, _ = list_stations(
         session,
-        limit=num_total,
+        limit=None,
         include_total=False,
         polygon_intersection_filter=polygon_intersection_filter,
     )
@@ -367,26 +432,46 @@ def create_monthly_measurement(
 def create_many_monthly_measurements(
     session: sqlmodel.Session,
     monthly_measurements_to_create: Sequence[observations.MonthlyMeasurementCreate],
-) -> list[observations.MonthlyMeasurement]:
-    """Create several monthly measurements."""
-    db_records = []
-    for monthly_measurement_create in monthly_measurements_to_create:
-        db_monthly_measurement = observations.MonthlyMeasurement(
-            station_id=monthly_measurement_create.station_id,
-            variable_id=monthly_measurement_create.variable_id,
-            value=monthly_measurement_create.value,
-            date=monthly_measurement_create.date,
-        )
-        db_records.append(db_monthly_measurement)
-        session.add(db_monthly_measurement)
-    try:
-        session.commit()
-    except sqlalchemy.exc.DBAPIError:
-        raise
-    else:
-        for db_record in db_records:
-            session.refresh(db_record)
-        return db_records
+    batch_size: int = DEFAULT_BULK_INSERT_BATCH_SIZE,
+) -> list[sqlalchemy.Row]:
+    """Create several monthly measurements.
+
+    Measurements are inserted in batches of multi-row INSERT statements and the
+    returned rows hold their columns, without loading the related station and
+    variable.
+    """
+    return _bulk_insert(
+        session,
+        sqlalchemy.insert(observations.MonthlyMeasurement).returning(
+            *observations.MonthlyMeasurement.__table__.columns
+        ),
+        [
+            {**measurement_create.model_dump(), "id": uuid.uuid4()}
+            for measurement_create in monthly_measurements_to_create
+        ],
+        batch_size=batch_size,
+    )
+
+
+def upsert_many_monthly_measurements(
+    session: sqlmodel.Session,
+    measurements_to_upsert: Sequence[observations.MonthlyMeasurementCreate],
+    batch_size: int = DEFAULT_BULK_INSERT_BATCH_SIZE,
+) -> list[sqlalchemy.Row]:
+    """Create several monthly measurements, or update the value of existing ones.
+
+    Measurements are matched by their station, variable and date with
+    `INSERT ... ON CONFLICT DO UPDATE`, so this can be called repeatedly with the
+    same input. Only rows that were either created or had their value changed
+    are returned.
+    """
+    return _upsert_measurements(
+        session,
+        observations.MonthlyMeasurement,
+        ("station_id", "variable_id", "date"),
+        measurements_to_upsert,
+        batch_size,
+    )
 
 
 def get_monthly_measurement(
@@ -410,16 +495,22 @@ def delete_monthly_measurement(
 def list_monthly_measurements(
     session: sqlmodel.Session,
     *,
-    limit: int = 20,
+    limit: Optional[int] = 20,
     offset: int = 0,
     station_id_filter: Optional[uuid.UUID] = None,
     variable_id_filter: Optional[uuid.UUID] = None,
     month_filter: Optional[int] = None,
     include_total: bool = False,
+    cursor: Optional[tuple[dt.date, uuid.UUID]] = None,
 ) -> tuple[Sequence[observations.MonthlyMeasurement], Optional[int]]:
-    """List existing monthly measurements."""
+    """List existing monthly measurements.
+
+    The ``cursor`` parameter enables keyset pagination. It is expected to be the
+    ``(date, id)`` of the last measurement of the previous page, and it replaces
+    ``offset``.
+    """
     statement = sqlmodel.select(observations.MonthlyMeasurement).order_by(
-        observations.MonthlyMeasurement.date
+        observations.MonthlyMeasurement.date, observations.MonthlyMeasurement.id
     )
     if station_id_filter is not None:
         statement = statement.where(
@@ -430,12 +521,23 @@ def list_monthly_measurements(
             observations.MonthlyMeasurement.variable_id == variable_id_filter
         )
     if month_filter is not None:
+        # this expression is indexed, see `observations.MonthlyMeasurement`
         statement = statement.where(
-            sqlmodel.func.extract("MONTH", observations.MonthlyMeasurement.date)
+            sqlalchemy.extract("month", observations.MonthlyMeasurement.date)
             == month_filter
         )
-    items = session.exec(statement.offset(offset).limit(limit)).all()
-    num_items = _get_total_num_records(session, statement) if include_total else None
+    items, num_items = _get_page(
+        session,
+        statement,
+        limit=limit,
+        offset=offset,
+        include_total=include_total,
+        keyset=(
+            observations.MonthlyMeasurement.date,
+            observations.MonthlyMeasurement.id,
+        ),
+        cursor=cursor,
+    )
     return items, num_items
 
 
@@ -446,17 +548,9 @@ def collect_all_monthly_measurements(
     variable_id_filter: Optional[uuid.UUID] = None,
     month_filter: Optional[int] = None,
 ) -> Sequence[observations.MonthlyMeasurement]:
-    _, num_total = list_monthly_measurements(
-        session,
-        limit=1,
-        station_id_filter=station_id_filter,
-        variable_id_filter=variable_id_filter,
-        month_filter=month_filter,
-        include_total=True,
-    )
     result, _ = list_monthly_measurements(
         session,
-        limit=num_total,
+        limit=None,
         station_id_filter=station_id_filter,
         variable_id_filter=variable_id_filter,
         month_filter=month_filter,
@@ -484,23 +578,46 @@ def create_seasonal_measurement(
 def create_many_seasonal_measurements(
     session: sqlmodel.Session,
     measurements_to_create: Sequence[observations.SeasonalMeasurementCreate],
-) -> list[observations.SeasonalMeasurement]:
-    """Create several seasonal measurements."""
-    db_records = []
-    for measurement_create in measurements_to_create:
-        db_measurement = observations.SeasonalMeasurement(
-            **measurement_create.model_dump()
-        )
-        db_records.append(db_measurement)
-        session.add(db_measurement)
-    try:
-        session.commit()
-    except sqlalchemy.exc.DBAPIError:
-        raise
-    else:
-        for db_record in db_records:
-            session.refresh(db_record)
-        return db_records
+    batch_size: int = DEFAULT_BULK_INSERT_BATCH_SIZE,
+) -> list[sqlalchemy.Row]:
+    """Create several seasonal measurements.
+
+    Measurements are inserted in batches of multi-row INSERT statements and the
+    returned rows hold their columns, without loading the related station and
+    variable.
+    """
+    return _bulk_insert(
+        session,
+        sqlalchemy.insert(observations.SeasonalMeasurement).returning(
+            *observations.SeasonalMeasurement.__table__.columns
+        ),
+        [
+            {**measurement_create.model_dump(), "id": uuid.uuid4()}
+            for measurement_create in measurements_to_create
+        ],
+        batch_size=batch_size,
+    )
+
+
+def upsert_many_seasonal_measurements(
+    session: sqlmodel.Session,
+    measurements_to_upsert: Sequence[observations.SeasonalMeasurementCreate],
+    batch_size: int = DEFAULT_BULK_INSERT_BATCH_SIZE,
+) -> list[sqlalchemy.Row]:
+    """Create several seasonal measurements, or update the value of existing ones.
+
+    Measurements are matched by their station, variable, season and year with
+    `INSERT ... ON CONFLICT DO UPDATE`, so this can be called repeatedly with the
+    same input. Only rows that were either created or had their value changed
+    are returned.
+    """
+    return _upsert_measurements(
+        session,
+        observations.SeasonalMeasurement,
+        ("station_id", "variable_id", "season", "year"),
+        measurements_to_upsert,
+        batch_size,
+    )
 
 
 def get_seasonal_measurement(
@@ -524,16 +641,22 @@ def delete_seasonal_measurement(
 def list_seasonal_measurements(
     session: sqlmodel.Session,
     *,
-    limit: int = 20,
+    limit: Optional[int] = 20,
     offset: int = 0,
     station_id_filter: Optional[uuid.UUID] = None,
     variable_id_filter: Optional[uuid.UUID] = None,
     season_filter: Optional[base.Season] = None,
     include_total: bool = False,
+    cursor: Optional[tuple[int, uuid.UUID]] = None,
 ) -> tuple[Sequence[observations.SeasonalMeasurement], Optional[int]]:
-    """List existing seasonal measurements."""
+    """List existing seasonal measurements.
+
+    The ``cursor`` parameter enables keyset pagination. It is expected to be the
+    ``(year, id)`` of the last measurement of the previous page, and it replaces
+    ``offset``.
+    """
     statement = sqlmodel.select(observations.SeasonalMeasurement).order_by(
-        observations.SeasonalMeasurement.year
+        observations.SeasonalMeasurement.year, observations.SeasonalMeasurement.id
     )
     if station_id_filter is not None:
         statement = statement.where(
@@ -547,8 +670,18 @@ def list_seasonal_measurements(
         statement = statement.where(
             observations.SeasonalMeasurement.season == season_filter
         )
-    items = session.exec(statement.offset(offset).limit(limit)).all()
-    num_items = _get_total_num_records(session, statement) if include_total else None
+    items, num_items = _get_page(
+        session,
+        statement,
+        limit=limit,
+        offset=offset,
+        include_total=include_total,
+        keyset=(
+            observations.SeasonalMeasurement.year,
+            observations.SeasonalMeasurement.id,
+        ),
+        cursor=cursor,
+    )
     return items, num_items
 
 
@@ -559,17 +692,9 @@ def collect_all_seasonal_measurements(
     variable_id_filter: Optional[uuid.UUID] = None,
     season_filter: Optional[base.Season] = None,
 ) -> Sequence[observations.SeasonalMeasurement]:
-    _, num_total = list_seasonal_measurements(
-        session,
-        limit=1,
-        station_id_filter=station_id_filter,
-        variable_id_filter=variable_id_filter,
-        season_filter=season_filter,
-        include_total=True,
-    )
     result, _ = list_seasonal_measurements(
         session,
-        limit=num_total,
+        limit=None,
         station_id_filter=station_id_filter,
         variable_id_filter=variable_id_filter,
         season_filter=season_filter,
@@ -596,23 +721,46 @@ def create_yearly_measurement(
 def create_many_yearly_measurements(
     session: sqlmodel.Session,
     measurements_to_create: Sequence[observations.YearlyMeasurementCreate],
-) -> list[observations.YearlyMeasurement]:
-    """Create several yearly measurements."""
-    db_records = []
-    for measurement_create in measurements_to_create:
-        db_measurement = observations.YearlyMeasurement(
-            **measurement_create.model_dump()
-        )
-        db_records.append(db_measurement)
-        session.add(db_measurement)
-    try:
-        session.commit()
-    except sqlalchemy.exc.DBAPIError:
-        raise
-    else:
-        for db_record in db_records:
-            session.refresh(db_record)
-        return db_records
+    batch_size: int = DEFAULT_BULK_INSERT_BATCH_SIZE,
+) -> list[sqlalchemy.Row]:
+    """Create several yearly measurements.
+
+    Measurements are inserted in batches of multi-row INSERT statements and the
+    returned rows hold their columns, without loading the related station and
+    variable.
+    """
+    return _bulk_insert(
+        session,
+        sqlalchemy.insert(observations.YearlyMeasurement).returning(
+            *observations.YearlyMeasurement.__table__.columns
+        ),
+        [
+            {**measurement_create.model_dump(), "id": uuid.uuid4()}
+            for measurement_create in measurements_to_create
+        ],
+        batch_size=batch_size,
+    )
+
+
+def upsert_many_yearly_measurements(
+    session: sqlmodel.Session,
+    measurements_to_upsert: Sequence[observations.YearlyMeasurementCreate],
+    batch_size: int = DEFAULT_BULK_INSERT_BATCH_SIZE,
+) -> list[sqlalchemy.Row]:
+    """Create several yearly measurements, or update the value of existing ones.
+
+    Measurements are matched by their station, variable and year with
+    `INSERT ... ON CONFLICT DO UPDATE`, so this can be called repeatedly with the
+    same input. Only rows that were either created or had their value changed
+    are returned.
+    """
+    return _upsert_measurements(
+        session,
+        observations.YearlyMeasurement,
+        ("station_id", "variable_id", "year"),
+        measurements_to_upsert,
+        batch_size,
+    )
 
 
 def get_yearly_measurement(
@@ -636,15 +784,21 @@ def delete_yearly_measurement(
 def list_yearly_measurements(
     session: sqlmodel.Session,
     *,
-    limit: int = 20,
+    limit: Optional[int] = 20,
     offset: int = 0,
     station_id_filter: Optional[uuid.UUID] = None,
     variable_id_filter: Optional[uuid.UUID] = None,
     include_total: bool = False,
+    cursor: Optional[tuple[int, uuid.UUID]] = None,
 ) -> tuple[Sequence[observations.YearlyMeasurement], Optional[int]]:
-    """List existing yearly measurements."""
+    """List existing yearly measurements.
+
+    The ``cursor`` parameter enables keyset pagination. It is expected to be the
+    ``(year, id)`` of the last measurement of the previous page, and it replaces
+    ``offset``.
+    """
     statement = sqlmodel.select(observations.YearlyMeasurement).order_by(
-        observations.YearlyMeasurement.year
+        observations.YearlyMeasurement.year, observations.YearlyMeasurement.id
     )
     if station_id_filter is not None:
         statement = statement.where(
@@ -654,8 +808,15 @@ def list_yearly_measurements(
         statement = statement.where(
             observations.YearlyMeasurement.variable_id == variable_id_filter
         )
-    items = session.exec(statement.offset(offset).limit(limit)).all()
-    num_items = _get_total_num_records(session, statement) if include_total else None
+    items, num_items = _get_page(
+        session,
+        statement,
+        limit=limit,
+        offset=offset,
+        include_total=include_total,
+        keyset=(observations.YearlyMeasurement.year, observations.YearlyMeasurement.id),
+        cursor=cursor,
+    )
     return items, num_items
 
 
@@ -665,16 +826,9 @@ def collect_all_yearly_measurements(
     station_id_filter: Optional[uuid.UUID] = None,
     variable_id_filter: Optional[uuid.UUID] = None,
 ) -> Sequence[observations.YearlyMeasurement]:
-    _, num_total = list_yearly_measurements(
-        session,
-        limit=1,
-        station_id_filter=station_id_filter,
-        variable_id_filter=variable_id_filter,
-        include_total=True,
-    )
     result, _ = list_yearly_measurements(
         session,
-        limit=num_total,
+        limit=None,
         station_id_filter=station_id_filter,
         variable_id_filter=variable_id_filter,
         include_total=False,
@@ -682,6 +836,401 @@ def collect_all_yearly_measurements(
     return result
 
 
+def get_measurement_series_columns(
+    session: sqlmodel.Session,
+    aggregation_type: base.ObservationAggregationType,
+    *,
+    station_id: uuid.UUID,
+    variable_id: uuid.UUID,
+    month_filter: Optional[int] = None,
+    season_filter: Optional[base.Season] = None,
+) -> dict[str, list]:
+    """Get the time series of a station's variable as a mapping of columns.
+
+    Only the columns that locate each measurement in time and its value are
+    selected, with a Core query that aggregates each one into a Postgres array.
+    The result is a single row which the driver parses into plain lists, sorted
+    by time, without materializing any ORM instance. Keys of the returned mapping
+    are:
+
+    - monthly: ``date`` and ``value``
+    - seasonal: ``year``, ``season`` (the season name) and ``value``
+    - yearly: ``year`` and ``value``
+    """
+    table_model, columns, order_by = _get_measurement_series_column_selection(
+        aggregation_type
+    )
+    statement = sqlalchemy.select(
+        *(
+            func.array_agg(postgresql.aggregate_order_by(column, *order_by)).label(name)
+            for name, column in columns.items()
+        )
+    ).where(
+        table_model.station_id == station_id,
+        table_model.variable_id == variable_id,
+    )
+    if month_filter is not None:
+        # this expression is indexed, see `observations.MonthlyMeasurement`
+        statement = statement.where(
+            sqlalchemy.extract("month", observations.MonthlyMeasurement.date)
+            == month_filter
+        )
+    if season_filter is not None:
+        statement = statement.where(
+            observations.SeasonalMeasurement.season == season_filter
+        )
+    row = session.execute(statement).one()
+    # `array_agg()` yields NULL when there are no measurements
+    return {name: list(row._mapping[name] or []) for name in columns}
+
+
+def get_nearest_station_measurement_columns(
+    session: sqlmodel.Session,
+    point_geom: shapely.Point,
+    max_distance_meters: float,
+    aggregation_type: base.ObservationAggregationType,
+    *,
+    variable_id: uuid.UUID,
+    month_filter: Optional[int] = None,
+    season_filter: Optional[base.Season] = None,
+) -> Optional[tuple[observations.Station, dict[str, list]]]:
+    """Get the nearest station that has measurements of a variable, and its series.
+
+    A single query finds the station nearest to the input EPSG:4326 point, within
+    `max_distance_meters`, that has at least one measurement matching the
+    filters. It also aggregates that station's measurements in the same way as
+    `get_measurement_series_columns()`. Distances are geodesic. Stations are
+    sorted with PostGIS' KNN operator, which is served by the station's geography
+    index, and measurements are checked with a semi-join. Returns `None` if no
+    such station exists.
+    """
+    table_model, columns, order_by = _get_measurement_series_column_selection(
+        aggregation_type
+    )
+    measurement_filters = _get_measurement_series_filters(
+        table_model, variable_id, month_filter, season_filter
+    )
+    nearest_station = sqlalchemy.orm.aliased(
+        observations.Station,
+        _select_nearest_station_with_measurements(
+            point_geom, max_distance_meters, table_model, measurement_filters
+        ).subquery("nearest_station"),
+    )
+    measurements = _select_lateral_measurement_columns(
+        nearest_station.id, table_model, columns, order_by, measurement_filters
+    )
+    statement = sqlalchemy.select(nearest_station, measurements).join(
+        measurements, sqlalchemy.true()
+    )
+    if (row := session.execute(statement).first()) is not None:
+        station, *values = row
+        result = (
+            station,
+            {name: list(column_values) for name, column_values in zip(columns, values)},
+        )
+    else:
+        result = None
+    return result
+
+
+def get_grid_cell_nearest_station_measurement_columns(
+    session: sqlmodel.Session,
+    cell_index: int,
+    point_geom: shapely.Point,
+    max_distance_meters: float,
+    aggregation_type: base.ObservationAggregationType,
+    *,
+    variable_id: uuid.UUID,
+    month_filter: Optional[int] = None,
+    season_filter: Optional[base.Season] = None,
+) -> Optional[tuple[Optional[observations.Station], dict[str, list]]]:
+    """Get the nearest station with measurements among those of a grid cell.
+
+    This does the same as `get_nearest_station_measurement_columns()`, except
+    that only the candidate stations which have been precomputed for the grid
+    cell that contains the point are considered, which avoids a spatial index
+    scan. It is done with a single query.
+
+    Returns `None` if the cell has not been stored, e.g. because grid cells have
+    not been computed for the variable yet. If none of the cell's stations has
+    measurements matching the filters, the returned station is `None`.
+    """
+    table_model, columns, order_by = _get_measurement_series_column_selection(
+        aggregation_type
+    )
+    measurement_filters = _get_measurement_series_filters(
+        table_model, variable_id, month_filter, season_filter
+    )
+    cell = (
+        sqlalchemy.select(observations.StationGridCell.station_ids)
+        .where(
+            observations.StationGridCell.variable_id == variable_id,
+            observations.StationGridCell.aggregation_type == aggregation_type,
+            observations.StationGridCell.cell_index == cell_index,
+        )
+        .subquery("cell")
+    )
+    nearest_station = sqlalchemy.orm.aliased(
+        observations.Station,
+        _select_nearest_station_with_measurements(
+            point_geom,
+            max_distance_meters,
+            table_model,
+            measurement_filters,
+            observations.Station.id == sqlalchemy.any_(cell.c.station_ids),
+        ).lateral("nearest_station"),
+    )
+    measurements = _select_lateral_measurement_columns(
+        nearest_station.id, table_model, columns, order_by, measurement_filters
+    )
+    statement = (
+        sqlalchemy.select(nearest_station, measurements)
+        .select_from(cell)
+        .outerjoin(nearest_station, sqlalchemy.true())
+        .outerjoin(measurements, sqlalchemy.true())
+    )
+    if (row := session.execute(statement).first()) is not None:
+        station, *values = row
+        result = (
+            station,
+            {
+                name: list(column_values or [])
+                for name, column_values in zip(columns, values)
+            },
+        )
+    else:
+        result = None
+    return result
+
+
+def _get_measurement_series_filters(
+    table_model: type[sqlmodel.SQLModel],
+    variable_id: uuid.UUID,
+    month_filter: Optional[int],
+    season_filter: Optional[base.Season],
+) -> list:
+    result = [table_model.variable_id == variable_id]
+    if month_filter is not None:
+        # this expression is indexed, see `observations.MonthlyMeasurement`
+        result.append(
+            sqlalchemy.extract("month", observations.MonthlyMeasurement.date)
+            == month_filter
+        )
+    if season_filter is not None:
+        result.append(observations.SeasonalMeasurement.season == season_filter)
+    return result
+
+
+def _select_nearest_station_with_measurements(
+    point_geom: shapely.Point,
+    max_distance_meters: float,
+    table_model: type[sqlmodel.SQLModel],
+    measurement_filters: list,
+    *station_filters,
+) -> sqlalchemy.Select:
+    # this expression is indexed, see `observations.Station`
+    station_geography = func.geography(observations.Station.geom)
+    point_geography = func.geography(
+        func.ST_GeomFromWKB(shapely.io.to_wkb(point_geom), 4326)
+    )
+    return (
+        sqlmodel.select(observations.Station)
+        .where(
+            *station_filters,
+            func.ST_DWithin(station_geography, point_geography, max_distance_meters),
+            sqlalchemy.exists().where(
+                table_model.station_id == observations.Station.id,
+                *measurement_filters,
+            ),
+        )
+        .order_by(station_geography.op("<->")(point_geography))
+        .limit(1)
+    )
+
+
+def _select_lateral_measurement_columns(
+    station_id,
+    table_model: type[sqlmodel.SQLModel],
+    columns: dict,
+    order_by: tuple,
+    measurement_filters: list,
+) -> sqlalchemy.Lateral:
+    return (
+        sqlalchemy.select(
+            *(
+                func.array_agg(postgresql.aggregate_order_by(column, *order_by)).label(
+                    name
+                )
+                for name, column in columns.items()
+            )
+        )
+        .where(table_model.station_id == station_id, *measurement_filters)
+        .lateral("measurements")
+    )
+
+
+def collect_all_stations_with_measurements(
+    session: sqlmodel.Session,
+    aggregation_type: base.ObservationAggregationType,
+    *,
+    variable_id: uuid.UUID,
+) -> Sequence[observations.Station]:
+    """Collect stations that have measurements of a variable."""
+    table_model, _, _ = _get_measurement_series_column_selection(aggregation_type)
+    statement = (
+        sqlmodel.select(observations.Station)
+        .where(
+            sqlalchemy.exists().where(
+                table_model.station_id == observations.Station.id,
+                table_model.variable_id == variable_id,
+            )
+        )
+        .order_by(observations.Station.code)
+    )
+    return session.exec(statement).all()
+
+
+def replace_station_grid_cells(
+    session: sqlmodel.Session,
+    aggregation_type: base.ObservationAggregationType,
+    *,
+    variable_id: uuid.UUID,
+    cells_to_create: Sequence[observations.StationGridCellCreate],
+    batch_size: int = DEFAULT_BULK_INSERT_BATCH_SIZE,
+) -> list[sqlalchemy.Row]:
+    """Replace the stored grid cells of a variable and aggregation type.
+
+    Existing cells are deleted and the new ones are created in the same
+    transaction, so that readers never see a partially refreshed grid.
+    """
+    table = observations.StationGridCell
+    session.execute(
+        sqlmodel.delete(table).where(
+            table.variable_id == variable_id,
+            table.aggregation_type == aggregation_type,
+        )
+    )
+    return _bulk_insert(
+        session,
+        sqlalchemy.insert(table).returning(table.id),
+        [cell_create.model_dump() for cell_create in cells_to_create],
+        batch_size=batch_size,
+    )
+
+
+def collect_measurement_columns(
+    session: sqlmodel.Session,
+    aggregation_type: base.ObservationAggregationType,
+    *,
+    series_filter: Optional[Sequence[tuple[uuid.UUID, uuid.UUID]]] = None,
+) -> dict[str, list]:
+    """Collect the measurements of many series as a mapping of columns.
+
+    This is the bulk counterpart of `get_measurement_series_columns()`. Besides
+    the keys described there, the returned mapping also has the ``station_id``
+    and ``variable_id`` of each measurement. Measurements are sorted by station,
+    variable and time. The optional `series_filter` restricts the result to the
+    given pairs of (station id, variable id).
+    """
+    table_model, columns, order_by = _get_measurement_series_column_selection(
+        aggregation_type
+    )
+    columns = {
+        "station_id": table_model.station_id,
+        "variable_id": table_model.variable_id,
+        **columns,
+    }
+    statement = sqlalchemy.select(
+        *(column.label(name) for name, column in columns.items())
+    ).order_by(table_model.station_id, table_model.variable_id, *order_by)
+    if series_filter is not None:
+        statement = statement.where(
+            sqlalchemy.tuple_(table_model.station_id, table_model.variable_id).in_(
+                series_filter
+            )
+        )
+    rows = session.execute(statement).all()
+    # transpose rows into columns
+    values = list(zip(*rows)) or [()] * len(columns)
+    return {name: list(column_values) for name, column_values in zip(columns, values)}
+
+
+def _get_measurement_series_column_selection(
+    aggregation_type: base.ObservationAggregationType,
+) -> tuple[type[sqlmodel.SQLModel], dict, tuple]:
+    """Return the table, columns and sort order of a measurement series."""
+    if aggregation_type == base.ObservationAggregationType.MONTHLY:
+        table_model = observations.MonthlyMeasurement
+        time_columns = {"date": table_model.date}
+        order_by = (table_model.date,)
+    elif aggregation_type == base.ObservationAggregationType.SEASONAL:
+        table_model = observations.SeasonalMeasurement
+        time_columns = {
+            "year": table_model.year,
+            "season": sqlalchemy.cast(table_model.season, sqlalchemy.String),
+        }
+        # postgres sorts enum values in the order they were declared
+        order_by = (table_model.year, table_model.season)
+    else:  # YEARLY
+        table_model = observations.YearlyMeasurement
+        time_columns = {"year": table_model.year}
+        order_by = (table_model.year,)
+    return table_model, {**time_columns, "value": table_model.value}, order_by
+
+
+def notify_observation_data_changed(session: sqlmodel.Session) -> None:
+    """Broadcast that observation measurements have been modified.
+
+    Web workers which keep an in-memory store of observations refresh it when
+    notified. As with `bump_coverage_metadata_version()`, this does not commit the
+    session and the notification is only delivered once it is committed.
+    """
+    session.execute(sqlmodel.select(func.pg_notify(OBSERVATION_DATA_CHANNEL, "")))
+
+
+def collect_all_harvest_watermarks(
+    session: sqlmodel.Session,
+    *,
+    aggregation_type_filter: Optional[base.ObservationAggregationType] = None,
+) -> Sequence[observations.HarvestWatermark]:
+    statement = sqlmodel.select(observations.HarvestWatermark)
+    if aggregation_type_filter is not None:
+        statement = statement.where(
+            observations.HarvestWatermark.aggregation_type == aggregation_type_filter
+        )
+    return session.exec(statement).all()
+
+
+def upsert_many_harvest_watermarks(
+    session: sqlmodel.Session,
+    watermarks_to_upsert: Sequence[observations.HarvestWatermarkCreate],
+    batch_size: int = DEFAULT_BULK_INSERT_BATCH_SIZE,
+) -> None:
+    """Create several harvest watermarks, or update existing ones.
+
+    Watermarks are matched by their station, variable, aggregation type and
+    period.
+    """
+    statement = postgresql.insert(observations.HarvestWatermark)
+    statement = statement.on_conflict_do_update(
+        constraint="uq_harvestwatermark_series",
+        set_={
+            "last_year": statement.excluded.last_year,
+            "payload_hash": statement.excluded.payload_hash,
+            "fetched_at": statement.excluded.fetched_at,
+        },
+    ).returning(observations.HarvestWatermark.id)
+    _bulk_insert(
+        session,
+        statement,
+        [
+            {**watermark.model_dump(), "id": uuid.uuid4()}
+            for watermark in watermarks_to_upsert
+        ],
+        batch_size=batch_size,
+    )
+
+
 def get_configuration_parameter_value(
     session: sqlmodel.Session, configuration_parameter_value_id: uuid.UUID
 ) -> Optional[coverages.ConfigurationParameterValue]:
@@ -709,7 +1258,7 @@ def get_configuration_parameter_value_by_names(
 def list_configuration_parameter_values(
     session: sqlmodel.Session,
     *,
-    limit: int = 20,
+    limit: Optional[int] = 20,
     offset: int = 0,
     include_total: bool = False,
     used_by_coverage_configuration: coverages.CoverageConfiguration | None = None,
@@ -726,8 +1275,9 @@ def list_configuration_parameter_values(
                 coverages.CoverageConfiguration.id == used_by_coverage_configuration.id
             )
         )
-    items = session.exec(statement.offset(offset).limit(limit)).all()
-    num_items = _get_total_num_records(session, statement) if include_total else None
+    items, num_items = _get_page(
+        session, statement, limit=limit, offset=offset, include_total=include_total
+    )
     return items, num_items
 
 
@@ -735,21 +1285,33 @@ def collect_all_configuration_parameter_values(
     session: sqlmodel.Session,
     used_by_coverage_configuration: coverages.CoverageConfiguration | None = None,
 ) -> Sequence[coverages.ConfigurationParameterValue]:
-    _, num_total = list_configuration_parameter_values(
-        session,
-        limit=1,
-        include_total=True,
-        used_by_coverage_configuration=used_by_coverage_configuration,
-    )
     result, _ = list_configuration_parameter_values(
         session,
-        limit=num_total,
+        limit=None,
         include_total=False,
         used_by_coverage_configuration=used_by_coverage_configuration,
     )
     return result
 
 
+def collect_configuration_parameter_values_by_parameter_names(
+    session: sqlmodel.Session, configuration_parameter_names: Sequence[str]
+) -> Sequence[coverages.ConfigurationParameterValue]:
+    """Collect all values of the input configuration parameters in a single query."""
+    statement = (
+        sqlmodel.select(coverages.ConfigurationParameterValue)
+        .join(coverages.ConfigurationParameter)
+        .where(coverages.ConfigurationParameter.name.in_(configuration_parameter_names))
+        .options(
+            sqlalchemy.orm.contains_eager(
+                coverages.ConfigurationParameterValue.configuration_parameter
+            )
+        )
+        .order_by(coverages.ConfigurationParameterValue.sort_order)
+    )
+    return session.exec(statement).all()
+
+
 def get_configuration_parameter(
     session: sqlmodel.Session, configuration_parameter_id: uuid.UUID
 ) -> Optional[coverages.ConfigurationParameter]:
@@ -774,7 +1336,7 @@ def get_configuration_parameter_by_name(
 def list_configuration_parameters(
     session: sqlmodel.Session,
     *,
-    limit: int = 20,
+    limit: Optional[int] = 20,
     offset: int = 0,
     include_total: bool = False,
     name_filter: str | None = None,
@@ -787,18 +1349,16 @@ def list_configuration_parameters(
         statement = _add_substring_filter(
             statement, name_filter, coverages.ConfigurationParameter.name
         )
-    items = session.exec(statement.offset(offset).limit(limit)).all()
-    num_items = _get_total_num_records(session, statement) if include_total else None
+    items, num_items = _get_page(
+        session, statement, limit=limit, offset=offset, include_total=include_total
+    )
     return items, num_items
 
 
 def collect_all_configuration_parameters(
     session: sqlmodel.Session,
 ) -> Sequence[coverages.ConfigurationParameter]:
-    _, num_total = list_configuration_parameters(session, limit=1, include_total=True)
-    result, _ = list_configuration_parameters(
-        session, limit=num_total, include_total=False
-    )
+    result, _ = list_configuration_parameters(session, limit=None, include_total=False)
     return result
 
 
@@ -845,6 +1405,7 @@ def create_configuration_parameter(
         db_configuration_parameter.allowed_values.append(db_conf_param_value)
         to_refresh.append(db_conf_param_value)
     session.add(db_configuration_parameter)
+    bump_coverage_metadata_version(session)
     session.commit()
     for item in to_refresh:
         session.refresh(item)
@@ -894,20 +1455,74 @@ def update_configuration_parameter(
         setattr(db_configuration_parameter, key, value)
     session.add(db_configuration_parameter)
     to_refresh.append(db_configuration_parameter)
+    bump_coverage_metadata_version(session)
     session.commit()
     for item in to_refresh:
         session.refresh(item)
     return db_configuration_parameter
 
 
+# Loader options for the coverage configuration object graph. Functions which
+# retrieve coverage configurations accept a `load_options` parameter, which lets
+# each call site eagerly load only the relationships that it is going to use.
+#
+# - `COVERAGE_CONFIGURATION_POSSIBLE_VALUES_LOADERS` loads the possible values,
+#   together with their configuration parameter value and configuration
+#   parameter. This is what is needed in order to generate coverage identifiers
+#   and to serialize coverage configurations in the API
+# - `COVERAGE_CONFIGURATION_DETAIL_LOADERS` additionally loads the related
+#   observation variable, the uncertainty bounds coverage configurations and
+#   the secondary coverage configurations
+COVERAGE_CONFIGURATION_POSSIBLE_VALUES_LOADERS: Final[
+    tuple[sqlalchemy.orm.interfaces.LoaderOption, ...]
+] = (
+    sqlalchemy.orm.selectinload(coverages.CoverageConfiguration.possible_values)
+    .joinedload(
+        coverages.ConfigurationParameterPossibleValue.configuration_parameter_value
+    )
+    .joinedload(coverages.ConfigurationParameterValue.configuration_parameter),
+)
+COVERAGE_CONFIGURATION_DETAIL_LOADERS: Final[
+    tuple[sqlalchemy.orm.interfaces.LoaderOption, ...]
+] = (
+    *COVERAGE_CONFIGURATION_POSSIBLE_VALUES_LOADERS,
+    sqlalchemy.orm.joinedload(
+        coverages.CoverageConfiguration.related_observation_variable
+    ),
+    sqlalchemy.orm.joinedload(
+        coverages.CoverageConfiguration.uncertainty_lower_bounds_coverage_configuration
+    ),
+    sqlalchemy.orm.joinedload(
+        coverages.CoverageConfiguration.uncertainty_upper_bounds_coverage_configuration
+    ),
+    sqlalchemy.orm.selectinload(
+        coverages.CoverageConfiguration.secondary_coverage_configurations
+    ).joinedload(
+        coverages.RelatedCoverageConfiguration.secondary_coverage_configuration
+    ),
+)
+
+
 def get_coverage_configuration(
-    session: sqlmodel.Session, coverage_configuration_id: uuid.UUID
+    session: sqlmodel.Session,
+    coverage_configuration_id: uuid.UUID,
+    load_options: Sequence[
+        sqlalchemy.orm.interfaces.LoaderOption
+    ] = COVERAGE_CONFIGURATION_POSSIBLE_VALUES_LOADERS,
 ) -> Optional[coverages.CoverageConfiguration]:
-    return session.get(coverages.CoverageConfiguration, coverage_configuration_id)
+    return session.get(
+        coverages.CoverageConfiguration,
+        coverage_configuration_id,
+        options=load_options,
+    )
 
 
 def get_coverage_configuration_by_name(
-    session: sqlmodel.Session, coverage_configuration_name: str
+    session: sqlmodel.Session,
+    coverage_configuration_name: str,
+    load_options: Sequence[
+        sqlalchemy.orm.interfaces.LoaderOption
+    ] = COVERAGE_CONFIGURATION_POSSIBLE_VALUES_LOADERS,
 ) -> Optional[coverages.CoverageConfiguration]:
     """Get a coverage configuration by its name.
 
@@ -915,9 +1530,9 @@ def get_coverage_configuration_by_name(
     identify it.
     """
     return session.exec(
-        sqlmodel.select(coverages.CoverageConfiguration).where(
-            coverages.CoverageConfiguration.name == coverage_configuration_name
-        )
+        sqlmodel.select(coverages.CoverageConfiguration)
+        .where(coverages.CoverageConfiguration.name == coverage_configuration_name)
+        .options(*load_options)
     ).first()
 
 
@@ -939,7 +1554,7 @@ def get_coverage(
 def list_coverage_configurations(
     session: sqlmodel.Session,
     *,
-    limit: int = 20,
+    limit: Optional[int] = 20,
     offset: int = 0,
     include_total: bool = False,
     name_filter: Optional[str] = None,
@@ -948,8 +1563,15 @@ def list_coverage_configurations(
     configuration_parameter_values_filter: Optional[
         list[coverages.ConfigurationParameterValue]
     ] = None,
+    load_options: Sequence[
+        sqlalchemy.orm.interfaces.LoaderOption
+    ] = COVERAGE_CONFIGURATION_POSSIBLE_VALUES_LOADERS,
 ) -> tuple[Sequence[coverages.CoverageConfiguration], Optional[int]]:
-    """List existing coverage configurations."""
+    """List existing coverage configurations.
+
+    The relationships mentioned in `load_options` are loaded eagerly, with a
+    fixed number of extra queries, regardless of the number of returned items.
+    """
     statement = sqlmodel.select(coverages.CoverageConfiguration).order_by(
         coverages.CoverageConfiguration.name
     )
@@ -970,57 +1592,28 @@ def list_coverage_configurations(
             coverages.CoverageConfiguration.display_name_italian,
         )
     if len(conf_params := configuration_parameter_values_filter or []) > 0:
-        possible_values_cte = (
-            sqlmodel.select(
-                coverages.CoverageConfiguration.id,
-                func.jsonb_agg(
-                    func.json_build_object(
-                        coverages.ConfigurationParameter.name,
-                        coverages.ConfigurationParameterValue.name,
-                    )
-                ).label("possible_values"),
-            )
-            .join(
-                coverages.ConfigurationParameterPossibleValue,
-                coverages.CoverageConfiguration.id
-                == coverages.ConfigurationParameterPossibleValue.coverage_configuration_id,
-            )
-            .join(
-                coverages.ConfigurationParameterValue,
-                coverages.ConfigurationParameterValue.id
-                == coverages.ConfigurationParameterPossibleValue.configuration_parameter_value_id,
-            )
-            .join(
-                coverages.ConfigurationParameter,
-                coverages.ConfigurationParameter.id
-                == coverages.ConfigurationParameterValue.configuration_parameter_id,
-            )
-            .group_by(coverages.CoverageConfiguration.id)
-        ).cte("cov_conf_possible_values")
-        statement = statement.join(
-            possible_values_cte,
-            possible_values_cte.c.id == coverages.CoverageConfiguration.id,
-        )
-        for conf_param_value in conf_params:
-            param_name = conf_param_value.configuration_parameter.name
-            param_value = conf_param_value.name
-            statement = statement.where(
-                func.jsonb_path_exists(
-                    possible_values_cte.c.possible_values,
-                    # the below expression is a fragment of SQL/JSON Path
-                    # language, which represents postgresql's way of filtering a
-                    # JSON array. More detail at:
-                    #
-                    # https://www.postgresql.org/docs/current/functions-json.html#FUNCTIONS-SQLJSON-PATH
-                    #
-                    # in this case it reads like:
-                    # return True if the current element of the array, which is an object, has a key named
-                    # `param_name` with a corresponding value of `param_value`
-                    f'$[*] ? (@.{param_name} == "{param_value}")',
-                )
-            )
-    items = session.exec(statement.offset(offset).limit(limit)).all()
-    num_items = _get_total_num_records(session, statement) if include_total else None
+        # relational division: keep the coverage configurations which have all of
+        # the requested values. This is resolved with an index-only scan of the
+        # possible values' (configuration_parameter_value_id,
+        # coverage_configuration_id) index
+        value_ids = {cpv.id for cpv in conf_params}
+        possible_value = coverages.ConfigurationParameterPossibleValue
+        matching_ids = (
+            sqlmodel.select(possible_value.coverage_configuration_id)
+            .where(possible_value.configuration_parameter_value_id.in_(value_ids))
+            .group_by(possible_value.coverage_configuration_id)
+            .having(func.count() == len(value_ids))
+        )
+        statement = statement.where(
+            coverages.CoverageConfiguration.id.in_(matching_ids)
+        )
+    items, num_items = _get_page(
+        session,
+        statement.options(*load_options),
+        limit=limit,
+        offset=offset,
+        include_total=include_total,
+    )
     return items, num_items
 
 
@@ -1032,28 +1625,51 @@ def collect_all_coverage_configurations(
     configuration_parameter_values_filter: Optional[
         list[coverages.ConfigurationParameterValue]
     ] = None,
+    load_options: Sequence[
+        sqlalchemy.orm.interfaces.LoaderOption
+    ] = COVERAGE_CONFIGURATION_POSSIBLE_VALUES_LOADERS,
 ) -> Sequence[coverages.CoverageConfiguration]:
-    _, num_total = list_coverage_configurations(
-        session,
-        limit=1,
-        include_total=True,
-        name_filter=name_filter,
-        english_display_name_filter=english_display_name_filter,
-        italian_display_name_filter=italian_display_name_filter,
-        configuration_parameter_values_filter=configuration_parameter_values_filter,
-    )
     result, _ = list_coverage_configurations(
         session,
-        limit=num_total,
+        limit=None,
         include_total=False,
         name_filter=name_filter,
         english_display_name_filter=english_display_name_filter,
         italian_display_name_filter=italian_display_name_filter,
         configuration_parameter_values_filter=configuration_parameter_values_filter,
+        load_options=load_options,
     )
     return result
 
 
+def collect_coverage_configurations_by_possible_values(
+    session: sqlmodel.Session,
+    required_values: Sequence[Sequence[coverages.ConfigurationParameterValue]],
+) -> Sequence[coverages.CoverageConfiguration]:
+    """Collect coverage configurations which use some value of each input group.
+
+    Matching is done in a single query and the possible values of the returned
+    coverage configurations are loaded eagerly.
+    """
+    possible_value = coverages.ConfigurationParameterPossibleValue
+    statement = (
+        sqlmodel.select(coverages.CoverageConfiguration)
+        .order_by(coverages.CoverageConfiguration.name)
+        .options(*COVERAGE_CONFIGURATION_POSSIBLE_VALUES_LOADERS)
+    )
+    for group in required_values:
+        statement = statement.where(
+            coverages.CoverageConfiguration.id.in_(
+                sqlmodel.select(possible_value.coverage_configuration_id).where(
+                    possible_value.configuration_parameter_value_id.in_(
+                        [v.id for v in group]
+                    )
+                )
+            )
+        )
+    return session.exec(statement).all()
+
+
 def create_coverage_configuration(
     session: sqlmodel.Session,
     coverage_configuration_create: coverages.CoverageConfigurationCreate,
@@ -1117,6 +1733,7 @@ def create_coverage_configuration(
                 f"Configuration parameter value with id "
                 f"{possible.configuration_parameter_value_id} does not exist"
             )
+    bump_coverage_metadata_version(session)
     session.commit()
     for item in to_refresh:
         session.refresh(item)
@@ -1199,6 +1816,7 @@ def update_coverage_configuration(
         setattr(db_coverage_configuration, key, value)
     session.add(db_coverage_configuration)
     to_refresh.append(db_coverage_configuration)
+    bump_coverage_metadata_version(session)
     session.commit()
     for item in to_refresh:
         session.refresh(item)
@@ -1214,11 +1832,93 @@ def delete_coverage_configuration(
     )
     if db_coverage_configuration is not None:
         session.delete(db_coverage_configuration)
+        bump_coverage_metadata_version(session)
         session.commit()
     else:
         raise RuntimeError("Coverage configuration not found")
 
 
+def get_coverage_metadata_version(session: sqlmodel.Session) -> int:
+    db_version = session.get(coverages.CoverageMetadataVersion, 1)
+    return db_version.version if db_version is not None else 0
+
+
+def bump_coverage_metadata_version(session: sqlmodel.Session) -> int:
+    """Increment the coverage metadata version and broadcast the new value.
+
+    This does not commit the session - it is meant to be called as part of the
+    same transaction that modifies coverage metadata. Since Postgres only
+    delivers notifications once the transaction is committed, listeners are
+    never told about changes which end up being rolled back.
+    """
+    table = coverages.CoverageMetadataVersion
+    statement = (
+        postgresql.insert(table)
+        .values(id=1, version=1)
+        .on_conflict_do_update(
+            index_elements=[table.id], set_={"version": table.version + 1}
+        )
+        .returning(table.version)
+    )
+    new_version = session.execute(statement).scalar_one()
+    session.execute(
+        sqlmodel.select(func.pg_notify(COVERAGE_METADATA_CHANNEL, str(new_version)))
+    )
+    return new_version
+
+
+def collect_all_climate_barometer_series(
+    session: sqlmodel.Session,
+    smoothing_strategies: Optional[Sequence[base.CoverageDataSmoothingStrategy]] = None,
+    include_uncertainty: bool = True,
+) -> Sequence[coverages.ClimateBarometerSeries]:
+    """Collect stored climate barometer series, ordered by their coverage."""
+    table = coverages.ClimateBarometerSeries
+    statement = sqlmodel.select(table).order_by(table.sort_order, table.id)
+    if smoothing_strategies is not None:
+        statement = statement.where(
+            table.smoothing_strategy.in_([s.value for s in smoothing_strategies])
+        )
+    if not include_uncertainty:
+        statement = statement.where(table.is_uncertainty.is_(False))
+    return session.exec(statement).all()
+
+
+def replace_climate_barometer_series(
+    session: sqlmodel.Session,
+    series_to_create: Sequence[coverages.ClimateBarometerSeriesCreate],
+    batch_size: int = DEFAULT_BULK_INSERT_BATCH_SIZE,
+) -> list[sqlalchemy.Row]:
+    """Replace all stored climate barometer series with the input ones.
+
+    Existing series are deleted and the new ones are created in the same
+    transaction, so that readers never see a partially refreshed store.
+    Returns the id, coverage identifier, smoothing strategy and number of values
+    of each created series.
+    """
+    table = coverages.ClimateBarometerSeries
+    updated_at = dt.datetime.now(dt.timezone.utc)
+    session.execute(sqlmodel.delete(table))
+    return _bulk_insert(
+        session,
+        sqlalchemy.insert(table).returning(
+            table.id,
+            table.coverage_identifier,
+            table.smoothing_strategy,
+            sqlalchemy.func.cardinality(table.values).label("num_values"),
+        ),
+        [
+            {
+                **series_create.model_dump(exclude={"smoothing_strategy"}),
+                "smoothing_strategy": series_create.smoothing_strategy.value,
+                "updated_at": updated_at,
+            }
+            for series_create in series_to_create
+        ],
+        batch_size=batch_size,
+    )
+
+
 def generate_coverage_identifiers(
     coverage_configuration: coverages.CoverageConfiguration,
     configuration_parameter_values_filter: Optional[
@@ -1226,7 +1926,62 @@ def generate_coverage_identifiers(
     ] = None,
 ) -> list[str]:
     """Build list of legal coverage identifiers for a coverage configuration."""
+    values_to_combine = _get_coverage_identifier_parts(
+        coverage_configuration, configuration_parameter_values_filter
+    )
+    allowed_identifiers = []
+    for combination in itertools.product(*values_to_combine):
+        dataset_id = "-".join((coverage_configuration.name, *combination))
+        allowed_identifiers.append(dataset_id)
+    return allowed_identifiers
+
+
+def count_coverage_identifiers(
+    coverage_configuration: coverages.CoverageConfiguration,
+    configuration_parameter_values_filter: Optional[
+        list[coverages.ConfigurationParameterValue]
+    ] = None,
+) -> int:
+    """Count legal coverage identifiers of a coverage configuration.
+
+    This is equivalent to `len(generate_coverage_identifiers())`, but it does not
+    build the identifiers.
+    """
+    return math.prod(
+        len(part)
+        for part in _get_coverage_identifier_parts(
+            coverage_configuration, configuration_parameter_values_filter
+        )
+    )
+
 
+def iter_sorted_coverage_identifiers(
+    coverage_configuration: coverages.CoverageConfiguration,
+    configuration_parameter_values_filter: Optional[
+        list[coverages.ConfigurationParameterValue]
+    ] = None,
+) -> Iterator[str]:
+    """Lazily generate legal coverage identifiers, in lexicographic order.
+
+    Configuration parameter values only use characters which sort after the `-`
+    separator, so combining sorted values yields sorted identifiers.
+    """
+    values_to_combine = [
+        sorted(part)
+        for part in _get_coverage_identifier_parts(
+            coverage_configuration, configuration_parameter_values_filter
+        )
+    ]
+    for combination in itertools.product(*values_to_combine):
+        yield "-".join((coverage_configuration.name, *combination))
+
+
+def _get_coverage_identifier_parts(
+    coverage_configuration: coverages.CoverageConfiguration,
+    configuration_parameter_values_filter: Optional[
+        list[coverages.ConfigurationParameterValue]
+    ] = None,
+) -> list[list[str]]:
     params_to_filter = {}
     for cpv in configuration_parameter_values_filter or []:
         values = params_to_filter.setdefault(cpv.configuration_parameter.name, [])
@@ -1250,20 +2005,16 @@ def generate_coverage_identifiers(
         values_to_combine.append(part_values)
     # account for the possibility that there is an error in the
     # coverage_id_pattern, where some of the parts are not actually configured
-    allowed_identifiers = []
     for index, container in enumerate(values_to_combine):
         if len(container) == 0:
             values_to_combine[index] = [pattern_parts[index]]
-    for combination in itertools.product(*values_to_combine):
-        dataset_id = "-".join((coverage_configuration.name, *combination))
-        allowed_identifiers.append(dataset_id)
-    return allowed_identifiers
+    return values_to_combine
 
 
 def list_municipality_centroids(
     session: sqlmodel.Session,
     *,
-    limit: int = 20,
+    limit: Optional[int] = 20,
     offset: int = 0,
     include_total: bool = False,
     polygon_intersection_filter: shapely.Polygon = None,
@@ -1300,8 +2051,9 @@ def list_municipality_centroids(
                 ),
             )
         )
-    items = session.exec(statement.offset(offset).limit(limit)).all()
-    num_items = _get_total_num_records(session, statement) if include_total else None
+    items, num_items = _get_page(
+        session, statement, limit=limit, offset=offset, include_total=include_total
+    )
     return [
         municipalities.MunicipalityCentroid(
             id=i.id,
@@ -1320,7 +2072,7 @@ def list_municipality_centroids(
 def list_municipalities(
     session: sqlmodel.Session,
     *,
-    limit: int = 20,
+    limit: Optional[int] = 20,
     offset: int = 0,
     include_total: bool = False,
     polygon_intersection_filter: shapely.Polygon = None,
@@ -1365,42 +2117,60 @@ def list_municipalities(
                 func.ST_GeomFromWKB(shapely.io.to_wkb(point_filter), 4326),
             )
         )
-    items = session.exec(statement.offset(offset).limit(limit)).all()
-    num_items = _get_total_num_records(session, statement) if include_total else None
+    items, num_items = _get_page(
+        session, statement, limit=limit, offset=offset, include_total=include_total
+    )
     return items, num_items
 
 
+def get_municipalities(
+    session: sqlmodel.Session, municipality_ids: Sequence[uuid.UUID]
+) -> list[municipalities.Municipality]:
+    """Get municipalities by their ids, in the same order as the input ids.
+
+    Ids which do not exist in the database are ignored.
+    """
+    statement = sqlmodel.select(municipalities.Municipality).where(
+        municipalities.Municipality.id.in_(municipality_ids)
+    )
+    found = {m.id: m for m in session.exec(statement).all()}
+    return [found[id_] for id_ in municipality_ids if id_ in found]
+
+
 def collect_all_municipalities(
     session: sqlmodel.Session,
 ) -> Sequence[municipalities.Municipality]:
-    _, num_total = list_municipalities(session, limit=1, include_total=True)
-    result, _ = list_municipalities(session, limit=num_total, include_total=False)
+    result, _ = list_municipalities(session, limit=None, include_total=False)
     return result
 
 
 def create_many_municipalities(
     session: sqlmodel.Session,
     municipalities_to_create: Sequence[municipalities.MunicipalityCreate],
-) -> list[municipalities.Municipality]:
-    """Create several municipalities."""
-    db_records = []
-    for mun_create in municipalities_to_create:
-        geom = shapely.io.from_geojson(mun_create.geom.model_dump_json())
-        wkbelement = from_shape(geom)
-        db_mun = municipalities.Municipality(
-            **mun_create.model_dump(exclude={"geom"}),
-            geom=wkbelement,
-        )
-        db_records.append(db_mun)
-        session.add(db_mun)
-    try:
-        session.commit()
-    except sqlalchemy.exc.DBAPIError:
-        raise
-    else:
-        for db_record in db_records:
-            session.refresh(db_record)
-        return db_records
+    batch_size: int = DEFAULT_BULK_INSERT_BATCH_SIZE,
+) -> list[sqlalchemy.Row]:
+    """Create several municipalities.
+
+    Municipalities are inserted in batches of multi-row INSERT statements and
+    the returned rows only hold their `id` and `name`.
+    """
+    return _bulk_insert(
+        session,
+        sqlalchemy.insert(municipalities.Municipality).returning(
+            municipalities.Municipality.id, municipalities.Municipality.name
+        ),
+        [
+            {
+                **mun_create.model_dump(exclude={"geom"}),
+                "id": uuid.uuid4(),
+                "geom": from_shape(
+                    shapely.io.from_geojson(mun_create.geom.model_dump_json())
+                ),
+            }
+            for mun_create in municipalities_to_create
+        ],
+        batch_size=batch_size,
+    )
 
 
 def delete_all_municipalities(session: sqlmodel.Session) -> None:
@@ -1515,6 +2285,160 @@ def ensure_uncertainty_type_configuration_parameters_exist(
     return lower_bound_value, upper_bound_value
 
 
+def count_all_records(
+    session: sqlmodel.Session, table_model: type[sqlmodel.SQLModel]
+) -> int:
+    """Return the total number of records of a table, without any filtering.
+
+    Counts are cached per table in the current process. The cache is invalidated
+    whenever a session commits the creation or deletion of any record and, in
+    order to also pick up changes made by other processes, each count is
+    discarded after `_RECORD_COUNT_MAX_AGE_SECONDS`.
+    """
+    table_name = table_model.__tablename__
+    now = time.monotonic()
+    with _RECORD_COUNTS_LOCK:
+        cached = _RECORD_COUNTS.get(table_name)
+    if cached is not None and now - cached[1] < _RECORD_COUNT_MAX_AGE_SECONDS:
+        result = cached[0]
+    else:
+        result = session.exec(
+            sqlmodel.select(func.count()).select_from(table_model)
+        ).one()
+        with _RECORD_COUNTS_LOCK:
+            _RECORD_COUNTS[table_name] = (result, now)
+    return result
+
+
+def invalidate_record_counts() -> None:
+    """Discard all cached table record counts."""
+    with _RECORD_COUNTS_LOCK:
+        _RECORD_COUNTS.clear()
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_flush")
+def _track_record_count_changes(session: sqlalchemy.orm.Session, flush_context):
+    if len(session.new) > 0 or len(session.deleted) > 0:
+        session.info[_RECORD_COUNTS_CHANGED_KEY] = True
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "do_orm_execute")
+def _track_bulk_record_count_changes(orm_execute_state: sqlalchemy.orm.ORMExecuteState):
+    if orm_execute_state.is_insert or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_RECORD_COUNTS_CHANGED_KEY] = True
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_commit")
+def _invalidate_changed_record_counts(session: sqlalchemy.orm.Session):
+    if session.info.pop(_RECORD_COUNTS_CHANGED_KEY, False):
+        invalidate_record_counts()
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_rollback")
+def _forget_record_count_changes(session: sqlalchemy.orm.Session):
+    session.info.pop(_RECORD_COUNTS_CHANGED_KEY, None)
+
+
+def _get_page(
+    session: sqlmodel.Session,
+    statement,
+    *,
+    limit: Optional[int],
+    offset: int,
+    include_total: bool,
+    keyset: Optional[tuple] = None,
+    cursor: Optional[tuple] = None,
+) -> tuple[Sequence, Optional[int]]:
+    """Fetch a page of results and, optionally, the total number of results.
+
+    The total is fetched together with the page, by means of a window function.
+    It is only computed in a separate query when the page is past the end of the
+    results, as then there is no row to carry it.
+
+    When a `cursor` is provided, the page is made of the records whose `keyset`
+    columns sort after the `cursor` values, and `offset` is ignored. The keyset
+    columns must match the statement's ordering, so that the database can seek
+    directly to the start of the page via an index. The total then needs its own
+    query, since the page query only sees the records after the cursor.
+    """
+    if cursor is not None:
+        items = session.exec(
+            statement.where(
+                sqlalchemy.tuple_(*keyset) > sqlalchemy.tuple_(*cursor)
+            ).limit(limit)
+        ).all()
+        total = _get_total_num_records(session, statement) if include_total else None
+    elif include_total:
+        rows = session.execute(
+            statement.add_columns(func.count().over()).offset(offset).limit(limit)
+        ).all()
+        items = [row[0] for row in rows]
+        if len(rows) > 0:
+            total = rows[0][1]
+        elif offset > 0:
+            total = _get_total_num_records(session, statement)
+        else:
+            total = 0
+    else:
+        items = session.exec(statement.offset(offset).limit(limit)).all()
+        total = None
+    return items, total
+
+
+def _bulk_insert(
+    session: sqlmodel.Session,
+    statement: sqlalchemy.Insert,
+    values: Sequence[dict],
+    *,
+    batch_size: int,
+) -> list[sqlalchemy.Row]:
+    """Execute an INSERT statement with one multi-row VALUES clause per batch.
+
+    This skips the ORM unit of work, which would otherwise issue an INSERT and,
+    after committing, a SELECT for each record. All batches are committed
+    together and the rows produced by the statement's RETURNING clause are
+    returned.
+    """
+    if batch_size < 1:
+        raise ValueError(f"Invalid batch size: {batch_size!r}")
+    created = []
+    for start in range(0, len(values), batch_size):
+        batch = values[start : start + batch_size]
+        created.extend(session.execute(statement.values(batch)).all())
+    session.commit()
+    return created
+
+
+def _upsert_measurements(
+    session: sqlmodel.Session,
+    table_model: type[sqlmodel.SQLModel],
+    natural_key: Sequence[str],
+    measurements: Sequence[sqlmodel.SQLModel],
+    batch_size: int,
+) -> list[sqlalchemy.Row]:
+    # a single INSERT ... ON CONFLICT DO UPDATE statement cannot affect the same
+    # row twice, so only the last of any repeated measurements is kept
+    unique_measurements = {
+        tuple(getattr(measurement, name) for name in natural_key): measurement
+        for measurement in measurements
+    }
+    statement = postgresql.insert(table_model)
+    statement = statement.on_conflict_do_update(
+        index_elements=natural_key,
+        set_={"value": statement.excluded.value},
+        where=table_model.value.is_distinct_from(statement.excluded.value),
+    ).returning(*table_model.__table__.columns)
+    return _bulk_insert(
+        session,
+        statement,
+        [
+            {**measurement.model_dump(), "id": uuid.uuid4()}
+            for measurement in unique_measurements.values()
+        ],
+        batch_size=batch_size,
+    )
+
+
 def _get_total_num_records(session: sqlmodel.Session, statement):
     return session.exec(
         sqlmodel.select(sqlmodel.func.count()).select_from(statement)
@@ -1,8 +1,16 @@
 import dataclasses
 import datetime as dt
+import functools
 import logging
+import os
+import tempfile
+import time
+from collections.abc import AsyncIterator
+from pathlib import Path
 from typing import Optional
 
+import anyio
+import anyio.to_thread
 import httpx
 import numpy as np
 import shapely
@@ -20,37 +28,259 @@ from .thredds import (
 logger = logging.getLogger(__name__)
 
 
+_PARTIAL_DOWNLOAD_SUFFIX = ".part"
+
+# Downloads which are currently being streamed from THREDDS and written to the
+# cache, indexed by their cache key. This is used for making concurrent requests
+# for the same data wait for the first download to finish instead of also
+# querying THREDDS. It is scoped to the current worker process.
+_IN_FLIGHT_DOWNLOADS: dict[str, anyio.Event] = {}
+
+# monotonic time of the last cache eviction run, which is used for throttling
+# evictions
+_LAST_EVICTION: Optional[float] = None
+
+
+async def get_cached_coverage_data(
+    settings: config.ArpavPpcvSettings,
+    cache_key: str,
+) -> Optional[Path]:
+    """Return the path to the cached coverage data, if it exists.
+
+    If the same data is currently being downloaded by another request, this waits
+    for that download to finish before looking up the cache.
+
+    Finding a cached file also marks it as having been recently used, which is
+    relevant for the cache's LRU eviction policy.
+    """
+    download_settings = settings.coverage_download_settings
+    if (cache_dir := download_settings.cache_dir) is None:
+        return None
+    if (in_flight := _IN_FLIGHT_DOWNLOADS.get(cache_key)) is not None:
+        logger.debug(f"Waiting for in-flight download of {cache_key!r}...")
+        with anyio.move_on_after(
+            download_settings.cache_in_flight_wait_timeout_seconds
+        ) as cancel_scope:
+            await in_flight.wait()
+        if cancel_scope.cancelled_caught:
+            # the other download is either stuck or it has been abandoned without
+            # being released (e.g. the client disconnected before the response
+            # started streaming), so stop tracking it
+            logger.debug(f"Timed out waiting for in-flight download of {cache_key!r}")
+            release_in_flight_download(cache_key, in_flight)
+    return await anyio.to_thread.run_sync(_touch_cached_file, cache_dir / cache_key)
+
+
+def register_in_flight_download(cache_key: str) -> Optional[anyio.Event]:
+    """Register a download of coverage data as being in flight.
+
+    Returns `None` if there is already an in-flight download for the same
+    cache key. Callers must release the returned event with
+    `release_in_flight_download()`, which `stream_and_cache_coverage_data()`
+    does when it finishes.
+
+    This function is not async on purpose - calling it right after a cache miss
+    ensures no other request is able to register the same download in between.
+    """
+    if cache_key in _IN_FLIGHT_DOWNLOADS:
+        return None
+    _IN_FLIGHT_DOWNLOADS[cache_key] = anyio.Event()
+    return _IN_FLIGHT_DOWNLOADS[cache_key]
+
+
+def release_in_flight_download(
+    cache_key: str, in_flight: Optional[anyio.Event]
+) -> None:
+    """Mark an in-flight download as finished, waking up any waiting requests."""
+    if in_flight is not None:
+        in_flight.set()
+        if _IN_FLIGHT_DOWNLOADS.get(cache_key) is in_flight:
+            del _IN_FLIGHT_DOWNLOADS[cache_key]
+
+
+def _touch_cached_file(cache_path: Path) -> Optional[Path]:
+    result = None
+    if cache_path.is_file():
+        logger.debug(f"Found cached data at {cache_path!r}...")
+        try:
+            os.utime(cache_path)
+        except FileNotFoundError:
+            # file has been evicted in the meantime
+            logger.debug(f"cached file {cache_path!r} is no longer available")
+        else:
+            result = cache_path
+    return result
+
+
 async def retrieve_coverage_data(
     settings: config.ArpavPpcvSettings,
     http_client: httpx.AsyncClient,
-    cache_key: str,
     coverage: coverages.CoverageInternal,
     bbox: shapely.Polygon | None,
     temporal_range: tuple[Optional[dt.datetime], Optional[dt.datetime]],
-):
-    if (
-        cache_path := settings.coverage_download_settings.cache_dir / cache_key
-    ).is_file():
-        logger.debug(f"Found cached data at {cache_path!r}...")
-    else:
-        logger.debug("Retrieving data from THREDDS server...")
-        ds_fragment = crawler.get_thredds_url_fragment(
-            coverage, settings.thredds_server.base_url
+) -> httpx.Response:
+    """Retrieve coverage data from the THREDDS server.
+
+    The returned response is a streaming response, which must be closed by the
+    caller.
+    """
+    logger.debug("Retrieving data from THREDDS server...")
+    ds_fragment = crawler.get_thredds_url_fragment(
+        coverage, settings.thredds_server.base_url
+    )
+    ncss_url = "/".join(
+        (
+            settings.thredds_server.base_url,
+            settings.thredds_server.netcdf_subset_service_url_fragment,
+            ds_fragment,
         )
-        ncss_url = "/".join(
-            (
-                settings.thredds_server.base_url,
-                settings.thredds_server.netcdf_subset_service_url_fragment,
-                ds_fragment,
+    )
+    logger.debug(f"{ncss_url=}")
+    return await ncss.async_query_dataset_area(
+        http_client,
+        ncss_url,
+        bbox=bbox,
+        temporal_range=temporal_range,
+    )
+
+
+async def stream_and_cache_coverage_data(
+    settings: config.ArpavPpcvSettings,
+    response: httpx.Response,
+    cache_key: str,
+    in_flight: Optional[anyio.Event] = None,
+) -> AsyncIterator[bytes]:
+    """Stream the THREDDS response while also writing it to the cache.
+
+    Data is written to a temporary file, which only gets moved into its final
+    cache location after the whole response has been received. This ensures
+    that interrupted downloads never result in an incomplete file being
+    served from the cache.
+
+    The `in_flight` event, as returned by `register_in_flight_download()`, is
+    released once streaming is done, regardless of whether it succeeded.
+    """
+    download_settings = settings.coverage_download_settings
+    should_cache = (
+        download_settings.cache_dir is not None
+        and response.status_code == httpx.codes.OK
+    )
+    if not should_cache:
+        try:
+            async for chunk in response.aiter_bytes():
+                yield chunk
+        finally:
+            release_in_flight_download(cache_key, in_flight)
+            await response.aclose()
+    else:
+        cache_path = download_settings.cache_dir / cache_key
+        temp_path = None
+        try:
+            temp_path = await anyio.to_thread.run_sync(_create_temp_file, cache_path)
+            async with await anyio.open_file(temp_path, "wb") as fh:
+                async for chunk in response.aiter_bytes():
+                    await fh.write(chunk)
+                    yield chunk
+            await anyio.to_thread.run_sync(os.replace, temp_path, cache_path)
+            logger.debug(f"Stored coverage data in cache at {cache_path!r}")
+            release_in_flight_download(cache_key, in_flight)
+            await _maybe_evict_cached_coverage_data(
+                download_settings, exclude=cache_path
+            )
+        finally:
+            release_in_flight_download(cache_key, in_flight)
+            with anyio.CancelScope(shield=True):
+                if temp_path is not None:
+                    await anyio.to_thread.run_sync(
+                        functools.partial(temp_path.unlink, missing_ok=True)
+                    )
+                await response.aclose()
+
+
+def _create_temp_file(cache_path: Path) -> Path:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, raw_temp_path = tempfile.mkstemp(
+        dir=cache_path.parent,
+        prefix=f".{cache_path.name}.",
+        suffix=_PARTIAL_DOWNLOAD_SUFFIX,
+    )
+    os.close(fd)
+    return Path(raw_temp_path)
+
+
+async def _maybe_evict_cached_coverage_data(
+    download_settings: config.CoverageDownloadSettings,
+    exclude: Optional[Path] = None,
+) -> None:
+    # walking the whole cache directory is relatively expensive, so evictions
+    # are throttled to run at most once per configured interval
+    global _LAST_EVICTION
+    now = time.monotonic()
+    if (
+        _LAST_EVICTION is None
+        or now - _LAST_EVICTION >= download_settings.cache_eviction_interval_seconds
+    ):
+        _LAST_EVICTION = now
+        await anyio.to_thread.run_sync(
+            functools.partial(
+                evict_cached_coverage_data,
+                download_settings.cache_dir,
+                download_settings.cache_max_size_bytes,
+                download_settings.cache_max_age_days,
+                exclude=exclude,
             )
         )
-        logger.debug(f"{ncss_url=}")
-        return await ncss.async_query_dataset_area(
-            http_client,
-            ncss_url,
-            bbox=bbox,
-            temporal_range=temporal_range,
-        )
+
+
+def evict_cached_coverage_data(
+    cache_dir: Path,
+    max_size_bytes: int,
+    max_age_days: Optional[int] = None,
+    exclude: Optional[Path] = None,
+) -> list[Path]:
+    """Remove cached files in order to keep the cache within its limits.
+
+    Files that have not been used for longer than `max_age_days` are removed
+    first. Then, if the cache is still larger than `max_size_bytes`, the least
+    recently used files are removed until it fits. A file's modification time
+    is used for tracking its last usage. The `exclude` path, if provided, is
+    never evicted, although its size still counts towards the cache size.
+    """
+    entries = []
+    for path in cache_dir.rglob("*.nc"):
+        try:
+            stat_result = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat_result.st_mtime, stat_result.st_size, path))
+    entries.sort()
+    to_evict = []
+    if max_age_days is not None:
+        oldest_allowed = time.time() - max_age_days * 24 * 60 * 60
+        remaining = []
+        for entry in entries:
+            if entry[0] < oldest_allowed and entry[2] != exclude:
+                to_evict.append(entry)
+            else:
+                remaining.append(entry)
+        entries = remaining
+    total_size = sum(e[1] for e in entries)
+    for entry in entries:
+        if total_size <= max_size_bytes:
+            break
+        if entry[2] == exclude:
+            continue
+        to_evict.append(entry)
+        total_size -= entry[1]
+    evicted = []
+    for _, _, path in to_evict:
+        logger.debug(f"Evicting {path!r} from the coverage data cache...")
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        evicted.append(path)
+    return evicted
 
 
 def get_cache_key(
@@ -107,6 +337,39 @@ class CoverageDownloadGrid:
                 pols.append(pol)
         return shapely.MultiPolygon(pols)
 
+    @property
+    def cell_bounds(self) -> np.ndarray:
+        """Return the (min x, min y, max x, max y) of each cell, by cell index."""
+        min_x, min_y = np.meshgrid(self.xx[:-1], self.yy[:-1])
+        max_x, max_y = np.meshgrid(self.xx[1:], self.yy[1:])
+        return np.column_stack(
+            [min_x.ravel(), min_y.ravel(), max_x.ravel(), max_y.ravel()]
+        )
+
+    def get_cell_index(self, point: shapely.Point) -> Optional[int]:
+        """Return the index of the grid cell which contains the input point.
+
+        Cells are numbered row by row, starting from the one with the lowest
+        coordinates. Points outside the grid do not have a cell.
+        """
+        num_cols = self.xx.size - 1
+        num_rows = self.yy.size - 1
+        # points on the grid's upper edges belong to the last column/row
+        col = min(
+            int(np.searchsorted(self.xx, point.x, side="right")) - 1, num_cols - 1
+        )
+        row = min(
+            int(np.searchsorted(self.yy, point.y, side="right")) - 1, num_rows - 1
+        )
+        if (
+            self.xx[0] <= point.x <= self.xx[-1]
+            and self.yy[0] <= point.y <= self.yy[-1]
+        ):
+            result = row * num_cols + col
+        else:
+            result = None
+        return result
+
     @classmethod
     def from_config(cls, grid_conf: config.CoverageDownloadSpatialGrid):
         return cls(
@@ -0,0 +1,32 @@
+"""add coverage metadata version
+
+Revision ID: 9a1f3c2b7d45
+Revises: 4df282a0319d
+Create Date: 2026-10-17 10:12:41.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a1f3c2b7d45'
+down_revision: Union[str, None] = '4df282a0319d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    table = op.create_table('coveragemetadataversion',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(table, [{'id': 1, 'version': 0}])
+
+
+def downgrade() -> None:
+    op.drop_table('coveragemetadataversion')
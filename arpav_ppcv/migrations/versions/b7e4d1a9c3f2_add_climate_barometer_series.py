@@ -0,0 +1,38 @@
+"""add climate barometer series
+
+Revision ID: b7e4d1a9c3f2
+Revises: 9a1f3c2b7d45
+Create Date: 2026-10-17 14:03:27.519284
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4d1a9c3f2'
+down_revision: Union[str, None] = '9a1f3c2b7d45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('climatebarometerseries',
+    sa.Column('times', postgresql.ARRAY(sa.DateTime()), nullable=False),
+    sa.Column('values', postgresql.ARRAY(sa.Float()), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('coverage_identifier', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('smoothing_strategy', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('is_uncertainty', sa.Boolean(), nullable=False),
+    sa.Column('sort_order', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('coverage_identifier', 'smoothing_strategy')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('climatebarometerseries')
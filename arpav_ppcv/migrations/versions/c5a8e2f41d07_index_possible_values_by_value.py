@@ -0,0 +1,27 @@
+"""index possible values by value
+
+Revision ID: c5a8e2f41d07
+Revises: b7e4d1a9c3f2
+Create Date: 2026-10-17 15:21:09.114502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a8e2f41d07'
+down_revision: Union[str, None] = 'b7e4d1a9c3f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_configurationparameterpossiblevalue_value_id_cov_conf_id', 'configurationparameterpossiblevalue', ['configuration_parameter_value_id', 'coverage_configuration_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_configurationparameterpossiblevalue_value_id_cov_conf_id', table_name='configurationparameterpossiblevalue')
@@ -0,0 +1,31 @@
+"""index measurements for keyset pagination
+
+Revision ID: d91b6f3a2e58
+Revises: c5a8e2f41d07
+Create Date: 2026-10-17 17:02:44.381207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91b6f3a2e58'
+down_revision: Union[str, None] = 'c5a8e2f41d07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_monthlymeasurement_date_id', 'monthlymeasurement', ['date', 'id'], unique=False)
+    op.create_index('ix_seasonalmeasurement_year_id', 'seasonalmeasurement', ['year', 'id'], unique=False)
+    op.create_index('ix_yearlymeasurement_year_id', 'yearlymeasurement', ['year', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_yearlymeasurement_year_id', table_name='yearlymeasurement')
+    op.drop_index('ix_seasonalmeasurement_year_id', table_name='seasonalmeasurement')
+    op.drop_index('ix_monthlymeasurement_date_id', table_name='monthlymeasurement')
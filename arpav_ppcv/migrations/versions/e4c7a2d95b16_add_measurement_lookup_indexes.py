@@ -0,0 +1,45 @@
+"""add measurement lookup indexes and natural key constraints
+
+Revision ID: e4c7a2d95b16
+Revises: d91b6f3a2e58
+Create Date: 2026-10-17 18:11:37.540913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4c7a2d95b16'
+down_revision: Union[str, None] = 'd91b6f3a2e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_NATURAL_KEYS = {
+    'monthlymeasurement': ('uq_monthlymeasurement_station_variable_date', ['station_id', 'variable_id', 'date']),
+    'seasonalmeasurement': ('uq_seasonalmeasurement_station_variable_season_year', ['station_id', 'variable_id', 'season', 'year']),
+    'yearlymeasurement': ('uq_yearlymeasurement_station_variable_year', ['station_id', 'variable_id', 'year']),
+}
+
+
+def upgrade() -> None:
+    for table_name, (constraint_name, columns) in _NATURAL_KEYS.items():
+        # remove duplicate measurements, which would prevent creating the
+        # constraint, keeping a single record for each natural key
+        op.execute(
+            f"DELETE FROM {table_name} AS a USING {table_name} AS b "
+            f"WHERE a.id > b.id AND "
+            + " AND ".join(f"a.{c} = b.{c}" for c in columns)
+        )
+        op.create_unique_constraint(constraint_name, table_name, columns)
+    op.create_index('ix_monthlymeasurement_station_variable_month_date', 'monthlymeasurement', ['station_id', 'variable_id', sa.text('(EXTRACT(month FROM date))'), 'date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_monthlymeasurement_station_variable_month_date', table_name='monthlymeasurement')
+    for table_name, (constraint_name, _) in _NATURAL_KEYS.items():
+        op.drop_constraint(constraint_name, table_name, type_='unique')
@@ -67,9 +67,18 @@ def refresh_monthly_measurements(
             )
         ),
     ] = None,
+    full_refresh: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Process the whole history of each series, instead of only the "
+                "series which changed since they were last harvested."
+            )
+        ),
+    ] = False,
 ) -> None:
     observations_flows.refresh_monthly_measurements(
-        station_code=station, variable_name=variable
+        station_code=station, variable_name=variable, full_refresh=full_refresh
     )
 
 
@@ -93,10 +102,20 @@ def refresh_seasonal_measurements(
             )
         ),
     ] = None,
+    full_refresh: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Process the whole history of each series, instead of only the "
+                "series which changed since they were last harvested."
+            )
+        ),
+    ] = False,
 ) -> None:
     observations_flows.refresh_seasonal_measurements(
         station_code=station,
         variable_name=variable,
+        full_refresh=full_refresh,
     )
 
 
@@ -120,7 +139,16 @@ def refresh_yearly_measurements(
             )
         ),
     ] = None,
+    full_refresh: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Process the whole history of each series, instead of only the "
+                "series which changed since they were last harvested."
+            )
+        ),
+    ] = False,
 ) -> None:
     observations_flows.refresh_yearly_measurements(
-        station_code=station, variable_name=variable
+        station_code=station, variable_name=variable, full_refresh=full_refresh
     )
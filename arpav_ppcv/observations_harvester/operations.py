@@ -1,85 +1,464 @@
 import datetime as dt
+import hashlib
+import itertools
+import json
 import logging
+import time
 from collections.abc import (
-    Generator,
+    Awaitable,
     Sequence,
 )
 from typing import (
     Callable,
+    Final,
+    TypeVar,
 )
 
+import anyio
+import anyio.to_thread
 import geojson_pydantic
 import httpx
-import pyproj
 import shapely
-import shapely.ops
+import sqlalchemy
+import sqlmodel
 
-from ..schemas import observations
+from .. import (
+    config,
+    database,
+    utils,
+)
+from ..schemas import (
+    base,
+    observations,
+)
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
 
-def fetch_remote_stations(
-    client: httpx.Client,
-    variables: Sequence[observations.Variable],
-    fetch_stations_with_months: bool,
-    fetch_stations_with_seasons: bool,
-    fetch_stations_with_yearly_measurements: bool,
-) -> Generator[dict, None, None]:
-    station_url = (
-        "https://api.arpa.veneto.it/REST/v1/clima_indicatori/staz_attive_lunghe"
-    )
-    for variable in variables:
-        logger.info(
-            f"Retrieving stations with monthly measurements for variable "
-            f"{variable.name!r}..."
+_API_TABLES: Final[dict[base.ObservationAggregationType, str]] = {
+    base.ObservationAggregationType.MONTHLY: "M",
+    base.ObservationAggregationType.SEASONAL: "S",
+    base.ObservationAggregationType.YEARLY: "A",
+}
+
+_SEASON_PERIODS: Final[dict[base.Season, int]] = {
+    base.Season.WINTER: 1,
+    base.Season.SPRING: 2,
+    base.Season.SUMMER: 3,
+    base.Season.AUTUMN: 4,
+}
+
+
+class TokenBucket:
+    """Rate limiter which lets callers proceed at a sustained rate.
+
+    The bucket holds up to `capacity` tokens and is refilled with `rate` tokens
+    per second. Each call to `acquire()` takes a token, waiting for the bucket
+    to be refilled if it is empty.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0 or capacity < 1:
+            raise ValueError(f"Invalid token bucket: {rate=!r}, {capacity=!r}")
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = anyio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._capacity,
+                    self._tokens + (now - self._updated_at) * self._rate,
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await anyio.sleep((1 - self._tokens) / self._rate)
+
+
+class ObservationsHarvester:
+    """Harvest observations from the ARPA Veneto REST API concurrently.
+
+    Requests are bounded both in number of concurrent requests and in rate, as
+    per the `observations_harvester` settings, and failed requests are retried
+    with an exponential backoff. Harvested measurements are stored as soon as
+    each API response is received, with a separate database session for each
+    response.
+
+    Instances must be created inside a running event loop - use
+    `run_harvester()` for calling them from synchronous code.
+    """
+
+    def __init__(
+        self,
+        settings: config.ArpavPpcvSettings,
+        http_client: httpx.AsyncClient,
+        db_engine: sqlalchemy.Engine,
+    ):
+        harvester_settings = settings.observations_harvester
+        self._http_client = http_client
+        self._db_engine = db_engine
+        self._base_url = harvester_settings.base_url.rstrip("/")
+        self._num_retries = harvester_settings.num_request_retries
+        self._retry_backoff_seconds = harvester_settings.retry_backoff_seconds
+        self._batch_size = settings.db_bulk_insert_batch_size
+        self._request_limiter = anyio.CapacityLimiter(
+            harvester_settings.max_concurrent_requests
+        )
+        self._rate_limiter = TokenBucket(
+            harvester_settings.max_requests_per_second,
+            harvester_settings.max_burst_requests,
         )
+        self._db_limiter = anyio.CapacityLimiter(settings.db_thread_limiter_capacity)
+
+    async def fetch(self, path: str, params: dict[str, str]) -> list[dict]:
+        """Retrieve the `data` items of an API response."""
+        url = "/".join((self._base_url, path)) if path else self._base_url
+        for attempt in itertools.count():
+            async with self._request_limiter:
+                await self._rate_limiter.acquire()
+                try:
+                    response = await self._http_client.get(url, params=params)
+                    response.raise_for_status()
+                except (httpx.TransportError, httpx.HTTPStatusError) as err:
+                    if attempt >= self._num_retries or not _is_retryable(err):
+                        raise
+                    delay = self._retry_backoff_seconds * 2**attempt
+                    logger.warning(
+                        f"Request to {url!r} with {params} failed ({err!r}), "
+                        f"retrying in {delay} seconds..."
+                    )
+                else:
+                    return response.json().get("data", [])
+            await anyio.sleep(delay)
+
+    async def harvest_stations(
+        self,
+        variables: Sequence[observations.Variable],
+        fetch_stations_with_months: bool,
+        fetch_stations_with_seasons: bool,
+        fetch_stations_with_yearly_measurements: bool,
+    ) -> set[observations.StationCreate]:
+        periods = []
         if fetch_stations_with_months:
-            for month in range(1, 13):
-                logger.info(f"Processing month {month}...")
-                month_response = client.get(
-                    station_url,
-                    params={
-                        "indicatore": variable.name,
-                        "tabella": "M",
-                        "periodo": str(month),
-                    },
-                )
-                month_response.raise_for_status()
-                for raw_station in month_response.json().get("data", []):
-                    yield raw_station
+            table = _API_TABLES[base.ObservationAggregationType.MONTHLY]
+            periods.extend((table, str(month)) for month in range(1, 13))
         if fetch_stations_with_seasons:
-            for season in range(1, 5):
-                logger.info(f"Processing season {season}...")
-                season_response = client.get(
-                    station_url,
-                    params={
-                        "indicatore": variable.name,
-                        "tabella": "S",
-                        "periodo": str(season),
-                    },
-                )
-                season_response.raise_for_status()
-                for raw_station in season_response.json().get("data", []):
-                    yield raw_station
+            table = _API_TABLES[base.ObservationAggregationType.SEASONAL]
+            periods.extend((table, str(season)) for season in _SEASON_PERIODS.values())
         if fetch_stations_with_yearly_measurements:
-            logger.info("Processing year...")
-            year_response = client.get(
-                station_url,
-                params={
+            periods.append((_API_TABLES[base.ObservationAggregationType.YEARLY], "0"))
+        raw_stations = {}
+
+        async def harvest(variable: observations.Variable, table: str, period: str):
+            logger.info(
+                f"Retrieving stations for variable {variable.name!r} "
+                f"(table: {table!r}, period: {period!r})..."
+            )
+            for raw_station in await self.fetch(
+                "staz_attive_lunghe",
+                {"indicatore": variable.name, "tabella": table, "periodo": period},
+            ):
+                raw_stations[str(raw_station["statcd"])] = raw_station
+
+        async with anyio.create_task_group() as tg:
+            for variable, (table, period) in itertools.product(variables, periods):
+                tg.start_soon(harvest, variable, table, period)
+        # stations are parsed all at once, so that their coordinates are
+        # reprojected in a single call
+        return set(parse_stations(list(raw_stations.values())))
+
+    async def harvest_monthly_measurements(
+        self,
+        stations: Sequence[observations.Station],
+        variables: Sequence[observations.Variable],
+        months: Sequence[int],
+        full_refresh: bool = False,
+    ) -> list[sqlalchemy.Row]:
+        """Retrieve monthly measurements and store them.
+
+        Returns the measurements which have been either created or updated.
+        """
+
+        def parse(station, variable, month, raw_measurement):
+            return observations.MonthlyMeasurementCreate(
+                station_id=station.id,
+                variable_id=variable.id,
+                value=raw_measurement["valore"],
+                date=dt.date(raw_measurement["anno"], month, 1),
+            )
+
+        return await self._harvest_measurements(
+            base.ObservationAggregationType.MONTHLY,
+            stations,
+            variables,
+            [(month, str(month)) for month in months],
+            parse,
+            database.upsert_many_monthly_measurements,
+            full_refresh,
+        )
+
+    async def harvest_seasonal_measurements(
+        self,
+        stations: Sequence[observations.Station],
+        variables: Sequence[observations.Variable],
+        seasons: Sequence[base.Season],
+        full_refresh: bool = False,
+    ) -> list[sqlalchemy.Row]:
+        """Retrieve seasonal measurements and store them.
+
+        Returns the measurements which have been either created or updated.
+        """
+
+        def parse(station, variable, season, raw_measurement):
+            return observations.SeasonalMeasurementCreate(
+                station_id=station.id,
+                variable_id=variable.id,
+                value=raw_measurement["valore"],
+                year=int(raw_measurement["anno"]),
+                season=season,
+            )
+
+        return await self._harvest_measurements(
+            base.ObservationAggregationType.SEASONAL,
+            stations,
+            variables,
+            [(season, str(_SEASON_PERIODS[season])) for season in seasons],
+            parse,
+            database.upsert_many_seasonal_measurements,
+            full_refresh,
+        )
+
+    async def harvest_yearly_measurements(
+        self,
+        stations: Sequence[observations.Station],
+        variables: Sequence[observations.Variable],
+        full_refresh: bool = False,
+    ) -> list[sqlalchemy.Row]:
+        """Retrieve yearly measurements and store them.
+
+        Returns the measurements which have been either created or updated.
+        """
+
+        def parse(station, variable, period, raw_measurement):
+            return observations.YearlyMeasurementCreate(
+                station_id=station.id,
+                variable_id=variable.id,
+                value=raw_measurement["valore"],
+                year=int(raw_measurement["anno"]),
+            )
+
+        return await self._harvest_measurements(
+            base.ObservationAggregationType.YEARLY,
+            stations,
+            variables,
+            [(None, "0")],
+            parse,
+            database.upsert_many_yearly_measurements,
+            full_refresh,
+        )
+
+    async def _harvest_measurements(
+        self,
+        aggregation_type: base.ObservationAggregationType,
+        stations: Sequence[observations.Station],
+        variables: Sequence[observations.Variable],
+        periods: Sequence[tuple],
+        parse: Callable,
+        upsert: Callable[..., list[sqlalchemy.Row]],
+        full_refresh: bool,
+    ) -> list[sqlalchemy.Row]:
+        """Harvest series of measurements incrementally.
+
+        Each item of `periods` is a tuple of (period, API period), where `period`
+        is passed along to the `parse` callable.
+
+        Each series has a watermark, which holds the hash of its last harvested
+        API payload and the most recent year found in it. Series whose payload
+        has not changed are skipped and, for the others, measurements older than
+        the watermark's year are neither parsed nor stored. The year of the
+        watermark is itself processed again, as its measurement may have been
+        revised upstream. Watermarks are ignored when doing a `full_refresh`.
+
+        Once done, web workers are notified if any measurement has been stored.
+        """
+        watermarks = {
+            (w.station_id, w.variable_id, w.period): w
+            for w in await anyio.to_thread.run_sync(
+                self._collect_watermarks, aggregation_type, limiter=self._db_limiter
+            )
+        }
+        upserted = []
+        unchanged_series_watermarks = []
+
+        async def harvest(station, variable, period, api_period):
+            raw_measurements = await self.fetch(
+                "",
+                {
+                    "statcd": station.code,
                     "indicatore": variable.name,
-                    "tabella": "A",
-                    "periodo": "0",
+                    "tabella": _API_TABLES[aggregation_type],
+                    "periodo": api_period,
                 },
             )
-            year_response.raise_for_status()
-            for raw_station in year_response.json().get("data", []):
-                yield raw_station
+            watermark = watermarks.get((station.id, variable.id, api_period))
+            new_watermark = observations.HarvestWatermarkCreate(
+                station_id=station.id,
+                variable_id=variable.id,
+                aggregation_type=aggregation_type,
+                period=api_period,
+                last_year=max(
+                    (int(raw["anno"]) for raw in raw_measurements), default=None
+                ),
+                payload_hash=_hash_payload(raw_measurements),
+                fetched_at=dt.datetime.now(dt.timezone.utc),
+            )
+            if full_refresh or watermark is None:
+                min_year = None
+            elif watermark.payload_hash == new_watermark.payload_hash:
+                unchanged_series_watermarks.append(new_watermark)
+                return
+            else:
+                min_year = watermark.last_year
+            to_upsert = [
+                parse(station, variable, period, raw_measurement)
+                for raw_measurement in raw_measurements
+                if min_year is None or int(raw_measurement["anno"]) >= min_year
+            ]
+            upserted.extend(
+                await anyio.to_thread.run_sync(
+                    self._store,
+                    upsert,
+                    to_upsert,
+                    new_watermark,
+                    limiter=self._db_limiter,
+                )
+            )
+
+        async with anyio.create_task_group() as tg:
+            for station, variable, period_info in itertools.product(
+                stations, variables, periods
+            ):
+                tg.start_soon(harvest, station, variable, *period_info)
+        if len(unchanged_series_watermarks) > 0:
+            logger.info(
+                f"Skipped {len(unchanged_series_watermarks)} unchanged "
+                f"{aggregation_type.value.lower()} series"
+            )
+            await anyio.to_thread.run_sync(
+                self._store_watermarks,
+                unchanged_series_watermarks,
+                limiter=self._db_limiter,
+            )
+        if len(upserted) > 0:
+            await anyio.to_thread.run_sync(
+                self._notify_observation_data_changed, limiter=self._db_limiter
+            )
+        return upserted
+
+    def _collect_watermarks(
+        self, aggregation_type: base.ObservationAggregationType
+    ) -> Sequence[observations.HarvestWatermark]:
+        with sqlmodel.Session(self._db_engine) as session:
+            return database.collect_all_harvest_watermarks(
+                session, aggregation_type_filter=aggregation_type
+            )
+
+    def _store(
+        self,
+        upsert: Callable[..., list[sqlalchemy.Row]],
+        to_upsert: list,
+        watermark: observations.HarvestWatermarkCreate,
+    ) -> list[sqlalchemy.Row]:
+        # the watermark is only stored after its measurements, so that a failure
+        # in between just means the series is processed again on the next run
+        with sqlmodel.Session(self._db_engine) as session:
+            upserted = upsert(session, to_upsert, batch_size=self._batch_size)
+            database.upsert_many_harvest_watermarks(session, [watermark])
+        return upserted
+
+    def _notify_observation_data_changed(self) -> None:
+        with sqlmodel.Session(self._db_engine) as session:
+            database.notify_observation_data_changed(session)
+            session.commit()
+
+    def _store_watermarks(
+        self, watermarks: Sequence[observations.HarvestWatermarkCreate]
+    ) -> None:
+        with sqlmodel.Session(self._db_engine) as session:
+            database.upsert_many_harvest_watermarks(
+                session, watermarks, batch_size=self._batch_size
+            )
+
+
+def run_harvester(
+    settings: config.ArpavPpcvSettings,
+    db_engine: sqlalchemy.Engine,
+    harvest: Callable[[ObservationsHarvester], Awaitable[T]],
+) -> T:
+    """Run a harvesting coroutine from synchronous code.
+
+    Example:
+
+        created = run_harvester(
+            settings,
+            db_engine,
+            lambda harvester: harvester.harvest_yearly_measurements(
+                stations, variables
+            ),
+        )
+    """
+
+    async def run():
+        async with httpx.AsyncClient(
+            timeout=settings.http_client_timeout_seconds
+        ) as http_client:
+            return await harvest(
+                ObservationsHarvester(settings, http_client, db_engine)
+            )
+
+    return anyio.run(run)
+
 
+def _hash_payload(raw_items: list[dict]) -> str:
+    serialized = json.dumps(raw_items, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
 
-def parse_station(
-    raw_station: dict, coord_converter: Callable
-) -> observations.StationCreate:
+
+def _is_retryable(error: httpx.TransportError | httpx.HTTPStatusError) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        return status_code == httpx.codes.TOO_MANY_REQUESTS or status_code >= 500
+    return True
+
+
+def parse_stations(
+    raw_stations: Sequence[dict],
+) -> list[observations.StationCreate]:
+    """Parse stations, as returned by the ARPAV API.
+
+    Station coordinates are reprojected from EPSG:4258 to EPSG:4326.
+    """
+    lons, lats = utils.transform_coordinates(
+        [s["EPSG4258_LON"] for s in raw_stations],
+        [s["EPSG4258_LAT"] for s in raw_stations],
+        source_crs="EPSG:4258",
+        target_crs="EPSG:4326",
+    )
+    return [
+        parse_station(raw_station, shapely.Point(lon, lat))
+        for raw_station, lon, lat in zip(raw_stations, lons, lats)
+    ]
+
+
+def parse_station(raw_station: dict, geom: shapely.Point) -> observations.StationCreate:
+    """Parse a station, whose EPSG:4326 location has already been computed."""
     station_code = str(raw_station["statcd"])
     if raw_start := raw_station.get("iniziovalidita"):
         try:
@@ -99,36 +478,12 @@ def parse_station(
             active_until = None
     else:
         active_until = None
-    pt_4258 = shapely.Point(raw_station["EPSG4258_LON"], raw_station["EPSG4258_LAT"])
-    pt_4326 = shapely.ops.transform(coord_converter, pt_4258)
     return observations.StationCreate(
         code=station_code,
-        geom=geojson_pydantic.Point(type="Point", coordinates=(pt_4326.x, pt_4326.y)),
+        geom=geojson_pydantic.Point(type="Point", coordinates=(geom.x, geom.y)),
         altitude_m=raw_station["altitude"],
         name=raw_station["statnm"],
         type_=raw_station.get("stattype", "").lower().replace(" ", "_"),
         active_since=active_since,
         active_until=active_until,
     )
-
-
-def harvest_stations(
-    client: httpx.Client,
-    variables_to_refresh: Sequence[observations.Variable],
-    fetch_stations_with_months: bool,
-    fetch_stations_with_seasons: bool,
-    fetch_stations_with_yearly_measurements: bool,
-) -> set[observations.StationCreate]:
-    coord_converter = pyproj.Transformer.from_crs(
-        pyproj.CRS("epsg:4258"), pyproj.CRS("epsg:4326"), always_xy=True
-    ).transform
-    stations = set()
-    for raw_station in fetch_remote_stations(
-        client,
-        variables_to_refresh,
-        fetch_stations_with_months,
-        fetch_stations_with_seasons,
-        fetch_stations_with_yearly_measurements,
-    ):
-        stations.add(parse_station(raw_station, coord_converter))
-    return stations
@@ -0,0 +1,374 @@
+"""In-memory store of observation measurements.
+
+The network of observation stations is small, so each web worker may keep all of
+its measurements in memory and serve observation time series without querying
+the database. Measurements are stored as compact numpy arrays, indexed by
+(station, variable, aggregation type, period), where the period is the month of
+monthly series, the position of the season (1 to 4) for seasonal series and `0`
+for yearly series - the same periods used by the harvest watermarks. Stations
+and variables are kept too.
+
+The store is loaded at startup and refreshed incrementally whenever the
+observation harvesting flows notify that they have stored new measurements (see
+`cacheinvalidation`). On refresh, only the series whose harvest watermark has
+changed are loaded again.
+"""
+
+import dataclasses
+import logging
+import threading
+import uuid
+from typing import (
+    Final,
+    Optional,
+)
+
+import numpy as np
+import pandas as pd
+import shapely
+import sqlalchemy
+import sqlmodel
+from geoalchemy2.shape import to_shape
+
+from . import (
+    cacheinvalidation,
+    config,
+    database,
+    utils,
+)
+from .schemas import (
+    base,
+    observations,
+)
+
+logger = logging.getLogger(__name__)
+
+# (station id, variable id, aggregation type)
+SeriesKey = tuple[uuid.UUID, uuid.UUID, base.ObservationAggregationType]
+# (station id, variable id, aggregation type, period)
+WatermarkKey = tuple[uuid.UUID, uuid.UUID, base.ObservationAggregationType, int]
+
+_STORE: Optional["ObservationStore"] = None
+_LOCK = threading.Lock()
+
+_SEASONS: Final[list[base.Season]] = list(base.Season)
+
+
+@dataclasses.dataclass(frozen=True)
+class _PeriodSeries:
+    # dates for monthly series, years for seasonal and yearly series
+    times: np.ndarray
+    values: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes
+
+
+@dataclasses.dataclass(frozen=True)
+class _StoreContents:
+    stations: dict[uuid.UUID, observations.Station]
+    stations_by_code: dict[str, observations.Station]
+    station_ids: np.ndarray
+    # longitude and latitude of each station, in the same order as `station_ids`
+    station_coords: np.ndarray
+    variables_by_name: dict[str, observations.Variable]
+    series: dict[SeriesKey, dict[int, _PeriodSeries]]
+    watermark_hashes: dict[WatermarkKey, str]
+
+
+class ObservationStore:
+    """Per-worker store of all observation measurements.
+
+    Readers are served from an immutable snapshot of the store's contents, which
+    a refresh replaces as a whole once it is done loading.
+    """
+
+    def __init__(self, engine: sqlalchemy.Engine):
+        self.engine = engine
+        self._contents: Optional[_StoreContents] = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._contents is not None
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(
+            period_series.nbytes
+            for periods in self._get_contents().series.values()
+            for period_series in periods.values()
+        )
+
+    def load(self) -> None:
+        """Load all measurements, replacing the current contents of the store."""
+        self._refresh(full=True)
+
+    def refresh(self) -> int:
+        """Load the measurements of series that have changed since last refresh.
+
+        Returns the number of series which have been loaded.
+        """
+        return self._refresh(full=not self.is_loaded)
+
+    def get_station_by_code(self, station_code: str) -> Optional[observations.Station]:
+        return self._get_contents().stations_by_code.get(station_code)
+
+    def get_variable_by_name(
+        self, variable_name: str
+    ) -> Optional[observations.Variable]:
+        return self._get_contents().variables_by_name.get(variable_name)
+
+    def get_nearest_station_measurement_columns(
+        self,
+        point_geom: shapely.Point,
+        max_distance_meters: float,
+        aggregation_type: base.ObservationAggregationType,
+        *,
+        variable_id: uuid.UUID,
+        month_filter: Optional[int] = None,
+        season_filter: Optional[base.Season] = None,
+    ) -> Optional[tuple[observations.Station, dict[str, np.ndarray]]]:
+        """Get the nearest station that has measurements of a variable, and its series.
+
+        This is the in-memory counterpart of
+        `database.get_nearest_station_measurement_columns()`.
+        """
+        contents = self._get_contents()
+        result = None
+        if len(contents.station_ids) > 0:
+            distances = utils.get_geodesic_distances(
+                contents.station_coords[:, 0],
+                contents.station_coords[:, 1],
+                point_geom.x,
+                point_geom.y,
+            )
+            for index in np.argsort(distances, kind="stable"):
+                if distances[index] > max_distance_meters:
+                    break
+                columns = self.get_measurement_series_columns(
+                    aggregation_type,
+                    station_id=contents.station_ids[index],
+                    variable_id=variable_id,
+                    month_filter=month_filter,
+                    season_filter=season_filter,
+                )
+                if len(columns["value"]) > 0:
+                    result = contents.stations[contents.station_ids[index]], columns
+                    break
+        return result
+
+    def get_measurement_series_columns(
+        self,
+        aggregation_type: base.ObservationAggregationType,
+        *,
+        station_id: uuid.UUID,
+        variable_id: uuid.UUID,
+        month_filter: Optional[int] = None,
+        season_filter: Optional[base.Season] = None,
+    ) -> dict[str, np.ndarray]:
+        """Get the time series of a station's variable as a mapping of columns.
+
+        The result is the same as that of `database.get_measurement_series_columns()`,
+        except that columns are numpy arrays.
+        """
+        periods = self._get_contents().series.get(
+            (station_id, variable_id, aggregation_type), {}
+        )
+        if month_filter is not None:
+            periods = (
+                {month_filter: periods[month_filter]} if month_filter in periods else {}
+            )
+        if season_filter is not None:
+            period = _SEASONS.index(season_filter) + 1
+            periods = {period: periods[period]} if period in periods else {}
+        period_numbers = np.concatenate(
+            [
+                np.full(len(period_series.values), period, dtype="int8")
+                for period, period_series in periods.items()
+            ]
+            or [np.empty(0, dtype="int8")]
+        )
+        times = np.concatenate(
+            [period_series.times for period_series in periods.values()]
+            or [np.empty(0, dtype=_get_times_dtype(aggregation_type))]
+        )
+        values = np.concatenate(
+            [period_series.values for period_series in periods.values()]
+            or [np.empty(0, dtype="float64")]
+        )
+        if aggregation_type == base.ObservationAggregationType.MONTHLY:
+            order = np.argsort(times, kind="stable")
+            result = {"date": times[order]}
+        elif aggregation_type == base.ObservationAggregationType.SEASONAL:
+            order = np.lexsort((period_numbers, times))
+            result = {
+                "year": times[order],
+                "season": np.array([s.name for s in _SEASONS])[
+                    period_numbers[order] - 1
+                ],
+            }
+        else:  # YEARLY
+            order = np.argsort(times, kind="stable")
+            result = {"year": times[order]}
+        result["value"] = values[order]
+        return result
+
+    def _get_contents(self) -> _StoreContents:
+        if (contents := self._contents) is None:
+            raise RuntimeError("Observation store has not been loaded yet")
+        return contents
+
+    def _refresh(self, full: bool) -> int:
+        with self._refresh_lock, sqlmodel.Session(self.engine) as session:
+            previous = None if full else self._contents
+            # watermarks are read before measurements, so that a series which is
+            # harvested in between is seen as changed again on the next refresh,
+            # rather than being missed
+            watermark_hashes = {
+                (
+                    w.station_id,
+                    w.variable_id,
+                    w.aggregation_type,
+                    int(w.period),
+                ): w.payload_hash
+                for w in database.collect_all_harvest_watermarks(session)
+            }
+            stations = database.collect_all_stations(session)
+            variables = database.collect_all_variables(session)
+            station_ids = {s.id for s in stations}
+            variable_ids = {v.id for v in variables}
+            if previous is None:
+                series = {}
+            else:
+                series = {
+                    key: periods
+                    for key, periods in previous.series.items()
+                    if key[0] in station_ids and key[1] in variable_ids
+                }
+            if previous is not None:
+                changed_series = {
+                    key[:3]
+                    for key, payload_hash in watermark_hashes.items()
+                    if previous.watermark_hashes.get(key) != payload_hash
+                }
+            num_loaded = 0
+            for aggregation_type in base.ObservationAggregationType:
+                if previous is None:
+                    series_filter = None
+                else:
+                    series_filter = [
+                        (station_id, variable_id)
+                        for station_id, variable_id, type_ in changed_series
+                        if type_ == aggregation_type
+                    ]
+                    if len(series_filter) == 0:
+                        continue
+                    for station_id, variable_id in series_filter:
+                        series.pop((station_id, variable_id, aggregation_type), None)
+                loaded = _build_series(
+                    database.collect_measurement_columns(
+                        session, aggregation_type, series_filter=series_filter
+                    ),
+                    aggregation_type,
+                )
+                series.update(loaded)
+                num_loaded += len(loaded)
+        self._contents = _StoreContents(
+            stations={s.id: s for s in stations},
+            stations_by_code={s.code: s for s in stations},
+            station_ids=np.array([s.id for s in stations], dtype=object),
+            station_coords=shapely.get_coordinates(
+                [to_shape(s.geom) for s in stations]
+            ).reshape(-1, 2),
+            variables_by_name={v.name: v for v in variables},
+            series=series,
+            watermark_hashes=watermark_hashes,
+        )
+        return num_loaded
+
+
+def _get_times_dtype(aggregation_type: base.ObservationAggregationType) -> str:
+    return (
+        "datetime64[D]"
+        if aggregation_type == base.ObservationAggregationType.MONTHLY
+        else "int16"
+    )
+
+
+def _build_series(
+    columns: dict[str, list], aggregation_type: base.ObservationAggregationType
+) -> dict[SeriesKey, dict[int, _PeriodSeries]]:
+    if aggregation_type == base.ObservationAggregationType.MONTHLY:
+        times = np.array(columns["date"], dtype="datetime64[D]")
+        periods = times.astype("datetime64[M]").astype("int64") % 12 + 1
+    else:
+        times = np.array(columns["year"], dtype="int16")
+        if aggregation_type == base.ObservationAggregationType.SEASONAL:
+            periods = (
+                pd.Categorical(
+                    columns["season"], categories=[s.name for s in _SEASONS]
+                ).codes
+                + 1
+            )
+        else:  # YEARLY
+            periods = np.zeros(len(times), dtype="int64")
+    df = pd.DataFrame(
+        {
+            "station_id": columns["station_id"],
+            "variable_id": columns["variable_id"],
+            "period": periods,
+            "times": times,
+            "values": np.array(columns["value"], dtype="float64"),
+        }
+    )
+    result = {}
+    # measurements are sorted by station, variable and time, and grouping keeps
+    # that order
+    for (station_id, variable_id, period), group in df.groupby(
+        ["station_id", "variable_id", "period"], sort=False
+    ):
+        result.setdefault((station_id, variable_id, aggregation_type), {})[
+            int(period)
+        ] = _PeriodSeries(
+            times=group["times"].to_numpy(dtype=_get_times_dtype(aggregation_type)),
+            values=group["values"].to_numpy(),
+        )
+    return result
+
+
+def get_observation_store() -> Optional[ObservationStore]:
+    """Return the worker's observation store, or `None` if it is not in use."""
+    store = _STORE
+    return store if store is not None and store.is_loaded else None
+
+
+def load_observation_store(
+    settings: config.ArpavPpcvSettings,
+) -> Optional[ObservationStore]:
+    """Create and load the worker's observation store, if it is enabled."""
+    global _STORE
+    with _LOCK:
+        if settings.observation_store.enabled and _STORE is None:
+            _STORE = ObservationStore(database.get_engine(settings))
+        store = _STORE
+    if store is not None:
+        store.load()
+        logger.info(f"Loaded observation store ({store.size_bytes} bytes)")
+    return store
+
+
+def refresh_observation_store() -> None:
+    if (store := _STORE) is not None:
+        num_loaded = store.refresh()
+        logger.info(f"Refreshed {num_loaded} series of the observation store")
+
+
+def close_observation_store() -> None:
+    global _STORE
+    with _LOCK:
+        _STORE = None
+
+
+cacheinvalidation.register_observation_data_callback(refresh_observation_store)
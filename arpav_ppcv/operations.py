@@ -1,10 +1,12 @@
 import datetime as dt
-import functools
 import io
 import itertools
 import logging
+import uuid
 import warnings
+from pathlib import Path
 from typing import (
+    Final,
     Optional,
     Sequence,
 )
@@ -18,21 +20,23 @@ import numpy as np
 import pandas as pd
 import pyloess
 import pymannkendall as mk
-import pyproj
 import shapely
 import shapely.io
 import sqlmodel
-from anyio.from_thread import start_blocking_portal
 from arpav_ppcv.schemas.base import CoreConfParamName
 from dateutil.parser import isoparse
 from geoalchemy2.shape import to_shape
 from pandas.core.indexes.datetimes import DatetimeIndex
-from pyproj.enums import TransformDirection
-from shapely.ops import transform
 
 from . import (
     config,
+    coverageregistry,
     database,
+    datadownloads,
+    exceptions,
+    observationstore,
+    timeseriescache,
+    utils,
 )
 from .schemas import (
     base,
@@ -41,20 +45,118 @@ from .schemas import (
 )
 from .thredds import (
     crawler,
+    localmirror,
     ncss,
 )
+from .thredds import models as thredds_models
 
 logger = logging.getLogger(__name__)
 
 
-def get_climate_barometer_time_series(
+async def async_get_climate_barometer_time_series(
     settings: config.ArpavPpcvSettings,
+    session: sqlmodel.Session,
+    http_client: httpx.AsyncClient,
+    smoothing_strategies: list[base.CoverageDataSmoothingStrategy],
+    include_uncertainty: bool,
+) -> dict[
+    tuple[coverages.CoverageInternal, base.CoverageDataSmoothingStrategy], pd.Series
+]:
+    """Get climate barometer time series.
+
+    Series are served from the store that is populated by the
+    `refresh_climate_barometer_series` prefect flow. Only when the store is
+    empty are they retrieved from THREDDS, fetching all datasets concurrently.
+    """
+    # the unsmoothed series are always part of the result
+    strategies = [base.CoverageDataSmoothingStrategy.NO_SMOOTHING] + [
+        ss
+        for ss in smoothing_strategies
+        if ss != base.CoverageDataSmoothingStrategy.NO_SMOOTHING
+    ]
+    result = await database.run_in_db_thread(
+        settings,
+        _get_stored_climate_barometer_time_series,
+        session,
+        strategies,
+        include_uncertainty,
+    )
+    if len(result) == 0:
+        logger.warning(
+            "Climate barometer series store is empty - retrieving data from THREDDS"
+        )
+        barometer_covs = await database.run_in_db_thread(
+            settings, get_climate_barometer_coverages, session, include_uncertainty
+        )
+        dfs = await _async_retrieve_climate_barometer_data(
+            settings, http_client, [cov for cov, _ in barometer_covs]
+        )
+        for cov, _ in barometer_covs:
+            smoothed = await anyio.to_thread.run_sync(
+                smooth_climate_barometer_data, cov, dfs[cov], strategies
+            )
+            for strategy, series in smoothed.items():
+                result[(cov, strategy)] = series
+    return result
+
+
+def _get_stored_climate_barometer_time_series(
     session: sqlmodel.Session,
     smoothing_strategies: list[base.CoverageDataSmoothingStrategy],
     include_uncertainty: bool,
 ) -> dict[
     tuple[coverages.CoverageInternal, base.CoverageDataSmoothingStrategy], pd.Series
 ]:
+    stored = {}
+    for db_series in database.collect_all_climate_barometer_series(
+        session,
+        smoothing_strategies=smoothing_strategies,
+        include_uncertainty=include_uncertainty,
+    ):
+        variants = stored.setdefault(db_series.coverage_identifier, {})
+        variants[db_series.smoothing_strategy] = db_series
+    result = {}
+    for coverage_identifier, variants in stored.items():
+        if (cov := coverageregistry.get_coverage(session, coverage_identifier)) is None:
+            logger.warning(
+                f"Stored climate barometer series refer to unknown coverage "
+                f"{coverage_identifier!r} - skipping"
+            )
+            continue
+        # results are ordered by coverage and then by the requested strategies
+        for strategy in smoothing_strategies:
+            if (db_series := variants.get(strategy.value)) is not None:
+                result[(cov, strategy)] = _parse_stored_climate_barometer_series(
+                    db_series, strategy
+                )
+    return result
+
+
+def _parse_stored_climate_barometer_series(
+    db_series: coverages.ClimateBarometerSeries,
+    smoothing_strategy: base.CoverageDataSmoothingStrategy,
+) -> pd.Series:
+    if smoothing_strategy == base.CoverageDataSmoothingStrategy.NO_SMOOTHING:
+        name = db_series.coverage_identifier
+    else:
+        name = "__".join((db_series.coverage_identifier, smoothing_strategy.value))
+    return pd.Series(
+        np.asarray(db_series.values, dtype=np.float64),
+        index=pd.DatetimeIndex(db_series.times, name="time"),
+        name=name,
+    )
+
+
+def get_climate_barometer_coverages(
+    session: sqlmodel.Session,
+    include_uncertainty: bool,
+) -> list[tuple[coverages.CoverageInternal, bool]]:
+    """Get climate barometer coverages.
+
+    Each coverage is returned together with a flag telling whether it is an
+    uncertainty coverage. Uncertainty coverages come right after their related
+    main coverage.
+    """
     covs = database.collect_all_coverages(
         session,
         configuration_parameter_values_filter=[
@@ -63,12 +165,8 @@ def get_climate_barometer_time_series(
             )
         ],
     )
-    additional_smoothing_strategies = [
-        ss
-        for ss in smoothing_strategies
-        if ss != base.CoverageDataSmoothingStrategy.NO_SMOOTHING
-    ]
-    dfs = []
+    result = []
+    seen = set()
     for cov in covs:
         is_uncertainty_cov = False
         for used_value in cov.configuration.possible_values:
@@ -77,50 +175,172 @@ def get_climate_barometer_time_series(
                 == CoreConfParamName.UNCERTAINTY_TYPE.value
             ):
                 is_uncertainty_cov = True
-        if not is_uncertainty_cov:
-            df = _get_climate_barometer_data(settings, cov)
-            dfs.append((cov, df))
+        if not is_uncertainty_cov and cov not in seen:
+            result.append((cov, False))
+            seen.add(cov)
 
         if include_uncertainty:
-            lower_cov, upper_cov = get_related_uncertainty_coverage_configurations(
+            for related_cov in get_related_uncertainty_coverage_configurations(
                 session, cov
-            )
-            if lower_cov is not None:
-                lower_df = _get_climate_barometer_data(settings, lower_cov)
-                dfs.append((lower_cov, lower_df))
-            if upper_cov is not None:
-                upper_df = _get_climate_barometer_data(settings, upper_cov)
-                dfs.append((upper_cov, upper_df))
+            ):
+                if related_cov is not None and related_cov not in seen:
+                    result.append((related_cov, True))
+                    seen.add(related_cov)
+    return result
+
+
+def smooth_climate_barometer_data(
+    coverage: coverages.CoverageInternal,
+    df: pd.DataFrame,
+    smoothing_strategies: Sequence[base.CoverageDataSmoothingStrategy],
+) -> dict[base.CoverageDataSmoothingStrategy, pd.Series]:
     result = {}
-    for cov, df in dfs:
-        result[(cov, base.CoverageDataSmoothingStrategy.NO_SMOOTHING)] = df[
-            cov.identifier
-        ].squeeze()
-        for strategy in additional_smoothing_strategies:
+    for strategy in smoothing_strategies:
+        if strategy == base.CoverageDataSmoothingStrategy.NO_SMOOTHING:
+            result[strategy] = df[coverage.identifier].squeeze()
+        else:
             df, smoothed_col = process_coverage_smoothing_strategy(
-                df, cov.identifier, strategy
+                df, coverage.identifier, strategy
             )
-            result[(cov, strategy)] = df[smoothed_col].squeeze()
+            result[strategy] = df[smoothed_col].squeeze()
     return result
 
 
-def _get_climate_barometer_data(
+def build_climate_barometer_series_to_store(
+    coverage: coverages.CoverageInternal,
+    df: pd.DataFrame,
+    is_uncertainty: bool,
+    sort_order: int,
+) -> list[coverages.ClimateBarometerSeriesCreate]:
+    """Prepare all smoothed variants of a climate barometer series for storage."""
+    result = []
+    smoothed = smooth_climate_barometer_data(
+        coverage, df, list(base.CoverageDataSmoothingStrategy)
+    )
+    for strategy, series in smoothed.items():
+        result.append(
+            coverages.ClimateBarometerSeriesCreate(
+                coverage_identifier=coverage.identifier,
+                smoothing_strategy=strategy,
+                is_uncertainty=is_uncertainty,
+                sort_order=sort_order,
+                times=list(pd.DatetimeIndex(series.index).to_pydatetime()),
+                values=series.to_numpy(dtype=np.float64, na_value=np.nan).tolist(),
+            )
+        )
+    return result
+
+
+async def _async_retrieve_climate_barometer_data(
+    settings: config.ArpavPpcvSettings,
+    http_client: httpx.AsyncClient,
+    covs: Sequence[coverages.CoverageInternal],
+) -> dict[coverages.CoverageInternal, pd.DataFrame]:
+    """Retrieve climate barometer data of multiple coverages concurrently.
+
+    Datasets are downloaded concurrently from the THREDDS file server, but they
+    are parsed one at a time, since netCDF4 is not thread safe.
+
+    Raises `CoverageDataRetrievalError` if any of the coverages could not be
+    retrieved.
+    """
+    # resolving dataset URLs may need to lazy load coverage configuration
+    # details, so it is done beforehand in a database thread
+    datasets = await database.run_in_db_thread(
+        settings,
+        resolve_climate_barometer_datasets,
+        settings,
+        covs,
+        settings.thredds_server.file_server_url_fragment,
+    )
+    result = {}
+
+    async def retrieve_data(coverage: coverages.CoverageInternal):
+        file_url, netcdf_variable_name = datasets[coverage]
+        try:
+            response = await http_client.get(file_url)
+            response.raise_for_status()
+            result[coverage] = await anyio.to_thread.run_sync(
+                parse_climate_barometer_dataset,
+                response.content,
+                netcdf_variable_name,
+                coverage.identifier,
+            )
+        except (httpx.HTTPError, OSError):
+            logger.exception(f"Could not retrieve data for {coverage.identifier!r}")
+
+    async with anyio.create_task_group() as tg:
+        for cov in datasets.keys():
+            tg.start_soon(retrieve_data, cov)
+    if len(result) < len(datasets):
+        raise exceptions.CoverageDataRetrievalError()
+    return result
+
+
+def resolve_climate_barometer_datasets(
+    settings: config.ArpavPpcvSettings,
+    covs: Sequence[coverages.CoverageInternal],
+    service_url_fragment: Optional[str] = None,
+) -> dict[coverages.CoverageInternal, tuple[str, str]]:
+    """Get the URL and main NetCDF variable name of each coverage.
+
+    URLs refer to the THREDDS OPeNDAP service, unless another service is
+    specified.
+    """
+    return {
+        cov: (
+            _build_thredds_service_url(
+                settings,
+                cov,
+                service_url_fragment
+                or settings.thredds_server.opendap_service_url_fragment,
+            ),
+            coverageregistry.get_main_netcdf_variable_name(cov),
+        )
+        for cov in covs
+    }
+
+
+def _build_thredds_service_url(
     settings: config.ArpavPpcvSettings,
     coverage: coverages.CoverageInternal,
-) -> pd.DataFrame:
-    opendap_url = "/".join(
+    service_url_fragment: str,
+) -> str:
+    return "/".join(
         (
             settings.thredds_server.base_url,
-            settings.thredds_server.opendap_service_url_fragment,
+            service_url_fragment,
             crawler.get_thredds_url_fragment(
                 coverage, settings.thredds_server.base_url
             ),
         )
     )
-    ds = netCDF4.Dataset(opendap_url)
-    netcdf_variable_name = coverage.configuration.get_main_netcdf_variable_name(
-        coverage.identifier
-    )
+
+
+def read_climate_barometer_dataset(
+    opendap_url: str, netcdf_variable_name: str, target_name: str
+) -> pd.DataFrame:
+    with localmirror.NETCDF_LOCK:
+        with netCDF4.Dataset(opendap_url) as ds:
+            return _read_climate_barometer_netcdf_dataset(
+                ds, netcdf_variable_name, target_name
+            )
+
+
+def parse_climate_barometer_dataset(
+    data: bytes, netcdf_variable_name: str, target_name: str
+) -> pd.DataFrame:
+    """Parse a climate barometer dataset which is held in memory."""
+    with localmirror.NETCDF_LOCK:
+        with netCDF4.Dataset(f"{target_name}.nc", mode="r", memory=data) as ds:
+            return _read_climate_barometer_netcdf_dataset(
+                ds, netcdf_variable_name, target_name
+            )
+
+
+def _read_climate_barometer_netcdf_dataset(
+    ds: netCDF4.Dataset, netcdf_variable_name: str, target_name: str
+) -> pd.DataFrame:
     df = pd.DataFrame(
         {
             "time": pd.Series(
@@ -130,12 +350,11 @@ def _get_climate_barometer_data(
                     calendar=ds.variables["time"].calendar,
                 )
             ),
-            coverage.identifier: pd.Series(
+            target_name: pd.Series(
                 ds.variables[netcdf_variable_name][:].ravel(),
             ),
         }
     )
-    ds.close()
     df.set_index("time", inplace=True)
     return df
 
@@ -147,23 +366,15 @@ def get_station_data(
     month: int,
     temporal_range: tuple[dt.datetime | None, dt.datetime | None],
 ) -> Optional[pd.DataFrame]:
-    raw_measurements = database.collect_all_monthly_measurements(
-        session=session,
-        station_id_filter=station.id,
-        variable_id_filter=variable.id,
+    df = get_observation_series(
+        session,
+        base.ObservationAggregationType.MONTHLY,
+        station,
+        variable,
         month_filter=month,
+        temporal_range=temporal_range,
     )
-    df = pd.DataFrame(m.model_dump() for m in raw_measurements)
     if not df.empty:
-        df = df.rename(columns={"value": variable.name})
-        df["time"] = pd.to_datetime(df["date"], utc=True)
-        df = df[["time", variable.name]]
-        df.set_index("time", inplace=True)
-        start, end = temporal_range
-        if start is not None:
-            df = df[start:]
-        if end is not None:
-            df = df[:end]
         return df
     else:
         logger.info(
@@ -172,6 +383,74 @@ def get_station_data(
         )
 
 
+def get_observation_series(
+    session: sqlmodel.Session,
+    aggregation_type: base.ObservationAggregationType,
+    station: observations.Station,
+    variable: observations.Variable,
+    *,
+    month_filter: Optional[int] = None,
+    season_filter: Optional[base.Season] = None,
+    temporal_range: tuple[dt.datetime | None, dt.datetime | None] = (None, None),
+) -> pd.DataFrame:
+    """Get a station's measurements as a dataframe indexed by UTC time.
+
+    The measurements are read column by column, either from the worker's
+    observation store, when it is in use, or straight from the DB. The resulting
+    dataframe has a single column, named after the variable.
+    """
+    retriever_kwargs = {
+        "station_id": station.id,
+        "variable_id": variable.id,
+        "month_filter": month_filter,
+        "season_filter": season_filter,
+    }
+    if (store := observationstore.get_observation_store()) is not None:
+        columns = store.get_measurement_series_columns(
+            aggregation_type, **retriever_kwargs
+        )
+    else:
+        columns = database.get_measurement_series_columns(
+            session, aggregation_type, **retriever_kwargs
+        )
+    df = _build_observation_series_frame(columns, aggregation_type, variable.name)
+    start, end = temporal_range
+    if start is not None:
+        df = df[start:]
+    if end is not None:
+        df = df[:end]
+    return df
+
+
+# month in which each season starts, indexed by the position of the season in
+# `base.Season` - this is the same order postgres uses for sorting seasons
+_SEASON_START_MONTHS: Final[np.ndarray] = np.array([1, 4, 7, 10])
+
+
+def _build_observation_series_frame(
+    columns: dict[str, list],
+    aggregation_type: base.ObservationAggregationType,
+    column_name: str,
+) -> pd.DataFrame:
+    if aggregation_type == base.ObservationAggregationType.MONTHLY:
+        times = np.array(columns["date"], dtype="datetime64[D]")
+    else:
+        years = np.array(columns["year"], dtype="int64")
+        months = np.zeros_like(years)
+        if aggregation_type == base.ObservationAggregationType.SEASONAL:
+            season_codes = pd.Categorical(
+                columns["season"], categories=[s.name for s in base.Season]
+            ).codes
+            months = _SEASON_START_MONTHS[season_codes] - 1
+        times = (years - 1970) * 12 + months
+        times = times.astype("datetime64[M]")
+    index = pd.DatetimeIndex(times.astype("datetime64[ns]"), name="time")
+    return pd.DataFrame(
+        {column_name: np.array(columns["value"], dtype="float64")},
+        index=index.tz_localize("UTC"),
+    )
+
+
 def aggregate_decade_data(
     variable: observations.Variable, measurements: pd.DataFrame
 ) -> pd.DataFrame:
@@ -403,22 +682,12 @@ async def async_retrieve_data_via_ncss(
     result_gatherer: dict,
 ) -> None:
     time_start, time_end = temporal_range
-    ds_fragment = crawler.get_thredds_url_fragment(
-        coverage, settings.thredds_server.base_url
-    )
-    ncss_url = "/".join(
-        (
-            settings.thredds_server.base_url,
-            settings.thredds_server.netcdf_subset_service_url_fragment,
-            ds_fragment,
-        )
-    )
+    # resolving the URL may need to contact the THREDDS catalog synchronously
+    ncss_url = await anyio.to_thread.run_sync(_build_ncss_url, settings, coverage)
     raw_coverage_data = await ncss.async_query_dataset(
         http_client,
         thredds_ncss_url=ncss_url,
-        netcdf_variable_name=coverage.configuration.get_main_netcdf_variable_name(
-            coverage.identifier
-        ),
+        netcdf_variable_name=coverageregistry.get_main_netcdf_variable_name(coverage),
         longitude=point_geom.x,
         latitude=point_geom.y,
         time_start=time_start,
@@ -427,6 +696,38 @@ async def async_retrieve_data_via_ncss(
     result_gatherer[coverage] = raw_coverage_data
 
 
+async def retrieve_multiple_dataset_grids(
+    settings: config.ArpavPpcvSettings,
+    client: httpx.AsyncClient,
+    coverages_: list[coverages.CoverageInternal],
+) -> dict[coverages.CoverageInternal, Optional[thredds_models.ThreddsDatasetGrid]]:
+    grids = {}
+
+    async def retrieve_grid(coverage: coverages.CoverageInternal):
+        ncss_url = await anyio.to_thread.run_sync(_build_ncss_url, settings, coverage)
+        grids[coverage] = await timeseriescache.async_get_dataset_grid(client, ncss_url)
+
+    async with anyio.create_task_group() as tg:
+        for cov in coverages_:
+            tg.start_soon(retrieve_grid, cov)
+    return grids
+
+
+def _build_ncss_url(
+    settings: config.ArpavPpcvSettings, coverage: coverages.CoverageInternal
+) -> str:
+    ds_fragment = crawler.get_thredds_url_fragment(
+        coverage, settings.thredds_server.base_url
+    )
+    return "/".join(
+        (
+            settings.thredds_server.base_url,
+            settings.thredds_server.netcdf_subset_service_url_fragment,
+            ds_fragment,
+        )
+    )
+
+
 async def retrieve_multiple_ncss_datasets(
     settings: config.ArpavPpcvSettings,
     client: httpx.AsyncClient,
@@ -485,6 +786,113 @@ def _parse_ncss_dataset(
         return df
 
 
+def _extract_local_time_series(
+    settings: config.ArpavPpcvSettings,
+    coverage: coverages.CoverageInternal,
+    point_geom: shapely.Point,
+    time_start: dt.datetime | None,
+    time_end: dt.datetime | None,
+) -> Optional[pd.DataFrame]:
+    """Extract a coverage's time series from the local mirror of THREDDS datasets.
+
+    Returns `None` if the coverage's dataset is not available locally, in which
+    case the data is to be retrieved from THREDDS NCSS instead.
+    """
+    result = None
+    if (dataset_path := _find_local_dataset_path(settings, coverage)) is not None:
+        try:
+            result = localmirror.extract_point_time_series(
+                dataset_path,
+                coverageregistry.get_main_netcdf_variable_name(coverage),
+                longitude=point_geom.x,
+                latitude=point_geom.y,
+                time_start=time_start,
+                time_end=time_end,
+                target_name=coverage.identifier,
+                max_open_datasets=settings.local_datasets.max_open_datasets,
+            )
+        except (localmirror.LocalDatasetError, OSError):
+            logger.exception(
+                f"Could not extract time series for {coverage.identifier!r} "
+                f"from {dataset_path!r} - falling back to NCSS..."
+            )
+    return result
+
+
+def _find_local_dataset_path(
+    settings: config.ArpavPpcvSettings,
+    coverage: coverages.CoverageInternal,
+) -> Optional[Path]:
+    local_settings = settings.local_datasets
+    result = None
+    if (
+        local_settings.base_dir is not None
+        and coverage.configuration.archive in local_settings.time_series_archives
+    ):
+        result = localmirror.find_local_dataset_path(
+            local_settings.base_dir, coverageregistry.get_thredds_url_fragment(coverage)
+        )
+    return result
+
+
+async def _async_get_time_series_cache_keys(
+    settings: config.ArpavPpcvSettings,
+    http_client: httpx.AsyncClient,
+    coverages_: list[coverages.CoverageInternal],
+    point_geom: shapely.Point,
+    time_start: dt.datetime | None,
+    time_end: dt.datetime | None,
+) -> dict[coverages.CoverageInternal, timeseriescache.TimeSeriesCacheKey]:
+    """Build time series cache keys, by snapping the point to each dataset's grid.
+
+    Coverages whose grid cannot be determined do not get a cache key.
+    """
+    grid_cells, remote_coverages = await anyio.to_thread.run_sync(
+        _find_local_grid_cells, settings, coverages_, point_geom
+    )
+    if len(remote_coverages) > 0:
+        grids = await retrieve_multiple_dataset_grids(
+            settings, http_client, remote_coverages
+        )
+        for cov, grid in grids.items():
+            if grid is not None:
+                grid_cells[cov] = grid.find_cell(point_geom.x, point_geom.y)
+    return {
+        cov: timeseriescache.build_cache_key(cov.identifier, cell, time_start, time_end)
+        for cov, cell in grid_cells.items()
+    }
+
+
+def _find_local_grid_cells(
+    settings: config.ArpavPpcvSettings,
+    coverages_: list[coverages.CoverageInternal],
+    point_geom: shapely.Point,
+) -> tuple[
+    dict[coverages.CoverageInternal, tuple[int, int]], list[coverages.CoverageInternal]
+]:
+    """Find grid cells of coverages in the local mirror of THREDDS datasets.
+
+    Returns the found grid cells and the coverages which are not available
+    locally.
+    """
+    grid_cells = {}
+    remote_coverages = []
+    for cov in coverages_:
+        if (dataset_path := _find_local_dataset_path(settings, cov)) is not None:
+            try:
+                grid_cells[cov] = localmirror.find_grid_cell(
+                    dataset_path,
+                    point_geom.x,
+                    point_geom.y,
+                    max_open_datasets=settings.local_datasets.max_open_datasets,
+                )
+            except (localmirror.LocalDatasetError, OSError):
+                logger.exception(f"Could not find grid cell in {dataset_path!r}")
+        else:
+            remote_coverages.append(cov)
+    return grid_cells, remote_coverages
+
+
 def _simplify_date(raw_date: str) -> str:
     """Simplify a date by loosing its day and time information.
 
@@ -610,7 +1018,7 @@ def get_related_coverages(
     return related_covs
 
 
-def get_coverage_time_series(
+async def async_get_coverage_time_series(
     settings: config.ArpavPpcvSettings,
     session: sqlmodel.Session,
     http_client: httpx.AsyncClient,
@@ -638,59 +1046,91 @@ def get_coverage_time_series(
         ]
     ],
 ]:
+    """Retrieve time series data for a coverage and, optionally, related data.
+
+    NCSS requests are performed concurrently on the current event loop, with the
+    shared http client. Database queries run in worker threads, bounded by
+    `database.run_in_db_thread()`, and reading local datasets, parsing and
+    smoothing data run in worker threads too, so that the event loop is never
+    blocked.
+    """
     start, end = parse_temporal_range(temporal_range)
-    to_retrieve_from_ncss = [coverage]
-    if include_coverage_uncertainty:
-        lower_cov, upper_cov = get_related_uncertainty_coverage_configurations(
-            session, coverage
+    to_retrieve = await database.run_in_db_thread(
+        settings,
+        _get_coverages_for_time_series,
+        session,
+        coverage,
+        include_coverage_uncertainty,
+        include_coverage_related_data,
+    )
+    cache = timeseriescache.get_time_series_cache(settings)
+    cache_keys = (
+        await _async_get_time_series_cache_keys(
+            settings, http_client, to_retrieve, point_geom, start, end
         )
-        if lower_cov is not None:
-            to_retrieve_from_ncss.append(lower_cov)
-        if upper_cov is not None:
-            to_retrieve_from_ncss.append(upper_cov)
-    if include_coverage_related_data:
-        related_covs = get_related_coverages(coverage)
-        to_retrieve_from_ncss.extend(related_covs)
-    with start_blocking_portal() as portal:
-        raw_data = portal.call(
-            retrieve_multiple_ncss_datasets,
+        if cache is not None
+        else {}
+    )
+    parsed_data = {}
+    for cov, cache_key in cache_keys.items():
+        cached_series = cache.get(
+            cache_key, base.CoverageDataSmoothingStrategy.NO_SMOOTHING.value
+        )
+        if cached_series is not None:
+            parsed_data[cov] = cached_series.to_frame()
+    retrieved_data = {}
+    for cov in to_retrieve:
+        if cov not in parsed_data and settings.local_datasets.base_dir is not None:
+            local_df = await anyio.to_thread.run_sync(
+                _extract_local_time_series, settings, cov, point_geom, start, end
+            )
+            if local_df is not None:
+                retrieved_data[cov] = local_df
+    to_retrieve_from_ncss = [
+        c for c in to_retrieve if c not in parsed_data and c not in retrieved_data
+    ]
+    if len(to_retrieve_from_ncss) > 0:
+        raw_data = await retrieve_multiple_ncss_datasets(
             settings,
             http_client,
             to_retrieve_from_ncss,
             point_geom,
             (start, end),
         )
-    coverage_result = {}
+        for cov, data_ in raw_data.items():
+            retrieved_data[cov] = await anyio.to_thread.run_sync(
+                _parse_ncss_dataset,
+                data_,
+                coverageregistry.get_main_netcdf_variable_name(cov),
+                start,
+                end,
+                cov.identifier,
+            )
+    for cov, df in retrieved_data.items():
+        if (cache_key := cache_keys.get(cov)) is not None:
+            cache.set(
+                cache_key,
+                base.CoverageDataSmoothingStrategy.NO_SMOOTHING.value,
+                df[cov.identifier],
+            )
+        parsed_data[cov] = df
     additional_coverage_smoothing_strategies = [
         ss
         for ss in coverage_smoothing_strategies
         if ss != base.CoverageDataSmoothingStrategy.NO_SMOOTHING
     ]
-
-    for cov, data_ in raw_data.items():
-        cov: coverages.CoverageInternal
-        df = _parse_ncss_dataset(
-            data_,
-            cov.configuration.get_main_netcdf_variable_name(cov.identifier),
-            start,
-            end,
-            cov.identifier,
+    coverage_result = {}
+    for cov, df in parsed_data.items():
+        coverage_result.update(
+            await anyio.to_thread.run_sync(
+                _smooth_coverage_series,
+                settings,
+                cov,
+                df,
+                additional_coverage_smoothing_strategies,
+                cache_keys.get(cov),
+            )
         )
-        unsmoothed_data = df[cov.identifier]
-        coverage_result[
-            (cov, base.CoverageDataSmoothingStrategy.NO_SMOOTHING)
-        ] = unsmoothed_data
-        if unsmoothed_data.count() > 1:
-            for smoothing_strategy in additional_coverage_smoothing_strategies:
-                df, smoothed_column = process_coverage_smoothing_strategy(
-                    df,
-                    cov.identifier,
-                    smoothing_strategy,
-                    ignore_warnings=(not settings.debug),
-                )
-                coverage_result[(cov, smoothing_strategy)] = df[
-                    smoothed_column
-                ].squeeze()
 
     if not include_coverage_data:
         del coverage_result[(coverage, base.CoverageDataSmoothingStrategy.NO_SMOOTHING)]
@@ -704,170 +1144,421 @@ def get_coverage_time_series(
 
     observation_result = None
     if include_observation_data:
-        additional_observation_smoothing_strategies = [
-            ss
-            for ss in observation_smoothing_strategies
-            if ss != base.ObservationDataSmoothingStrategy.NO_SMOOTHING
-        ]
-        variable = coverage.configuration.related_observation_variable
-        if coverage.configuration.related_observation_variable is not None:
-            station_data = extract_nearby_station_data(
-                session,
-                settings,
-                point_geom,
-                coverage.configuration,
-                coverage.identifier,
+        observation_result = await database.run_in_db_thread(
+            settings,
+            _get_nearby_observation_series,
+            session,
+            settings,
+            coverage,
+            point_geom,
+            start,
+            end,
+            observation_smoothing_strategies,
+        )
+    return coverage_result, observation_result
+
+
+async def async_get_coverage_multi_point_time_series(
+    settings: config.ArpavPpcvSettings,
+    session: sqlmodel.Session,
+    http_client: httpx.AsyncClient,
+    coverage: coverages.CoverageInternal,
+    points: Sequence[shapely.Point],
+    temporal_range: str,
+    coverage_smoothing_strategies: list[base.CoverageDataSmoothingStrategy],
+    include_coverage_data: bool = True,
+    include_coverage_uncertainty: bool = False,
+    include_coverage_related_data: bool = False,
+) -> list[
+    dict[
+        tuple[coverages.CoverageInternal, base.CoverageDataSmoothingStrategy], pd.Series
+    ]
+]:
+    """Retrieve time series data for a coverage at multiple points.
+
+    Each coverage is retrieved from NCSS only once, as a NetCDF subset of the area
+    that encloses all points, and the series of all points are then extracted
+    from it. The result holds one item per point, in the same order as `points`.
+    """
+    start, end = parse_temporal_range(temporal_range)
+    to_retrieve = await database.run_in_db_thread(
+        settings,
+        _get_coverages_for_time_series,
+        session,
+        coverage,
+        include_coverage_uncertainty,
+        include_coverage_related_data,
+    )
+    longitudes = np.array([p.x for p in points])
+    latitudes = np.array([p.y for p in points])
+    # enlarge the area, so that it also includes the grid cells that are nearest
+    # to points located on its edges
+    margin = settings.multi_point_time_series_bbox_margin_degrees
+    bbox = shapely.box(
+        longitudes.min() - margin,
+        latitudes.min() - margin,
+        longitudes.max() + margin,
+        latitudes.max() + margin,
+    )
+    area_data = await retrieve_multiple_ncss_areas(
+        settings, http_client, to_retrieve, bbox
+    )
+    additional_coverage_smoothing_strategies = [
+        ss
+        for ss in coverage_smoothing_strategies
+        if ss != base.CoverageDataSmoothingStrategy.NO_SMOOTHING
+    ]
+    result = [{} for _ in points]
+    for cov in to_retrieve:
+        points_series = await anyio.to_thread.run_sync(
+            _extract_multi_point_time_series,
+            settings,
+            cov,
+            area_data[cov],
+            longitudes,
+            latitudes,
+            start,
+            end,
+            additional_coverage_smoothing_strategies,
+        )
+        for point_result, point_series in zip(result, points_series):
+            point_result.update(point_series)
+    if not include_coverage_data:
+        for point_result in result:
+            for strategy in coverage_smoothing_strategies:
+                point_result.pop((coverage, strategy), None)
+    return result
+
+
+async def retrieve_multiple_ncss_areas(
+    settings: config.ArpavPpcvSettings,
+    client: httpx.AsyncClient,
+    datasets_to_retrieve: list[coverages.CoverageInternal],
+    bbox: shapely.Polygon,
+) -> dict[coverages.CoverageInternal, bytes]:
+    """Retrieve NetCDF subsets of multiple coverages for the same area.
+
+    Raises `CoverageDataRetrievalError` if any of the coverages could not be
+    retrieved.
+    """
+    raw_data = {}
+
+    async def retrieve_area(coverage: coverages.CoverageInternal):
+        ncss_url = await anyio.to_thread.run_sync(_build_ncss_url, settings, coverage)
+        try:
+            response = await ncss.async_query_dataset_area(
+                client,
+                ncss_url,
+                netcdf_variable_names=[
+                    coverageregistry.get_main_netcdf_variable_name(coverage)
+                ],
+                bbox=bbox,
+                temporal_range=(None, None),
             )
-            if station_data is not None:
-                observation_result = {}
-                raw_station_data, station = station_data
-                station_df = _process_station_data(
-                    raw_station_data,
-                    start,
-                    end,
-                    variable.name,
-                    aggregation_type=(
-                        coverage.configuration.observation_variable_aggregation_type
-                    ),
-                )
-                observation_result[
-                    (
-                        station,
-                        variable,
-                        base.ObservationDataSmoothingStrategy.NO_SMOOTHING,
-                    )
-                ] = station_df[variable.name].squeeze()
-                for smoothing_strategy in additional_observation_smoothing_strategies:
-                    (
-                        station_df,
-                        smoothed_column,
-                    ) = process_station_data_smoothing_strategy(
-                        station_df, variable.name, smoothing_strategy
-                    )
-                    observation_result[
-                        (station, variable, smoothing_strategy)
-                    ] = station_df[smoothed_column].squeeze()
-            else:
-                logger.info("No station data found, skipping...")
-        else:
-            logger.info(
-                "Cannot include observation data - no observation variable is related "
-                "to this coverage configuration"
+            try:
+                response.raise_for_status()
+                raw_data[coverage] = await response.aread()
+            finally:
+                await response.aclose()
+        except httpx.HTTPError:
+            logger.exception(f"Could not retrieve data for {coverage.identifier!r}")
+
+    async with anyio.create_task_group() as tg:
+        for to_retrieve in datasets_to_retrieve:
+            tg.start_soon(retrieve_area, to_retrieve)
+    if len(raw_data) < len(datasets_to_retrieve):
+        raise exceptions.CoverageDataRetrievalError()
+    return raw_data
+
+
+def _extract_multi_point_time_series(
+    settings: config.ArpavPpcvSettings,
+    coverage: coverages.CoverageInternal,
+    raw_data: bytes,
+    longitudes: np.ndarray,
+    latitudes: np.ndarray,
+    time_start: dt.datetime | None,
+    time_end: dt.datetime | None,
+    smoothing_strategies: list[base.CoverageDataSmoothingStrategy],
+) -> list[
+    dict[
+        tuple[coverages.CoverageInternal, base.CoverageDataSmoothingStrategy], pd.Series
+    ]
+]:
+    try:
+        values, time_index = localmirror.extract_points_time_series_from_memory(
+            f"{coverage.identifier}.nc",
+            raw_data,
+            coverageregistry.get_main_netcdf_variable_name(coverage),
+            longitudes,
+            latitudes,
+        )
+    except (localmirror.LocalDatasetError, OSError) as err:
+        logger.exception(f"Could not read NCSS response for {coverage.identifier!r}")
+        raise exceptions.CoverageDataRetrievalError() from err
+    result = []
+    for point_values in values:
+        df = pd.DataFrame({coverage.identifier: point_values}, index=time_index)
+        if time_start is not None:
+            df = df[time_start:]
+        if time_end is not None:
+            df = df[:time_end]
+        result.append(
+            _smooth_coverage_series(settings, coverage, df, smoothing_strategies, None)
+        )
+    return result
+
+
+def _get_coverages_for_time_series(
+    session: sqlmodel.Session,
+    coverage: coverages.CoverageInternal,
+    include_coverage_uncertainty: bool,
+    include_coverage_related_data: bool,
+) -> list[coverages.CoverageInternal]:
+    result = [coverage]
+    if include_coverage_uncertainty:
+        lower_cov, upper_cov = get_related_uncertainty_coverage_configurations(
+            session, coverage
+        )
+        if lower_cov is not None:
+            result.append(lower_cov)
+        if upper_cov is not None:
+            result.append(upper_cov)
+    if include_coverage_related_data:
+        result.extend(get_related_coverages(coverage))
+    return result
+
+
+def _smooth_coverage_series(
+    settings: config.ArpavPpcvSettings,
+    coverage: coverages.CoverageInternal,
+    df: pd.DataFrame,
+    smoothing_strategies: list[base.CoverageDataSmoothingStrategy],
+    cache_key: Optional[timeseriescache.TimeSeriesCacheKey],
+) -> dict[
+    tuple[coverages.CoverageInternal, base.CoverageDataSmoothingStrategy], pd.Series
+]:
+    cache = timeseriescache.get_time_series_cache(settings)
+    unsmoothed_data = df[coverage.identifier]
+    result = {
+        (coverage, base.CoverageDataSmoothingStrategy.NO_SMOOTHING): unsmoothed_data
+    }
+    if unsmoothed_data.count() > 1:
+        for smoothing_strategy in smoothing_strategies:
+            smoothed_data = (
+                cache.get(cache_key, smoothing_strategy.value)
+                if cache is not None and cache_key is not None
+                else None
             )
-    return coverage_result, observation_result
+            if smoothed_data is None:
+                df, smoothed_column = process_coverage_smoothing_strategy(
+                    df,
+                    coverage.identifier,
+                    smoothing_strategy,
+                    ignore_warnings=(not settings.debug),
+                )
+                smoothed_data = df[smoothed_column].squeeze()
+                if cache is not None and cache_key is not None:
+                    cache.set(cache_key, smoothing_strategy.value, smoothed_data)
+            result[(coverage, smoothing_strategy)] = smoothed_data
+    return result
 
 
-def extract_nearby_station_data(
+def _get_nearby_observation_series(
     session: sqlmodel.Session,
     settings: config.ArpavPpcvSettings,
+    coverage: coverages.CoverageInternal,
     point_geom: shapely.Point,
-    coverage_configuration: coverages.CoverageConfiguration,
-    coverage_identifier: str,
+    time_start: dt.datetime | None,
+    time_end: dt.datetime | None,
+    smoothing_strategies: list[base.ObservationDataSmoothingStrategy],
 ) -> Optional[
-    tuple[
-        list[
-            observations.MonthlyMeasurement
-            | observations.SeasonalMeasurement
-            | observations.YearlyMeasurement
+    dict[
+        tuple[
+            observations.Station,
+            observations.Variable,
+            base.ObservationDataSmoothingStrategy,
         ],
-        observations.Station,
+        pd.Series,
     ]
 ]:
-    point_buffer_geom = _get_spatial_buffer(
-        point_geom, settings.nearest_station_radius_meters
-    )
-    nearby_stations = database.collect_all_stations(
-        session, polygon_intersection_filter=point_buffer_geom
-    )
-    if len(nearby_stations) > 0:
-        retriever_kwargs = {
-            "variable_id_filter": coverage_configuration.observation_variable_id
-        }
-        aggregation_type = coverage_configuration.observation_variable_aggregation_type
-        if aggregation_type == base.ObservationAggregationType.MONTHLY:
-            retriever = functools.partial(
-                database.collect_all_monthly_measurements,
-                session,
-                **retriever_kwargs,
-                month_filter=None,
-            )
-        elif aggregation_type == base.ObservationAggregationType.SEASONAL:
-            retriever = functools.partial(
-                database.collect_all_seasonal_measurements,
+    result = None
+    additional_observation_smoothing_strategies = [
+        ss
+        for ss in smoothing_strategies
+        if ss != base.ObservationDataSmoothingStrategy.NO_SMOOTHING
+    ]
+    variable = coverage.configuration.related_observation_variable
+    if variable is not None:
+        station_data = extract_nearby_station_data(
+            session,
+            settings,
+            point_geom,
+            coverage.configuration,
+            coverage.identifier,
+            temporal_range=(time_start, time_end),
+        )
+        if station_data is not None:
+            result = {}
+            station_df, station = station_data
+            result[
+                (
+                    station,
+                    variable,
+                    base.ObservationDataSmoothingStrategy.NO_SMOOTHING,
+                )
+            ] = station_df[variable.name].squeeze()
+            for smoothing_strategy in additional_observation_smoothing_strategies:
+                (
+                    station_df,
+                    smoothed_column,
+                ) = process_station_data_smoothing_strategy(
+                    station_df, variable.name, smoothing_strategy
+                )
+                result[(station, variable, smoothing_strategy)] = station_df[
+                    smoothed_column
+                ].squeeze()
+        else:
+            logger.info("No station data found, skipping...")
+    else:
+        logger.info(
+            "Cannot include observation data - no observation variable is related "
+            "to this coverage configuration"
+        )
+    return result
+
+
+def extract_nearby_station_data(
+    session: sqlmodel.Session,
+    settings: config.ArpavPpcvSettings,
+    point_geom: shapely.Point,
+    coverage_configuration: coverages.CoverageConfiguration,
+    coverage_identifier: str,
+    temporal_range: tuple[dt.datetime | None, dt.datetime | None] = (None, None),
+) -> Optional[tuple[pd.DataFrame, observations.Station]]:
+    """Get the series of the nearest station with data for the coverage.
+
+    The station is the one nearest to the input EPSG:4326 point, within the
+    configured radius, that has measurements of the coverage's related
+    observation variable, with its aggregation type. Unless the observation
+    store is in use, candidate stations are taken from the precomputed cell of
+    the coverage download grid which contains the point.
+    """
+    aggregation_type = coverage_configuration.observation_variable_aggregation_type
+    variable = coverage_configuration.related_observation_variable
+    if aggregation_type == base.ObservationAggregationType.SEASONAL:
+        season_filter = coverage_configuration.get_seasonal_aggregation_query_filter(
+            coverage_identifier
+        )
+    else:
+        season_filter = None
+    retriever_kwargs = {"variable_id": variable.id, "season_filter": season_filter}
+    if (store := observationstore.get_observation_store()) is not None:
+        nearest = store.get_nearest_station_measurement_columns(
+            point_geom,
+            settings.nearest_station_radius_meters,
+            aggregation_type,
+            **retriever_kwargs,
+        )
+    else:
+        grid = datadownloads.CoverageDownloadGrid.from_config(
+            settings.coverage_download_settings.spatial_grid
+        )
+        if (cell_index := grid.get_cell_index(point_geom)) is not None:
+            cell_nearest = database.get_grid_cell_nearest_station_measurement_columns(
                 session,
+                cell_index,
+                point_geom,
+                settings.nearest_station_radius_meters,
+                aggregation_type,
                 **retriever_kwargs,
-                season_filter=coverage_configuration.get_seasonal_aggregation_query_filter(
-                    coverage_identifier
-                ),
             )
-        else:  # ANNUAL
-            retriever = functools.partial(
-                database.collect_all_yearly_measurements,
+        else:
+            cell_nearest = None
+        if cell_nearest is not None:
+            nearest = cell_nearest if cell_nearest[0] is not None else None
+        else:
+            # the point is outside of the grid, or the grid's cells have not been
+            # computed yet
+            nearest = database.get_nearest_station_measurement_columns(
                 session,
+                point_geom,
+                settings.nearest_station_radius_meters,
+                aggregation_type,
                 **retriever_kwargs,
             )
-        sorted_stations = sorted(
-            nearby_stations, key=lambda s: to_shape(s.geom).distance(point_geom)
+    if nearest is not None:
+        station, columns = nearest
+        station_df = _build_observation_series_frame(
+            columns, aggregation_type, variable.name
         )
-        # order nearby stations by distance and then iterate through them in order to
-        # try to get measurements for the relevant variable and temporal aggregation
-        for station in sorted_stations:
-            logger.debug(f"Processing station {station.id}...")
-            raw_station_data = retriever(station_id_filter=station.id)
-            if len(raw_station_data) > 0:
-                # stop with the first station that has data
-                result = (raw_station_data, station)
-                break
-        else:
-            result = None
-            logger.info("Nearby stations do not have data")
+        start, end = temporal_range
+        if start is not None:
+            station_df = station_df[start:]
+        if end is not None:
+            station_df = station_df[:end]
+        result = (station_df, station)
     else:
         logger.info(
-            f"There are no nearby stations from {shapely.io.to_wkt(point_geom)}"
+            f"There are no nearby stations with data from "
+            f"{shapely.io.to_wkt(point_geom)}"
         )
         result = None
     return result
 
 
-def _process_station_data(
-    raw_data: list[observations.SeasonalMeasurement],
-    time_start: Optional[dt.datetime],
-    time_end: Optional[dt.datetime],
-    base_name: str,
+def build_station_grid_cells(
+    grid: datadownloads.CoverageDownloadGrid,
+    stations: Sequence[observations.Station],
+    max_distance_meters: float,
     aggregation_type: base.ObservationAggregationType,
-):
-    df = pd.DataFrame([i.model_dump() for i in raw_data])
-    df = df.rename(columns={"value": base_name})
-    if aggregation_type == base.ObservationAggregationType.SEASONAL:
-        df["season_month"] = (
-            df["season"]
-            .astype("string")
-            .replace(
-                {
-                    "Season.WINTER": "01",
-                    "Season.SPRING": "04",
-                    "Season.SUMMER": "07",
-                    "Season.AUTUMN": "10",
-                }
+    variable_id: uuid.UUID,
+) -> list[observations.StationGridCellCreate]:
+    """Find the stations which may be the nearest ones to points of each cell.
+
+    A station is a candidate for a cell if it is within `max_distance_meters`
+    of the cell's centre plus the distance between the centre and the cell's
+    farthest corner, which ensures that it is within `max_distance_meters` of
+    every point of the cell which may have it as its nearest station.
+    Candidates are sorted by their distance to the cell's centre.
+    """
+    bounds = grid.cell_bounds
+    centre_lons = (bounds[:, 0] + bounds[:, 2]) / 2
+    centre_lats = (bounds[:, 1] + bounds[:, 3]) / 2
+    cell_radii = np.max(
+        [
+            utils.get_geodesic_distances(
+                centre_lons, centre_lats, bounds[:, x], bounds[:, y]
+            )
+            for x, y in ((0, 1), (0, 3), (2, 1), (2, 3))
+        ],
+        axis=0,
+    )
+    station_coords = shapely.get_coordinates(
+        [to_shape(s.geom) for s in stations]
+    ).reshape(-1, 2)
+    # distances between each cell centre (rows) and each station (columns)
+    distances = utils.get_geodesic_distances(
+        centre_lons[:, np.newaxis],
+        centre_lats[:, np.newaxis],
+        station_coords[np.newaxis, :, 0],
+        station_coords[np.newaxis, :, 1],
+    )
+    result = []
+    for cell_index, (cell_distances, cell_radius) in enumerate(
+        zip(distances, cell_radii)
+    ):
+        candidates = np.flatnonzero(cell_distances <= max_distance_meters + cell_radius)
+        candidates = candidates[np.argsort(cell_distances[candidates], kind="stable")]
+        result.append(
+            observations.StationGridCellCreate(
+                variable_id=variable_id,
+                aggregation_type=aggregation_type,
+                cell_index=cell_index,
+                station_ids=[stations[i].id for i in candidates],
             )
         )
-        df["time"] = pd.to_datetime(
-            df["year"].astype("string") + "-" + df["season_month"] + "-01", utc=True
-        )
-    elif aggregation_type == base.ObservationAggregationType.YEARLY:
-        df["time"] = pd.to_datetime(df["year"].astype("string"), utc=True)
-    else:
-        raise RuntimeError(
-            f"Unable to process station data with aggregation type {aggregation_type}"
-        )
-
-    df = df[[base_name, "time"]]
-    df.set_index("time", inplace=True)
-    if time_start is not None:
-        df = df[time_start:]
-    if time_end is not None:
-        df = df[:time_end]
-    return df
+    return result
 
 
 def _apply_loess_smoothing(
@@ -912,32 +1603,6 @@ def parse_temporal_range(
     return start, end
 
 
-def _get_spatial_buffer(
-    point_geom: shapely.Point, distance_meters: int
-) -> shapely.Polygon:
-    """Buffer input point.
-
-    This function expects the input point geometry to be in EPSG:4326 CRS and will
-    return a buffer also in the same CRS. However, the buffer's distance is expected
-    to be provided in meters. This function takes care of reprojecting the input
-    geometry and the output buffer too.
-    """
-    coordinate_transformer = pyproj.Transformer.from_crs(
-        pyproj.CRS("EPSG:4326"), pyproj.CRS("EPSG:3004"), always_xy=True
-    ).transform
-    forward_coordinate_transformer = functools.partial(
-        coordinate_transformer, direction=TransformDirection.FORWARD
-    )
-    inverse_coordinate_transformer = functools.partial(
-        coordinate_transformer, direction=TransformDirection.INVERSE
-    )
-    point_geom_projected = transform(forward_coordinate_transformer, point_geom)
-    buffer_geom_projected = shapely.buffer(
-        point_geom_projected, distance=distance_meters
-    )
-    return transform(inverse_coordinate_transformer, buffer_geom_projected)
-
-
 def get_historical_variable_parameters(
     session: sqlmodel.Session,
 ) -> dict[str, coverages.HistoricalVariableMenuTree]:
@@ -1184,30 +1849,6 @@ def sanitize_observation_variable_name(name: str) -> str:
     return name.lower().replace(" ", "_").replace("-", "_")
 
 
-def _filter_configuration_parameter_values(
-    session: sqlmodel.Session,
-    possible_param_values: Sequence[str],
-    param_name: str,
-    return_all_if_filter_empty: bool = True,
-) -> list[coverages.ConfigurationParameterValue]:
-    result = []
-    for v in possible_param_values:
-        if (
-            conf_param_value := database.get_configuration_parameter_value_by_names(
-                session, param_name, v
-            )
-        ) is not None:
-            result.append(conf_param_value)
-        else:
-            logger.warning(f"Invalid {param_name}: {v!r}, ignoring...")
-    else:
-        if len(result) == 0 and return_all_if_filter_empty:
-            result = database.get_configuration_parameter_by_name(
-                session, param_name
-            ).allowed_values[:]
-    return result
-
-
 def list_coverage_identifiers_by_param_values(
     session: sqlmodel.Session,
     climatological_variable_filter: Optional[list[str]] = None,
@@ -1220,105 +1861,70 @@ def list_coverage_identifiers_by_param_values(
     *,
     limit: int = 20,
     offset: int = 0,
-) -> list[str]:
-    valid_variables = _filter_configuration_parameter_values(
-        session,
-        climatological_variable_filter or [],
-        CoreConfParamName.CLIMATOLOGICAL_VARIABLE.value,
-    )
-    valid_climatological_models = _filter_configuration_parameter_values(
-        session,
-        climatological_model_filter or [],
-        CoreConfParamName.CLIMATOLOGICAL_MODEL.value,
-    )
-    valid_aggregation_periods = _filter_configuration_parameter_values(
-        session,
-        aggregation_period_filter or [],
-        CoreConfParamName.AGGREGATION_PERIOD.value,
-    )
-    valid_scenarios = _filter_configuration_parameter_values(
-        session, scenario_filter or [], CoreConfParamName.SCENARIO.value
-    )
-    valid_measures = _filter_configuration_parameter_values(
-        session, measure_filter or [], CoreConfParamName.MEASURE.value
-    )
-    valid_year_periods = _filter_configuration_parameter_values(
-        session, year_period_filter or [], CoreConfParamName.YEAR_PERIOD.value
-    )
-    valid_time_windows = _filter_configuration_parameter_values(
-        session,
-        time_window_filter or [],
-        "time_window",
-        return_all_if_filter_empty=False,
-    )
-    if len(valid_time_windows) == 0:
-        valid_time_windows.insert(0, None)
-    valid_time_window_names = [tw.name for tw in valid_time_windows if tw is not None]
-    coverage_identifiers = set()
-    for combination in itertools.product(
-        valid_variables,
-        valid_aggregation_periods,
-        valid_climatological_models,
-        valid_scenarios,
-        valid_measures,
-        valid_year_periods,
-        valid_time_windows,
+) -> tuple[list[str], int]:
+    """List identifiers of forecast coverages, sorted, along with their total.
+
+    Each filter restricts its parameter to the input values, ignoring those
+    which are not valid. Empty filters allow any value of the parameter, except
+    for the time window, which is not required to be used by coverages at all.
+    """
+    filters = {
+        CoreConfParamName.CLIMATOLOGICAL_VARIABLE.value: climatological_variable_filter,
+        CoreConfParamName.AGGREGATION_PERIOD.value: aggregation_period_filter,
+        CoreConfParamName.CLIMATOLOGICAL_MODEL.value: climatological_model_filter,
+        CoreConfParamName.SCENARIO.value: scenario_filter,
+        CoreConfParamName.MEASURE.value: measure_filter,
+        CoreConfParamName.YEAR_PERIOD.value: year_period_filter,
+        "time_window": time_window_filter,
+    }
+    param_values = {}
+    for (
+        param_value
+    ) in database.collect_configuration_parameter_values_by_parameter_names(
+        session, [CoreConfParamName.ARCHIVE.value, *filters.keys()]
     ):
-        (
-            variable,
-            aggregation_period,
-            model,
-            scenario,
-            measure,
-            year_period,
-            time_window,
-        ) = combination
-        logger.debug(
-            f"getting links for variable: {variable.name!r}, "
-            f"aggregation_period: {aggregation_period.name!r}, "
-            f"model: {model.name!r}, scenario: {scenario.name!r}, "
-            f"measure: {measure.name!r}, "
-            f"year_period: {year_period.name!r}, "
-            f"time_window: {time_window.name if time_window else time_window!r}..."
-        )
-        param_values_filter = [
-            database.get_configuration_parameter_value_by_names(
-                session, CoreConfParamName.ARCHIVE.value, "forecast"
-            ),
-            variable,
-            aggregation_period,
-            model,
-            scenario,
-            measure,
-            year_period,
-            time_window,
+        values = param_values.setdefault(param_value.configuration_parameter.name, {})
+        values[param_value.name] = param_value
+    required_values = [
+        [
+            v
+            for v in param_values.get(CoreConfParamName.ARCHIVE.value, {}).values()
+            if v.name == "forecast"
         ]
-        filter_ = [i for i in param_values_filter if i is not None]
-        cov_confs, _ = database.list_coverage_configurations(
-            session,
-            limit=limit,
-            offset=offset,
-            configuration_parameter_values_filter=filter_,
-        )
-        for cov_conf in cov_confs:
-            identifiers = database.generate_coverage_identifiers(
-                cov_conf, configuration_parameter_values_filter=filter_
+    ]
+    for param_name, filter_ in filters.items():
+        available = param_values.get(param_name, {})
+        valid = []
+        for value_name in filter_ or []:
+            if (param_value := available.get(value_name)) is not None:
+                valid.append(param_value)
+            else:
+                logger.warning(f"Invalid {param_name}: {value_name!r}, ignoring...")
+        if len(valid) == 0 and param_name != "time_window":
+            valid = list(available.values())
+        if len(valid) > 0 or param_name != "time_window":
+            required_values.append(valid)
+    values_filter = [v for group in required_values for v in group]
+    cov_confs = database.collect_coverage_configurations_by_possible_values(
+        session, required_values
+    )
+    # identifiers start with the name of their coverage configuration and are
+    # generated in sorted order, so they can be paginated without generating
+    # those that come after the requested page
+    cov_confs = sorted(cov_confs, key=lambda cc: cc.name)
+    total = 0
+    coverage_identifiers = []
+    for cov_conf in cov_confs:
+        num_identifiers = database.count_coverage_identifiers(cov_conf, values_filter)
+        page_start = max(offset - total, 0)
+        page_end = max(offset + limit - total, 0)
+        if page_start < num_identifiers and page_start < page_end:
+            coverage_identifiers.extend(
+                itertools.islice(
+                    database.iter_sorted_coverage_identifiers(cov_conf, values_filter),
+                    page_start,
+                    page_end,
+                )
             )
-            for cov_id in identifiers:
-                if time_window is None:
-                    used_values = cov_conf.retrieve_configuration_parameters(cov_id)
-                    used_time_window = used_values.get("time_window")
-                    if used_time_window is None:
-                        coverage_identifiers.add(cov_id)
-                    elif (
-                        len(valid_time_window_names) == 0
-                        or used_time_window in valid_time_window_names
-                    ):
-                        coverage_identifiers.add(cov_id)
-                else:
-                    coverage_identifiers.add(cov_id)
-            if len(coverage_identifiers) > (offset + limit):
-                break
-        if len(coverage_identifiers) > (offset + limit):
-            break
-    return sorted(coverage_identifiers)[offset : offset + limit]
+        total += num_identifiers
+    return coverage_identifiers, total
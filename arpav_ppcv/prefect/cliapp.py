@@ -2,6 +2,7 @@ import prefect
 import typer
 
 from ..config import ArpavPpcvSettings
+from .flows import coverages as coverages_flows
 from .flows import observations as observations_flows
 
 app = typer.Typer()
@@ -15,6 +16,7 @@ def start_periodic_tasks(
     refresh_seasonal_measurements: bool = False,
     refresh_yearly_measurements: bool = False,
     refresh_station_variables: bool = False,
+    refresh_climate_barometer: bool = False,
 ):
     """Starts a prefect worker to perform background tasks.
 
@@ -27,6 +29,7 @@ def start_periodic_tasks(
     - refreshing observation yearly measurements for known stations
     - refreshing the database views which contain available observation stations for
       each indicator
+    - refreshing the stored climate barometer series
 
     """
     settings: ArpavPpcvSettings = ctx.obj["settings"]
@@ -65,4 +68,12 @@ def start_periodic_tasks(
             )
         )
         to_serve.append(station_variables_deployment)
+    if refresh_climate_barometer:
+        climate_barometer_deployment = (
+            coverages_flows.refresh_climate_barometer_series.to_deployment(
+                name="climate_barometer_refresher",
+                cron=settings.prefect.climate_barometer_refresher_flow_cron_schedule,
+            )
+        )
+        to_serve.append(climate_barometer_deployment)
     prefect.serve(*to_serve)
@@ -0,0 +1,86 @@
+import prefect
+import prefect.artifacts
+import sqlmodel
+
+from arpav_ppcv import (
+    database,
+    operations,
+)
+from arpav_ppcv.config import get_settings
+from arpav_ppcv.schemas import coverages
+
+# this is a module global because we need to configure the prefect flow and
+# task with values from it
+settings = get_settings()
+db_engine = database.get_engine(settings)
+
+
+@prefect.task(
+    retries=settings.prefect.num_task_retries,
+    retry_delay_seconds=settings.prefect.task_retry_delay_seconds,
+)
+def retrieve_climate_barometer_series(
+    coverage: coverages.CoverageInternal,
+    opendap_url: str,
+    netcdf_variable_name: str,
+    is_uncertainty: bool,
+    sort_order: int,
+) -> list[coverages.ClimateBarometerSeriesCreate]:
+    df = operations.read_climate_barometer_dataset(
+        opendap_url, netcdf_variable_name, coverage.identifier
+    )
+    return operations.build_climate_barometer_series_to_store(
+        coverage, df, is_uncertainty=is_uncertainty, sort_order=sort_order
+    )
+
+
+@prefect.flow(
+    log_prints=True,
+    retries=settings.prefect.num_flow_retries,
+    retry_delay_seconds=settings.prefect.flow_retry_delay_seconds,
+)
+def refresh_climate_barometer_series():
+    """Retrieve climate barometer series from THREDDS and store them.
+
+    All stored series are replaced at once, after every coverage has been
+    successfully retrieved.
+    """
+    with sqlmodel.Session(db_engine) as db_session:
+        barometer_covs = operations.get_climate_barometer_coverages(
+            db_session, include_uncertainty=True
+        )
+        if len(barometer_covs) > 0:
+            datasets = operations.resolve_climate_barometer_datasets(
+                settings, [cov for cov, _ in barometer_covs]
+            )
+            to_wait_for = []
+            for sort_order, (cov, is_uncertainty) in enumerate(barometer_covs):
+                print(f"Processing coverage {cov.identifier!r}...")
+                opendap_url, netcdf_variable_name = datasets[cov]
+                fut = retrieve_climate_barometer_series.submit(
+                    cov, opendap_url, netcdf_variable_name, is_uncertainty, sort_order
+                )
+                to_wait_for.append(fut)
+            to_create = []
+            for future in to_wait_for:
+                to_create.extend(future.result())
+            print(f"Storing {len(to_create)} climate barometer series...")
+            stored = database.replace_climate_barometer_series(
+                db_session,
+                to_create,
+                batch_size=settings.db_bulk_insert_batch_size,
+            )
+            prefect.artifacts.create_table_artifact(
+                key="climate-barometer-series-refreshed",
+                table=[
+                    {
+                        "coverage": s.coverage_identifier,
+                        "smoothing strategy": s.smoothing_strategy,
+                        "number of values": s.num_values,
+                    }
+                    for s in stored
+                ],
+                description=f"# Stored {len(stored)} climate barometer series",
+            )
+        else:
+            print("There are no climate barometer coverages to process, skipping...")
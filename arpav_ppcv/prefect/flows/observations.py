@@ -1,17 +1,19 @@
-import datetime as dt
 import uuid
 from typing import Sequence
 
-import httpx
 import sqlmodel
 import prefect
 import prefect.artifacts
-import pyproj
+import sqlalchemy
 
-from arpav_ppcv import database
+from arpav_ppcv import (
+    database,
+    datadownloads,
+)
 from arpav_ppcv.config import get_settings
 from arpav_ppcv.observations_harvester import operations
 from arpav_ppcv.operations import (
+    build_station_grid_cells,
     create_db_schema,
     refresh_station_variable_database_view,
 )
@@ -26,33 +28,6 @@ settings = get_settings()
 db_engine = database.get_engine(settings)
 
 
-@prefect.task(
-    retries=settings.prefect.num_task_retries,
-    retry_delay_seconds=settings.prefect.task_retry_delay_seconds,
-)
-def harvest_stations(
-    client: httpx.Client,
-    variable: observations.Variable,
-    fetch_stations_with_months: bool,
-    fetch_stations_with_seasons: bool,
-    fetch_stations_with_yearly_measurements: bool,
-) -> set[observations.StationCreate]:
-    coord_converter = pyproj.Transformer.from_crs(
-        pyproj.CRS("epsg:4258"), pyproj.CRS("epsg:4326"), always_xy=True
-    ).transform
-    stations = set()
-    retriever = operations.fetch_remote_stations(
-        client=client,
-        variables=[variable],
-        fetch_stations_with_months=fetch_stations_with_months,
-        fetch_stations_with_seasons=fetch_stations_with_seasons,
-        fetch_stations_with_yearly_measurements=fetch_stations_with_yearly_measurements,
-    )
-    for raw_station in retriever:
-        stations.add(operations.parse_station(raw_station, coord_converter))
-    return stations
-
-
 @prefect.task(
     retries=settings.prefect.num_task_retries,
     retry_delay_seconds=settings.prefect.task_retry_delay_seconds,
@@ -98,55 +73,38 @@ def refresh_stations(
     refresh_stations_with_seasonal_data: bool = True,
     refresh_stations_with_yearly_data: bool = True,
 ):
-    client = httpx.Client()
     with sqlmodel.Session(db_engine) as db_session:
         db_variables = _get_variables(db_session, variable_name)
         if len(db_variables) > 0:
-            to_filter_for_new_stations = set()
-            to_wait_on = []
             for variable in db_variables:
                 print(
                     f"refreshing stations that have values for "
                     f"variable {variable.name!r}..."
                 )
-                if refresh_stations_with_monthly_data:
-                    monthly_future = harvest_stations.submit(
-                        client,
-                        variable,
-                        fetch_stations_with_months=True,
-                        fetch_stations_with_seasons=False,
-                        fetch_stations_with_yearly_measurements=False,
-                    )
-                    to_wait_on.append(monthly_future)
-                if refresh_stations_with_seasonal_data:
-                    seasonal_future = harvest_stations.submit(
-                        client,
-                        variable,
-                        fetch_stations_with_months=False,
-                        fetch_stations_with_seasons=True,
-                        fetch_stations_with_yearly_measurements=False,
-                    )
-                    to_wait_on.append(seasonal_future)
-                if refresh_stations_with_yearly_data:
-                    yearly_future = harvest_stations.submit(
-                        client,
-                        variable,
-                        fetch_stations_with_months=False,
-                        fetch_stations_with_seasons=False,
-                        fetch_stations_with_yearly_measurements=True,
-                    )
-                    to_wait_on.append(yearly_future)
-            for future in to_wait_on:
-                to_filter_for_new_stations.update(future.result())
+            harvested = operations.run_harvester(
+                settings,
+                db_engine,
+                lambda harvester: harvester.harvest_stations(
+                    db_variables,
+                    fetch_stations_with_months=refresh_stations_with_monthly_data,
+                    fetch_stations_with_seasons=refresh_stations_with_seasonal_data,
+                    fetch_stations_with_yearly_measurements=(
+                        refresh_stations_with_yearly_data
+                    ),
+                ),
+            )
             to_create = find_new_stations(
-                database.collect_all_stations(db_session),
-                list(to_filter_for_new_stations),
+                database.collect_all_stations(db_session), list(harvested)
             )
             if len(to_create) > 0:
                 print(f"Found {len(to_create)} new stations. Creating them now...")
                 for s in to_create:
                     print(f"- ({s.code}) {s.name}")
-                created = database.create_many_stations(db_session, to_create)
+                created = database.create_many_stations(
+                    db_session,
+                    to_create,
+                    batch_size=settings.db_bulk_insert_batch_size,
+                )
             else:
                 created = []
                 print("No new stations found.")
@@ -161,51 +119,6 @@ def refresh_stations(
             print("There are no variables to process, skipping...")
 
 
-@prefect.task(
-    retries=settings.prefect.num_task_retries,
-    retry_delay_seconds=settings.prefect.task_retry_delay_seconds,
-)
-def harvest_monthly_measurements(
-    client: httpx.Client,
-    db_session: sqlmodel.Session,
-    station: observations.Station,
-    variable: observations.Variable,
-    month: int,
-) -> list[observations.MonthlyMeasurementCreate]:
-    existing_measurements = database.collect_all_monthly_measurements(
-        db_session,
-        station_id_filter=station.id,
-        variable_id_filter=variable.id,
-        month_filter=month,
-    )
-    existing = {}
-    for db_measurement in existing_measurements:
-        measurement_id = build_monthly_measurement_id(db_measurement)
-        existing[measurement_id] = db_measurement
-    response = client.get(
-        "https://api.arpa.veneto.it/REST/v1/clima_indicatori",
-        params={
-            "statcd": station.code,
-            "indicatore": variable.name,
-            "tabella": "M",
-            "periodo": month,
-        },
-    )
-    response.raise_for_status()
-    to_create = []
-    for raw_measurement in response.json().get("data", []):
-        measurement_create = observations.MonthlyMeasurementCreate(
-            station_id=station.id,
-            variable_id=variable.id,
-            value=raw_measurement["valore"],
-            date=dt.date(raw_measurement["anno"], month, 1),
-        )
-        measurement_id = build_monthly_measurement_id(measurement_create)
-        if measurement_id not in existing:
-            to_create.append(measurement_create)
-    return to_create
-
-
 @prefect.flow(
     log_prints=True,
     retries=settings.prefect.num_flow_retries,
@@ -215,100 +128,32 @@ def refresh_monthly_measurements(
     station_code: str | None = None,
     variable_name: str | None = None,
     month: int | None = None,
+    full_refresh: bool = False,
 ):
-    client = httpx.Client()
-    all_created = []
     with sqlmodel.Session(db_engine) as db_session:
-        if len(db_variables := _get_variables(db_session, variable_name)) > 0:
-            if len(db_stations := _get_stations(db_session, station_code)) > 0:
-                for db_station in db_stations:
-                    to_create = []
-                    to_wait_for = []
-                    print(f"Processing station: {db_station.name!r}...")
-                    for db_variable in db_variables:
-                        print(f"Processing variable: {db_variable.name!r}...")
-                        if len(months := _get_months(month)) > 0:
-                            for current_month in months:
-                                print(f"Processing month: {current_month!r}...")
-                                fut = harvest_monthly_measurements.submit(
-                                    client,
-                                    db_session,
-                                    db_station,
-                                    db_variable,
-                                    current_month,
-                                )
-                                to_wait_for.append(fut)
-                        else:
-                            print("There are no months to process, skipping...")
-                    for future in to_wait_for:
-                        to_create.extend(future.result())
-                    print(f"creating {len(to_create)} new monthly measurements...")
-                    created = database.create_many_monthly_measurements(
-                        db_session, to_create
-                    )
-                    all_created.extend(created)
-            else:
-                print("There are no stations to process, skipping...")
-        else:
-            print("There are no variables to process, skipping...")
-        prefect.artifacts.create_table_artifact(
-            key="monthly-measurements-created",
-            table=_build_created_measurements_table(all_created),
-            description=f"# Created {len(all_created)} monthly measurements",
+        db_variables = _get_variables(db_session, variable_name)
+        db_stations = _get_stations(db_session, station_code)
+    months = _get_months(month)
+    if _can_harvest(db_stations, db_variables, "months", months):
+        print(
+            f"Processing {len(db_stations)} stations, {len(db_variables)} "
+            f"variables and {len(months)} months..."
         )
-
-
-@prefect.task(
-    retries=settings.prefect.num_task_retries,
-    retry_delay_seconds=settings.prefect.task_retry_delay_seconds,
-)
-def harvest_seasonal_measurements(
-    client: httpx.Client,
-    db_session: sqlmodel.Session,
-    station: observations.Station,
-    variable: observations.Variable,
-    season: base.Season,
-) -> list[observations.SeasonalMeasurementCreate]:
-    existing_measurements = database.collect_all_seasonal_measurements(
-        db_session,
-        station_id_filter=station.id,
-        variable_id_filter=variable.id,
-        season_filter=season,
-    )
-    existing = {}
-    for db_measurement in existing_measurements:
-        measurement_id = build_seasonal_measurement_id(db_measurement)
-        existing[measurement_id] = db_measurement
-
-    season_query_param = {
-        base.Season.WINTER: 1,
-        base.Season.SPRING: 2,
-        base.Season.SUMMER: 3,
-        base.Season.AUTUMN: 4,
-    }[season]
-    response = client.get(
-        "https://api.arpa.veneto.it/REST/v1/clima_indicatori",
-        params={
-            "statcd": station.code,
-            "indicatore": variable.name,
-            "tabella": "S",
-            "periodo": season_query_param,
-        },
-    )
-    response.raise_for_status()
-    to_create = []
-    for raw_measurement in response.json().get("data", []):
-        measurement_create = observations.SeasonalMeasurementCreate(
-            station_id=station.id,
-            variable_id=variable.id,
-            value=raw_measurement["valore"],
-            year=int(raw_measurement["anno"]),
-            season=season,
+        upserted = operations.run_harvester(
+            settings,
+            db_engine,
+            lambda harvester: harvester.harvest_monthly_measurements(
+                db_stations, db_variables, months, full_refresh=full_refresh
+            ),
         )
-        measurement_id = build_seasonal_measurement_id(measurement_create)
-        if measurement_id not in existing:
-            to_create.append(measurement_create)
-    return to_create
+    else:
+        upserted = []
+    print(f"created or updated {len(upserted)} monthly measurements")
+    prefect.artifacts.create_table_artifact(
+        key="monthly-measurements-created",
+        table=_build_upserted_measurements_table(upserted, db_stations, db_variables),
+        description=f"# Created or updated {len(upserted)} monthly measurements",
+    )
 
 
 @prefect.flow(
@@ -320,86 +165,32 @@ def refresh_seasonal_measurements(
     station_code: str | None = None,
     variable_name: str | None = None,
     season_name: str | None = None,
+    full_refresh: bool = False,
 ):
-    client = httpx.Client()
-    all_created = []
     with sqlmodel.Session(db_engine) as db_session:
-        if len(db_variables := _get_variables(db_session, variable_name)) > 0:
-            if len(db_stations := _get_stations(db_session, station_code)) > 0:
-                for db_station in db_stations:
-                    to_create = []
-                    to_wait_for = []
-                    print(f"Processing station: {db_station.name!r}...")
-                    for db_variable in db_variables:
-                        print(f"Processing variable: {db_variable.name!r}...")
-                        if len(seasons := _get_seasons(season_name)) > 0:
-                            for season in seasons:
-                                print(f"Processing season: {season!r}...")
-                                fut = harvest_seasonal_measurements.submit(
-                                    client, db_session, db_station, db_variable, season
-                                )
-                                to_wait_for.append(fut)
-                        else:
-                            print("There are no seasons to process, skipping...")
-                    for future in to_wait_for:
-                        to_create.extend(future.result())
-                    print(f"creating {len(to_create)} new seasonal measurements...")
-                    created = database.create_many_seasonal_measurements(
-                        db_session, to_create
-                    )
-                    all_created.extend(created)
-            else:
-                print("There are no stations to process, skipping...")
-        else:
-            print("There are no variables to process, skipping...")
-        prefect.artifacts.create_table_artifact(
-            key="seasonal-measurements-created",
-            table=_build_created_measurements_table(all_created),
-            description=f"# Created {len(all_created)} seasonal measurements",
+        db_variables = _get_variables(db_session, variable_name)
+        db_stations = _get_stations(db_session, station_code)
+    seasons = _get_seasons(season_name)
+    if _can_harvest(db_stations, db_variables, "seasons", seasons):
+        print(
+            f"Processing {len(db_stations)} stations, {len(db_variables)} "
+            f"variables and {len(seasons)} seasons..."
         )
-
-
-@prefect.task(
-    retries=settings.prefect.num_task_retries,
-    retry_delay_seconds=settings.prefect.task_retry_delay_seconds,
-)
-def harvest_yearly_measurements(
-    client: httpx.Client,
-    db_session: sqlmodel.Session,
-    station: observations.Station,
-    variable: observations.Variable,
-) -> list[observations.YearlyMeasurementCreate]:
-    to_create = []
-    existing_measurements = database.collect_all_yearly_measurements(
-        db_session,
-        station_id_filter=station.id,
-        variable_id_filter=variable.id,
-    )
-    existing = {}
-    for db_measurement in existing_measurements:
-        measurement_id = build_yearly_measurement_id(db_measurement)
-        existing[measurement_id] = db_measurement
-    response = client.get(
-        "https://api.arpa.veneto.it/REST/v1/clima_indicatori",
-        params={
-            "statcd": station.code,
-            "indicatore": variable.name,
-            "tabella": "A",
-            "periodo": "0",
-        },
-    )
-    response.raise_for_status()
-    for raw_measurement in response.json().get("data", []):
-        yearly_measurement_create = observations.YearlyMeasurementCreate(
-            station_id=station.id,
-            variable_id=variable.id,
-            value=raw_measurement["valore"],
-            year=int(raw_measurement["anno"]),
+        upserted = operations.run_harvester(
+            settings,
+            db_engine,
+            lambda harvester: harvester.harvest_seasonal_measurements(
+                db_stations, db_variables, seasons, full_refresh=full_refresh
+            ),
         )
-        measurement_id = build_yearly_measurement_id(yearly_measurement_create)
-        if measurement_id not in existing:
-            to_create.append(yearly_measurement_create)
-    return to_create
+    else:
+        upserted = []
+    print(f"created or updated {len(upserted)} seasonal measurements")
+    prefect.artifacts.create_table_artifact(
+        key="seasonal-measurements-created",
+        table=_build_upserted_measurements_table(upserted, db_stations, db_variables),
+        description=f"# Created or updated {len(upserted)} seasonal measurements",
+    )
 
 
 @prefect.flow(
@@ -410,38 +201,48 @@ def harvest_yearly_measurements(
 def refresh_yearly_measurements(
     station_code: str | None = None,
     variable_name: str | None = None,
+    full_refresh: bool = False,
 ):
-    client = httpx.Client()
-    all_created = []
     with sqlmodel.Session(db_engine) as db_session:
-        if len(db_variables := _get_variables(db_session, variable_name)) > 0:
-            if len(db_stations := _get_stations(db_session, station_code)) > 0:
-                for db_station in db_stations:
-                    to_create = []
-                    to_wait_for = []
-                    print(f"Processing station: {db_station.name!r}...")
-                    for db_variable in db_variables:
-                        print(f"Processing variable: {db_variable.name!r}...")
-                        fut = harvest_yearly_measurements.submit(
-                            client, db_session, db_station, db_variable
-                        )
-                        to_wait_for.append(fut)
-                    for future in to_wait_for:
-                        to_create.extend(future.result())
-                    print(f"creating {len(to_create)} new yearly measurements...")
-                    created = database.create_many_yearly_measurements(
-                        db_session, to_create
-                    )
-                    all_created.extend(created)
-            else:
-                print("There are no stations to process, skipping...")
-        else:
-            print("There are no variables to process, skipping...")
-        prefect.artifacts.create_table_artifact(
-            key="yearly-measurements-created",
-            table=_build_created_measurements_table(all_created),
-            description=f"# Created {len(all_created)} yearly measurements",
+        db_variables = _get_variables(db_session, variable_name)
+        db_stations = _get_stations(db_session, station_code)
+    if _can_harvest(db_stations, db_variables):
+        print(
+            f"Processing {len(db_stations)} stations and {len(db_variables)} "
+            f"variables..."
+        )
+        upserted = operations.run_harvester(
+            settings,
+            db_engine,
+            lambda harvester: harvester.harvest_yearly_measurements(
+                db_stations, db_variables, full_refresh=full_refresh
+            ),
         )
+    else:
+        upserted = []
+    print(f"created or updated {len(upserted)} yearly measurements")
+    prefect.artifacts.create_table_artifact(
+        key="yearly-measurements-created",
+        table=_build_upserted_measurements_table(upserted, db_stations, db_variables),
+        description=f"# Created or updated {len(upserted)} yearly measurements",
+    )
+
+
+def _can_harvest(
+    db_stations: Sequence[observations.Station],
+    db_variables: Sequence[observations.Variable],
+    periods_name: str | None = None,
+    periods: Sequence | None = None,
+) -> bool:
+    if len(db_variables) == 0:
+        print("There are no variables to process, skipping...")
+    elif len(db_stations) == 0:
+        print("There are no stations to process, skipping...")
+    elif periods is not None and len(periods) == 0:
+        print(f"There are no {periods_name} to process, skipping...")
+    else:
+        return True
+    return False
 
 
 def _get_stations(
@@ -490,16 +291,20 @@ def _get_months(month_index: int | None = None) -> list[int]:
     return result
 
 
-def _build_created_measurements_table(
-    measurements: Sequence[observations.MonthlyMeasurement]
-    | Sequence[observations.SeasonalMeasurement]
-    | Sequence[observations.YearlyMeasurement],
+def _build_upserted_measurements_table(
+    measurements: Sequence[sqlalchemy.Row],
+    stations: Sequence[observations.Station],
+    variables: Sequence[observations.Variable],
 ) -> list[dict]:
+    stations_by_id = {s.id: s for s in stations}
+    variables_by_id = {v.id: v for v in variables}
     aggregated_items = {}
     for measurement in measurements:
-        station_identifier = f"{measurement.station.name} ({measurement.station.code})"
+        station = stations_by_id[measurement.station_id]
+        station_identifier = f"{station.name} ({station.code})"
         station_items = aggregated_items.setdefault(station_identifier, {})
-        variable_items = station_items.setdefault(measurement.variable.name, [])
+        variable_name = variables_by_id[measurement.variable_id].name
+        variable_items = station_items.setdefault(variable_name, [])
         variable_items.append(measurement)
     table_contents = []
     for station_identifier, station_items in aggregated_items.items():
@@ -508,51 +313,12 @@ def _build_created_measurements_table(
                 {
                     "station": station_identifier,
                     "variable": variable_name,
-                    "number of new measurements": len(measurement_items),
+                    "number of new or updated measurements": len(measurement_items),
                 }
             )
     return table_contents
 
 
-def build_monthly_measurement_id(
-    measurement: observations.MonthlyMeasurement
-    | observations.MonthlyMeasurementCreate,
-) -> str:
-    return "-".join(
-        (
-            str(measurement.station_id),
-            str(measurement.variable_id),
-            measurement.date.strftime("%Y%m"),
-        )
-    )
-
-
-def build_seasonal_measurement_id(
-    measurement: observations.SeasonalMeasurement
-    | observations.SeasonalMeasurementCreate,
-) -> str:
-    return "-".join(
-        (
-            str(measurement.station_id),
-            str(measurement.variable_id),
-            str(measurement.year),
-            measurement.season.value,
-        )
-    )
-
-
-def build_yearly_measurement_id(
-    measurement: observations.YearlyMeasurement | observations.YearlyMeasurementCreate,
-) -> str:
-    return "-".join(
-        (
-            str(measurement.station_id),
-            str(measurement.variable_id),
-            str(measurement.year),
-        )
-    )
-
-
 @prefect.task(
     retries=settings.prefect.num_task_retries,
     retry_delay_seconds=settings.prefect.task_retry_delay_seconds,
@@ -590,5 +356,78 @@ def refresh_station_variables(
             to_wait_on.append(var_future)
         for future in to_wait_on:
             future.result()
+        refresh_station_grid_cells(variable_name=variable_name)
     else:
         print("There are no variables to process, skipping...")
+
+
+@prefect.flow(
+    log_prints=True,
+    retries=settings.prefect.num_flow_retries,
+    retry_delay_seconds=settings.prefect.flow_retry_delay_seconds,
+)
+def refresh_station_grid_cells(
+    variable_name: str | None = None,
+):
+    """Refresh the candidate nearest stations of each cell of the download grid.
+
+    Cells are computed for each observation variable and aggregation type that
+    is related to a coverage configuration. Since candidates depend on the
+    nearest station radius, this must also run whenever that setting changes.
+    """
+    grid = datadownloads.CoverageDownloadGrid.from_config(
+        settings.coverage_download_settings.spatial_grid
+    )
+    table_contents = []
+    with sqlmodel.Session(db_engine) as db_session:
+        variables = {v.id: v for v in _get_variables(db_session, variable_name)}
+        to_refresh = sorted(
+            {
+                (
+                    cov_conf.observation_variable_id,
+                    cov_conf.observation_variable_aggregation_type,
+                )
+                for cov_conf in database.collect_all_coverage_configurations(db_session)
+                if cov_conf.observation_variable_id in variables
+                and cov_conf.observation_variable_aggregation_type is not None
+            },
+            key=lambda item: (variables[item[0]].name, item[1].value),
+        )
+        for variable_id, aggregation_type in to_refresh:
+            variable = variables[variable_id]
+            print(
+                f"refreshing grid cells for variable {variable.name!r} and "
+                f"aggregation type {aggregation_type.value!r}..."
+            )
+            stations = database.collect_all_stations_with_measurements(
+                db_session, aggregation_type, variable_id=variable_id
+            )
+            cells = build_station_grid_cells(
+                grid,
+                stations,
+                settings.nearest_station_radius_meters,
+                aggregation_type,
+                variable_id,
+            )
+            database.replace_station_grid_cells(
+                db_session,
+                aggregation_type,
+                variable_id=variable_id,
+                cells_to_create=cells,
+                batch_size=settings.db_bulk_insert_batch_size,
+            )
+            table_contents.append(
+                {
+                    "variable": variable.name,
+                    "aggregation type": aggregation_type.value,
+                    "stations": len(stations),
+                    "cells with candidate stations": sum(
+                        1 for c in cells if len(c.station_ids) > 0
+                    ),
+                }
+            )
+    prefect.artifacts.create_table_artifact(
+        key="station-grid-cells-refreshed",
+        table=table_contents,
+        description=f"# Refreshed grid cells of {len(table_contents)} variables",
+    )
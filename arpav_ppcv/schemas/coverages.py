@@ -1,4 +1,5 @@
 import dataclasses
+import datetime as dt
 import logging
 import re
 import uuid
@@ -13,6 +14,7 @@ from typing import (
 import pydantic
 import sqlalchemy
 import sqlmodel
+from sqlalchemy.dialects import postgresql
 
 from .. import exceptions
 from . import base
@@ -559,6 +561,13 @@ class ConfigurationParameterPossibleValue(sqlmodel.SQLModel, table=True):
             onupdate="CASCADE",
             ondelete="CASCADE",  # i.e. delete all possible values if the related conf parameter value gets deleted
         ),
+        # the primary key is indexed by coverage configuration first - this index
+        # serves lookups of the coverage configurations that use some values
+        sqlalchemy.Index(
+            "ix_configurationparameterpossiblevalue_value_id_cov_conf_id",
+            "configuration_parameter_value_id",
+            "coverage_configuration_id",
+        ),
     )
 
     coverage_configuration_id: Optional[uuid.UUID] = sqlmodel.Field(
@@ -590,6 +599,58 @@ class ConfigurationParameterPossibleValueUpdate(sqlmodel.SQLModel):
     configuration_parameter_value_id: uuid.UUID
 
 
+class CoverageMetadataVersion(sqlmodel.SQLModel, table=True):
+    """Version of the coverage-related metadata.
+
+    This table holds a single row, whose version gets incremented whenever
+    coverage configurations or configuration parameters are modified. It is used
+    for detecting stale in-process caches.
+    """
+
+    id: int = sqlmodel.Field(default=1, primary_key=True)
+    version: int = 0
+
+
+class ClimateBarometerSeries(sqlmodel.SQLModel, table=True):
+    """Precomputed climate barometer time series.
+
+    Holds the parsed series of each climate barometer coverage, together with its
+    smoothed variants. This table is populated by the
+    `refresh_climate_barometer_series` prefect flow and it is read by the climate
+    barometer API endpoint, which thus avoids querying THREDDS.
+    """
+
+    __table_args__ = (
+        sqlalchemy.UniqueConstraint("coverage_identifier", "smoothing_strategy"),
+    )
+
+    id: Optional[int] = sqlmodel.Field(default=None, primary_key=True)
+    coverage_identifier: str
+    smoothing_strategy: str
+    is_uncertainty: bool = False
+    sort_order: int = 0
+    times: list[dt.datetime] = sqlmodel.Field(
+        sa_column=sqlalchemy.Column(
+            postgresql.ARRAY(sqlalchemy.DateTime()), nullable=False
+        )
+    )
+    values: list[float] = sqlmodel.Field(
+        sa_column=sqlalchemy.Column(postgresql.ARRAY(sqlalchemy.Float), nullable=False)
+    )
+    updated_at: dt.datetime = sqlmodel.Field(
+        sa_column=sqlalchemy.Column(sqlalchemy.DateTime(timezone=True), nullable=False)
+    )
+
+
+class ClimateBarometerSeriesCreate(sqlmodel.SQLModel):
+    coverage_identifier: str
+    smoothing_strategy: base.CoverageDataSmoothingStrategy
+    is_uncertainty: bool
+    sort_order: int
+    times: list[dt.datetime]
+    values: list[float]
+
+
 @dataclasses.dataclass(frozen=True)
 class CoverageInternal:
     configuration: CoverageConfiguration
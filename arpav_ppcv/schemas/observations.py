@@ -10,6 +10,7 @@ import geoalchemy2
 import pydantic
 import sqlalchemy
 import sqlmodel
+from sqlalchemy.dialects import postgresql
 
 from . import fields
 from . import base
@@ -50,6 +51,16 @@ class StationBase(sqlmodel.SQLModel):
 
 
 class Station(StationBase, table=True):
+    __table_args__ = (
+        # serves searches for nearby stations, which use geodesic distances -
+        # the expression must match the one used in
+        # `database.get_nearest_station_measurement_columns()`
+        sqlalchemy.Index(
+            "ix_station_geom_geography",
+            sqlalchemy.text("(geography(geom))"),
+            postgresql_using="gist",
+        ),
+    )
     altitude_m: Optional[float] = sqlmodel.Field(default=None)
     name: str = ""
     type_: str = ""
@@ -267,6 +278,25 @@ class MonthlyMeasurement(MonthlyMeasurementBase, table=True):
             onupdate="CASCADE",
             ondelete="CASCADE",  # i.e. delete a monthly measurement if its related station is deleted
         ),
+        # supports keyset pagination, which sorts by date and id
+        sqlalchemy.Index("ix_monthlymeasurement_date_id", "date", "id"),
+        # a station has at most one measurement of a variable for each month - this
+        # also serves lookups by station and variable, sorted by date
+        sqlalchemy.UniqueConstraint(
+            "station_id",
+            "variable_id",
+            "date",
+            name="uq_monthlymeasurement_station_variable_date",
+        ),
+        # serves lookups by station, variable and month, sorted by date. The
+        # expression must match the one used in `database.list_monthly_measurements()`
+        sqlalchemy.Index(
+            "ix_monthlymeasurement_station_variable_month_date",
+            "station_id",
+            "variable_id",
+            sqlalchemy.text("(EXTRACT(month FROM date))"),
+            "date",
+        ),
     )
     id: pydantic.UUID4 = sqlmodel.Field(default_factory=uuid.uuid4, primary_key=True)
     station_id: pydantic.UUID4
@@ -326,6 +356,18 @@ class SeasonalMeasurement(sqlmodel.SQLModel, table=True):
             onupdate="CASCADE",
             ondelete="CASCADE",  # i.e. delete a measurement if its related station is deleted
         ),
+        # supports keyset pagination, which sorts by year and id
+        sqlalchemy.Index("ix_seasonalmeasurement_year_id", "year", "id"),
+        # a station has at most one measurement of a variable for each season of a
+        # year - this also serves lookups by station, variable and season, sorted
+        # by year
+        sqlalchemy.UniqueConstraint(
+            "station_id",
+            "variable_id",
+            "season",
+            "year",
+            name="uq_seasonalmeasurement_station_variable_season_year",
+        ),
     )
     id: pydantic.UUID4 = sqlmodel.Field(default_factory=uuid.uuid4, primary_key=True)
     station_id: pydantic.UUID4
@@ -390,6 +432,16 @@ class YearlyMeasurement(sqlmodel.SQLModel, table=True):
             onupdate="CASCADE",
             ondelete="CASCADE",  # i.e. delete a measurement if its related station is deleted
         ),
+        # supports keyset pagination, which sorts by year and id
+        sqlalchemy.Index("ix_yearlymeasurement_year_id", "year", "id"),
+        # a station has at most one measurement of a variable for each year - this
+        # also serves lookups by station and variable, sorted by year
+        sqlalchemy.UniqueConstraint(
+            "station_id",
+            "variable_id",
+            "year",
+            name="uq_yearlymeasurement_station_variable_year",
+        ),
     )
     id: pydantic.UUID4 = sqlmodel.Field(default_factory=uuid.uuid4, primary_key=True)
     station_id: pydantic.UUID4
@@ -427,3 +479,113 @@ class YearlyMeasurementCreate(sqlmodel.SQLModel):
 class YearlyMeasurementUpdate(sqlmodel.SQLModel):
     value: Optional[float] = None
     year: Optional[int] = None
+
+
+class HarvestWatermark(sqlmodel.SQLModel, table=True):
+    """Progress of harvesting a series of measurements from the ARPA Veneto API.
+
+    A series is made of the measurements of a station and variable, for an
+    aggregation type and period. The `period` uses the same values as the API,
+    i.e. the month number for monthly series, the season number for seasonal
+    series and `0` for yearly series.
+    """
+
+    __table_args__ = (
+        sqlalchemy.ForeignKeyConstraint(
+            [
+                "station_id",
+            ],
+            [
+                "station.id",
+            ],
+            onupdate="CASCADE",
+            ondelete="CASCADE",  # i.e. delete a watermark if its related station is deleted
+        ),
+        sqlalchemy.ForeignKeyConstraint(
+            [
+                "variable_id",
+            ],
+            [
+                "variable.id",
+            ],
+            onupdate="CASCADE",
+            ondelete="CASCADE",  # i.e. delete a watermark if its related variable is deleted
+        ),
+        sqlalchemy.UniqueConstraint(
+            "station_id",
+            "variable_id",
+            "aggregation_type",
+            "period",
+            name="uq_harvestwatermark_series",
+        ),
+    )
+    id: pydantic.UUID4 = sqlmodel.Field(default_factory=uuid.uuid4, primary_key=True)
+    station_id: pydantic.UUID4
+    variable_id: pydantic.UUID4
+    aggregation_type: base.ObservationAggregationType
+    period: str
+    # most recent year found in the series when it was last harvested
+    last_year: Optional[int] = None
+    # hash of the API payload, used to detect whether the series has changed
+    payload_hash: str
+    fetched_at: dt.datetime = sqlmodel.Field(
+        sa_column=sqlalchemy.Column(sqlalchemy.DateTime(timezone=True), nullable=False)
+    )
+
+
+class HarvestWatermarkCreate(sqlmodel.SQLModel):
+    station_id: pydantic.UUID4
+    variable_id: pydantic.UUID4
+    aggregation_type: base.ObservationAggregationType
+    period: str
+    last_year: Optional[int] = None
+    payload_hash: str
+    fetched_at: dt.datetime
+
+
+class StationGridCell(sqlmodel.SQLModel, table=True):
+    """Stations which may be the nearest ones to the points of a grid cell.
+
+    For an observation variable and aggregation type, each cell of the coverage
+    download spatial grid holds the stations that have measurements and which
+    may be within the nearest station radius of some point of the cell, sorted
+    by their distance to the cell's centre. Cells without such stations hold an
+    empty list. This table is populated by the `refresh_station_grid_cells`
+    prefect flow and it is read when retrieving time series with observation
+    data, which thus avoid spatial queries.
+    """
+
+    __table_args__ = (
+        sqlalchemy.ForeignKeyConstraint(
+            [
+                "variable_id",
+            ],
+            [
+                "variable.id",
+            ],
+            onupdate="CASCADE",
+            ondelete="CASCADE",  # i.e. delete a grid cell if its related variable is deleted
+        ),
+        # also serves lookups of a cell
+        sqlalchemy.UniqueConstraint(
+            "variable_id",
+            "aggregation_type",
+            "cell_index",
+            name="uq_stationgridcell_cell",
+        ),
+    )
+    id: Optional[int] = sqlmodel.Field(default=None, primary_key=True)
+    variable_id: pydantic.UUID4
+    aggregation_type: base.ObservationAggregationType
+    # see `datadownloads.CoverageDownloadGrid.get_cell_index()`
+    cell_index: int
+    station_ids: list[uuid.UUID] = sqlmodel.Field(
+        sa_column=sqlalchemy.Column(postgresql.ARRAY(sqlalchemy.Uuid()), nullable=False)
+    )
+
+
+class StationGridCellCreate(sqlmodel.SQLModel):
+    variable_id: pydantic.UUID4
+    aggregation_type: base.ObservationAggregationType
+    cell_index: int
+    station_ids: list[uuid.UUID]
@@ -0,0 +1,121 @@
+"""Pooled HTTP client used for communicating with the THREDDS server.
+
+A single ``httpx.AsyncClient`` is shared by all requests served by a worker
+process, which allows reusing TCP (and TLS) connections to THREDDS via
+keep-alive instead of performing a new handshake for every WMS, NCSS or
+download request.
+"""
+
+import dataclasses
+import logging
+from typing import Optional
+
+import httpx
+
+from .. import config
+
+logger = logging.getLogger(__name__)
+
+_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+_NUM_REQUESTS_SENT: int = 0
+
+
+@dataclasses.dataclass(frozen=True)
+class HttpClientPoolStats:
+    max_connections: int
+    max_keepalive_connections: int
+    num_connections: int
+    num_active_connections: int
+    num_idle_connections: int
+    num_active_requests: int
+    num_queued_requests: int
+    num_requests_sent: int
+    http2_enabled: bool
+
+
+def get_http_client(settings: config.ArpavPpcvSettings) -> httpx.AsyncClient:
+    # This function implements caching of the http client, relying on the value
+    # of the module global `_HTTP_CLIENT` variable, in a similar way to what
+    # `database.get_engine()` does. The client is expected to be created in the
+    # web application's lifespan function, which ensures it is bound to the
+    # worker's event loop, and to be closed when the application shuts down.
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        _HTTP_CLIENT = _build_http_client(settings)
+    return _HTTP_CLIENT
+
+
+async def close_http_client() -> None:
+    """Close the shared http client, releasing all of its pooled connections."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None:
+        await _HTTP_CLIENT.aclose()
+        _HTTP_CLIENT = None
+
+
+def get_pool_stats(
+    settings: config.ArpavPpcvSettings,
+) -> Optional[HttpClientPoolStats]:
+    """Return usage statistics about the shared http client's connection pool.
+
+    This inspects the underlying httpcore connection pool and is meant to be used
+    for monitoring purposes only. Since it relies on private httpx/httpcore
+    attributes, every access is guarded and falls back to an empty pool.
+    """
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        return None
+    transport = getattr(_HTTP_CLIENT, "_transport", None)
+    pool = getattr(transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    num_idle = sum(_call_or_default(c, "is_idle", False) for c in connections)
+    pool_requests = list(getattr(pool, "_requests", []))
+    num_queued = sum(_call_or_default(r, "is_queued", False) for r in pool_requests)
+    return HttpClientPoolStats(
+        max_connections=settings.thredds_server.http_client_max_connections,
+        max_keepalive_connections=(
+            settings.thredds_server.http_client_max_keepalive_connections
+        ),
+        num_connections=len(connections),
+        num_active_connections=len(connections) - num_idle,
+        num_idle_connections=num_idle,
+        num_active_requests=len(pool_requests) - num_queued,
+        num_queued_requests=num_queued,
+        num_requests_sent=_NUM_REQUESTS_SENT,
+        http2_enabled=bool(getattr(pool, "_http2", False)),
+    )
+
+
+def _call_or_default(obj, method_name: str, default):
+    method = getattr(obj, method_name, None)
+    return method() if callable(method) else default
+
+
+def _build_http_client(settings: config.ArpavPpcvSettings) -> httpx.AsyncClient:
+    thredds_settings = settings.thredds_server
+    client_kwargs = {
+        "timeout": settings.http_client_timeout_seconds,
+        "limits": httpx.Limits(
+            max_connections=thredds_settings.http_client_max_connections,
+            max_keepalive_connections=(
+                thredds_settings.http_client_max_keepalive_connections
+            ),
+            keepalive_expiry=thredds_settings.http_client_keepalive_expiry_seconds,
+        ),
+        "event_hooks": {"request": [_count_request]},
+    }
+    try:
+        client = httpx.AsyncClient(
+            http2=thredds_settings.http_client_use_http2, **client_kwargs
+        )
+    except ImportError:
+        logger.warning(
+            "HTTP/2 support has been requested but the `h2` package is not "
+            "installed - Falling back to HTTP/1.1"
+        )
+        client = httpx.AsyncClient(**client_kwargs)
+    return client
+
+
+async def _count_request(request: httpx.Request) -> None:
+    global _NUM_REQUESTS_SENT
+    _NUM_REQUESTS_SENT += 1
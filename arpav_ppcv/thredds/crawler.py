@@ -11,7 +11,10 @@ import anyio.to_thread
 import exceptiongroup
 import httpx
 
-from .. import database
+from .. import (
+    coverageregistry,
+    database,
+)
 from ..schemas import coverages
 from ..utils import batched
 
@@ -30,9 +33,7 @@ _THREDDS_FILE_SERVER_URL_FRAGMENT = "fileServer"
 def get_thredds_url_fragment(
     coverage: coverages.CoverageInternal, thredds_base_url: str
 ) -> str:
-    dataset_url_fragment = coverage.configuration.get_thredds_url_fragment(
-        coverage.identifier
-    )
+    dataset_url_fragment = coverageregistry.get_thredds_url_fragment(coverage)
     if any(c in dataset_url_fragment for c in FNMATCH_SPECIAL_CHARS):
         logger.debug(
             f"THREDDS dataset url ({dataset_url_fragment}) is an "
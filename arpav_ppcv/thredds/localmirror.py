@@ -0,0 +1,329 @@
+"""Point time series extraction from the local mirror of THREDDS datasets.
+
+The `import-thredds-datasets` CLI command mirrors THREDDS datasets to a local
+directory, keeping the same structure as the THREDDS URL fragments. This module
+reads point time series directly from those files, which avoids a round trip to
+the THREDDS NCSS service and the subsequent parsing of its CSV output.
+
+Opened datasets are kept in an LRU of open handles, alongside a precomputed
+lookup structure that maps coordinates to their grid indexes. Since the
+netCDF4/HDF5 libraries are not thread safe, all reads are serialized with a lock.
+The lock is shared by all netCDF4 usage in the process, including that which is
+done outside of this module.
+"""
+
+import collections
+import dataclasses
+import datetime as dt
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+
+import cftime
+import netCDF4
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from . import crawler
+
+logger = logging.getLogger(__name__)
+
+_LATITUDE_NAMES = ("lat", "latitude")
+_LONGITUDE_NAMES = ("lon", "longitude")
+_TIME_NAMES = ("time",)
+
+_OPEN_DATASETS: collections.OrderedDict[
+    Path, "LocalDataset"
+] = collections.OrderedDict()
+NETCDF_LOCK = threading.RLock()
+
+
+class LocalDatasetError(Exception):
+    """Raised when a dataset cannot be used for extracting point time series."""
+
+
+@dataclasses.dataclass
+class LocalDataset:
+    path: Path
+    dataset: netCDF4.Dataset
+    time_index: pd.DatetimeIndex
+    time_dimension: str
+    latitude_dimension: str
+    longitude_dimension: str
+    # for regular grids, with 1D coordinates
+    latitudes: Optional[np.ndarray] = None
+    longitudes: Optional[np.ndarray] = None
+    # for curvilinear grids, with 2D coordinates
+    tree: Optional[cKDTree] = None
+    grid_shape: Optional[tuple[int, int]] = None
+
+    def find_grid_index(self, longitude: float, latitude: float) -> tuple[int, int]:
+        """Return the (row, column) index of the grid cell nearest to a point."""
+        rows, cols = self.find_grid_indexes(np.array([longitude]), np.array([latitude]))
+        return int(rows[0]), int(cols[0])
+
+    def find_grid_indexes(
+        self, longitudes: np.ndarray, latitudes: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return the row and column indexes of the grid cells nearest to points."""
+        if self.tree is not None:
+            _, flat_indexes = self.tree.query(np.column_stack((latitudes, longitudes)))
+            rows, cols = np.unravel_index(flat_indexes, self.grid_shape)
+        else:
+            rows = np.abs(self.latitudes[:, np.newaxis] - latitudes).argmin(axis=0)
+            cols = np.abs(self.longitudes[:, np.newaxis] - longitudes).argmin(axis=0)
+        return rows, cols
+
+    def read_point_series(
+        self, variable_name: str, longitude: float, latitude: float
+    ) -> np.ndarray:
+        variable = self._get_variable(variable_name)
+        row, col = self.find_grid_index(longitude, latitude)
+        indexer = []
+        for dimension in variable.dimensions:
+            if dimension == self.time_dimension:
+                indexer.append(slice(None))
+            elif dimension == self.latitude_dimension:
+                indexer.append(row)
+            elif dimension == self.longitude_dimension:
+                indexer.append(col)
+            else:
+                # degenerate dimensions, like a single height level
+                indexer.append(0)
+        raw_values = variable[tuple(indexer)]
+        return np.ma.filled(np.ma.asarray(raw_values, dtype=np.float64), np.nan)
+
+    def read_points_series(
+        self, variable_name: str, longitudes: np.ndarray, latitudes: np.ndarray
+    ) -> np.ndarray:
+        """Read the time series of the grid cells which are nearest to points.
+
+        The whole variable is read at once and the series are then extracted with
+        vectorized indexing, which is meant for datasets that have been subset to
+        the area that encloses the points. Returns an array with shape
+        (number of points, number of time steps).
+        """
+        variable = self._get_variable(variable_name)
+        rows, cols = self.find_grid_indexes(longitudes, latitudes)
+        indexer = []
+        kept_dimensions = []
+        for dimension in variable.dimensions:
+            if dimension in (
+                self.time_dimension,
+                self.latitude_dimension,
+                self.longitude_dimension,
+            ):
+                indexer.append(slice(None))
+                kept_dimensions.append(dimension)
+            else:
+                indexer.append(0)
+        raw_values = np.ma.filled(
+            np.ma.asarray(variable[tuple(indexer)], dtype=np.float64), np.nan
+        )
+        # ensure a (time, lat, lon) layout, regardless of the variable's layout
+        raw_values = np.moveaxis(
+            raw_values,
+            [
+                kept_dimensions.index(self.time_dimension),
+                kept_dimensions.index(self.latitude_dimension),
+                kept_dimensions.index(self.longitude_dimension),
+            ],
+            [0, 1, 2],
+        )
+        return raw_values[:, rows, cols].T
+
+    def _get_variable(self, variable_name: str) -> netCDF4.Variable:
+        try:
+            return self.dataset.variables[variable_name]
+        except KeyError as err:
+            raise LocalDatasetError(
+                f"{self.path!r} does not have a {variable_name!r} variable"
+            ) from err
+
+    @classmethod
+    def open(cls, path: Path) -> "LocalDataset":
+        dataset = netCDF4.Dataset(path, mode="r")
+        try:
+            return cls._from_netcdf_dataset(path, dataset)
+        except Exception:
+            dataset.close()
+            raise
+
+    @classmethod
+    def from_memory(cls, name: str, data: bytes) -> "LocalDataset":
+        """Open a dataset which is held in memory, like an NCSS response."""
+        dataset = netCDF4.Dataset(name, mode="r", memory=data)
+        try:
+            return cls._from_netcdf_dataset(Path(name), dataset)
+        except Exception:
+            dataset.close()
+            raise
+
+    @classmethod
+    def _from_netcdf_dataset(
+        cls, path: Path, dataset: netCDF4.Dataset
+    ) -> "LocalDataset":
+        time_var = _find_variable(dataset, _TIME_NAMES)
+        lat_var = _find_variable(dataset, _LATITUDE_NAMES)
+        lon_var = _find_variable(dataset, _LONGITUDE_NAMES)
+        if time_var is None or lat_var is None or lon_var is None:
+            raise LocalDatasetError(f"{path!r} does not have time/lat/lon variables")
+        kwargs = {}
+        if lat_var.ndim == 1 and lon_var.ndim == 1:
+            kwargs.update(
+                latitude_dimension=lat_var.dimensions[0],
+                longitude_dimension=lon_var.dimensions[0],
+                latitudes=np.asarray(lat_var[:], dtype=np.float64),
+                longitudes=np.asarray(lon_var[:], dtype=np.float64),
+            )
+        elif lat_var.ndim == 2 and lat_var.dimensions == lon_var.dimensions:
+            lats = np.asarray(lat_var[:], dtype=np.float64)
+            lons = np.asarray(lon_var[:], dtype=np.float64)
+            kwargs.update(
+                latitude_dimension=lat_var.dimensions[0],
+                longitude_dimension=lat_var.dimensions[1],
+                tree=cKDTree(np.column_stack((lats.ravel(), lons.ravel()))),
+                grid_shape=lats.shape,
+            )
+        else:
+            raise LocalDatasetError(f"{path!r} has unsupported coordinate variables")
+        return cls(
+            path=path,
+            dataset=dataset,
+            time_index=_build_time_index(time_var),
+            time_dimension=time_var.dimensions[0],
+            **kwargs,
+        )
+
+
+def get_local_dataset(path: Path, max_open_datasets: int) -> LocalDataset:
+    """Return an opened local dataset, reusing previously opened handles."""
+    with NETCDF_LOCK:
+        if (local_dataset := _OPEN_DATASETS.get(path)) is not None:
+            _OPEN_DATASETS.move_to_end(path)
+        else:
+            if not path.is_file():
+                raise LocalDatasetError(f"{path!r} is not available locally")
+            local_dataset = LocalDataset.open(path)
+            _OPEN_DATASETS[path] = local_dataset
+            while len(_OPEN_DATASETS) > max_open_datasets:
+                _, evicted = _OPEN_DATASETS.popitem(last=False)
+                evicted.dataset.close()
+        return local_dataset
+
+
+def find_local_dataset_path(base_dir: Path, url_fragment: str) -> Optional[Path]:
+    """Return the path of a dataset in the local mirror, if it exists.
+
+    URL fragments which are fnmatch patterns are matched against the local
+    files, in a similar way to what `crawler.find_thredds_dataset_url_fragment()`
+    does with the THREDDS catalog.
+    """
+    if any(c in url_fragment for c in crawler.FNMATCH_SPECIAL_CHARS):
+        matches = sorted(p for p in base_dir.glob(url_fragment) if p.is_file())
+        result = matches[0] if len(matches) > 0 else None
+    else:
+        candidate = base_dir / url_fragment
+        result = candidate if candidate.is_file() else None
+    return result
+
+
+def close_local_datasets() -> None:
+    with NETCDF_LOCK:
+        while len(_OPEN_DATASETS) > 0:
+            _, local_dataset = _OPEN_DATASETS.popitem()
+            local_dataset.dataset.close()
+
+
+def find_grid_cell(
+    path: Path, longitude: float, latitude: float, max_open_datasets: int = 64
+) -> tuple[int, int]:
+    """Return the index of the dataset's grid cell which is nearest to a point."""
+    with NETCDF_LOCK:
+        local_dataset = get_local_dataset(path, max_open_datasets)
+        return local_dataset.find_grid_index(longitude, latitude)
+
+
+def extract_point_time_series(
+    path: Path,
+    netcdf_variable_name: str,
+    longitude: float,
+    latitude: float,
+    time_start: Optional[dt.datetime],
+    time_end: Optional[dt.datetime],
+    target_name: str,
+    max_open_datasets: int = 64,
+) -> pd.DataFrame:
+    """Extract the time series of the grid cell which is nearest to a point.
+
+    The result has the same shape as the output of
+    `operations._parse_ncss_dataset()`, i.e. a dataframe indexed by time, with a
+    single column named `target_name`.
+    """
+    with NETCDF_LOCK:
+        local_dataset = get_local_dataset(path, max_open_datasets)
+        values = local_dataset.read_point_series(
+            netcdf_variable_name, longitude, latitude
+        )
+        time_index = local_dataset.time_index
+    df = pd.DataFrame({target_name: values}, index=time_index)
+    if time_start is not None:
+        df = df[time_start:]
+    if time_end is not None:
+        df = df[:time_end]
+    return df
+
+
+def extract_points_time_series_from_memory(
+    name: str,
+    data: bytes,
+    netcdf_variable_name: str,
+    longitudes: np.ndarray,
+    latitudes: np.ndarray,
+) -> tuple[np.ndarray, pd.DatetimeIndex]:
+    """Extract the time series of the grid cells nearest to points from memory.
+
+    This is meant for datasets which are held in memory, like NCSS responses.
+    Returns the values, as returned by `LocalDataset.read_points_series()`, and
+    the time index.
+    """
+    with NETCDF_LOCK:
+        local_dataset = LocalDataset.from_memory(name, data)
+        try:
+            values = local_dataset.read_points_series(
+                netcdf_variable_name, longitudes, latitudes
+            )
+        finally:
+            local_dataset.dataset.close()
+    return values, local_dataset.time_index
+
+
+def _find_variable(
+    dataset: netCDF4.Dataset, candidate_names: tuple[str, ...]
+) -> Optional[netCDF4.Variable]:
+    for name in candidate_names:
+        if name in dataset.variables:
+            return dataset.variables[name]
+    return None
+
+
+def _build_time_index(time_var: netCDF4.Variable) -> pd.DatetimeIndex:
+    calendar = getattr(time_var, "calendar", "standard")
+    try:
+        dates = cftime.num2pydate(time_var[:], units=time_var.units, calendar=calendar)
+    except ValueError:
+        # non-standard calendars (e.g. 360_day) may produce dates which do not
+        # exist in the gregorian calendar - in a similar way to what is done for
+        # NCSS responses, reset those to the 15th day of their month
+        dates = [
+            dt.datetime(d.year, d.month, 15)
+            for d in cftime.num2date(
+                time_var[:],
+                units=time_var.units,
+                calendar=calendar,
+                only_use_cftime_datetimes=True,
+            )
+        ]
+    return pd.DatetimeIndex(dates, name="time").tz_localize(dt.timezone.utc)
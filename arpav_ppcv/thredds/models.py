@@ -3,7 +3,9 @@ import datetime as dt
 import enum
 import fnmatch
 import urllib.parse
+from typing import Optional
 
+import numpy as np
 import shapely
 
 
@@ -62,11 +64,27 @@ class ThreddsDatasetDescriptionTemporalBounds:
     end: dt.datetime
 
 
+@dataclasses.dataclass
+class ThreddsDatasetGrid:
+    """Native grid of a dataset with 1D latitude and longitude axes."""
+
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+
+    def find_cell(self, longitude: float, latitude: float) -> tuple[int, int]:
+        """Return the (row, column) index of the grid cell nearest to a point."""
+        return (
+            int(np.abs(self.latitudes - latitude).argmin()),
+            int(np.abs(self.longitudes - longitude).argmin()),
+        )
+
+
 @dataclasses.dataclass
 class ThreddsDatasetDescription:
     variables: list[ThreddsDatasetDescriptionVariable]
     spatial_bounds: shapely.Polygon
     temporal_bounds: ThreddsDatasetDescriptionTemporalBounds
+    grid: Optional[ThreddsDatasetGrid] = None
 
 
 @dataclasses.dataclass
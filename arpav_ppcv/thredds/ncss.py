@@ -8,8 +8,10 @@ https://docs.unidata.ucar.edu/tds/current/userguide/netcdf_subset_service_ref.ht
 import datetime as dt
 import logging
 import xml.etree.ElementTree as etree
+from typing import Optional
 
 import httpx
+import numpy as np
 import shapely
 
 from ..exceptions import CoverageDataRetrievalError
@@ -54,6 +56,7 @@ async def async_get_dataset_description(
         variables=variables,
         spatial_bounds=spatial_bounds,
         temporal_bounds=temporal_bounds,
+        grid=_parse_dataset_grid(root),
     )
 
 
@@ -89,9 +92,37 @@ def get_dataset_description(
         variables=variables,
         spatial_bounds=spatial_bounds,
         temporal_bounds=temporal_bounds,
+        grid=_parse_dataset_grid(root),
     )
 
 
+def _parse_dataset_grid(
+    root: etree.Element,
+) -> Optional[models.ThreddsDatasetGrid]:
+    """Parse the dataset's native grid from its NCSS description.
+
+    Only grids with 1D latitude and longitude axes are supported - datasets in
+    projected coordinates do not have these axes, so `None` is returned.
+    """
+    axes = {}
+    for axis_type in ("Lat", "Lon"):
+        try:
+            values_el = root.findall(f"./axis[@axisType='{axis_type}']/values")[0]
+        except IndexError:
+            return None
+        if (raw_start := values_el.get("start")) is not None:
+            axes[axis_type] = float(raw_start) + float(
+                values_el.get("increment")
+            ) * np.arange(int(values_el.get("npts")))
+        else:
+            axes[axis_type] = np.array(
+                [float(v) for v in (values_el.text or "").split()]
+            )
+    if any(len(axis) == 0 for axis in axes.values()):
+        return None
+    return models.ThreddsDatasetGrid(latitudes=axes["Lat"], longitudes=axes["Lon"])
+
+
 async def async_query_dataset_area(
     http_client: httpx.AsyncClient,
     thredds_ncss_url: str,
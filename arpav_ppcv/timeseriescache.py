@@ -0,0 +1,221 @@
+"""In-memory cache of coverage time series.
+
+Many distinct points fall into the same grid cell of a coverage's dataset, and
+they all produce the same time series. This module caches parsed time series by
+(coverage identifier, grid cell, temporal range), alongside their smoothed
+variants. Series are stored compactly, as numpy arrays of float64 values with an
+epoch-based time index, so that cached series are identical to uncached ones.
+
+The cache is process-wide. Entries expire after a configurable time and the
+least recently used entries are evicted whenever the cache grows beyond its
+configured size. The native grids of THREDDS datasets, which are needed in order
+to find the cell that contains a point, are cached too, in a bounded LRU.
+"""
+
+import collections
+import dataclasses
+import datetime as dt
+import logging
+import threading
+import time
+import xml.etree.ElementTree as etree
+from typing import (
+    Final,
+    Optional,
+)
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from . import (
+    cacheinvalidation,
+    config,
+)
+from .thredds import (
+    models,
+    ncss,
+)
+
+logger = logging.getLogger(__name__)
+
+# (coverage identifier, grid cell, temporal range start, temporal range end)
+TimeSeriesCacheKey = tuple[
+    str, tuple[int, ...], Optional[dt.datetime], Optional[dt.datetime]
+]
+
+_CACHE: Optional["TimeSeriesCache"] = None
+_MAX_DATASET_GRIDS: Final[int] = 1024
+# datasets without a usable grid, or whose grid could not be retrieved, are
+# stored as `None`, so that their description is not retrieved again on each
+# request - they are retried after the next cache invalidation
+_DATASET_GRIDS: collections.OrderedDict[
+    str, Optional[models.ThreddsDatasetGrid]
+] = collections.OrderedDict()
+_LOCK = threading.Lock()
+
+
+@dataclasses.dataclass(frozen=True)
+class CompactSeries:
+    name: str
+    # nanoseconds since the epoch, in UTC
+    times: np.ndarray
+    values: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> "CompactSeries":
+        index = pd.DatetimeIndex(series.index)
+        if index.tz is not None:
+            index = index.tz_convert(dt.timezone.utc).tz_localize(None)
+        return cls(
+            name=str(series.name),
+            times=index.asi8.copy(),
+            values=series.to_numpy(dtype=np.float64, na_value=np.nan),
+        )
+
+    def to_series(self) -> pd.Series:
+        index = pd.to_datetime(self.times, unit="ns", utc=True)
+        index.name = "time"
+        return pd.Series(self.values.copy(), index=index, name=self.name)
+
+
+@dataclasses.dataclass
+class _CacheEntry:
+    created_at: float
+    variants: dict[str, CompactSeries] = dataclasses.field(default_factory=dict)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(s.nbytes for s in self.variants.values())
+
+
+class TimeSeriesCache:
+    """LRU cache of time series, with time-based expiry of entries.
+
+    Each entry holds the unsmoothed series and any smoothed variants of it.
+    Variants expire together with the entry they belong to.
+    """
+
+    def __init__(self, max_size_bytes: int, ttl_seconds: float):
+        self.max_size_bytes = max_size_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: collections.OrderedDict[
+            TimeSeriesCacheKey, _CacheEntry
+        ] = collections.OrderedDict()
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size_bytes
+
+    def get(self, key: TimeSeriesCacheKey, variant: str) -> Optional[pd.Series]:
+        with self._lock:
+            result = None
+            if (entry := self._entries.get(key)) is not None:
+                if time.monotonic() - entry.created_at > self.ttl_seconds:
+                    self._remove(key)
+                elif (compact := entry.variants.get(variant)) is not None:
+                    self._entries.move_to_end(key)
+                    result = compact
+        return result.to_series() if result is not None else None
+
+    def set(self, key: TimeSeriesCacheKey, variant: str, series: pd.Series) -> None:
+        compact = CompactSeries.from_series(series)
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                entry = self._entries[key] = _CacheEntry(created_at=time.monotonic())
+            else:
+                self._entries.move_to_end(key)
+            if (previous := entry.variants.get(variant)) is not None:
+                self._size_bytes -= previous.nbytes
+            entry.variants[variant] = compact
+            self._size_bytes += compact.nbytes
+            while self._size_bytes > self.max_size_bytes and len(self._entries) > 0:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def _remove(self, key: TimeSeriesCacheKey) -> None:
+        entry = self._entries.pop(key)
+        self._size_bytes -= entry.nbytes
+
+
+def get_time_series_cache(
+    settings: config.ArpavPpcvSettings,
+) -> Optional[TimeSeriesCache]:
+    """Return the process-wide time series cache, or `None` if it is disabled."""
+    # This function implements caching of the cache, relying on the value of the
+    # module global `_CACHE` variable, in a similar way to what
+    # `database.get_engine()` does
+    global _CACHE
+    result = None
+    if settings.time_series_cache.enabled:
+        with _LOCK:
+            if _CACHE is None:
+                _CACHE = TimeSeriesCache(
+                    max_size_bytes=settings.time_series_cache.max_size_bytes,
+                    ttl_seconds=settings.time_series_cache.ttl_seconds,
+                )
+            result = _CACHE
+    return result
+
+
+def invalidate_time_series_cache() -> None:
+    """Discard all cached time series and dataset grids."""
+    with _LOCK:
+        if _CACHE is not None:
+            _CACHE.clear()
+        _DATASET_GRIDS.clear()
+
+
+cacheinvalidation.register_invalidation_callback(invalidate_time_series_cache)
+
+
+async def async_get_dataset_grid(
+    http_client: httpx.AsyncClient, thredds_ncss_url: str
+) -> Optional[models.ThreddsDatasetGrid]:
+    """Return the native grid of a THREDDS dataset.
+
+    Returns `None` if the dataset's grid cannot be determined, in which case
+    time series of the dataset are not cached.
+    """
+    with _LOCK:
+        is_known = thredds_ncss_url in _DATASET_GRIDS
+        if is_known:
+            _DATASET_GRIDS.move_to_end(thredds_ncss_url)
+            grid = _DATASET_GRIDS[thredds_ncss_url]
+    if not is_known:
+        grid = None
+        try:
+            description = await ncss.async_get_dataset_description(
+                http_client, thredds_ncss_url
+            )
+        except (httpx.HTTPError, etree.ParseError, IndexError, ValueError):
+            logger.exception(f"Could not retrieve grid of {thredds_ncss_url!r}")
+        else:
+            grid = description.grid
+        with _LOCK:
+            _DATASET_GRIDS[thredds_ncss_url] = grid
+            while len(_DATASET_GRIDS) > _MAX_DATASET_GRIDS:
+                _DATASET_GRIDS.popitem(last=False)
+    return grid
+
+
+def build_cache_key(
+    coverage_identifier: str,
+    grid_cell: tuple[int, ...],
+    time_start: Optional[dt.datetime],
+    time_end: Optional[dt.datetime],
+) -> TimeSeriesCacheKey:
+    return coverage_identifier, tuple(grid_cell), time_start, time_end
@@ -1,4 +1,15 @@
+import threading
 from itertools import islice
+from typing import Final
+
+import numpy as np
+import pyproj
+
+_GEOD: Final[pyproj.Geod] = pyproj.Geod(ellps="WGS84")
+
+# pyproj transformers must not be shared between threads, so each thread keeps
+# its own cache of them
+_TRANSFORMERS = threading.local()
 
 
 def batched(iterable, n):
@@ -16,3 +27,54 @@ def batched(iterable, n):
     it = iter(iterable)
     while batch := tuple(islice(it, n)):
         yield batch
+
+
+def get_geodesic_distances(lons1, lats1, lons2, lats2) -> np.ndarray:
+    """Return the geodesic distances, in meters, between EPSG:4326 coordinates.
+
+    Inputs are broadcast against each other, as numpy does, and the result has
+    their broadcast shape.
+    """
+    arrays = np.broadcast_arrays(lons1, lats1, lons2, lats2)
+    # pyproj mishandles numpy arrays of a single element, hence the lists
+    _, _, distances = _GEOD.inv(*(a.astype("float64").ravel().tolist() for a in arrays))
+    return np.array(distances, dtype="float64").reshape(arrays[0].shape)
+
+
+def get_transformer(source_crs: str, target_crs: str) -> pyproj.Transformer:
+    """Return a transformer between two CRSs, with x/y (i.e. lon/lat) axis order.
+
+    Creating transformers is expensive, so they are cached, separately for each
+    thread.
+    """
+    cache = getattr(_TRANSFORMERS, "cache", None)
+    if cache is None:
+        cache = _TRANSFORMERS.cache = {}
+    key = (source_crs.upper(), target_crs.upper())
+    if (transformer := cache.get(key)) is None:
+        transformer = cache[key] = pyproj.Transformer.from_crs(*key, always_xy=True)
+    return transformer
+
+
+def transform_coordinates(
+    xs, ys, *, source_crs: str, target_crs: str
+) -> tuple[np.ndarray, np.ndarray]:
+    """Reproject arrays of coordinates in a single call.
+
+    Inputs are broadcast against each other and the results have their
+    broadcast shape.
+    """
+    transformer = get_transformer(source_crs, target_crs)
+    xs, ys = np.broadcast_arrays(
+        np.asarray(xs, dtype="float64"), np.asarray(ys, dtype="float64")
+    )
+    if xs.size == 1:
+        # pyproj mishandles numpy arrays of a single element
+        new_x, new_y = transformer.transform(xs.item(), ys.item())
+        result = np.full(xs.shape, new_x), np.full(ys.shape, new_y)
+    else:
+        new_xs, new_ys = transformer.transform(
+            np.ascontiguousarray(xs), np.ascontiguousarray(ys)
+        )
+        result = np.asarray(new_xs), np.asarray(new_ys)
+    return result
@@ -20,11 +20,15 @@ from typing import Dict, Any, Union, Optional, List, Sequence
 
 import anyio.to_thread
 import starlette_admin
+from sqlmodel import Session
 from starlette.requests import Request
 from starlette_admin import exceptions as starlette_admin_exceptions
 from starlette_admin.contrib.sqlmodel import ModelView
 
-from .... import database
+from .... import (
+    cacheinvalidation,
+    database,
+)
 from ....schemas import (
     coverages,
     base,
@@ -66,12 +70,22 @@ def coverage_configurations_choices_loader(
     else:
         main_cov_conf_id = None
     result = []
-    all_cov_confs = database.collect_all_coverage_configurations(request.state.session)
+    all_cov_confs = database.collect_all_coverage_configurations(
+        request.state.session, load_options=()
+    )
     for cov_conf in [cc for cc in all_cov_confs if cc.id != main_cov_conf_id]:
         result.append((cov_conf.name, cov_conf.name))
     return result
 
 
+def _notify_coverage_metadata_change(session: Session) -> None:
+    # deletions are performed by the base ModelView, so they do not go through
+    # our database functions, which take care of bumping the metadata version
+    database.bump_coverage_metadata_version(session)
+    session.commit()
+    cacheinvalidation.invalidate_local_caches()
+
+
 class ConfigurationParameterView(ModelView):
     identity = "configuration_parameters"
     name = "Configuration Parameter"
@@ -238,6 +252,7 @@ class ConfigurationParameterView(ModelView):
                 db_configuration_parameter,
                 config_param_update,
             )
+            cacheinvalidation.invalidate_local_caches()
             conf_param_read = read_schemas.ConfigurationParameterRead(
                 **db_configuration_parameter.model_dump(),
                 allowed_values=[
@@ -314,6 +329,11 @@ class ConfigurationParameterView(ModelView):
         else:
             return await super().delete(request, pks)
 
+    async def after_delete(self, request: Request, obj: Any) -> None:
+        await anyio.to_thread.run_sync(
+            _notify_coverage_metadata_change, request.state.session
+        )
+
 
 class CoverageConfigurationView(ModelView):
     identity = "coverage_configurations"
@@ -512,11 +532,21 @@ class CoverageConfigurationView(ModelView):
             ],
         )
 
+    async def after_delete(self, request: Request, obj: Any) -> None:
+        await anyio.to_thread.run_sync(
+            _notify_coverage_metadata_change, request.state.session
+        )
+
     async def find_by_pk(
         self, request: Request, pk: Any
     ) -> read_schemas.CoverageConfigurationRead:
         db_cov_conf = await anyio.to_thread.run_sync(
-            database.get_coverage_configuration, request.state.session, pk
+            functools.partial(
+                database.get_coverage_configuration,
+                load_options=database.COVERAGE_CONFIGURATION_DETAIL_LOADERS,
+            ),
+            request.state.session,
+            pk,
         )
         return self._serialize_instance(db_cov_conf)
 
@@ -534,6 +564,7 @@ class CoverageConfigurationView(ModelView):
             offset=skip,
             name_filter=str(where) if where not in (None, "") else None,
             include_total=False,
+            load_options=database.COVERAGE_CONFIGURATION_DETAIL_LOADERS,
         )
         db_cov_confs, _ = await anyio.to_thread.run_sync(
             list_cov_confs, request.state.session
@@ -624,6 +655,7 @@ class CoverageConfigurationView(ModelView):
             db_cov_conf = await anyio.to_thread.run_sync(
                 database.create_coverage_configuration, session, cov_conf_create
             )
+            cacheinvalidation.invalidate_local_caches()
             return self._serialize_instance(db_cov_conf)
         except Exception as e:
             return self.handle_exception(e)
@@ -715,6 +747,7 @@ class CoverageConfigurationView(ModelView):
                 db_coverage_configuration,
                 cov_conv_update,
             )
+            cacheinvalidation.invalidate_local_caches()
             return self._serialize_instance(db_coverage_configuration)
         except Exception as e:
             self.handle_exception(e)
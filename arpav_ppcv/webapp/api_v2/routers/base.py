@@ -1,10 +1,23 @@
+import dataclasses
 import importlib.metadata
 import logging
 import os
+from typing import Annotated
 
-from fastapi import APIRouter
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    status,
+)
 
-from ..schemas.base import AppInformation
+from ....config import ArpavPpcvSettings
+from ....thredds import client as thredds_client
+from ... import dependencies
+from ..schemas.base import (
+    AppInformation,
+    HttpClientPoolInformation,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -18,3 +31,23 @@ async def get_app_info():
         "version": importlib.metadata.version("arpav_ppcv_backend"),
         "git_commit": os.getenv("GIT_COMMIT", "unknown"),
     }
+
+
+@router.get("/http-client-pool", response_model=HttpClientPoolInformation)
+async def get_http_client_pool_info(
+    settings: Annotated[ArpavPpcvSettings, Depends(dependencies.get_settings)],
+):
+    """Return usage statistics of the current worker's THREDDS http client pool.
+
+    This endpoint is only available when the
+    `thredds_server.expose_http_client_stats` setting is enabled.
+    """
+    if not settings.thredds_server.expose_http_client_stats:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if (stats := thredds_client.get_pool_stats(settings)) is not None:
+        return HttpClientPoolInformation(**dataclasses.asdict(stats))
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The http client has not been initialized yet",
+        )
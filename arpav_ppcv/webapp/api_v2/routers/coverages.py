@@ -1,3 +1,4 @@
+import functools
 import logging
 import urllib.parse
 from operator import itemgetter
@@ -9,7 +10,9 @@ from typing import (
 
 import anyio.to_thread
 import httpx
+import pandas as pd
 import pydantic
+import shapely.errors
 import shapely.io
 from fastapi import (
     APIRouter,
@@ -25,6 +28,7 @@ from sqlmodel import Session
 from starlette.background import BackgroundTask
 
 from .... import (
+    coverageregistry,
     database as db,
     datadownloads,
     exceptions,
@@ -41,9 +45,21 @@ from ....schemas.base import (
     CoverageDataSmoothingStrategy,
     ObservationDataSmoothingStrategy,
 )
+from ....schemas.coverages import (
+    ConfigurationParameter,
+    CoverageConfiguration,
+    CoverageInternal,
+)
+from ....schemas.observations import (
+    Station,
+    Variable,
+)
 from ... import dependencies
+from ...responses import build_file_response
 from ..schemas import coverages as coverage_schemas
 from ..schemas.base import (
+    MultiPointTimeSeriesList,
+    PointTimeSeriesList,
     TimeSeries,
     TimeSeriesList,
 )
@@ -73,9 +89,7 @@ def list_configuration_parameters(
         include_total=True,
         name_filter=name_contains,
     )
-    _, unfiltered_total = db.list_configuration_parameters(
-        db_session, limit=1, offset=0, include_total=True
-    )
+    unfiltered_total = db.count_all_records(db_session, ConfigurationParameter)
     return coverage_schemas.ConfigurationParameterList.from_items(
         config_params,
         request,
@@ -158,9 +172,7 @@ def list_coverage_configurations(
         include_total=True,
         configuration_parameter_values_filter=conf_param_values_filter or None,
     )
-    _, unfiltered_total = db.list_coverage_configurations(
-        db_session, limit=1, offset=0, include_total=True
-    )
+    unfiltered_total = db.count_all_records(db_session, CoverageConfiguration)
     return coverage_schemas.CoverageConfigurationList.from_items(
         coverage_configurations,
         request,
@@ -246,7 +258,7 @@ def list_coverage_identifiers(
             logger.debug(
                 f"ignoring unknown parameter/value pair {param_name}:{param_value}"
             )
-    cov_internals, filtered_total = db.list_coverage_identifiers(
+    cov_internals, filtered_total = coverageregistry.list_coverage_identifiers(
         db_session,
         limit=list_params.limit,
         offset=list_params.offset,
@@ -254,9 +266,7 @@ def list_coverage_identifiers(
         name_filter=name_contains,
         configuration_parameter_values_filter=conf_param_values_filter or None,
     )
-    _, unfiltered_total = db.list_coverage_identifiers(
-        db_session, limit=1, offset=0, include_total=True
-    )
+    unfiltered_total = len(coverageregistry.get_registry(db_session))
 
     return coverage_schemas.CoverageIdentifierList.from_items(
         cov_internals,
@@ -277,7 +287,9 @@ def get_coverage_identifier(
     db_session: Annotated[Session, Depends(dependencies.get_db_session)],
     coverage_identifier: str,
 ):
-    if (coverage := db.get_coverage(db_session, coverage_identifier)) is not None:
+    if (
+        coverage := coverageregistry.get_coverage(db_session, coverage_identifier)
+    ) is not None:
         return coverage_schemas.CoverageIdentifierReadListItem.from_db_instance(
             coverage, request
         )
@@ -300,7 +312,7 @@ async def wms_endpoint(
     """
 
     cov = await anyio.to_thread.run_sync(
-        db.get_coverage, db_session, coverage_identifier
+        coverageregistry.get_coverage, db_session, coverage_identifier
     )
     if cov is not None:
         ds_fragment = thredds_crawler.get_thredds_url_fragment(
@@ -388,7 +400,7 @@ def list_forecast_data_download_links(
     time_window: Annotated[list[str], Query()] = None,
 ) -> coverage_schemas.CoverageDownloadList:
     """Get download links forecast data"""
-    coverage_identifiers = operations.list_coverage_identifiers_by_param_values(
+    coverage_identifiers, total = operations.list_coverage_identifiers_by_param_values(
         db_session,
         climatological_variable,
         aggregation_period,
@@ -405,12 +417,13 @@ def list_forecast_data_download_links(
         request=request,
         limit=list_params.limit,
         offset=list_params.offset,
-        total=len(coverage_identifiers),
+        total=total,
     )
 
 
 @router.get("/forecast-data/{coverage_identifier}")
 async def get_forecast_data(
+    request: Request,
     settings: Annotated[ArpavPpcvSettings, Depends(dependencies.get_settings)],
     http_client: Annotated[httpx.AsyncClient, Depends(dependencies.get_http_client)],
     db_session: Annotated[Session, Depends(dependencies.get_db_session)],
@@ -418,7 +431,10 @@ async def get_forecast_data(
     coords: Annotated[str, Query(description="A Well-Known-Text Polygon")] = None,
     datetime: Optional[str] = "../..",
 ):
-    if (coverage := db.get_coverage(db_session, coverage_identifier)) is not None:
+    coverage = await anyio.to_thread.run_sync(
+        coverageregistry.get_coverage, db_session, coverage_identifier
+    )
+    if coverage is not None:
         used_values = coverage.configuration.retrieve_configuration_parameters(
             coverage.identifier
         )
@@ -452,12 +468,32 @@ async def get_forecast_data(
             fitted_bbox = None
 
         cache_key = datadownloads.get_cache_key(coverage, fitted_bbox, temporal_range)
-        response_to_stream = await datadownloads.retrieve_coverage_data(
-            settings, http_client, cache_key, coverage, fitted_bbox, temporal_range
-        )
         filename = cache_key.rpartition("/")[-1]
+        cached_path = await datadownloads.get_cached_coverage_data(settings, cache_key)
+        if cached_path is not None:
+            return await anyio.to_thread.run_sync(
+                functools.partial(
+                    build_file_response,
+                    cached_path,
+                    filename,
+                    media_type="application/netcdf",
+                    range_header=request.headers.get("range"),
+                )
+            )
+        # register the download right after the cache miss, so that concurrent
+        # requests for the same data wait for it instead of also querying THREDDS
+        in_flight = datadownloads.register_in_flight_download(cache_key)
+        try:
+            response_to_stream = await datadownloads.retrieve_coverage_data(
+                settings, http_client, coverage, fitted_bbox, temporal_range
+            )
+        except BaseException:
+            datadownloads.release_in_flight_download(cache_key, in_flight)
+            raise
         return StreamingResponse(
-            response_to_stream.aiter_bytes(),
+            datadownloads.stream_and_cache_coverage_data(
+                settings, response_to_stream, cache_key, in_flight
+            ),
             status_code=response_to_stream.status_code,
             media_type="application/netcdf",
             headers={
@@ -536,9 +572,10 @@ def _modify_capabilities_response(
     "/time-series/climate-barometer",
     response_model=TimeSeriesList,
 )
-def get_climate_barometer_time_series(
+async def get_climate_barometer_time_series(
     db_session: Annotated[Session, Depends(dependencies.get_db_session)],
     settings: Annotated[ArpavPpcvSettings, Depends(dependencies.get_settings)],
+    http_client: Annotated[httpx.AsyncClient, Depends(dependencies.get_http_client)],
     data_smoothing: Annotated[list[CoverageDataSmoothingStrategy], Query()] = [
         CoverageDataSmoothingStrategy.NO_SMOOTHING
     ],
@@ -546,9 +583,10 @@ def get_climate_barometer_time_series(
 ):
     """Get climate barometer time series."""
     try:
-        relevant_series = operations.get_climate_barometer_time_series(
+        relevant_series = await operations.async_get_climate_barometer_time_series(
             settings,
             db_session,
+            http_client,
             smoothing_strategies=data_smoothing,
             include_uncertainty=include_uncertainty,
         )
@@ -558,17 +596,14 @@ def get_climate_barometer_time_series(
             detail="Could not retrieve data",
         ) from err
     else:
-        series = []
-        for coverage_info, pd_series in relevant_series.items():
-            cov, smoothing_strategy = coverage_info
-            series.append(
-                TimeSeries.from_coverage_series(pd_series, cov, smoothing_strategy)
-            )
-        return TimeSeriesList(series=series)
+        # serializing may need to lazy load coverage configuration details
+        return await db.run_in_db_thread(
+            settings, _serialize_climate_barometer_time_series, relevant_series
+        )
 
 
 @router.get("/time-series/{coverage_identifier}", response_model=TimeSeriesList)
-def get_time_series(
+async def get_time_series(
     db_session: Annotated[Session, Depends(dependencies.get_db_session)],
     settings: Annotated[ArpavPpcvSettings, Depends(dependencies.get_settings)],
     http_client: Annotated[httpx.AsyncClient, Depends(dependencies.get_http_client)],
@@ -600,7 +635,10 @@ def get_time_series(
     forecast model, this endpoint will return a representation of the various temporal
     series of data related to this forecast.
     """
-    if (coverage := db.get_coverage(db_session, coverage_identifier)) is not None:
+    coverage = await db.run_in_db_thread(
+        settings, coverageregistry.get_coverage, db_session, coverage_identifier
+    )
+    if coverage is not None:
         # TODO: catch errors with invalid geom
         geom = shapely.io.from_wkt(coords)
         if geom.geom_type == "MultiPoint":
@@ -621,7 +659,7 @@ def get_time_series(
             (
                 coverage_series,
                 observations_series,
-            ) = operations.get_coverage_time_series(
+            ) = await operations.async_get_coverage_time_series(
                 settings,
                 db_session,
                 http_client,
@@ -641,27 +679,172 @@ def get_time_series(
                 detail="Could not retrieve data",
             ) from err
         else:
-            series = []
-            for coverage_info, pd_series in coverage_series.items():
-                cov, smoothing_strategy = coverage_info
-                series.append(
-                    TimeSeries.from_coverage_series(pd_series, cov, smoothing_strategy)
-                )
-            if observations_series is not None:
-                for observation_info, pd_series in observations_series.items():
-                    station, variable, smoothing_strategy = observation_info
-                    series.append(
-                        TimeSeries.from_observation_series(
-                            pd_series, station, variable, smoothing_strategy
-                        )
-                    )
-            return TimeSeriesList(series=series)
+            # serializing may need to lazy load coverage configuration details
+            return await db.run_in_db_thread(
+                settings,
+                _serialize_time_series,
+                coverage_series,
+                observations_series,
+            )
     else:
         raise HTTPException(
             status_code=400, detail=_INVALID_COVERAGE_IDENTIFIER_ERROR_DETAIL
         )
 
 
+@router.get(
+    "/multi-point-time-series/{coverage_identifier}",
+    response_model=MultiPointTimeSeriesList,
+)
+async def get_multi_point_time_series(
+    db_session: Annotated[Session, Depends(dependencies.get_db_session)],
+    settings: Annotated[ArpavPpcvSettings, Depends(dependencies.get_settings)],
+    http_client: Annotated[httpx.AsyncClient, Depends(dependencies.get_http_client)],
+    coverage_identifier: str,
+    coords: Annotated[
+        Optional[str], Query(description="A Well-Known-Text MultiPoint or Point")
+    ] = None,
+    municipality_id: Annotated[
+        list[pydantic.UUID4],
+        Query(description="Use the centroids of these municipalities as points"),
+    ] = [],  # noqa
+    datetime: Optional[str] = "../..",
+    include_coverage_data: bool = True,
+    coverage_data_smoothing: Annotated[list[CoverageDataSmoothingStrategy], Query()] = [
+        CoverageDataSmoothingStrategy.NO_SMOOTHING
+    ],  # noqa
+    include_coverage_uncertainty: bool = False,
+    include_coverage_related_data: bool = False,
+):
+    """### Get forecast-related time series for multiple geographic locations.
+
+    This is equivalent to requesting the `/time-series/{coverage_identifier}`
+    endpoint for each point, but each of the underlying datasets is retrieved only
+    once. Observation data is not supported.
+    """
+    coverage = await db.run_in_db_thread(
+        settings, coverageregistry.get_coverage, db_session, coverage_identifier
+    )
+    if coverage is None:
+        raise HTTPException(
+            status_code=400, detail=_INVALID_COVERAGE_IDENTIFIER_ERROR_DETAIL
+        )
+    # each location is a tuple of (point, municipality)
+    locations = []
+    if coords is not None:
+        try:
+            geom = shapely.io.from_wkt(coords)
+        except shapely.errors.GEOSException as err:
+            raise HTTPException(status_code=400, detail="Invalid coords") from err
+        if geom.geom_type == "MultiPoint":
+            locations.extend((p, None) for p in geom.geoms)
+        elif geom.geom_type == "Point":
+            locations.append((geom, None))
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid coords - Must be a WKT MultiPoint or Point",
+            )
+    if len(municipality_id) > 0:
+        municipalities = await db.run_in_db_thread(
+            settings, db.get_municipalities, db_session, municipality_id
+        )
+        locations.extend(
+            (shapely.Point(m.centroid_epsg_4326_lon, m.centroid_epsg_4326_lat), m)
+            for m in municipalities
+            if m.centroid_epsg_4326_lon is not None
+            and m.centroid_epsg_4326_lat is not None
+        )
+    if len(locations) == 0:
+        raise HTTPException(
+            status_code=400, detail="Must provide coords or valid municipality ids"
+        )
+    if len(locations) > settings.multi_point_time_series_max_points:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Too many points - at most "
+                f"{settings.multi_point_time_series_max_points} can be requested"
+            ),
+        )
+    try:
+        points_series = await operations.async_get_coverage_multi_point_time_series(
+            settings,
+            db_session,
+            http_client,
+            coverage,
+            [point for point, _ in locations],
+            datetime,
+            coverage_data_smoothing,
+            include_coverage_data,
+            include_coverage_uncertainty,
+            include_coverage_related_data,
+        )
+    except exceptions.CoverageDataRetrievalError as err:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Could not retrieve data",
+        ) from err
+    # serializing may need to lazy load coverage configuration details
+    time_series_lists = await db.run_in_db_thread(
+        settings,
+        lambda: [_serialize_time_series(cs, None) for cs in points_series],
+    )
+    points = []
+    for (point, municipality), time_series_list in zip(locations, time_series_lists):
+        points.append(
+            PointTimeSeriesList(
+                coords=point.wkt,
+                municipality_id=municipality.id if municipality else None,
+                municipality_name=municipality.name if municipality else None,
+                series=time_series_list.series,
+            )
+        )
+    return MultiPointTimeSeriesList(points=points)
+
+
+def _serialize_climate_barometer_time_series(
+    relevant_series: dict[
+        tuple[CoverageInternal, CoverageDataSmoothingStrategy], pd.Series
+    ],
+) -> TimeSeriesList:
+    series = []
+    for coverage_info, pd_series in relevant_series.items():
+        cov, smoothing_strategy = coverage_info
+        series.append(
+            TimeSeries.from_coverage_series(pd_series, cov, smoothing_strategy)
+        )
+    return TimeSeriesList(series=series)
+
+
+def _serialize_time_series(
+    coverage_series: dict[
+        tuple[CoverageInternal, CoverageDataSmoothingStrategy], pd.Series
+    ],
+    observations_series: Optional[
+        dict[
+            tuple[Station, Variable, ObservationDataSmoothingStrategy],
+            pd.Series,
+        ]
+    ],
+) -> TimeSeriesList:
+    series = []
+    for coverage_info, pd_series in coverage_series.items():
+        cov, smoothing_strategy = coverage_info
+        series.append(
+            TimeSeries.from_coverage_series(pd_series, cov, smoothing_strategy)
+        )
+    if observations_series is not None:
+        for observation_info, pd_series in observations_series.items():
+            station, variable, smoothing_strategy = observation_info
+            series.append(
+                TimeSeries.from_observation_series(
+                    pd_series, station, variable, smoothing_strategy
+                )
+            )
+    return TimeSeriesList(series=series)
+
+
 @router.get(
     "/forecast-variable-combinations",
     response_model=coverage_schemas.ForecastVariableCombinationsList,
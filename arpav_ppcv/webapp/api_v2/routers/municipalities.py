@@ -12,6 +12,7 @@ from fastapi import (
 from sqlmodel import Session
 
 from .... import database as db
+from ....schemas import municipalities as app_models
 from ... import dependencies
 from ...responses import GeoJsonResponse
 from ..schemas.geojson import municipalities as municipalities_geojson
@@ -56,9 +57,7 @@ def list_municipalities(
         region_name_filter=region,
         **geom_filter_kwarg,
     )
-    _, unfiltered_total = db.list_municipalities(
-        db_session, limit=1, offset=0, include_total=True
-    )
+    unfiltered_total = db.count_all_records(db_session, app_models.Municipality)
     return municipalities_geojson.MunicipalityFeatureCollection.from_items(
         municipalities,
         request,
@@ -102,9 +101,7 @@ def list_municipality_centroids(
         region_name_filter=region,
         **geom_filter_kwarg,
     )
-    _, unfiltered_total = db.list_municipalities(
-        db_session, limit=1, offset=0, include_total=True
-    )
+    unfiltered_total = db.count_all_records(db_session, app_models.Municipality)
     return municipalities_geojson.MunicipalityCentroidFeatureCollection.from_items(
         centroids,
         request,
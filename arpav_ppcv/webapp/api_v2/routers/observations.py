@@ -1,6 +1,8 @@
+import datetime as dt
 import json
 import logging
 import math
+import uuid
 from typing import (
     Annotated,
     Optional,
@@ -24,11 +26,15 @@ from sqlmodel import Session
 
 from .... import (
     database as db,
+    observationstore,
     operations,
 )
 from ....config import ArpavPpcvSettings
 from ...responses import GeoJsonResponse
-from ....schemas import base
+from ....schemas import (
+    base,
+    observations as app_models,
+)
 from ... import dependencies
 from ..schemas import observations
 from ..schemas.geojson import observations as observations_geojson
@@ -36,12 +42,25 @@ from ..schemas.base import (
     TimeSeries,
     TimeSeriesItem,
     TimeSeriesList,
+    decode_cursor,
+    get_next_cursor,
 )
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _decode_list_cursor(cursor: Optional[str], *value_parsers) -> Optional[tuple]:
+    if cursor is not None:
+        try:
+            result = decode_cursor(cursor, *value_parsers)
+        except ValueError as err:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from err
+    else:
+        result = None
+    return result
+
+
 @router.get(
     "/stations",
     response_class=GeoJsonResponse,
@@ -65,8 +84,13 @@ def list_stations(
         base.ObservationAggregationType, Query()
     ] = base.ObservationAggregationType.SEASONAL,
     accept: Annotated[str | None, Header()] = None,
+    cursor: str | None = None,
 ):
-    """List known stations."""
+    """List known stations.
+
+    Results can also be paginated with the opaque `cursor` found in the `next`
+    link, which is faster than using `offset` for retrieving deep pages.
+    """
     filter_kwargs = {}
     if variable_name is not None:
         if (db_var := db.get_variable_by_name(db_session, variable_name)) is not None:
@@ -83,11 +107,11 @@ def list_stations(
         limit=list_params.limit,
         offset=list_params.offset,
         include_total=True,
+        cursor=_decode_list_cursor(cursor, str, uuid.UUID),
         **filter_kwargs,
     )
-    _, unfiltered_total = db.list_stations(
-        db_session, limit=1, offset=0, include_total=True
-    )
+    next_cursor = get_next_cursor(stations, list_params.limit, "code", "id")
+    unfiltered_total = db.count_all_records(db_session, app_models.Station)
     if accept == "application/json":
         result = JSONResponse(
             content=jsonable_encoder(
@@ -98,6 +122,7 @@ def list_stations(
                     offset=list_params.offset,
                     filtered_total=filtered_total,
                     unfiltered_total=unfiltered_total,
+                    next_cursor=next_cursor,
                 )
             )
         )
@@ -109,6 +134,7 @@ def list_stations(
             offset=list_params.offset,
             filtered_total=filtered_total,
             unfiltered_total=unfiltered_total,
+            next_cursor=next_cursor,
         )
     return result
 
@@ -140,9 +166,7 @@ def list_variables(
         offset=list_params.offset,
         include_total=True,
     )
-    _, unfiltered_total = db.list_variables(
-        db_session, limit=1, offset=0, include_total=True
-    )
+    unfiltered_total = db.count_all_records(db_session, app_models.Variable)
     return observations.VariableList.from_items(
         variables,
         request,
@@ -178,8 +202,13 @@ def list_monthly_measurements(
     station_code: str | None = None,
     variable_name: str | None = None,
     month: Annotated[int | None, fastapi.Query(le=1, ge=12)] = None,
+    cursor: str | None = None,
 ):
-    """List known monthly measurements."""
+    """List known monthly measurements.
+
+    Results can also be paginated with the opaque `cursor` found in the `next`
+    link, which is faster than using `offset` for retrieving deep pages.
+    """
     if station_code is not None:
         db_station = db.get_station_by_code(db_session, station_code)
         if db_station is not None:
@@ -204,10 +233,10 @@ def list_monthly_measurements(
         variable_id_filter=variable_id,
         month_filter=month,
         include_total=True,
+        cursor=_decode_list_cursor(cursor, dt.date.fromisoformat, uuid.UUID),
     )
-    _, unfiltered_total = db.list_monthly_measurements(
-        db_session, limit=1, offset=0, include_total=True
-    )
+    next_cursor = get_next_cursor(monthly_measurements, list_params.limit, "date", "id")
+    unfiltered_total = db.count_all_records(db_session, app_models.MonthlyMeasurement)
     return observations.MonthlyMeasurementList.from_items(
         monthly_measurements,
         request,
@@ -215,6 +244,7 @@ def list_monthly_measurements(
         offset=list_params.offset,
         filtered_total=filtered_total,
         unfiltered_total=unfiltered_total,
+        next_cursor=next_cursor,
     )
 
 
@@ -245,8 +275,13 @@ def list_seasonal_measurements(
     station_code: str | None = None,
     variable_name: str | None = None,
     season: base.Season | None = None,
+    cursor: str | None = None,
 ):
-    """List known seasonal measurements."""
+    """List known seasonal measurements.
+
+    Results can also be paginated with the opaque `cursor` found in the `next`
+    link, which is faster than using `offset` for retrieving deep pages.
+    """
     if station_code is not None:
         db_station = db.get_station_by_code(db_session, station_code)
         if db_station is not None:
@@ -271,10 +306,10 @@ def list_seasonal_measurements(
         variable_id_filter=variable_id,
         season_filter=season,
         include_total=True,
+        cursor=_decode_list_cursor(cursor, int, uuid.UUID),
     )
-    _, unfiltered_total = db.list_seasonal_measurements(
-        db_session, limit=1, offset=0, include_total=True
-    )
+    next_cursor = get_next_cursor(measurements, list_params.limit, "year", "id")
+    unfiltered_total = db.count_all_records(db_session, app_models.SeasonalMeasurement)
     return observations.SeasonalMeasurementList.from_items(
         measurements,
         request,
@@ -282,6 +317,7 @@ def list_seasonal_measurements(
         offset=list_params.offset,
         filtered_total=filtered_total,
         unfiltered_total=unfiltered_total,
+        next_cursor=next_cursor,
     )
 
 
@@ -307,8 +343,13 @@ def list_yearly_measurements(
     list_params: Annotated[dependencies.CommonListFilterParameters, Depends()],
     station_code: str | None = None,
     variable_name: str | None = None,
+    cursor: str | None = None,
 ):
-    """List known yearly measurements."""
+    """List known yearly measurements.
+
+    Results can also be paginated with the opaque `cursor` found in the `next`
+    link, which is faster than using `offset` for retrieving deep pages.
+    """
     if station_code is not None:
         db_station = db.get_station_by_code(db_session, station_code)
         if db_station is not None:
@@ -332,10 +373,10 @@ def list_yearly_measurements(
         station_id_filter=station_id,
         variable_id_filter=variable_id,
         include_total=True,
+        cursor=_decode_list_cursor(cursor, int, uuid.UUID),
     )
-    _, unfiltered_total = db.list_yearly_measurements(
-        db_session, limit=1, offset=0, include_total=True
-    )
+    next_cursor = get_next_cursor(measurements, list_params.limit, "year", "id")
+    unfiltered_total = db.count_all_records(db_session, app_models.YearlyMeasurement)
     return observations.YearlyMeasurementList.from_items(
         measurements,
         request,
@@ -343,6 +384,7 @@ def list_yearly_measurements(
         offset=list_params.offset,
         filtered_total=filtered_total,
         unfiltered_total=unfiltered_total,
+        next_cursor=next_cursor,
     )
 
 
@@ -378,10 +420,16 @@ def get_time_series(
     mann_kendall_start_year: Optional[int] = None,
     mann_kendall_end_year: Optional[int] = None,
 ):
-    if (db_station := db.get_station_by_code(db_session, station_code)) is not None:
-        if (
-            db_variable := db.get_variable_by_name(db_session, variable_name)
-        ) is not None:
+    # stations and variables are taken from the observation store, when in use,
+    # so that the whole request is served without querying the DB
+    if (store := observationstore.get_observation_store()) is not None:
+        db_station = store.get_station_by_code(station_code)
+        db_variable = store.get_variable_by_name(variable_name)
+    else:
+        db_station = db.get_station_by_code(db_session, station_code)
+        db_variable = db.get_variable_by_name(db_session, variable_name)
+    if db_station is not None:
+        if db_variable is not None:
             if include_mann_kendall_trend:
                 try:
                     mann_kendall = base.MannKendallParameters(
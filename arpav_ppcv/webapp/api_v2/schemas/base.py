@@ -1,7 +1,14 @@
+import base64
+import binascii
 import datetime as dt
+import enum
+import functools
+import json
 import logging
 import math
+import types
 import typing
+import uuid
 
 import pandas as pd
 import pydantic
@@ -31,6 +38,18 @@ class AppInformation(pydantic.BaseModel):
     git_commit: str
 
 
+class HttpClientPoolInformation(pydantic.BaseModel):
+    max_connections: int
+    max_keepalive_connections: int
+    num_connections: int
+    num_active_connections: int
+    num_idle_connections: int
+    num_active_requests: int
+    num_queued_requests: int
+    num_requests_sent: int
+    http2_enabled: bool
+
+
 @typing.runtime_checkable
 class ApiReadableModel(typing.Protocol):
     """Protocol to be used by all schema models that represent API resources.
@@ -60,6 +79,36 @@ class ListLinks(pydantic.BaseModel):
     last: str | None = None
 
 
+@functools.cache
+def _get_display_name_translations(
+    member: enum.Enum,
+) -> types.MappingProxyType[str, str]:
+    """Get the translated display names of an enum member.
+
+    The member must provide a `get_display_name(locale)` method. Results are
+    computed once per member and then reused by all serialized time series.
+    """
+    return types.MappingProxyType(
+        {
+            LOCALE_EN.language: member.get_display_name(LOCALE_EN),
+            LOCALE_IT.language: member.get_display_name(LOCALE_IT),
+        }
+    )
+
+
+@functools.cache
+def _get_static_parameter_name_translations(
+    parameter_type: type[StaticCoverageSeriesParameter]
+    | type[StaticObservationSeriesParameter],
+) -> types.MappingProxyType[str, types.MappingProxyType[str, str]]:
+    return types.MappingProxyType(
+        {
+            member.value.lower(): _get_display_name_translations(member)
+            for member in parameter_type
+        }
+    )
+
+
 class TimeSeriesItem(pydantic.BaseModel):
     value: float
     datetime: dt.datetime
@@ -91,17 +140,18 @@ class TimeSeries(pydantic.BaseModel):
         if derived_series is not None:
             series_elaboration = base_schemas.TimeSeriesElaboration.DERIVED
             name = "_".join((variable.name, derived_series.value))
+            derived_series_names = _get_display_name_translations(derived_series)
             translated_name = {
                 LOCALE_EN.language: " - ".join(
                     (
                         variable.display_name_english,
-                        derived_series.get_display_name(LOCALE_EN),
+                        derived_series_names[LOCALE_EN.language],
                     )
                 ),
                 LOCALE_IT.language: " - ".join(
                     (
                         variable.display_name_italian,
-                        derived_series.get_display_name(LOCALE_IT),
+                        derived_series_names[LOCALE_IT.language],
                     )
                 ),
             }
@@ -130,90 +180,14 @@ class TimeSeries(pydantic.BaseModel):
                 **(extra_info or {}),
             },
             translations=TimeSeriesTranslations(
-                parameter_names={
-                    "series_name": {
-                        LOCALE_EN.language: (
-                            StaticObservationSeriesParameter.SERIES_NAME.get_display_name(
-                                LOCALE_EN
-                            )
-                        ),
-                        LOCALE_IT.language: (
-                            StaticObservationSeriesParameter.SERIES_NAME.get_display_name(
-                                LOCALE_IT
-                            )
-                        ),
-                    },
-                    "processing_method": {
-                        LOCALE_EN.language: (
-                            StaticObservationSeriesParameter.PROCESSING_METHOD.get_display_name(
-                                LOCALE_EN
-                            )
-                        ),
-                        LOCALE_IT.language: (
-                            StaticObservationSeriesParameter.PROCESSING_METHOD.get_display_name(
-                                LOCALE_IT
-                            )
-                        ),
-                    },
-                    "station": {
-                        LOCALE_EN.language: (
-                            StaticObservationSeriesParameter.STATION.get_display_name(
-                                LOCALE_EN
-                            )
-                        ),
-                        LOCALE_IT.language: (
-                            StaticObservationSeriesParameter.STATION.get_display_name(
-                                LOCALE_IT
-                            )
-                        ),
-                    },
-                    "variable": {
-                        LOCALE_EN.language: (
-                            StaticObservationSeriesParameter.VARIABLE.get_display_name(
-                                LOCALE_EN
-                            )
-                        ),
-                        LOCALE_IT.language: (
-                            StaticObservationSeriesParameter.VARIABLE.get_display_name(
-                                LOCALE_IT
-                            )
-                        ),
-                    },
-                    "series_elaboration": {
-                        LOCALE_EN.language: (
-                            StaticObservationSeriesParameter.SERIES_ELABORATION.get_display_name(
-                                LOCALE_EN
-                            )
-                        ),
-                        LOCALE_IT.language: (
-                            StaticObservationSeriesParameter.SERIES_ELABORATION.get_display_name(
-                                LOCALE_IT
-                            )
-                        ),
-                    },
-                    "derived_series": {
-                        LOCALE_EN.language: (
-                            StaticObservationSeriesParameter.DERIVED_SERIES.get_display_name(
-                                LOCALE_EN
-                            )
-                        ),
-                        LOCALE_IT.language: (
-                            StaticObservationSeriesParameter.DERIVED_SERIES.get_display_name(
-                                LOCALE_IT
-                            )
-                        ),
-                    },
-                },
+                parameter_names=_get_static_parameter_name_translations(
+                    StaticObservationSeriesParameter
+                ),
                 parameter_values={
                     "series_name": translated_name,
-                    "processing_method": {
-                        LOCALE_EN.language: smoothing_strategy.get_display_name(
-                            LOCALE_EN
-                        ),
-                        LOCALE_IT.language: smoothing_strategy.get_display_name(
-                            LOCALE_IT
-                        ),
-                    },
+                    "processing_method": _get_display_name_translations(
+                        smoothing_strategy
+                    ),
                     "variable": {
                         LOCALE_EN.language: variable.display_name_english
                         or variable.name,
@@ -224,22 +198,14 @@ class TimeSeries(pydantic.BaseModel):
                         LOCALE_EN.language: station.name,
                         LOCALE_IT.language: station.name,
                     },
-                    "series_elaboration": {
-                        LOCALE_EN.language: series_elaboration.get_display_name(
-                            LOCALE_EN
-                        ),
-                        LOCALE_IT.language: series_elaboration.get_display_name(
-                            LOCALE_IT
-                        ),
-                    },
-                    "derived_series": {
-                        LOCALE_EN.language: derived_series.get_display_name(LOCALE_EN)
+                    "series_elaboration": _get_display_name_translations(
+                        series_elaboration
+                    ),
+                    "derived_series": (
+                        _get_display_name_translations(derived_series)
                         if derived_series
-                        else "",
-                        LOCALE_IT.language: derived_series.get_display_name(LOCALE_IT)
-                        if derived_series
-                        else "",
-                    },
+                        else {LOCALE_EN.language: "", LOCALE_IT.language: ""}
+                    ),
                 },
             ),
         )
@@ -291,54 +257,9 @@ class TimeSeries(pydantic.BaseModel):
             },
             translations=TimeSeriesTranslations(
                 parameter_names={
-                    "series_name": {
-                        LOCALE_EN.language: (
-                            StaticCoverageSeriesParameter.SERIES_NAME.get_display_name(
-                                LOCALE_EN
-                            )
-                        ),
-                        LOCALE_IT.language: (
-                            StaticCoverageSeriesParameter.SERIES_NAME.get_display_name(
-                                LOCALE_IT
-                            )
-                        ),
-                    },
-                    "processing_method": {
-                        LOCALE_EN.language: (
-                            StaticCoverageSeriesParameter.PROCESSING_METHOD.get_display_name(
-                                LOCALE_EN
-                            )
-                        ),
-                        LOCALE_IT.language: (
-                            StaticCoverageSeriesParameter.PROCESSING_METHOD.get_display_name(
-                                LOCALE_IT
-                            )
-                        ),
-                    },
-                    "coverage_identifier": {
-                        LOCALE_EN.language: (
-                            StaticCoverageSeriesParameter.COVERAGE_IDENTIFIER.get_display_name(
-                                LOCALE_EN
-                            )
-                        ),
-                        LOCALE_IT.language: (
-                            StaticCoverageSeriesParameter.COVERAGE_IDENTIFIER.get_display_name(
-                                LOCALE_IT
-                            )
-                        ),
-                    },
-                    "coverage_configuration": {
-                        LOCALE_EN.language: (
-                            StaticCoverageSeriesParameter.COVERAGE_CONFIGURATION.get_display_name(
-                                LOCALE_EN
-                            )
-                        ),
-                        LOCALE_IT.language: (
-                            StaticCoverageSeriesParameter.COVERAGE_CONFIGURATION.get_display_name(
-                                LOCALE_IT
-                            )
-                        ),
-                    },
+                    **_get_static_parameter_name_translations(
+                        StaticCoverageSeriesParameter
+                    ),
                     **param_names_translations,
                 },
                 parameter_values={
@@ -352,14 +273,9 @@ class TimeSeries(pydantic.BaseModel):
                             or coverage.configuration.name
                         ),
                     },
-                    "processing_method": {
-                        LOCALE_EN.language: smoothing_strategy.get_display_name(
-                            LOCALE_EN
-                        ),
-                        LOCALE_IT.language: smoothing_strategy.get_display_name(
-                            LOCALE_IT
-                        ),
-                    },
+                    "processing_method": _get_display_name_translations(
+                        smoothing_strategy
+                    ),
                     "coverage_identifier": {
                         LOCALE_EN.language: coverage.identifier,
                         LOCALE_IT.language: coverage.identifier,
@@ -384,6 +300,17 @@ class TimeSeriesList(pydantic.BaseModel):
     series: list[TimeSeries]
 
 
+class PointTimeSeriesList(pydantic.BaseModel):
+    coords: str
+    municipality_id: typing.Optional[pydantic.UUID4] = None
+    municipality_name: typing.Optional[str] = None
+    series: list[TimeSeries]
+
+
+class MultiPointTimeSeriesList(pydantic.BaseModel):
+    points: list[PointTimeSeriesList]
+
+
 class WebResourceList(base_schemas.ResourceList):
     meta: ListMeta
     links: ListLinks
@@ -400,6 +327,7 @@ class WebResourceList(base_schemas.ResourceList):
         offset: int,
         filtered_total: int,
         unfiltered_total: int,
+        next_cursor: typing.Optional[str] = None,
     ):
         return cls(
             meta=get_meta(len(items), unfiltered_total, filtered_total),
@@ -410,6 +338,7 @@ class WebResourceList(base_schemas.ResourceList):
                 offset,
                 filtered_total,
                 len(items),
+                next_cursor=next_cursor,
             ),
             items=[cls.list_item_type.from_db_instance(i, request) for i in items],
         )
@@ -421,21 +350,87 @@ def get_pagination_urls(
     total_records: int,
     limit: int,
     offset: int,
+    *,
+    cursor: typing.Optional[str] = None,
+    next_cursor: typing.Optional[str] = None,
     **filters,
 ) -> dict[str, str]:
-    """Build pagination-related urls."""
+    """Build pagination-related urls.
+
+    When the current page has been retrieved with a `cursor`, the `self` and
+    `next` urls also use cursors and there is no `previous` url, as cursors only
+    move forward. When `next_cursor` is provided, it is used for the `next` url
+    in place of an offset, which lets clients page deep into the results without
+    the database having to skip over all of the previous records.
+    """
     pagination_offsets = _get_pagination_offsets(
         returned_records, total_records, limit, offset
     )
+    if cursor is not None:
+        has_next = next_cursor is not None
+        pagination_offsets.update(self=None, previous=None, next=None)
+    else:
+        has_next = pagination_offsets["next"] is not None
     pagination_urls = {}
     for link_rel, offset in pagination_offsets.items():
         if offset is not None:
             pagination_urls[link_rel] = _build_list_url(
                 base_url, limit, offset, **filters
             )
+    if cursor is not None:
+        pagination_urls["self"] = _build_list_url(
+            base_url, limit, None, cursor=cursor, **filters
+        )
+    if has_next and next_cursor is not None:
+        pagination_urls["next"] = _build_list_url(
+            base_url, limit, None, cursor=next_cursor, **filters
+        )
     return pagination_urls
 
 
+def encode_cursor(*values: str | int | dt.date | uuid.UUID) -> str:
+    """Encode the sorting key of a record as an opaque pagination cursor."""
+    payload = json.dumps([str(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: str, *value_parsers: typing.Callable[[str], typing.Any]
+) -> tuple:
+    """Decode a pagination cursor created by `encode_cursor()`.
+
+    Each value is converted with the respective parser. A `ValueError` is raised
+    if the cursor is not valid.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as err:
+        raise ValueError(f"Invalid cursor {cursor!r}") from err
+    if (
+        not isinstance(values, list)
+        or len(values) != len(value_parsers)
+        or not all(isinstance(v, str) for v in values)
+    ):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return tuple(parse(value) for parse, value in zip(value_parsers, values))
+
+
+def get_next_cursor(
+    items: typing.Sequence[typing.Any], limit: int, *key_attributes: str
+) -> typing.Optional[str]:
+    """Build the cursor for the page that follows the input items.
+
+    Returns `None` if the input page is not full, as then it is the last one.
+    """
+    if limit > 0 and len(items) == limit:
+        last = items[-1]
+        result = encode_cursor(*(getattr(last, attr) for attr in key_attributes))
+    else:
+        result = None
+    return result
+
+
 def _build_list_url(base_url: str, limit: int, offset: typing.Optional[int], **filters):
     """Build a URL suitable for a list page."""
     url = f"{base_url}?limit={limit}"
@@ -469,18 +464,22 @@ def get_list_links(
     offset: int,
     filtered_total: int,
     num_returned_records: int,
+    next_cursor: typing.Optional[str] = None,
 ) -> ListLinks:
     filters = dict(request.query_params)
     if "limit" in filters.keys():
         del filters["limit"]
     if "offset" in filters.keys():
         del filters["offset"]
+    cursor = filters.pop("cursor", None)
     pagination_urls = get_pagination_urls(
         request.url_for(path_operation_name),
         num_returned_records,
         filtered_total,
         limit,
         offset,
+        cursor=cursor,
+        next_cursor=next_cursor,
         **filters,
     )
     return ListLinks(**pagination_urls)
@@ -47,11 +47,12 @@ class ArpavFeatureCollection(geojson_pydantic.FeatureCollection):
         offset: int,
         filtered_total: int,
         unfiltered_total: int,
+        next_cursor: typing.Optional[str] = None,
     ) -> "ArpavFeatureCollection":
         return cls(
             features=[cls.list_item_type.from_db_instance(i, request) for i in items],
             links=cls._get_list_links(
-                request, limit, offset, filtered_total, len(items)
+                request, limit, offset, filtered_total, len(items), next_cursor
             ),
             number_matched=filtered_total,
             number_total=unfiltered_total,
@@ -66,18 +67,22 @@ class ArpavFeatureCollection(geojson_pydantic.FeatureCollection):
         offset: int,
         filtered_total: int,
         num_returned_records: int,
+        next_cursor: typing.Optional[str] = None,
     ) -> ListLinks:
         filters = dict(request.query_params)
         if "limit" in filters.keys():
             del filters["limit"]
         if "offset" in filters.keys():
             del filters["offset"]
+        cursor = filters.pop("cursor", None)
         pagination_urls = get_pagination_urls(
             request.url_for(cls.path_operation_name),
             num_returned_records,
             filtered_total,
             limit,
             offset,
+            cursor=cursor,
+            next_cursor=next_cursor,
             **filters,
         )
         return ListLinks(**pagination_urls)
@@ -1,13 +1,20 @@
 import contextlib
 
+import anyio.to_thread
+import sqlmodel
 from starlette.applications import Starlette
 from starlette.staticfiles import StaticFiles
 from starlette.templating import Jinja2Templates
 
 from .. import (
+    cacheinvalidation,
     config,
+    coverageregistry,
     database,
+    observationstore,
 )
+from ..thredds import client as thredds_client
+from ..thredds import localmirror
 from .api_v2.app import create_app as create_v2_app
 from .admin.app import create_admin
 from .routes import routes
@@ -15,10 +22,35 @@ from .routes import routes
 
 @contextlib.asynccontextmanager
 async def lifespan(app: Starlette):
+    # create the shared http client upfront, ensuring it is bound to the
+    # worker's event loop
+    thredds_client.get_http_client(app.state.settings)
+    if app.state.settings.listen_for_metadata_changes:
+        # listen for changes made by other workers before populating caches
+        await anyio.to_thread.run_sync(
+            cacheinvalidation.start_listener, app.state.settings
+        )
+    # build the coverage identifier registry upfront, so that the first requests
+    # do not have to pay for it
+    await anyio.to_thread.run_sync(_build_coverage_registry, app.state.settings)
+    # likewise, load observations upfront, if they are to be served from memory
+    await anyio.to_thread.run_sync(
+        observationstore.load_observation_store, app.state.settings
+    )
     yield
+    await thredds_client.close_http_client()
+    await anyio.to_thread.run_sync(cacheinvalidation.stop_listener)
+    observationstore.close_observation_store()
+    await anyio.to_thread.run_sync(localmirror.close_local_datasets)
     # ensure the database engine is properly disposed of, closing any connections
     database._DB_ENGINE.dispose()  # noqa
     database._DB_ENGINE = None
+    database._DB_THREAD_LIMITER = None
+
+
+def _build_coverage_registry(settings: config.ArpavPpcvSettings) -> None:
+    with sqlmodel.Session(database.get_engine(settings)) as session:
+        coverageregistry.refresh_registry(session)
 
 
 def create_app_from_settings(settings: config.ArpavPpcvSettings) -> Starlette:
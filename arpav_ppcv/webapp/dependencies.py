@@ -9,6 +9,7 @@ from .. import (
     config,
     database,
 )
+from ..thredds import client as thredds_client
 
 
 def get_settings() -> config.ArpavPpcvSettings:
@@ -32,13 +33,12 @@ def get_db_session(engine=Depends(get_db_engine)):  # noqa: B008
 def get_http_client(
     settings: config.ArpavPpcvSettings = Depends(get_settings),
 ) -> httpx.AsyncClient:
-    return httpx.AsyncClient(timeout=settings.http_client_timeout_seconds)
+    """Dependency for FastAPI to get the shared pooled http client.
 
-
-def get_sync_http_client(
-    settings: config.ArpavPpcvSettings = Depends(get_settings),
-) -> httpx.Client:
-    return httpx.Client(timeout=settings.http_client_timeout_seconds)
+    The client is not closed after the request is served, as it is reused by all
+    requests - it gets closed in the application's lifespan function instead.
+    """
+    return thredds_client.get_http_client(settings)
 
 
 class CommonListFilterParameters(pydantic.BaseModel):  # noqa: D101
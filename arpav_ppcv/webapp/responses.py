@@ -1,5 +1,110 @@
-from fastapi.responses import JSONResponse
+import re
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Optional
+
+import anyio
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
+
+_RANGE_HEADER_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+_FILE_CHUNK_SIZE = 64 * 1024
 
 
 class GeoJsonResponse(JSONResponse):
     media_type = "application/geo+json"
+
+
+def build_file_response(
+    path: Path,
+    filename: str,
+    media_type: str,
+    range_header: Optional[str] = None,
+) -> Response:
+    """Build a response which serves a local file, honoring HTTP range requests.
+
+    Only single byte ranges are supported. Requests with multiple ranges, or with
+    a range which is not parseable, are served the whole file, as allowed by
+    RFC 9110.
+    """
+    stat_result = path.stat()
+    file_size = stat_result.st_size
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    try:
+        byte_range = (
+            _parse_range_header(range_header, file_size)
+            if range_header is not None
+            else None
+        )
+    except ValueError:
+        response = Response(
+            status_code=416,
+            headers={**headers, "Content-Range": f"bytes */{file_size}"},
+        )
+    else:
+        if byte_range is None:
+            response = FileResponse(
+                path, media_type=media_type, headers=headers, stat_result=stat_result
+            )
+        else:
+            start, end = byte_range
+            response = StreamingResponse(
+                _iter_file_range(path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{file_size}",
+                    "Content-Length": str(end - start + 1),
+                },
+            )
+    return response
+
+
+def _parse_range_header(range_header: str, file_size: int) -> Optional[tuple[int, int]]:
+    """Parse an HTTP Range header.
+
+    Returns a tuple with the first and last byte positions (inclusive) or `None`
+    if the header is to be ignored. Raises `ValueError` if the range is not
+    satisfiable.
+    """
+    if (match_obj := _RANGE_HEADER_PATTERN.match(range_header.strip())) is None:
+        return None
+    raw_start, raw_end = match_obj.groups()
+    if raw_start == "" and raw_end == "":
+        return None
+    if raw_start == "":
+        suffix_length = int(raw_end)
+        if suffix_length == 0:
+            raise ValueError("Range is not satisfiable")
+        start = max(file_size - suffix_length, 0)
+        end = file_size - 1
+    else:
+        start = int(raw_start)
+        if raw_end != "" and int(raw_end) < start:
+            # a last-byte-pos lower than first-byte-pos makes the range invalid,
+            # which means the header must be ignored
+            return None
+        end = min(int(raw_end), file_size - 1) if raw_end != "" else file_size - 1
+        if start >= file_size:
+            raise ValueError("Range is not satisfiable")
+    return start, end
+
+
+async def _iter_file_range(path: Path, start: int, end: int) -> AsyncIterator[bytes]:
+    remaining = end - start + 1
+    async with await anyio.open_file(path, "rb") as fh:
+        await fh.seek(start)
+        while remaining > 0:
+            chunk = await fh.read(min(_FILE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,184 @@
+"""Benchmark bulk creation of observation stations and measurements.
+
+Compares the previous implementation of the `database.create_many_*()`
+functions, which added each record to the ORM session and refreshed it after
+committing, with the current one, which inserts records in batches of
+multi-row INSERT statements and only returns lightweight rows.
+
+Stations and monthly measurements are created in the **test** database and the
+time taken by both implementations is printed. All tables of the test database
+are dropped afterwards.
+
+Run with:
+
+    python tests/benchmarks/bulk_inserts.py --num-stations 200 --num-years 30
+"""
+
+import datetime as dt
+import time
+from typing import Callable
+
+import geojson_pydantic
+import shapely.io
+import sqlalchemy
+import sqlmodel
+import typer
+from geoalchemy2.shape import from_shape
+
+from arpav_ppcv import (
+    config,
+    database,
+)
+from arpav_ppcv.schemas import observations
+
+
+def main(
+    num_stations: int = 200,
+    num_years: int = 30,
+    batch_size: int = database.DEFAULT_BULK_INSERT_BATCH_SIZE,
+):
+    settings = config.get_settings()
+    engine = sqlmodel.create_engine(settings.test_db_dsn.unicode_string())
+    sqlmodel.SQLModel.metadata.create_all(engine)
+    try:
+        with sqlmodel.Session(engine) as session:
+            db_variable = database.create_variable(
+                session,
+                observations.VariableCreate(
+                    name="benchmark", description_english="Benchmark variable"
+                ),
+            )
+            stations_to_create = _generate_stations(num_stations)
+            print(
+                f"Creating {num_stations} stations and "
+                f"{num_stations * num_years * 12} monthly measurements"
+            )
+            for label, create_stations, create_measurements in (
+                (
+                    "before (ORM add and refresh)",
+                    _create_many_stations_with_orm,
+                    _create_many_monthly_measurements_with_orm,
+                ),
+                (
+                    f"after (multi-row INSERT, batches of {batch_size})",
+                    lambda s, items: database.create_many_stations(
+                        s, items, batch_size=batch_size
+                    ),
+                    lambda s, items: database.create_many_monthly_measurements(
+                        s, items, batch_size=batch_size
+                    ),
+                ),
+            ):
+                print(f"\n### {label}")
+                station_ids = _run_benchmark(
+                    session, "stations", create_stations, stations_to_create
+                )
+                measurements_to_create = _generate_monthly_measurements(
+                    station_ids, db_variable.id, num_years
+                )
+                _run_benchmark(
+                    session,
+                    "monthly measurements",
+                    create_measurements,
+                    measurements_to_create,
+                )
+                _delete_created_records(session)
+    finally:
+        sqlmodel.SQLModel.metadata.drop_all(engine)
+
+
+def _generate_stations(num_stations: int) -> list[observations.StationCreate]:
+    return [
+        observations.StationCreate(
+            code=f"benchmark{index}",
+            geom=geojson_pydantic.Point(
+                type="Point", coordinates=(11 + index / 1000, 45 + index / 1000)
+            ),
+            altitude_m=index,
+            name=f"benchmark station {index}",
+            type_="benchmark",
+        )
+        for index in range(num_stations)
+    ]
+
+
+def _generate_monthly_measurements(
+    station_ids, variable_id, num_years: int
+) -> list[observations.MonthlyMeasurementCreate]:
+    return [
+        observations.MonthlyMeasurementCreate(
+            station_id=station_id,
+            variable_id=variable_id,
+            value=month,
+            date=dt.date(1990 + year, month, 1),
+        )
+        for station_id in station_ids
+        for year in range(num_years)
+        for month in range(1, 13)
+    ]
+
+
+def _run_benchmark(
+    session: sqlmodel.Session,
+    label: str,
+    create_function: Callable,
+    to_create: list,
+) -> list:
+    start = time.perf_counter()
+    created = create_function(session, to_create)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label}: created {len(created)} records in {elapsed:.2f} s "
+        f"({len(created) / elapsed:.0f} records/s)"
+    )
+    return [record.id for record in created]
+
+
+def _delete_created_records(session: sqlmodel.Session) -> None:
+    session.execute(sqlalchemy.delete(observations.MonthlyMeasurement))
+    session.execute(sqlalchemy.delete(observations.Station))
+    session.commit()
+    session.expunge_all()
+
+
+# this is the previous implementation of `database.create_many_stations()`
+def _create_many_stations_with_orm(
+    session: sqlmodel.Session,
+    stations_to_create: list[observations.StationCreate],
+) -> list[observations.Station]:
+    db_records = []
+    for station_create in stations_to_create:
+        geom = shapely.io.from_geojson(station_create.geom.model_dump_json())
+        db_station = observations.Station(
+            **station_create.model_dump(exclude={"geom"}),
+            geom=from_shape(geom),
+        )
+        db_records.append(db_station)
+        session.add(db_station)
+    session.commit()
+    for db_record in db_records:
+        session.refresh(db_record)
+    return db_records
+
+
+# this is the previous implementation of
+# `database.create_many_monthly_measurements()`
+def _create_many_monthly_measurements_with_orm(
+    session: sqlmodel.Session,
+    measurements_to_create: list[observations.MonthlyMeasurementCreate],
+) -> list[observations.MonthlyMeasurement]:
+    db_records = []
+    for measurement_create in measurements_to_create:
+        db_measurement = observations.MonthlyMeasurement(
+            **measurement_create.model_dump()
+        )
+        db_records.append(db_measurement)
+        session.add(db_measurement)
+    session.commit()
+    for db_record in db_records:
+        session.refresh(db_record)
+    return db_records
+
+
+if __name__ == "__main__":
+    typer.run(main)
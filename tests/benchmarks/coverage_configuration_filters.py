@@ -0,0 +1,236 @@
+"""Benchmark filtering coverage configurations by configuration parameter values.
+
+Compares the previous implementation of
+`database.list_coverage_configurations()`, which aggregated all possible values
+of each coverage configuration into a JSONB array and filtered it with
+`jsonb_path_exists()`, with the current relational division query backed by
+the `(configuration_parameter_value_id, coverage_configuration_id)` index.
+
+The forecast catalogue is created in the **test** database, replicated
+`--scale` times, and the query plan and latency of both implementations are
+printed. All tables of the test database are dropped afterwards.
+
+Run with:
+
+    python tests/benchmarks/coverage_configuration_filters.py --scale 10
+"""
+
+import statistics
+import time
+
+import sqlalchemy
+import sqlmodel
+import typer
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
+
+from arpav_ppcv import (
+    config,
+    database,
+)
+from arpav_ppcv.bootstrapper.configurationparameters import (
+    generate_configuration_parameters,
+)
+from arpav_ppcv.bootstrapper.coverage_configurations.forecast import (
+    pr as pr_forecast,
+    tas as tas_forecast,
+    tasmax as tasmax_forecast,
+    tasmin as tasmin_forecast,
+)
+from arpav_ppcv.bootstrapper.variables import generate_variable_configurations
+from arpav_ppcv.schemas import coverages
+
+_INDEX_NAME = "ix_configurationparameterpossiblevalue_value_id_cov_conf_id"
+
+# each filter is a list of (configuration parameter name, value name)
+_FILTERS = {
+    "archive": [("archive", "forecast")],
+    "variable+scenario": [
+        ("archive", "forecast"),
+        ("climatological_variable", "tas"),
+        ("scenario", "rcp85"),
+    ],
+    "six parameters": [
+        ("archive", "forecast"),
+        ("climatological_variable", "tas"),
+        ("aggregation_period", "annual"),
+        ("climatological_model", "model_ensemble"),
+        ("scenario", "rcp85"),
+        ("measure", "anomaly"),
+    ],
+}
+
+
+def main(
+    scale: int = 10,
+    repetitions: int = 50,
+    show_plans: bool = True,
+):
+    settings = config.get_settings()
+    engine = sqlmodel.create_engine(settings.test_db_dsn.unicode_string())
+    sqlmodel.SQLModel.metadata.create_all(engine)
+    try:
+        with sqlmodel.Session(engine) as session:
+            _populate_catalogue(session, scale)
+            num_cov_confs = len(database.collect_all_coverage_configurations(session))
+            print(f"Catalogue has {num_cov_confs} coverage configurations")
+            for filter_name, filter_ in _FILTERS.items():
+                conf_param_values = [
+                    database.get_configuration_parameter_value_by_names(
+                        session, param_name, value_name
+                    )
+                    for param_name, value_name in filter_
+                ]
+                print(f"\n### Filter: {filter_name}")
+                _run_benchmark(
+                    session,
+                    "before (jsonb_path_exists, no index)",
+                    _build_jsonb_path_statement(conf_param_values),
+                    repetitions,
+                    show_plans,
+                    drop_index=True,
+                )
+                _run_benchmark(
+                    session,
+                    "after (relational division, with index)",
+                    _build_relational_division_statement(conf_param_values),
+                    repetitions,
+                    show_plans,
+                    drop_index=False,
+                )
+    finally:
+        sqlmodel.SQLModel.metadata.drop_all(engine)
+
+
+def _populate_catalogue(session: sqlmodel.Session, scale: int) -> None:
+    for param_create in generate_configuration_parameters():
+        database.create_configuration_parameter(session, param_create)
+    for variable_create in generate_variable_configurations():
+        database.create_variable(session, variable_create)
+    variables = {v.name: v for v in database.collect_all_variables(session)}
+    conf_param_values = {
+        (pv.configuration_parameter.name, pv.name): pv
+        for pv in database.collect_all_configuration_parameter_values(session)
+    }
+    to_create = []
+    for module_ in (pr_forecast, tas_forecast, tasmax_forecast, tasmin_forecast):
+        to_create.extend(module_.generate_configurations(conf_param_values, variables))
+    for copy_index in range(scale):
+        for cov_conf_create in to_create:
+            name = cov_conf_create.name
+            if copy_index > 0:
+                name = f"{name}_copy{copy_index}"
+            database.create_coverage_configuration(
+                session, cov_conf_create.model_copy(update={"name": name})
+            )
+    session.execute(sqlalchemy.text("ANALYZE"))
+    session.commit()
+
+
+def _build_jsonb_path_statement(
+    conf_param_values: list[coverages.ConfigurationParameterValue],
+):
+    possible_values_cte = (
+        sqlmodel.select(
+            coverages.CoverageConfiguration.id,
+            func.jsonb_agg(
+                func.json_build_object(
+                    coverages.ConfigurationParameter.name,
+                    coverages.ConfigurationParameterValue.name,
+                )
+            ).label("possible_values"),
+        )
+        .join(
+            coverages.ConfigurationParameterPossibleValue,
+            coverages.CoverageConfiguration.id
+            == coverages.ConfigurationParameterPossibleValue.coverage_configuration_id,
+        )
+        .join(
+            coverages.ConfigurationParameterValue,
+            coverages.ConfigurationParameterValue.id
+            == coverages.ConfigurationParameterPossibleValue.configuration_parameter_value_id,
+        )
+        .join(
+            coverages.ConfigurationParameter,
+            coverages.ConfigurationParameter.id
+            == coverages.ConfigurationParameterValue.configuration_parameter_id,
+        )
+        .group_by(coverages.CoverageConfiguration.id)
+    ).cte("cov_conf_possible_values")
+    statement = (
+        sqlmodel.select(coverages.CoverageConfiguration)
+        .order_by(coverages.CoverageConfiguration.name)
+        .join(
+            possible_values_cte,
+            possible_values_cte.c.id == coverages.CoverageConfiguration.id,
+        )
+    )
+    for conf_param_value in conf_param_values:
+        param_name = conf_param_value.configuration_parameter.name
+        statement = statement.where(
+            func.jsonb_path_exists(
+                possible_values_cte.c.possible_values,
+                f'$[*] ? (@.{param_name} == "{conf_param_value.name}")',
+            )
+        )
+    return statement.limit(20)
+
+
+def _build_relational_division_statement(
+    conf_param_values: list[coverages.ConfigurationParameterValue],
+):
+    # this is the same query which is built by
+    # `database.list_coverage_configurations()`
+    value_ids = {cpv.id for cpv in conf_param_values}
+    possible_value = coverages.ConfigurationParameterPossibleValue
+    matching_ids = (
+        sqlmodel.select(possible_value.coverage_configuration_id)
+        .where(possible_value.configuration_parameter_value_id.in_(value_ids))
+        .group_by(possible_value.coverage_configuration_id)
+        .having(func.count() == len(value_ids))
+    )
+    return (
+        sqlmodel.select(coverages.CoverageConfiguration)
+        .order_by(coverages.CoverageConfiguration.name)
+        .where(coverages.CoverageConfiguration.id.in_(matching_ids))
+        .limit(20)
+    )
+
+
+def _run_benchmark(
+    session: sqlmodel.Session,
+    label: str,
+    statement,
+    repetitions: int,
+    show_plan: bool,
+    drop_index: bool,
+) -> None:
+    # the index is dropped inside a transaction which is rolled back afterwards,
+    # so that the "before" measurements do not benefit from it
+    if drop_index:
+        session.execute(sqlalchemy.text(f"DROP INDEX {_INDEX_NAME}"))
+    try:
+        compiled = statement.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+        if show_plan:
+            plan = session.execute(
+                sqlalchemy.text(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}")
+            ).scalars()
+            print(f"\n{label} - plan:")
+            print("\n".join(plan))
+        timings = []
+        for _ in range(repetitions):
+            start = time.perf_counter()
+            session.execute(sqlalchemy.text(str(compiled))).all()
+            timings.append((time.perf_counter() - start) * 1000)
+        print(
+            f"{label}: median {statistics.median(timings):.2f} ms, "
+            f"max {max(timings):.2f} ms over {repetitions} runs"
+        )
+    finally:
+        session.rollback()
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,146 @@
+"""Benchmark reading a station's observation series into a pandas dataframe.
+
+Compares the previous implementation of `operations.get_station_data()`, which
+loaded every measurement as an ORM instance and built the dataframe out of
+their `model_dump()`, with the current one, which selects only the date and
+value columns with a Core query and builds the dataframe from numpy arrays.
+
+A 70-year monthly history is created for a single station in the **test**
+database and each implementation reads it back the given number of times, both
+for the whole series and for a single month, as the observations API does. All
+tables of the test database are dropped afterwards.
+
+Run with:
+
+    python tests/benchmarks/observation_reads.py --num-years 70 --repetitions 20
+"""
+
+import datetime as dt
+import time
+from typing import (
+    Callable,
+    Optional,
+)
+
+import geojson_pydantic
+import pandas as pd
+import sqlmodel
+import typer
+
+from arpav_ppcv import (
+    config,
+    database,
+    operations,
+)
+from arpav_ppcv.schemas import (
+    base,
+    observations,
+)
+
+
+def main(num_years: int = 70, repetitions: int = 20):
+    settings = config.get_settings()
+    engine = sqlmodel.create_engine(settings.test_db_dsn.unicode_string())
+    sqlmodel.SQLModel.metadata.create_all(engine)
+    try:
+        with sqlmodel.Session(engine) as session:
+            variable = database.create_variable(
+                session,
+                observations.VariableCreate(
+                    name="benchmark", description_english="Benchmark variable"
+                ),
+            )
+            station = database.get_station(
+                session,
+                database.create_many_stations(
+                    session,
+                    [
+                        observations.StationCreate(
+                            code="benchmark",
+                            geom=geojson_pydantic.Point(
+                                type="Point", coordinates=(11, 45)
+                            ),
+                            altitude_m=1,
+                            name="benchmark station",
+                            type_="benchmark",
+                        )
+                    ],
+                )[0].id,
+            )
+            database.create_many_monthly_measurements(
+                session,
+                [
+                    observations.MonthlyMeasurementCreate(
+                        station_id=station.id,
+                        variable_id=variable.id,
+                        value=year + month / 100,
+                        date=dt.date(1950 + year, month, 1),
+                    )
+                    for year in range(num_years)
+                    for month in range(1, 13)
+                ],
+            )
+            print(
+                f"Reading a {num_years}-year monthly history "
+                f"{repetitions} times per case"
+            )
+            for month in (None, 1):
+                print(f"\n### month filter: {month}")
+                before = _run_benchmark(
+                    "before (ORM instances and model_dump)",
+                    lambda: _get_station_data_with_orm(
+                        session, variable, station, month
+                    ),
+                    repetitions,
+                )
+                after = _run_benchmark(
+                    "after (Core query into numpy arrays)",
+                    lambda: operations.get_observation_series(
+                        session,
+                        base.ObservationAggregationType.MONTHLY,
+                        station,
+                        variable,
+                        month_filter=month,
+                    ),
+                    repetitions,
+                )
+                print(f"speedup: {before / after:.1f}x")
+    finally:
+        sqlmodel.SQLModel.metadata.drop_all(engine)
+
+
+def _run_benchmark(label: str, read_function: Callable, repetitions: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        df = read_function()
+    elapsed = (time.perf_counter() - start) / repetitions
+    print(f"{label}: read {len(df)} measurements in {elapsed * 1000:.1f} ms")
+    return elapsed
+
+
+# this is the previous implementation of `operations.get_station_data()`
+def _get_station_data_with_orm(
+    session: sqlmodel.Session,
+    variable: observations.Variable,
+    station: observations.Station,
+    month: Optional[int],
+) -> pd.DataFrame:
+    raw_measurements = database.collect_all_monthly_measurements(
+        session=session,
+        station_id_filter=station.id,
+        variable_id_filter=variable.id,
+        month_filter=month,
+    )
+    df = pd.DataFrame(m.model_dump() for m in raw_measurements)
+    df = df.rename(columns={"value": variable.name})
+    df["time"] = pd.to_datetime(df["date"], utc=True)
+    df = df[["time", variable.name]]
+    df.set_index("time", inplace=True)
+    # expire loaded instances, otherwise later repetitions would be served
+    # from the session's identity map
+    session.expunge_all()
+    return df
+
+
+if __name__ == "__main__":
+    typer.run(main)
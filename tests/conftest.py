@@ -15,6 +15,7 @@ from geoalchemy2.shape import from_shape
 from typer.testing import CliRunner
 
 from arpav_ppcv import (
+    cacheinvalidation,
     config,
     database,
     main,
@@ -62,7 +63,10 @@ def arpav_db(settings):
     """Provides a clean DB."""
     engine = next(_override_get_db_engine(settings))
     sqlmodel.SQLModel.metadata.create_all(engine)
+    # in-memory caches must not carry over data from other tests
+    cacheinvalidation.invalidate_local_caches()
     yield
+    cacheinvalidation.invalidate_local_caches()
     sqlmodel.SQLModel.metadata.drop_all(engine)
     # tables_to_truncate = list(sqlmodel.SQLModel.metadata.tables.keys())
     # tables_fragment = ', '.join(f'"{t}"' for t in tables_to_truncate)
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from arpav_ppcv import (
+    cacheinvalidation,
+    database,
+)
+from arpav_ppcv.schemas import coverages
+
+
+@pytest.fixture
+def invalidation_counter():
+    invalidated = threading.Event()
+    calls = []
+
+    def _callback():
+        calls.append(1)
+        invalidated.set()
+
+    cacheinvalidation.register_invalidation_callback(_callback)
+    yield calls, invalidated
+    cacheinvalidation._INVALIDATION_CALLBACKS.remove(_callback)
+
+
+def test_listener_only_invalidates_on_version_changes(invalidation_counter):
+    calls, _ = invalidation_counter
+    listener = cacheinvalidation.CoverageMetadataListener(engine=None)
+    listener.handle_version(3)
+    assert calls == []
+    listener.handle_version(3)
+    assert calls == []
+    listener.handle_version(4)
+    assert calls == [1]
+    assert listener.last_seen_version == 4
+
+
+def test_bump_coverage_metadata_version(arpav_db_session):
+    assert database.get_coverage_metadata_version(arpav_db_session) == 0
+    assert database.bump_coverage_metadata_version(arpav_db_session) == 1
+    assert database.bump_coverage_metadata_version(arpav_db_session) == 2
+    arpav_db_session.commit()
+    assert database.get_coverage_metadata_version(arpav_db_session) == 2
+
+
+def test_listener_invalidates_caches_on_notify(
+    arpav_db_session, settings, invalidation_counter
+):
+    calls, invalidated = invalidation_counter
+    listener = cacheinvalidation.CoverageMetadataListener(
+        arpav_db_session.get_bind(), poll_interval_seconds=0.1
+    )
+    listener.start()
+    try:
+        assert listener.connected.wait(timeout=5)
+        database.create_coverage_configuration(
+            arpav_db_session,
+            coverages.CoverageConfigurationCreate(
+                name="fake_conf",
+                netcdf_main_dataset_name="fake_ds",
+                thredds_url_pattern="fake",
+                unit_english="fake_unit",
+                palette="fake_palette",
+                color_scale_min=0.0,
+                color_scale_max=1.0,
+                possible_values=[],
+            ),
+        )
+        assert invalidated.wait(timeout=5)
+        assert listener.last_seen_version == database.get_coverage_metadata_version(
+            arpav_db_session
+        )
+    finally:
+        listener.stop(timeout=5)
+
+
+def test_listener_handles_observation_data_notifications(arpav_db_session):
+    handled = threading.Event()
+    cacheinvalidation.register_observation_data_callback(handled.set)
+    listener = cacheinvalidation.CoverageMetadataListener(
+        arpav_db_session.get_bind(), poll_interval_seconds=0.1
+    )
+    listener.start()
+    try:
+        assert listener.connected.wait(timeout=5)
+        database.notify_observation_data_changed(arpav_db_session)
+        arpav_db_session.commit()
+        assert handled.wait(timeout=5)
+    finally:
+        listener.stop(timeout=5)
+        cacheinvalidation._OBSERVATION_DATA_CALLBACKS.remove(handled.set)
@@ -0,0 +1,135 @@
+import uuid
+
+import pytest
+
+from arpav_ppcv import (
+    coverageregistry,
+    database,
+)
+
+
+def _build_entry(
+    conf_name: str, **parameter_values
+) -> coverageregistry.CoverageRegistryEntry:
+    return coverageregistry.CoverageRegistryEntry(
+        identifier="-".join((conf_name, *parameter_values.values())),
+        configuration_id=uuid.uuid5(uuid.NAMESPACE_DNS, conf_name),
+        configuration_name=conf_name,
+        parameter_values=parameter_values,
+        thredds_url_fragment=None,
+        netcdf_variable_name=None,
+    )
+
+
+@pytest.fixture
+def sample_registry():
+    return coverageregistry.CoverageRegistry(
+        [
+            _build_entry("tas", scenario="rcp26", year_period="winter"),
+            _build_entry("tas", scenario="rcp26", year_period="summer"),
+            _build_entry("tas", scenario="rcp85", year_period="winter"),
+            _build_entry("tas", scenario="rcp85", year_period="summer"),
+            _build_entry("pr", scenario="rcp26", year_period="annual"),
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "name_filter, parameter_values_filter, expected",
+    [
+        pytest.param(
+            None,
+            None,
+            [
+                "tas-rcp26-winter",
+                "tas-rcp26-summer",
+                "tas-rcp85-winter",
+                "tas-rcp85-summer",
+                "pr-rcp26-annual",
+            ],
+            id="no-filter",
+        ),
+        pytest.param(
+            None,
+            [("scenario", "rcp26")],
+            ["tas-rcp26-winter", "tas-rcp26-summer", "pr-rcp26-annual"],
+            id="single-value",
+        ),
+        pytest.param(
+            None,
+            [("scenario", "rcp85"), ("year_period", "winter")],
+            ["tas-rcp85-winter"],
+            id="multiple-params",
+        ),
+        pytest.param(
+            None,
+            [("year_period", "winter"), ("year_period", "annual")],
+            [],
+            id="configuration-must-have-all-values",
+        ),
+        pytest.param(
+            ["RCP85"],
+            [("year_period", "summer")],
+            ["tas-rcp85-summer"],
+            id="name-and-values",
+        ),
+        pytest.param(
+            None,
+            [("scenario", "unknown")],
+            [],
+            id="unknown-value",
+        ),
+    ],
+)
+def test_coverage_registry_filter(
+    sample_registry, name_filter, parameter_values_filter, expected
+):
+    result = sample_registry.filter(
+        name_filter=name_filter, parameter_values_filter=parameter_values_filter
+    )
+    assert [e.identifier for e in result] == expected
+
+
+def test_coverage_registry_get(sample_registry):
+    assert len(sample_registry) == 5
+    assert "pr-rcp26-annual" in sample_registry
+    assert sample_registry.get("pr-rcp26-annual").parameter_values == {
+        "scenario": "rcp26",
+        "year_period": "annual",
+    }
+    assert sample_registry.get("pr-rcp85-annual") is None
+
+
+def test_list_coverage_identifiers_matches_database(
+    arpav_db_session, sample_real_coverage_configurations
+):
+    archive_forecast = database.get_configuration_parameter_value_by_names(
+        arpav_db_session, "archive", "forecast"
+    )
+    for filter_ in (None, [archive_forecast]):
+        expected, expected_total = database.list_coverage_identifiers(
+            arpav_db_session,
+            limit=1000,
+            include_total=True,
+            configuration_parameter_values_filter=filter_,
+        )
+        result, total = coverageregistry.list_coverage_identifiers(
+            arpav_db_session,
+            limit=1000,
+            include_total=True,
+            configuration_parameter_values_filter=filter_,
+        )
+        assert total == expected_total
+        assert [c.identifier for c in result] == [c.identifier for c in expected]
+
+
+def test_get_coverage(arpav_db_session, sample_real_coverage_configurations):
+    cov_conf = database.collect_all_coverage_configurations(arpav_db_session)[0]
+    identifier = database.generate_coverage_identifiers(cov_conf)[0]
+    coverage = coverageregistry.get_coverage(arpav_db_session, identifier)
+    assert coverage.identifier == identifier
+    assert coverage.configuration.id == cov_conf.id
+    assert coverageregistry.get_thredds_url_fragment(coverage) == (
+        cov_conf.get_thredds_url_fragment(identifier)
+    )
+    assert coverageregistry.get_coverage(arpav_db_session, "fake-identifier") is None
@@ -1,11 +1,19 @@
+import datetime as dt
 import random
+import uuid
 from contextlib import nullcontext as does_not_raise
 
 import pydantic
 import pytest
+import shapely
+import sqlalchemy
 
 from arpav_ppcv import database
-from arpav_ppcv.schemas import coverages
+from arpav_ppcv.schemas import (
+    base,
+    coverages,
+    observations,
+)
 
 
 @pytest.mark.parametrize(
@@ -53,6 +61,98 @@ def test_list_coverage_configurations(
         assert db_cov_conf.name == ordered_cov_confs[index].name
 
 
+def test_list_coverage_configurations_filters_by_all_param_values(
+    arpav_db_session, sample_coverage_configurations
+):
+    first, second = sample_coverage_configurations[:2]
+    first_values = [pv.configuration_parameter_value for pv in first.possible_values]
+    second_values = [pv.configuration_parameter_value for pv in second.possible_values]
+    for values_filter in (first_values, first_values[:1]):
+        db_cov_confs, total = database.list_coverage_configurations(
+            arpav_db_session,
+            limit=100,
+            include_total=True,
+            configuration_parameter_values_filter=values_filter,
+        )
+        expected = sorted(
+            cc.name
+            for cc in sample_coverage_configurations
+            if {v.id for v in values_filter}.issubset(
+                {pv.configuration_parameter_value_id for pv in cc.possible_values}
+            )
+        )
+        assert first.name in expected
+        assert [cc.name for cc in db_cov_confs] == expected
+        assert total == len(expected)
+    mixed_filter = first_values + [
+        v for v in second_values if v.id not in {fv.id for fv in first_values}
+    ]
+    if len(mixed_filter) > len(first_values):
+        db_cov_confs, _ = database.list_coverage_configurations(
+            arpav_db_session,
+            limit=100,
+            configuration_parameter_values_filter=mixed_filter,
+        )
+        assert first.name not in [cc.name for cc in db_cov_confs]
+
+
+@pytest.mark.parametrize(
+    "load_options, max_num_queries",
+    [
+        pytest.param(database.COVERAGE_CONFIGURATION_POSSIBLE_VALUES_LOADERS, 2),
+        pytest.param(database.COVERAGE_CONFIGURATION_DETAIL_LOADERS, 3),
+    ],
+)
+def test_list_coverage_configurations_uses_bounded_number_of_queries(
+    arpav_db_session, sample_configuration_parameters, load_options, max_num_queries
+):
+    db_cov_confs = []
+    for i in range(100):
+        db_cov_confs.append(
+            coverages.CoverageConfiguration(
+                name=f"coverage_configuration{i:03d}",
+                netcdf_main_dataset_name="some-dataset-name",
+                thredds_url_pattern="the_thredds-param_{fake_parameter_0}",
+                palette="fake",
+                uncertainty_lower_bounds_coverage_configuration=(
+                    db_cov_confs[-1] if len(db_cov_confs) > 0 else None
+                ),
+                possible_values=[
+                    coverages.ConfigurationParameterPossibleValue(
+                        configuration_parameter_value=param.allowed_values[i % 4]
+                    )
+                    for param in sample_configuration_parameters[:2]
+                ],
+            )
+        )
+    arpav_db_session.add_all(db_cov_confs)
+    arpav_db_session.commit()
+    arpav_db_session.expunge_all()
+    executed = []
+
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    engine = arpav_db_session.get_bind()
+    sqlalchemy.event.listen(engine, "before_cursor_execute", count_query)
+    try:
+        listed, _ = database.list_coverage_configurations(
+            arpav_db_session, limit=100, load_options=load_options
+        )
+        for cov_conf in listed:
+            for pv in cov_conf.possible_values:
+                assert pv.configuration_parameter_value.configuration_parameter.name
+            if load_options == database.COVERAGE_CONFIGURATION_DETAIL_LOADERS:
+                lower = cov_conf.uncertainty_lower_bounds_coverage_configuration
+                assert lower is None or lower.name < cov_conf.name
+                assert cov_conf.related_observation_variable is None
+                assert cov_conf.secondary_coverage_configurations == []
+    finally:
+        sqlalchemy.event.remove(engine, "before_cursor_execute", count_query)
+    assert len(listed) == 100
+    assert len(executed) <= max_num_queries
+
+
 @pytest.mark.parametrize(
     "params_to_generate, params_to_use, expected_identifiers",
     [
@@ -119,6 +219,7 @@ def test_generate_coverage_identifiers(
         pytest.param(10, 0, False),
         pytest.param(10, 0, True),
         pytest.param(5, 2, True),
+        pytest.param(5, 30, True),
     ],
 )
 def test_list_variables(
@@ -137,6 +238,257 @@ def test_list_variables(
         assert db_variable.name == expected_names[index]
 
 
+def test_list_variables_fetches_page_and_total_in_a_single_query(
+    arpav_db_session, sample_variables
+):
+    executed = []
+
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    engine = arpav_db_session.get_bind()
+    sqlalchemy.event.listen(engine, "before_cursor_execute", count_query)
+    try:
+        db_variables, total = database.list_variables(
+            arpav_db_session, limit=5, offset=5, include_total=True
+        )
+    finally:
+        sqlalchemy.event.remove(engine, "before_cursor_execute", count_query)
+    assert len(db_variables) == 5
+    assert total == len(sample_variables)
+    assert len(executed) == 1
+
+
+def test_count_all_records_is_invalidated_on_commit(arpav_db_session, sample_variables):
+    database.invalidate_record_counts()
+    num_variables = len(sample_variables)
+    count = database.count_all_records(arpav_db_session, observations.Variable)
+    assert count == num_variables
+    database.create_variable(
+        arpav_db_session,
+        observations.VariableCreate(
+            name="another_variable", description_english="Another"
+        ),
+    )
+    count = database.count_all_records(arpav_db_session, observations.Variable)
+    assert count == num_variables + 1
+    database.delete_variable(arpav_db_session, sample_variables[0].id)
+    count = database.count_all_records(arpav_db_session, observations.Variable)
+    assert count == num_variables
+
+
+@pytest.mark.parametrize(
+    "batch_size, expected_num_inserts",
+    [
+        pytest.param(1000, 1),
+        pytest.param(7, 6),
+    ],
+)
+def test_create_many_monthly_measurements_inserts_in_batches(
+    arpav_db_session,
+    sample_stations,
+    sample_variables,
+    batch_size,
+    expected_num_inserts,
+):
+    to_create = [
+        observations.MonthlyMeasurementCreate(
+            station_id=sample_stations[0].id,
+            variable_id=sample_variables[0].id,
+            value=index,
+            date=dt.date(2000 + index // 12, index % 12 + 1, 1),
+        )
+        for index in range(40)
+    ]
+    executed = []
+
+    def capture_query(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    engine = arpav_db_session.get_bind()
+    sqlalchemy.event.listen(engine, "before_cursor_execute", capture_query)
+    try:
+        created = database.create_many_monthly_measurements(
+            arpav_db_session, to_create, batch_size=batch_size
+        )
+    finally:
+        sqlalchemy.event.remove(engine, "before_cursor_execute", capture_query)
+    assert len(executed) == expected_num_inserts
+    assert all(statement.startswith("INSERT") for statement in executed)
+    assert sorted(m.value for m in created) == list(range(40))
+    db_measurements, total = database.list_monthly_measurements(
+        arpav_db_session, limit=None, include_total=True
+    )
+    assert total == len(to_create)
+    assert {m.id for m in db_measurements} == {m.id for m in created}
+
+
+def test_upsert_many_monthly_measurements_is_idempotent(
+    arpav_db_session, sample_stations, sample_variables
+):
+    def build_measurements(values):
+        return [
+            observations.MonthlyMeasurementCreate(
+                station_id=sample_stations[0].id,
+                variable_id=sample_variables[0].id,
+                value=value,
+                date=dt.date(2000 + index, 1, 1),
+            )
+            for index, value in enumerate(values)
+        ]
+
+    created = database.upsert_many_monthly_measurements(
+        arpav_db_session, build_measurements([1.0, 2.0, 3.0])
+    )
+    assert len(created) == 3
+    assert (
+        database.upsert_many_monthly_measurements(
+            arpav_db_session, build_measurements([1.0, 2.0, 3.0])
+        )
+        == []
+    )
+    upserted = database.upsert_many_monthly_measurements(
+        arpav_db_session, build_measurements([1.0, 20.0, 3.0, 4.0])
+    )
+    assert sorted(m.value for m in upserted) == [4.0, 20.0]
+    db_measurements = database.collect_all_monthly_measurements(
+        arpav_db_session,
+        station_id_filter=sample_stations[0].id,
+        variable_id_filter=sample_variables[0].id,
+    )
+    assert sorted(m.value for m in db_measurements) == [1.0, 3.0, 4.0, 20.0]
+    updated_id = next(m.id for m in created if m.value == 2.0)
+    assert next(m.id for m in upserted if m.value == 20.0) == updated_id
+
+
+def test_get_nearest_station_measurement_columns(
+    arpav_db_session, sample_stations, sample_variables
+):
+    # sample stations are located at (i, 2 * i)
+    variable = sample_variables[0]
+    yearly = base.ObservationAggregationType.YEARLY
+    database.create_many_yearly_measurements(
+        arpav_db_session,
+        [
+            observations.YearlyMeasurementCreate(
+                station_id=station.id, variable_id=variable.id, value=value, year=2000
+            )
+            for station, value in ((sample_stations[0], 1.0), (sample_stations[2], 2.0))
+        ],
+    )
+    point = shapely.Point(0.9, 1.9)
+    station, columns = database.get_nearest_station_measurement_columns(
+        arpav_db_session, point, 500_000, yearly, variable_id=variable.id
+    )
+    # the nearest station, `sample_stations[1]`, has no measurements
+    assert station.id == sample_stations[0].id
+    assert columns == {"year": [2000], "value": [1.0]}
+    assert (
+        database.get_nearest_station_measurement_columns(
+            arpav_db_session, point, 1_000, yearly, variable_id=variable.id
+        )
+        is None
+    )
+
+
+def test_get_grid_cell_nearest_station_measurement_columns(
+    arpav_db_session, sample_stations, sample_variables
+):
+    # sample stations are located at (i, 2 * i)
+    variable_id = sample_variables[0].id
+    yearly = base.ObservationAggregationType.YEARLY
+    database.create_many_yearly_measurements(
+        arpav_db_session,
+        [
+            observations.YearlyMeasurementCreate(
+                station_id=station.id, variable_id=variable_id, value=value, year=2000
+            )
+            for station, value in ((sample_stations[0], 1.0), (sample_stations[3], 2.0))
+        ],
+    )
+    point = shapely.Point(0.9, 1.9)
+
+    def get_nearest(cell_index: int):
+        return database.get_grid_cell_nearest_station_measurement_columns(
+            arpav_db_session,
+            cell_index,
+            point,
+            300_000,
+            yearly,
+            variable_id=variable_id,
+        )
+
+    def store_cells(*station_ids_by_cell):
+        database.replace_station_grid_cells(
+            arpav_db_session,
+            yearly,
+            variable_id=variable_id,
+            cells_to_create=[
+                observations.StationGridCellCreate(
+                    variable_id=variable_id,
+                    aggregation_type=yearly,
+                    cell_index=index,
+                    station_ids=station_ids,
+                )
+                for index, station_ids in enumerate(station_ids_by_cell)
+            ],
+        )
+
+    assert get_nearest(0) is None
+    store_cells([s.id for s in sample_stations[3::-1]], [])
+    # the nearest candidate, `sample_stations[1]`, has no measurements and
+    # `sample_stations[3]` is too far
+    station, columns = get_nearest(0)
+    assert station.id == sample_stations[0].id
+    assert columns == {"year": [2000], "value": [1.0]}
+    assert get_nearest(1) == (None, {"year": [], "value": []})
+    store_cells([sample_stations[3].id])
+    assert get_nearest(0) == (None, {"year": [], "value": []})
+    assert get_nearest(1) is None
+
+
+def test_get_measurement_series_columns(
+    arpav_db_session, sample_stations, sample_variables
+):
+    station_id = sample_stations[0].id
+    variable_id = sample_variables[0].id
+    database.create_many_seasonal_measurements(
+        arpav_db_session,
+        [
+            observations.SeasonalMeasurementCreate(
+                station_id=station_id,
+                variable_id=variable_id,
+                value=value,
+                year=year,
+                season=season,
+            )
+            for year, season, value in (
+                (2001, base.Season.SUMMER, 3.0),
+                (2000, base.Season.AUTUMN, 2.0),
+                (2000, base.Season.WINTER, 1.0),
+            )
+        ],
+    )
+    result = database.get_measurement_series_columns(
+        arpav_db_session,
+        base.ObservationAggregationType.SEASONAL,
+        station_id=station_id,
+        variable_id=variable_id,
+    )
+    assert result == {
+        "year": [2000, 2000, 2001],
+        "season": ["WINTER", "AUTUMN", "SUMMER"],
+        "value": [1.0, 2.0, 3.0],
+    }
+    assert database.get_measurement_series_columns(
+        arpav_db_session,
+        base.ObservationAggregationType.SEASONAL,
+        station_id=station_id,
+        variable_id=variable_id,
+        season_filter=base.Season.SPRING,
+    ) == {"year": [], "season": [], "value": []}
+
+
 @pytest.mark.parametrize(
     "limit, offset, include_total",
     [
@@ -161,6 +513,89 @@ def test_list_monthly_measurements(
         assert db_measurement.date == expected_dates[index]
 
 
+def test_list_monthly_measurements_with_cursor(
+    arpav_db_session, sample_monthly_measurements
+):
+    expected = sorted(sample_monthly_measurements, key=lambda m: (m.date, m.id))
+    cursor = None
+    seen = []
+    while True:
+        page, total = database.list_monthly_measurements(
+            arpav_db_session, limit=25, include_total=True, cursor=cursor
+        )
+        assert total == len(sample_monthly_measurements)
+        if len(page) == 0:
+            break
+        seen.extend(page)
+        cursor = (page[-1].date, page[-1].id)
+    assert [m.id for m in seen] == [m.id for m in expected]
+
+
+@pytest.mark.parametrize(
+    "list_function, filter_kwargs, table_name, expected_index",
+    [
+        pytest.param(
+            database.list_monthly_measurements,
+            {"month_filter": 3},
+            "monthlymeasurement",
+            "ix_monthlymeasurement_station_variable_month_date",
+            id="monthly-by-month",
+        ),
+        pytest.param(
+            database.list_monthly_measurements,
+            {},
+            "monthlymeasurement",
+            "uq_monthlymeasurement_station_variable_date",
+            id="monthly",
+        ),
+        pytest.param(
+            database.list_seasonal_measurements,
+            {"season_filter": base.Season.WINTER},
+            "seasonalmeasurement",
+            "uq_seasonalmeasurement_station_variable_season_year",
+            id="seasonal-by-season",
+        ),
+        pytest.param(
+            database.list_yearly_measurements,
+            {},
+            "yearlymeasurement",
+            "uq_yearlymeasurement_station_variable_year",
+            id="yearly",
+        ),
+    ],
+)
+def test_measurement_lookups_are_index_driven(
+    arpav_db_session, list_function, filter_kwargs, table_name, expected_index
+):
+    executed = []
+
+    def capture_query(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    engine = arpav_db_session.get_bind()
+    sqlalchemy.event.listen(engine, "before_cursor_execute", capture_query)
+    try:
+        list_function(
+            arpav_db_session,
+            limit=None,
+            station_id_filter=uuid.uuid4(),
+            variable_id_filter=uuid.uuid4(),
+            **filter_kwargs,
+        )
+    finally:
+        sqlalchemy.event.remove(engine, "before_cursor_execute", capture_query)
+    statement, parameters = executed[0]
+    # test tables are tiny, so sequential scans would otherwise always win
+    arpav_db_session.execute(sqlalchemy.text("SET LOCAL enable_seqscan = off"))
+    plan = "\n".join(
+        arpav_db_session.connection()
+        .exec_driver_sql(f"EXPLAIN {statement}", parameters)
+        .scalars()
+    )
+    assert expected_index in plan
+    assert f"Seq Scan on {table_name}" not in plan
+
+
 @pytest.mark.parametrize(
     "name, thredds_url_pattern, expected_raise",
     [
@@ -0,0 +1,142 @@
+import os
+import time
+
+import anyio
+import httpx
+import numpy as np
+import pytest
+import shapely
+
+from arpav_ppcv import datadownloads
+
+
+def test_evict_cached_coverage_data_by_size(tmp_path):
+    now = time.time()
+    paths = []
+    for index in range(4):
+        path = tmp_path / f"conf/cov{index}.nc"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"0" * 10)
+        os.utime(path, (now - 100 + index, now - 100 + index))
+        paths.append(path)
+    evicted = datadownloads.evict_cached_coverage_data(tmp_path, max_size_bytes=25)
+    assert sorted(evicted) == sorted(paths[:2])
+    assert all(p.exists() for p in paths[2:])
+
+
+def test_evict_cached_coverage_data_by_age(tmp_path):
+    now = time.time()
+    old_path = tmp_path / "old.nc"
+    old_path.write_bytes(b"0")
+    os.utime(old_path, (now - 3 * 24 * 60 * 60, now - 3 * 24 * 60 * 60))
+    recent_path = tmp_path / "recent.nc"
+    recent_path.write_bytes(b"0")
+    evicted = datadownloads.evict_cached_coverage_data(
+        tmp_path, max_size_bytes=1024, max_age_days=2
+    )
+    assert evicted == [old_path]
+    assert recent_path.exists()
+
+
+def test_evict_cached_coverage_data_excludes_path(tmp_path):
+    now = time.time()
+    just_written = tmp_path / "just-written.nc"
+    just_written.write_bytes(b"0" * 10)
+    os.utime(just_written, (now - 100, now - 100))
+    other = tmp_path / "other.nc"
+    other.write_bytes(b"0" * 10)
+    evicted = datadownloads.evict_cached_coverage_data(
+        tmp_path, max_size_bytes=15, exclude=just_written
+    )
+    assert evicted == [other]
+    assert just_written.exists()
+
+
+@pytest.mark.parametrize(
+    "status_code, expected_cached",
+    [
+        pytest.param(200, True),
+        pytest.param(500, False),
+    ],
+)
+def test_stream_and_cache_coverage_data(
+    settings, tmp_path, status_code, expected_cached
+):
+    settings.coverage_download_settings.cache_dir = tmp_path
+    cache_key = "conf/some-coverage___full_extent___open-open.nc"
+    content = b"fake netcdf contents"
+
+    async def consume():
+        response = httpx.Response(status_code, content=content)
+        return b"".join(
+            [
+                chunk
+                async for chunk in datadownloads.stream_and_cache_coverage_data(
+                    settings, response, cache_key
+                )
+            ]
+        )
+
+    streamed = anyio.run(consume)
+    assert streamed == content
+    cached = anyio.run(datadownloads.get_cached_coverage_data, settings, cache_key)
+    if expected_cached:
+        assert cached.read_bytes() == content
+    else:
+        assert cached is None
+    assert list(tmp_path.rglob("*.part")) == []
+
+
+def test_get_cached_coverage_data_waits_for_in_flight_download(settings, tmp_path):
+    settings.coverage_download_settings.cache_dir = tmp_path
+    cache_key = "conf/some-coverage___full_extent___open-open.nc"
+    content = b"fake netcdf contents"
+
+    async def download_and_wait():
+        in_flight = datadownloads.register_in_flight_download(cache_key)
+        assert datadownloads.register_in_flight_download(cache_key) is None
+        results = []
+
+        async def wait_for_cache():
+            results.append(
+                await datadownloads.get_cached_coverage_data(settings, cache_key)
+            )
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(wait_for_cache)
+            await anyio.sleep(0.1)
+            assert results == []
+            response = httpx.Response(200, content=content)
+            async for _ in datadownloads.stream_and_cache_coverage_data(
+                settings, response, cache_key, in_flight
+            ):
+                pass
+        # the download has been released, so it can be registered again
+        new_in_flight = datadownloads.register_in_flight_download(cache_key)
+        assert new_in_flight is not None
+        datadownloads.release_in_flight_download(cache_key, new_in_flight)
+        return results
+
+    results = anyio.run(download_and_wait)
+    assert results[0].read_bytes() == content
+
+
+@pytest.mark.parametrize(
+    "point, expected",
+    [
+        pytest.param(shapely.Point(0.5, 0.5), 0, id="first-cell"),
+        pytest.param(shapely.Point(2.5, 0.5), 2, id="last-column"),
+        pytest.param(shapely.Point(1.5, 1.5), 4, id="second-row"),
+        pytest.param(shapely.Point(3, 2), 5, id="upper-corner"),
+        pytest.param(shapely.Point(3.5, 0.5), None, id="outside"),
+    ],
+)
+def test_coverage_download_grid_get_cell_index(point, expected):
+    grid = datadownloads.CoverageDownloadGrid(
+        xx=np.array([0.0, 1.0, 2.0, 3.0]), yy=np.array([0.0, 1.0, 2.0])
+    )
+    assert grid.get_cell_index(point) == expected
+    if expected is not None:
+        min_x, min_y, max_x, max_y = grid.cell_bounds[expected]
+        assert min_x <= point.x <= max_x
+        assert min_y <= point.y <= max_y
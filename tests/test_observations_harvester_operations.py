@@ -1,49 +1,241 @@
 import datetime as dt
-import re
+import time
+from contextlib import nullcontext as does_not_raise
 
-import httpx
+import anyio
 import geojson_pydantic
-import pyproj
+import httpx
 import pytest
+import sqlalchemy
+import starlette.applications
+import starlette.responses
+import starlette.routing
 
+from arpav_ppcv import (
+    config,
+    database,
+)
 from arpav_ppcv.observations_harvester import operations
 from arpav_ppcv.schemas import observations
 
 
-def test_fetch_remote_stations(
-    httpx_mock,
-    arpav_db_session,
-    sample_real_variables,
-):
-    httpx_mock.add_response(
-        url=re.compile(r"https://api.arpa.veneto.it/REST/v1/.*"),
-        json={
-            "data": [
+class _FakeArpavApi:
+    """Local stand-in for the ARPA Veneto REST API.
+
+    It keeps track of the requests it receives and of how many of them were
+    being processed at once, and fails the first `num_failures` requests.
+    """
+
+    def __init__(self, num_failures: int = 0, failure_status_code: int = 503):
+        self.num_failures = num_failures
+        self.failure_status_code = failure_status_code
+        self.requests = []
+        self.max_concurrent_requests = 0
+        self.measurements = [
+            {"anno": year, "valore": year / 100} for year in range(1990, 2000)
+        ]
+        self._concurrent_requests = 0
+        self.app = starlette.applications.Starlette(
+            routes=[
+                starlette.routing.Route(
+                    "/clima_indicatori/staz_attive_lunghe", self.get_stations
+                ),
+                starlette.routing.Route("/clima_indicatori", self.get_measurements),
+            ]
+        )
+
+    async def get_stations(self, request):
+        return await self._respond(
+            request,
+            [
                 {
                     "EPSG4258_LAT": 46.59389393,
                     "EPSG4258_LON": 12.51561664,
                     "altitude": 1342.0,
-                    "gaussx": 1769316.0,
-                    "gaussy": 5166067.0,
                     "iniziovalidita": "1992-12-11",
                     "statcd": 247,
                     "statnm": "Casamazzagno",
                 }
             ],
-        },
-        status_code=200,
-    )
-    with httpx.Client() as client:
-        fetched = list(
-            operations.fetch_remote_stations(
-                client,
-                sample_real_variables[0:1],
-                fetch_stations_with_months=True,
-                fetch_stations_with_seasons=False,
-                fetch_stations_with_yearly_measurements=False,
+        )
+
+    async def get_measurements(self, request):
+        return await self._respond(request, self.measurements)
+
+    async def _respond(self, request, data: list[dict]):
+        self.requests.append(dict(request.query_params))
+        should_fail = len(self.requests) <= self.num_failures
+        self._concurrent_requests += 1
+        self.max_concurrent_requests = max(
+            self.max_concurrent_requests, self._concurrent_requests
+        )
+        try:
+            await anyio.sleep(0.01)
+        finally:
+            self._concurrent_requests -= 1
+        if should_fail:
+            return starlette.responses.JSONResponse(
+                {}, status_code=self.failure_status_code
             )
+        return starlette.responses.JSONResponse({"data": data})
+
+
+def _run_harvester(settings, db_engine, fake_api: _FakeArpavApi, harvest):
+    async def run():
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=fake_api.app)
+        ) as http_client:
+            return await harvest(
+                operations.ObservationsHarvester(settings, http_client, db_engine)
+            )
+
+    return anyio.run(run)
+
+
+@pytest.fixture()
+def harvester_settings(settings):
+    settings.observations_harvester = config.ObservationsHarvesterSettings(
+        base_url="http://fake-arpav-api/clima_indicatori",
+        max_concurrent_requests=3,
+        max_requests_per_second=1000,
+        max_burst_requests=1000,
+        num_request_retries=2,
+        retry_backoff_seconds=0,
+    )
+    return settings
+
+
+def test_harvest_stations(harvester_settings):
+    fake_api = _FakeArpavApi()
+    variables = [observations.Variable(name=name) for name in ("TDd", "PRCPTOT")]
+    harvested = _run_harvester(
+        harvester_settings,
+        None,
+        fake_api,
+        lambda harvester: harvester.harvest_stations(
+            variables,
+            fetch_stations_with_months=True,
+            fetch_stations_with_seasons=True,
+            fetch_stations_with_yearly_measurements=True,
+        ),
+    )
+    assert [s.code for s in harvested] == ["247"]
+    assert len(fake_api.requests) == len(variables) * (12 + 4 + 1)
+    assert {r["indicatore"] for r in fake_api.requests} == {"TDd", "PRCPTOT"}
+    assert 1 < fake_api.max_concurrent_requests <= 3
+
+
+@pytest.mark.parametrize(
+    "num_failures, failure_status_code, expectation",
+    [
+        pytest.param(2, 503, does_not_raise(), id="retried"),
+        pytest.param(2, 429, does_not_raise(), id="retried-rate-limited"),
+        pytest.param(3, 503, pytest.raises(httpx.HTTPStatusError), id="exhausted"),
+        pytest.param(1, 404, pytest.raises(httpx.HTTPStatusError), id="not-retried"),
+    ],
+)
+def test_fetch_retries_failed_requests(
+    harvester_settings, num_failures, failure_status_code, expectation
+):
+    fake_api = _FakeArpavApi(
+        num_failures=num_failures, failure_status_code=failure_status_code
+    )
+    with expectation:
+        data = _run_harvester(
+            harvester_settings,
+            None,
+            fake_api,
+            lambda harvester: harvester.fetch(
+                "staz_attive_lunghe", {"indicatore": "TDd"}
+            ),
         )
-        assert list(fetched)[0]["statcd"] == 247
+        assert data[0]["statcd"] == 247
+
+
+def test_token_bucket_limits_rate():
+    async def acquire_many(bucket: operations.TokenBucket, num_tokens: int):
+        for _ in range(num_tokens):
+            await bucket.acquire()
+
+    start = time.monotonic()
+    anyio.run(acquire_many, operations.TokenBucket(rate=50, capacity=5), 15)
+    # the first 5 tokens are available at once and the other 10 take 1/50 s each
+    assert time.monotonic() - start >= 0.19
+
+
+def test_harvest_monthly_measurements(
+    harvester_settings, arpav_db_session, sample_stations, sample_variables
+):
+    fake_api = _FakeArpavApi(num_failures=1)
+    db_engine = arpav_db_session.get_bind()
+    stations = sample_stations[:2]
+    variables = sample_variables[:2]
+
+    def harvest(harvester):
+        return harvester.harvest_monthly_measurements(stations, variables, [1, 7])
+
+    upserted = _run_harvester(harvester_settings, db_engine, fake_api, harvest)
+    assert len(upserted) == len(stations) * len(variables) * 2 * 10
+    assert {r["tabella"] for r in fake_api.requests} == {"M"}
+    _, total = database.list_monthly_measurements(
+        arpav_db_session, limit=1, include_total=True
+    )
+    assert total == len(upserted)
+    # harvesting again does not create duplicates nor report unchanged values
+    assert _run_harvester(harvester_settings, db_engine, fake_api, harvest) == []
+
+
+def test_harvest_monthly_measurements_incrementally(
+    harvester_settings, arpav_db_session, sample_stations, sample_variables
+):
+    fake_api = _FakeArpavApi()
+    db_engine = arpav_db_session.get_bind()
+    stations = sample_stations[:2]
+    variables = sample_variables[:1]
+    num_series = len(stations) * len(variables)
+    executed = []
+
+    def capture_query(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    def harvest(full_refresh: bool = False):
+        return _run_harvester(
+            harvester_settings,
+            db_engine,
+            fake_api,
+            lambda harvester: harvester.harvest_monthly_measurements(
+                stations, variables, [1], full_refresh=full_refresh
+            ),
+        )
+
+    assert len(harvest()) == num_series * 10
+    watermarks = database.collect_all_harvest_watermarks(arpav_db_session)
+    assert len(watermarks) == num_series
+    assert {w.last_year for w in watermarks} == {1999}
+
+    # unchanged series are skipped altogether
+    sqlalchemy.event.listen(db_engine, "before_cursor_execute", capture_query)
+    try:
+        assert harvest() == []
+    finally:
+        sqlalchemy.event.remove(db_engine, "before_cursor_execute", capture_query)
+    assert not any("INSERT INTO monthlymeasurement" in q for q in executed)
+
+    # only measurements that are at least as recent as the watermark are stored
+    fake_api.measurements = [
+        {"anno": 1990, "valore": 42.0},
+        *fake_api.measurements[1:],
+        {"anno": 2000, "valore": 20.0},
+    ]
+    upserted = harvest()
+    assert [m.date.year for m in upserted] == [2000] * num_series
+    assert {
+        w.last_year for w in database.collect_all_harvest_watermarks(arpav_db_session)
+    } == {2000}
+
+    # a full refresh also picks up revised older measurements
+    upserted = harvest(full_refresh=True)
+    assert [(m.date.year, m.value) for m in upserted] == [(1990, 42.0)] * num_series
 
 
 @pytest.mark.parametrize(
@@ -72,11 +264,6 @@ def test_fetch_remote_stations(
         )
     ],
 )
-def test_parse_station(raw_station, parsed):
-    result = operations.parse_station(
-        raw_station,
-        coord_converter=pyproj.Transformer.from_crs(
-            pyproj.CRS("epsg:4258"), pyproj.CRS("epsg:4326"), always_xy=True
-        ).transform,
-    )
-    assert result == parsed
+def test_parse_stations(raw_station, parsed):
+    result = operations.parse_stations([raw_station])
+    assert result == [parsed]
@@ -0,0 +1,197 @@
+import datetime as dt
+import uuid
+
+import numpy as np
+import shapely
+from geoalchemy2.shape import from_shape
+
+from arpav_ppcv import (
+    database,
+    observationstore,
+)
+from arpav_ppcv.schemas import (
+    base,
+    observations,
+)
+
+
+def _fake_watermark(station_id, variable_id, aggregation_type, period, payload_hash):
+    return observations.HarvestWatermark(
+        station_id=station_id,
+        variable_id=variable_id,
+        aggregation_type=aggregation_type,
+        period=period,
+        payload_hash=payload_hash,
+        fetched_at=dt.datetime.now(dt.timezone.utc),
+    )
+
+
+def test_observation_store_refreshes_changed_series(monkeypatch):
+    station = observations.Station(
+        id=uuid.uuid4(),
+        code="station0",
+        name="Station 0",
+        geom=from_shape(shapely.Point(11.5, 45.5)),
+    )
+    variable = observations.Variable(id=uuid.uuid4(), name="tas")
+    monthly = base.ObservationAggregationType.MONTHLY
+    watermarks = [_fake_watermark(station.id, variable.id, monthly, "1", "hash1")]
+    stored_columns = {
+        "station_id": [station.id] * 3,
+        "variable_id": [variable.id] * 3,
+        "date": [dt.date(2000, 1, 1), dt.date(2000, 2, 1), dt.date(2001, 1, 1)],
+        "value": [1.0, 2.0, 3.0],
+    }
+    series_filters = []
+
+    def collect_measurement_columns(session, aggregation_type, *, series_filter):
+        series_filters.append((aggregation_type, series_filter))
+        if aggregation_type == monthly:
+            result = stored_columns
+        else:
+            result = {"station_id": [], "variable_id": [], "year": [], "value": []}
+            if aggregation_type == base.ObservationAggregationType.SEASONAL:
+                result["season"] = []
+        return result
+
+    monkeypatch.setattr(
+        database, "collect_all_harvest_watermarks", lambda session: watermarks
+    )
+    monkeypatch.setattr(database, "collect_all_stations", lambda session: [station])
+    monkeypatch.setattr(database, "collect_all_variables", lambda session: [variable])
+    monkeypatch.setattr(
+        database, "collect_measurement_columns", collect_measurement_columns
+    )
+
+    store = observationstore.ObservationStore(engine=None)
+    store.load()
+    assert [f for _, f in series_filters] == [None, None, None]
+    assert store.get_station_by_code("station0") is station
+    assert store.get_variable_by_name("tas") is variable
+    nearest_station, nearest_series = store.get_nearest_station_measurement_columns(
+        shapely.Point(11.501, 45.5), 1000, monthly, variable_id=variable.id
+    )
+    assert nearest_station is station
+    assert nearest_series["value"].tolist() == [1.0, 2.0, 3.0]
+    assert (
+        store.get_nearest_station_measurement_columns(
+            shapely.Point(11.52, 45.5), 1000, monthly, variable_id=variable.id
+        )
+        is None
+    )
+    whole_series = store.get_measurement_series_columns(
+        monthly, station_id=station.id, variable_id=variable.id
+    )
+    assert whole_series["date"].tolist() == stored_columns["date"]
+    assert whole_series["value"].tolist() == [1.0, 2.0, 3.0]
+    january = store.get_measurement_series_columns(
+        monthly, station_id=station.id, variable_id=variable.id, month_filter=1
+    )
+    assert january["value"].tolist() == [1.0, 3.0]
+    assert (
+        store.get_measurement_series_columns(
+            monthly, station_id=station.id, variable_id=variable.id, month_filter=3
+        )["value"].size
+        == 0
+    )
+
+    # nothing changed, so nothing is loaded
+    series_filters.clear()
+    assert store.refresh() == 0
+    assert series_filters == []
+
+    # only the series whose watermark changed is loaded again
+    watermarks[0] = _fake_watermark(station.id, variable.id, monthly, "1", "hash2")
+    stored_columns = {
+        **stored_columns,
+        "value": [10.0, 2.0, 30.0],
+    }
+    assert store.refresh() == 1
+    assert series_filters == [(monthly, [(station.id, variable.id)])]
+    january = store.get_measurement_series_columns(
+        monthly, station_id=station.id, variable_id=variable.id, month_filter=1
+    )
+    assert january["value"].tolist() == [10.0, 30.0]
+
+
+def test_observation_store_sorts_seasonal_series():
+    station_id = uuid.uuid4()
+    variable_id = uuid.uuid4()
+    seasonal = base.ObservationAggregationType.SEASONAL
+    series = observationstore._build_series(
+        {
+            "station_id": [station_id] * 4,
+            "variable_id": [variable_id] * 4,
+            "year": [1999, 1999, 2000, 2000],
+            "season": ["WINTER", "AUTUMN", "WINTER", "SUMMER"],
+            "value": [1.0, 2.0, 3.0, 4.0],
+        },
+        seasonal,
+    )
+    assert sorted(series[(station_id, variable_id, seasonal)]) == [1, 3, 4]
+    store = observationstore.ObservationStore(engine=None)
+    store._contents = observationstore._StoreContents(
+        stations={},
+        stations_by_code={},
+        station_ids=np.array([], dtype=object),
+        station_coords=np.empty((0, 2)),
+        variables_by_name={},
+        series=series,
+        watermark_hashes={},
+    )
+    result = store.get_measurement_series_columns(
+        seasonal, station_id=station_id, variable_id=variable_id
+    )
+    assert result["year"].tolist() == [1999, 1999, 2000, 2000]
+    assert result["season"].tolist() == ["WINTER", "AUTUMN", "WINTER", "SUMMER"]
+    assert result["value"].tolist() == [1.0, 2.0, 3.0, 4.0]
+    winter = store.get_measurement_series_columns(
+        seasonal,
+        station_id=station_id,
+        variable_id=variable_id,
+        season_filter=base.Season.WINTER,
+    )
+    assert winter["value"].tolist() == [1.0, 3.0]
+
+
+def test_observation_store_matches_database(
+    arpav_db_session, sample_stations, sample_variables
+):
+    station = sample_stations[0]
+    variable = sample_variables[0]
+    monthly = base.ObservationAggregationType.MONTHLY
+    database.create_many_monthly_measurements(
+        arpav_db_session,
+        [
+            observations.MonthlyMeasurementCreate(
+                station_id=station.id,
+                variable_id=variable.id,
+                value=year + month / 100,
+                date=dt.date(2000 + year, month, 1),
+            )
+            for year in range(3)
+            for month in (1, 2)
+        ],
+    )
+    store = observationstore.ObservationStore(arpav_db_session.get_bind())
+    store.load()
+    for month_filter in (None, 1, 2):
+        expected = database.get_measurement_series_columns(
+            arpav_db_session,
+            monthly,
+            station_id=station.id,
+            variable_id=variable.id,
+            month_filter=month_filter,
+        )
+        result = store.get_measurement_series_columns(
+            monthly,
+            station_id=station.id,
+            variable_id=variable.id,
+            month_filter=month_filter,
+        )
+        assert result["date"].tolist() == expected["date"]
+        assert result["value"].tolist() == expected["value"]
+    nearest_station, _ = store.get_nearest_station_measurement_columns(
+        shapely.Point(0, 0), 1000, monthly, variable_id=variable.id
+    )
+    assert nearest_station.id == station.id
@@ -1,6 +1,15 @@
 import datetime as dt
+import re
+import uuid
 
+import anyio
+import httpx
+import netCDF4
+import numpy as np
+import pandas as pd
 import pytest
+import shapely
+from geoalchemy2.shape import from_shape
 from pandas.core.dtypes.common import (
     is_datetime64_ns_dtype,
     is_float_dtype,
@@ -8,9 +17,42 @@ from pandas.core.dtypes.common import (
 
 from arpav_ppcv import (
     database,
+    datadownloads,
+    exceptions,
     operations,
+    timeseriescache,
 )
-from arpav_ppcv.schemas import coverages
+from arpav_ppcv.schemas import (
+    base,
+    coverages,
+    observations,
+)
+
+_FAKE_DATASET_DESCRIPTION = """<?xml version="1.0" encoding="UTF-8"?>
+<gridDataset location="fake" path="fake">
+  <axis name="lat" shape="10" type="double" axisType="Lat">
+    <values spacing="regularInterval" start="44.5" increment="0.1" npts="10" />
+  </axis>
+  <axis name="lon" shape="10" type="double" axisType="Lon">
+    <values spacing="regularInterval" start="11.1" increment="0.1" npts="10" />
+  </axis>
+  <gridSet name="time lat lon">
+    <grid name="tas" desc="temperature" shape="time lat lon" type="float">
+      <attribute name="units" value="degC" />
+    </grid>
+  </gridSet>
+  <LatLonBox>
+    <west>11.1</west>
+    <east>12.0</east>
+    <south>44.5</south>
+    <north>45.4</north>
+  </LatLonBox>
+  <TimeSpan>
+    <begin>1976-02-15T12:00:00Z</begin>
+    <end>2017-02-14T16:00:00Z</end>
+  </TimeSpan>
+</gridDataset>
+"""
 
 
 @pytest.mark.parametrize(
@@ -366,7 +408,7 @@ def test_list_coverage_identifiers_by_param_values(
     time_window_filter,
     expected,
 ):
-    result = operations.list_coverage_identifiers_by_param_values(
+    result, total = operations.list_coverage_identifiers_by_param_values(
         arpav_db_session,
         variable_filter,
         aggregation_period_filter,
@@ -378,7 +420,340 @@ def test_list_coverage_identifiers_by_param_values(
         limit=20,
         offset=0,
     )
+    assert result == sorted(result)
+    assert total == len(expected)
     for result_item in result:
         assert result_item in expected
     for expected_item in expected:
         assert expected_item in result
+
+
+def test_list_coverage_identifiers_by_param_values_paginates(
+    arpav_db_session,
+    sample_real_configuration_parameters,
+    sample_real_coverage_configurations,
+):
+    all_identifiers, total = operations.list_coverage_identifiers_by_param_values(
+        arpav_db_session, ["tas"], limit=10_000, offset=0
+    )
+    assert total == len(all_identifiers)
+    assert all_identifiers == sorted(all_identifiers)
+    paginated = []
+    for offset in range(0, total, 7):
+        page, page_total = operations.list_coverage_identifiers_by_param_values(
+            arpav_db_session, ["tas"], limit=7, offset=offset
+        )
+        assert page_total == total
+        paginated.extend(page)
+    assert paginated == all_identifiers
+
+
+def test_async_get_coverage_time_series_caches_grid_cell_series(
+    httpx_mock,
+    settings,
+    sample_tas_csv_data,
+):
+    httpx_mock.add_response(
+        url=re.compile(r".*ncss/grid/fake/dataset\.xml"),
+        text=_FAKE_DATASET_DESCRIPTION,
+    )
+    httpx_mock.add_response(
+        url=re.compile(r".*ncss/grid/fake\?.*"),
+        text=sample_tas_csv_data["tas"],
+    )
+    coverage = coverages.CoverageInternal(
+        configuration=coverages.CoverageConfiguration(
+            name="fake_tas",
+            netcdf_main_dataset_name="tas",
+            thredds_url_pattern="fake",
+            palette="fake",
+        ),
+        identifier="fake_tas",
+    )
+    smoothing_strategies = [
+        base.CoverageDataSmoothingStrategy.NO_SMOOTHING,
+        base.CoverageDataSmoothingStrategy.MOVING_AVERAGE_11_YEARS,
+    ]
+
+    async def _get_time_series(point_geom):
+        async with httpx.AsyncClient() as client:
+            return await operations.async_get_coverage_time_series(
+                settings,
+                None,
+                client,
+                coverage,
+                point_geom,
+                "../..",
+                smoothing_strategies,
+                [],
+            )
+
+    timeseriescache.invalidate_time_series_cache()
+    first, _ = anyio.run(_get_time_series, shapely.Point(11.5469, 44.9524))
+    # a different point, which falls into the same grid cell
+    second, _ = anyio.run(_get_time_series, shapely.Point(11.52, 44.98))
+    timeseriescache.invalidate_time_series_cache()
+    assert len(httpx_mock.get_requests()) == 2
+    for strategy in smoothing_strategies:
+        pd.testing.assert_series_equal(
+            first[(coverage, strategy)],
+            second[(coverage, strategy)],
+            check_freq=False,
+        )
+
+
+def test_async_get_coverage_multi_point_time_series(httpx_mock, settings, tmp_path):
+    subset_path = tmp_path / "subset.nc"
+    with netCDF4.Dataset(subset_path, mode="w") as ds:
+        ds.createDimension("time", None)
+        ds.createDimension("lat", 10)
+        ds.createDimension("lon", 10)
+        time_var = ds.createVariable("time", "f8", ("time",))
+        time_var.units = "days since 2000-01-01 00:00:00"
+        time_var[:] = [0, 366, 731]
+        ds.createVariable("lat", "f8", ("lat",))[:] = 44.5 + 0.1 * np.arange(10)
+        ds.createVariable("lon", "f8", ("lon",))[:] = 11.1 + 0.1 * np.arange(10)
+        tas = ds.createVariable("tas", "f4", ("time", "lat", "lon"))
+        tas[:] = np.arange(3 * 10 * 10, dtype=np.float32).reshape((3, 10, 10))
+    httpx_mock.add_response(
+        url=re.compile(r".*ncss/grid/fake\?.*"),
+        content=subset_path.read_bytes(),
+    )
+    coverage = coverages.CoverageInternal(
+        configuration=coverages.CoverageConfiguration(
+            name="fake_tas",
+            netcdf_main_dataset_name="tas",
+            thredds_url_pattern="fake",
+            palette="fake",
+        ),
+        identifier="fake_tas",
+    )
+
+    async def _get_time_series():
+        async with httpx.AsyncClient() as client:
+            return await operations.async_get_coverage_multi_point_time_series(
+                settings,
+                None,
+                client,
+                coverage,
+                [shapely.Point(11.5469, 44.9524), shapely.Point(11.12, 44.51)],
+                "../..",
+                [base.CoverageDataSmoothingStrategy.NO_SMOOTHING],
+            )
+
+    result = anyio.run(_get_time_series)
+    assert len(httpx_mock.get_requests()) == 1
+    assert len(result) == 2
+    no_smoothing_key = (coverage, base.CoverageDataSmoothingStrategy.NO_SMOOTHING)
+    assert result[0][no_smoothing_key].tolist() == [54.0, 154.0, 254.0]
+    assert result[1][no_smoothing_key].tolist() == [0.0, 100.0, 200.0]
+
+
+def test_build_climate_barometer_series_to_store(tmp_path):
+    dataset_path = tmp_path / "barometer.nc"
+    with netCDF4.Dataset(dataset_path, mode="w") as ds:
+        ds.createDimension("time", None)
+        time_var = ds.createVariable("time", "f8", ("time",))
+        time_var.units = "days since 2000-01-01 00:00:00"
+        time_var.calendar = "standard"
+        time_var[:] = 365.25 * np.arange(15)
+        ds.createVariable("tas", "f4", ("time",))[:] = np.arange(15, dtype=np.float32)
+    coverage = coverages.CoverageInternal(
+        configuration=coverages.CoverageConfiguration(
+            name="fake_tas", thredds_url_pattern="fake", palette="fake"
+        ),
+        identifier="fake_tas",
+    )
+    df = operations.read_climate_barometer_dataset(
+        str(dataset_path), "tas", coverage.identifier
+    )
+    result = operations.build_climate_barometer_series_to_store(
+        coverage, df, is_uncertainty=False, sort_order=3
+    )
+    assert [s.smoothing_strategy for s in result] == list(
+        base.CoverageDataSmoothingStrategy
+    )
+    no_smoothing, _, moving_average = result
+    assert no_smoothing.sort_order == 3
+    assert no_smoothing.times[0] == dt.datetime(2000, 1, 1)
+    assert no_smoothing.values == list(range(15))
+    assert np.isnan(moving_average.values[0])
+    assert moving_average.values[7] == 7.0
+
+
+def test_async_get_climate_barometer_time_series_serves_stored_series(
+    settings,
+    arpav_db_session,
+    sample_real_coverage_configurations,
+):
+    barometer_covs = operations.get_climate_barometer_coverages(
+        arpav_db_session, include_uncertainty=True
+    )
+    to_store = []
+    for sort_order, (cov, is_uncertainty) in enumerate(barometer_covs):
+        df = pd.DataFrame(
+            {cov.identifier: np.arange(15, dtype=np.float64)},
+            index=pd.DatetimeIndex(
+                [dt.datetime(2000 + i, 1, 1) for i in range(15)], name="time"
+            ),
+        )
+        to_store.extend(
+            operations.build_climate_barometer_series_to_store(
+                cov, df, is_uncertainty, sort_order
+            )
+        )
+    database.replace_climate_barometer_series(arpav_db_session, to_store)
+    # the THREDDS server is not reachable, so results must come from the store
+    settings.thredds_server.base_url = "http://fake-thredds"
+
+    async def _get_time_series(include_uncertainty: bool):
+        async with httpx.AsyncClient() as client:
+            return await operations.async_get_climate_barometer_time_series(
+                settings,
+                arpav_db_session,
+                client,
+                [base.CoverageDataSmoothingStrategy.LOESS_SMOOTHING],
+                include_uncertainty=include_uncertainty,
+            )
+
+    with_uncertainty = anyio.run(_get_time_series, True)
+    without_uncertainty = anyio.run(_get_time_series, False)
+    main_covs = [cov for cov, is_uncertainty in barometer_covs if not is_uncertainty]
+    assert list(without_uncertainty.keys()) == [
+        (cov, strategy)
+        for cov in main_covs
+        for strategy in (
+            base.CoverageDataSmoothingStrategy.NO_SMOOTHING,
+            base.CoverageDataSmoothingStrategy.LOESS_SMOOTHING,
+        )
+    ]
+    assert len(with_uncertainty) == 2 * len(barometer_covs)
+    first_series = next(iter(without_uncertainty.values()))
+    assert first_series.name == main_covs[0].identifier
+    assert first_series.tolist() == list(range(15))
+
+
+def test_async_retrieve_climate_barometer_data(settings, tmp_path):
+    settings.thredds_server.base_url = "http://fake-thredds"
+    covs = []
+    for index, name in enumerate(("fake_tas", "fake_pr")):
+        with netCDF4.Dataset(tmp_path / name, mode="w", format="NETCDF4") as ds:
+            ds.createDimension("time", None)
+            time_var = ds.createVariable("time", "f8", ("time",))
+            time_var.units = "days since 2000-01-01 00:00:00"
+            time_var.calendar = "standard"
+            time_var[:] = [0, 366]
+            ds.createVariable("var", "f4", ("time",))[:] = [index, index + 1]
+        covs.append(
+            coverages.CoverageInternal(
+                configuration=coverages.CoverageConfiguration(
+                    name=name,
+                    netcdf_main_dataset_name="var",
+                    thredds_url_pattern=name,
+                    palette="fake",
+                ),
+                identifier=name,
+            )
+        )
+    requested_paths = []
+
+    def serve_file(request: httpx.Request) -> httpx.Response:
+        requested_paths.append(request.url.path)
+        path = tmp_path / request.url.path.rpartition("/")[-1]
+        if path.is_file():
+            response = httpx.Response(200, content=path.read_bytes())
+        else:
+            response = httpx.Response(404)
+        return response
+
+    async def retrieve():
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(serve_file)
+        ) as client:
+            return await operations._async_retrieve_climate_barometer_data(
+                settings, client, covs
+            )
+
+    result = anyio.run(retrieve)
+    assert sorted(requested_paths) == ["/fileServer/fake_pr", "/fileServer/fake_tas"]
+    assert result[covs[0]]["fake_tas"].tolist() == [0.0, 1.0]
+    assert result[covs[1]]["fake_pr"].tolist() == [1.0, 2.0]
+    covs[1].configuration.thredds_url_pattern = "missing"
+    with pytest.raises(exceptions.CoverageDataRetrievalError):
+        anyio.run(retrieve)
+
+
+@pytest.mark.parametrize(
+    "aggregation_type, columns, expected_times",
+    [
+        pytest.param(
+            base.ObservationAggregationType.MONTHLY,
+            {"date": [dt.date(1950, 1, 1), dt.date(2020, 12, 1)], "value": [1, 2.5]},
+            ["1950-01-01", "2020-12-01"],
+        ),
+        pytest.param(
+            base.ObservationAggregationType.SEASONAL,
+            {
+                "year": [1999, 1999, 1999, 2000],
+                "season": ["WINTER", "SPRING", "SUMMER", "AUTUMN"],
+                "value": [1, 2.5, 3, 4],
+            },
+            ["1999-01-01", "1999-04-01", "1999-07-01", "2000-10-01"],
+        ),
+        pytest.param(
+            base.ObservationAggregationType.YEARLY,
+            {"year": [1960, 2024], "value": [1, 2.5]},
+            ["1960-01-01", "2024-01-01"],
+        ),
+    ],
+)
+def test_build_observation_series_frame(aggregation_type, columns, expected_times):
+    result = operations._build_observation_series_frame(
+        columns, aggregation_type, "tas"
+    )
+    assert list(result.columns) == ["tas"]
+    assert is_float_dtype(result["tas"])
+    assert result["tas"].tolist() == [float(v) for v in columns["value"]]
+    assert result.index.name == "time"
+    assert result.index.equals(pd.DatetimeIndex(expected_times, tz="UTC"))
+
+
+def test_build_observation_series_frame_handles_empty_series():
+    result = operations._build_observation_series_frame(
+        {"year": [], "season": [], "value": []},
+        base.ObservationAggregationType.SEASONAL,
+        "tas",
+    )
+    assert result.empty
+    assert str(result.index.tz) == "UTC"
+
+
+def test_build_station_grid_cells():
+    grid = datadownloads.CoverageDownloadGrid(
+        xx=np.array([11.0, 11.1, 11.2]), yy=np.array([45.0, 45.1])
+    )
+    stations = [
+        observations.Station(
+            id=uuid.uuid4(),
+            code=code,
+            name=code,
+            geom=from_shape(shapely.Point(lon, lat)),
+        )
+        for code, lon, lat in (
+            # near the centre of the first cell
+            ("first", 11.02, 45.05),
+            # outside of the grid, but near the second cell
+            ("outside", 11.205, 45.05),
+            # at the centre of the second cell
+            ("second", 11.15, 45.05),
+            ("far", 12.0, 46.0),
+        )
+    ]
+    variable_id = uuid.uuid4()
+    result = operations.build_station_grid_cells(
+        grid, stations, 1000, base.ObservationAggregationType.YEARLY, variable_id
+    )
+    assert [c.cell_index for c in result] == [0, 1]
+    assert all(c.variable_id == variable_id for c in result)
+    assert result[0].station_ids == [stations[0].id]
+    assert result[1].station_ids == [stations[2].id, stations[1].id]
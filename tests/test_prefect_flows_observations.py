@@ -1,81 +1,52 @@
 import datetime as dt
 import uuid
 
-import pytest
-
 from arpav_ppcv.prefect.flows import observations
 from arpav_ppcv.schemas import observations as observation_schemas
-from arpav_ppcv.schemas.base import Season
 
 
-@pytest.mark.parametrize(
-    "station_id, variable_id, value, date, expected",
-    [
-        pytest.param(
-            uuid.UUID("65af54f0-1df2-423b-994f-03fa1195dd7b"),
-            uuid.UUID("2a20f72f-2e0f-4a0c-9cd4-d3215aa9b8fc"),
-            10.23,
-            dt.date(2020, 1, 1),
-            "65af54f0-1df2-423b-994f-03fa1195dd7b-2a20f72f-2e0f-4a0c-9cd4-d3215aa9b8fc-202001",
-        ),
-    ],
-)
-def test_build_monthly_measurement_id(station_id, variable_id, value, date, expected):
-    result = observations.build_monthly_measurement_id(
-        observation_schemas.MonthlyMeasurementCreate(
-            station_id=station_id, variable_id=variable_id, value=value, date=date
+def test_build_upserted_measurements_table():
+    stations = [
+        observation_schemas.Station(
+            id=uuid.uuid4(), code=f"station{i}", name=f"Station {i}"
         )
-    )
-    assert result == expected
-
-
-@pytest.mark.parametrize(
-    "station_id, variable_id, value, year, season, expected",
-    [
-        pytest.param(
-            uuid.UUID("65af54f0-1df2-423b-994f-03fa1195dd7b"),
-            uuid.UUID("2a20f72f-2e0f-4a0c-9cd4-d3215aa9b8fc"),
-            10.23,
-            2020,
-            Season.SUMMER,
-            "65af54f0-1df2-423b-994f-03fa1195dd7b-2a20f72f-2e0f-4a0c-9cd4-d3215aa9b8fc-2020-SUMMER",
-        ),
-    ],
-)
-def test_build_seasonal_measurement_id(
-    station_id, variable_id, value, year, season, expected
-):
-    result = observations.build_seasonal_measurement_id(
-        observation_schemas.SeasonalMeasurementCreate(
-            station_id=station_id,
-            variable_id=variable_id,
-            value=value,
-            year=year,
-            season=season,
+        for i in range(2)
+    ]
+    variables = [
+        observation_schemas.Variable(id=uuid.uuid4(), name=f"variable{i}")
+        for i in range(2)
+    ]
+    measurements = [
+        observation_schemas.MonthlyMeasurementCreate(
+            station_id=station.id,
+            variable_id=variable.id,
+            value=1.0,
+            date=dt.date(2000 + index, 1, 1),
         )
-    )
-    assert result == expected
-
-
-@pytest.mark.parametrize(
-    "station_id, variable_id, value, year, expected",
-    [
-        pytest.param(
-            uuid.UUID("65af54f0-1df2-423b-994f-03fa1195dd7b"),
-            uuid.UUID("2a20f72f-2e0f-4a0c-9cd4-d3215aa9b8fc"),
-            10.23,
-            2020,
-            "65af54f0-1df2-423b-994f-03fa1195dd7b-2a20f72f-2e0f-4a0c-9cd4-d3215aa9b8fc-2020",
-        ),
-    ],
-)
-def test_build_yearly_measurement_id(station_id, variable_id, value, year, expected):
-    result = observations.build_yearly_measurement_id(
-        observation_schemas.YearlyMeasurementCreate(
-            station_id=station_id,
-            variable_id=variable_id,
-            value=value,
-            year=year,
+        for station, variable, count in (
+            (stations[0], variables[0], 3),
+            (stations[0], variables[1], 1),
+            (stations[1], variables[1], 2),
         )
+        for index in range(count)
+    ]
+    result = observations._build_upserted_measurements_table(
+        measurements, stations, variables
     )
-    assert result == expected
+    assert result == [
+        {
+            "station": "Station 0 (station0)",
+            "variable": "variable0",
+            "number of new or updated measurements": 3,
+        },
+        {
+            "station": "Station 0 (station0)",
+            "variable": "variable1",
+            "number of new or updated measurements": 1,
+        },
+        {
+            "station": "Station 1 (station1)",
+            "variable": "variable1",
+            "number of new or updated measurements": 2,
+        },
+    ]
@@ -0,0 +1,41 @@
+import anyio
+
+from arpav_ppcv.thredds import client
+
+
+def test_get_http_client_is_shared(settings):
+    first = client.get_http_client(settings)
+    second = client.get_http_client(settings)
+    assert first is second
+    anyio.run(client.close_http_client)
+    third = client.get_http_client(settings)
+    assert third is not first
+    assert first.is_closed
+    anyio.run(client.close_http_client)
+
+
+def test_get_pool_stats(settings):
+    assert client.get_pool_stats(settings) is None
+    client.get_http_client(settings)
+    stats = client.get_pool_stats(settings)
+    assert stats.num_connections == 0
+    assert stats.max_connections == settings.thredds_server.http_client_max_connections
+    anyio.run(client.close_http_client)
+
+
+def test_get_pool_stats_counts_requests_sent(settings, httpx_mock):
+    httpx_mock.add_response(url="http://fake-thredds/ncss", text="hi")
+    http_client = client.get_http_client(settings)
+    before = client.get_pool_stats(settings).num_requests_sent
+
+    async def _make_requests():
+        for _ in range(3):
+            response = await http_client.get("http://fake-thredds/ncss")
+            assert response.text == "hi"
+
+    anyio.run(_make_requests)
+    stats = client.get_pool_stats(settings)
+    assert stats.num_requests_sent == before + 3
+    assert stats.num_queued_requests == 0
+    assert stats.num_active_requests == 0
+    anyio.run(client.close_http_client)
@@ -0,0 +1,112 @@
+import datetime as dt
+
+import netCDF4
+import numpy as np
+import pytest
+
+from arpav_ppcv.thredds import localmirror
+
+
+@pytest.fixture()
+def local_dataset_path(tmp_path):
+    path = tmp_path / "tas" / "tas_avg.nc"
+    path.parent.mkdir()
+    with netCDF4.Dataset(path, mode="w") as ds:
+        ds.createDimension("time", None)
+        ds.createDimension("lat", 3)
+        ds.createDimension("lon", 4)
+        time_var = ds.createVariable("time", "f8", ("time",))
+        time_var.units = "days since 2000-01-01 00:00:00"
+        time_var.calendar = "standard"
+        time_var[:] = [0, 366, 731]
+        ds.createVariable("lat", "f8", ("lat",))[:] = [45.0, 45.5, 46.0]
+        ds.createVariable("lon", "f8", ("lon",))[:] = [11.0, 11.5, 12.0, 12.5]
+        tas = ds.createVariable("tas", "f4", ("time", "lat", "lon"), fill_value=-999)
+        tas[:] = np.arange(3 * 3 * 4, dtype=np.float32).reshape((3, 3, 4))
+        tas[1, 1, 2] = np.ma.masked
+    yield path
+    localmirror.close_local_datasets()
+
+
+def test_extract_point_time_series(local_dataset_path):
+    result = localmirror.extract_point_time_series(
+        local_dataset_path,
+        "tas",
+        longitude=11.9,
+        latitude=45.6,
+        time_start=None,
+        time_end=None,
+        target_name="my-coverage",
+    )
+    assert list(result.columns) == ["my-coverage"]
+    assert result.index.name == "time"
+    assert str(result.index.tz) == "UTC"
+    assert result.index[0] == dt.datetime(2000, 1, 1, tzinfo=dt.timezone.utc)
+    values = result["my-coverage"].tolist()
+    assert values[0] == 6.0
+    assert np.isnan(values[1])
+    assert values[2] == 30.0
+
+
+def test_extract_point_time_series_filters_temporal_range(local_dataset_path):
+    result = localmirror.extract_point_time_series(
+        local_dataset_path,
+        "tas",
+        longitude=11.0,
+        latitude=45.0,
+        time_start=dt.datetime(2000, 6, 1, tzinfo=dt.timezone.utc),
+        time_end=dt.datetime(2001, 6, 1, tzinfo=dt.timezone.utc),
+        target_name="my-coverage",
+    )
+    assert result["my-coverage"].tolist() == [12.0]
+
+
+def test_extract_point_time_series_unknown_variable(local_dataset_path):
+    with pytest.raises(localmirror.LocalDatasetError):
+        localmirror.extract_point_time_series(
+            local_dataset_path,
+            "pr",
+            longitude=11.0,
+            latitude=45.0,
+            time_start=None,
+            time_end=None,
+            target_name="my-coverage",
+        )
+
+
+def test_get_local_dataset_evicts_least_recently_used(tmp_path, local_dataset_path):
+    other_path = tmp_path / "other.nc"
+    other_path.write_bytes(local_dataset_path.read_bytes())
+    first = localmirror.get_local_dataset(local_dataset_path, max_open_datasets=1)
+    assert localmirror.get_local_dataset(local_dataset_path, 1) is first
+    localmirror.get_local_dataset(other_path, max_open_datasets=1)
+    assert not first.dataset.isopen()
+
+
+@pytest.mark.parametrize(
+    "url_fragment, expected",
+    [
+        pytest.param("tas/tas_avg.nc", "tas/tas_avg.nc"),
+        pytest.param("tas/tas_*.nc", "tas/tas_avg.nc"),
+        pytest.param("tas/missing.nc", None),
+    ],
+)
+def test_find_local_dataset_path(local_dataset_path, url_fragment, expected):
+    base_dir = local_dataset_path.parents[1]
+    result = localmirror.find_local_dataset_path(base_dir, url_fragment)
+    assert result == (base_dir / expected if expected is not None else None)
+
+
+def test_extract_points_time_series_from_memory(local_dataset_path):
+    result, time_index = localmirror.extract_points_time_series_from_memory(
+        "subset.nc",
+        local_dataset_path.read_bytes(),
+        "tas",
+        longitudes=np.array([11.9, 11.0, 12.4]),
+        latitudes=np.array([45.6, 45.0, 46.0]),
+    )
+    assert len(time_index) == 3
+    assert result.shape == (3, 3)
+    np.testing.assert_array_equal(result[0], [6.0, np.nan, 30.0])
+    np.testing.assert_array_equal(result[1], [0.0, 12.0, 24.0])
+    np.testing.assert_array_equal(result[2], [11.0, 23.0, 35.0])
@@ -0,0 +1,159 @@
+import datetime as dt
+
+import anyio
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+
+from arpav_ppcv import timeseriescache
+
+_DATASET_DESCRIPTION = """<?xml version="1.0" encoding="UTF-8"?>
+<gridDataset location="fake" path="fake">
+  <axis name="lat" shape="3" type="double" axisType="Lat">
+    <values spacing="regularInterval" start="45.0" increment="0.5" npts="3" />
+  </axis>
+  <axis name="lon" shape="4" type="double" axisType="Lon">
+    <values spacing="irregularPoint" npts="4">11.0 11.5 12.0 12.5</values>
+  </axis>
+  <gridSet name="time lat lon">
+    <grid name="tas" desc="temperature" shape="time lat lon" type="float">
+      <attribute name="units" value="degC" />
+    </grid>
+  </gridSet>
+  <LatLonBox>
+    <west>11.0</west>
+    <east>12.5</east>
+    <south>45.0</south>
+    <north>46.0</north>
+  </LatLonBox>
+  <TimeSpan>
+    <begin>2000-01-01T00:00:00Z</begin>
+    <end>2002-01-01T00:00:00Z</end>
+  </TimeSpan>
+</gridDataset>
+"""
+
+
+@pytest.fixture()
+def series():
+    index = pd.DatetimeIndex(
+        [
+            dt.datetime(2000, 1, 1, tzinfo=dt.timezone.utc),
+            dt.datetime(2001, 1, 1, tzinfo=dt.timezone.utc),
+            dt.datetime(2002, 1, 1, tzinfo=dt.timezone.utc),
+        ],
+        name="time",
+    )
+    return pd.Series([12.3, np.nan, -1.25], index=index, name="my-coverage")
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    timeseriescache.invalidate_time_series_cache()
+    yield
+    timeseriescache.invalidate_time_series_cache()
+
+
+def test_compact_series_roundtrip(series):
+    compact = timeseriescache.CompactSeries.from_series(series)
+    assert compact.values.dtype == np.float64
+    assert compact.times.dtype == np.int64
+    result = compact.to_series()
+    assert result.name == "my-coverage"
+    assert result.index.name == "time"
+    pd.testing.assert_series_equal(result, series, check_freq=False, check_exact=True)
+
+
+def test_time_series_cache_stores_variants(series):
+    cache = timeseriescache.TimeSeriesCache(max_size_bytes=1024, ttl_seconds=60)
+    key = timeseriescache.build_cache_key("my-coverage", (1, 2), None, None)
+    assert cache.get(key, "NO_SMOOTHING") is None
+    cache.set(key, "NO_SMOOTHING", series)
+    cache.set(key, "LOESS_SMOOTHING", series.rename("smoothed"))
+    assert len(cache) == 1
+    assert cache.get(key, "NO_SMOOTHING").name == "my-coverage"
+    assert cache.get(key, "LOESS_SMOOTHING").name == "smoothed"
+    assert cache.get(key, "MOVING_AVERAGE_11_YEARS") is None
+
+
+def test_time_series_cache_expires_entries(series, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(timeseriescache.time, "monotonic", lambda: now)
+    cache = timeseriescache.TimeSeriesCache(max_size_bytes=1024, ttl_seconds=60)
+    key = timeseriescache.build_cache_key("my-coverage", (1, 2), None, None)
+    cache.set(key, "NO_SMOOTHING", series)
+    now += 61
+    assert cache.get(key, "NO_SMOOTHING") is None
+    assert len(cache) == 0
+    assert cache.size_bytes == 0
+
+
+def test_time_series_cache_evicts_least_recently_used(series):
+    entry_size = timeseriescache.CompactSeries.from_series(series).nbytes
+    cache = timeseriescache.TimeSeriesCache(
+        max_size_bytes=entry_size * 2, ttl_seconds=60
+    )
+    first, second, third = (
+        timeseriescache.build_cache_key("my-coverage", (i, 0), None, None)
+        for i in range(3)
+    )
+    cache.set(first, "NO_SMOOTHING", series)
+    cache.set(second, "NO_SMOOTHING", series)
+    cache.get(first, "NO_SMOOTHING")
+    cache.set(third, "NO_SMOOTHING", series)
+    assert cache.get(first, "NO_SMOOTHING") is not None
+    assert cache.get(second, "NO_SMOOTHING") is None
+    assert cache.get(third, "NO_SMOOTHING") is not None
+    assert cache.size_bytes == entry_size * 2
+
+
+def test_async_get_dataset_grid(httpx_mock):
+    httpx_mock.add_response(
+        url="http://fake-thredds/ncss/grid/tas.nc/dataset.xml",
+        text=_DATASET_DESCRIPTION,
+    )
+
+    async def _get_grid():
+        async with httpx.AsyncClient() as client:
+            first = await timeseriescache.async_get_dataset_grid(
+                client, "http://fake-thredds/ncss/grid/tas.nc"
+            )
+            second = await timeseriescache.async_get_dataset_grid(
+                client, "http://fake-thredds/ncss/grid/tas.nc"
+            )
+        return first, second
+
+    grid, cached_grid = anyio.run(_get_grid)
+    assert cached_grid is grid
+    np.testing.assert_allclose(grid.latitudes, [45.0, 45.5, 46.0])
+    np.testing.assert_allclose(grid.longitudes, [11.0, 11.5, 12.0, 12.5])
+    assert grid.find_cell(longitude=11.9, latitude=45.6) == (1, 2)
+    assert len(httpx_mock.get_requests()) == 1
+
+
+def test_async_get_dataset_grid_remembers_failures(httpx_mock, monkeypatch):
+    monkeypatch.setattr(timeseriescache, "_MAX_DATASET_GRIDS", 1)
+    httpx_mock.add_response(
+        url="http://fake-thredds/ncss/grid/tas.nc/dataset.xml", status_code=500
+    )
+    httpx_mock.add_response(
+        url="http://fake-thredds/ncss/grid/pr.nc/dataset.xml",
+        text=_DATASET_DESCRIPTION,
+    )
+
+    async def _get_grids(*urls):
+        async with httpx.AsyncClient() as client:
+            return [
+                await timeseriescache.async_get_dataset_grid(client, url)
+                for url in urls
+            ]
+
+    tas_url = "http://fake-thredds/ncss/grid/tas.nc"
+    assert anyio.run(_get_grids, tas_url, tas_url) == [None, None]
+    assert len(httpx_mock.get_requests()) == 1
+    # the least recently used grid is evicted
+    anyio.run(_get_grids, "http://fake-thredds/ncss/grid/pr.nc")
+    assert list(timeseriescache._DATASET_GRIDS) == [
+        "http://fake-thredds/ncss/grid/pr.nc"
+    ]
@@ -0,0 +1,32 @@
+import threading
+
+import numpy as np
+import pytest
+
+from arpav_ppcv import utils
+
+
+def test_get_transformer_is_cached_per_thread():
+    transformer = utils.get_transformer("EPSG:4326", "EPSG:3004")
+    assert utils.get_transformer("epsg:4326", "epsg:3004") is transformer
+    other_thread_transformers = []
+    thread = threading.Thread(
+        target=lambda: other_thread_transformers.append(
+            utils.get_transformer("EPSG:4326", "EPSG:3004")
+        )
+    )
+    thread.start()
+    thread.join()
+    assert other_thread_transformers[0] is not transformer
+
+
+@pytest.mark.parametrize("num_points", [1, 3])
+def test_transform_coordinates(num_points):
+    lons = 11 + np.arange(num_points) / 10
+    lats = 45 + np.arange(num_points) / 10
+    xs, ys = utils.transform_coordinates(
+        lons, lats, source_crs="EPSG:4326", target_crs="EPSG:3004"
+    )
+    transformer = utils.get_transformer("EPSG:4326", "EPSG:3004")
+    expected = [transformer.transform(lon, lat) for lon, lat in zip(lons, lats)]
+    np.testing.assert_allclose(np.column_stack((xs, ys)), expected)
@@ -0,0 +1,114 @@
+import anyio
+import pytest
+
+from arpav_ppcv.webapp import responses
+
+_CONTENT = b"0123456789abcdefghij"
+
+
+@pytest.fixture
+def sample_file(tmp_path):
+    path = tmp_path / "sample.nc"
+    path.write_bytes(_CONTENT)
+    return path
+
+
+async def _consume(response) -> bytes:
+    chunks = []
+    async for chunk in response.body_iterator:
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+@pytest.mark.parametrize(
+    "range_header, expected",
+    [
+        pytest.param("bytes=0-9", (0, 9), id="first-bytes"),
+        pytest.param("bytes=-5", (15, 19), id="suffix"),
+        pytest.param("bytes=-50", (0, 19), id="suffix-larger-than-file"),
+        pytest.param("bytes=10-", (10, 19), id="open-ended"),
+        pytest.param("bytes=10-500", (10, 19), id="end-past-file-size"),
+        pytest.param("bytes=5-3", None, id="last-before-first"),
+        pytest.param("bytes=0-1,5-6", None, id="multi-range"),
+        pytest.param("items=0-1", None, id="unsupported-unit"),
+        pytest.param("bytes=-", None, id="empty-range"),
+    ],
+)
+def test_parse_range_header(range_header, expected):
+    assert responses._parse_range_header(range_header, len(_CONTENT)) == expected
+
+
+@pytest.mark.parametrize(
+    "range_header",
+    [
+        pytest.param("bytes=20-", id="start-equal-to-file-size"),
+        pytest.param("bytes=50-60", id="start-past-file-size"),
+        pytest.param("bytes=-0", id="zero-length-suffix"),
+    ],
+)
+def test_parse_range_header_unsatisfiable(range_header):
+    with pytest.raises(ValueError):
+        responses._parse_range_header(range_header, len(_CONTENT))
+
+
+def test_build_file_response_full_file(sample_file):
+    response = responses.build_file_response(
+        sample_file, "sample.nc", media_type="application/netcdf"
+    )
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(len(_CONTENT))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert 'filename="sample.nc"' in response.headers["content-disposition"]
+
+
+@pytest.mark.parametrize(
+    "range_header, expected_content_range, expected_body",
+    [
+        pytest.param("bytes=0-9", "bytes 0-9/20", _CONTENT[:10], id="first-bytes"),
+        pytest.param("bytes=-5", "bytes 15-19/20", _CONTENT[-5:], id="suffix"),
+        pytest.param("bytes=10-", "bytes 10-19/20", _CONTENT[10:], id="open-ended"),
+    ],
+)
+def test_build_file_response_partial(
+    sample_file, range_header, expected_content_range, expected_body
+):
+    response = responses.build_file_response(
+        sample_file,
+        "sample.nc",
+        media_type="application/netcdf",
+        range_header=range_header,
+    )
+    assert response.status_code == 206
+    assert response.headers["content-range"] == expected_content_range
+    assert response.headers["content-length"] == str(len(expected_body))
+    assert anyio.run(_consume, response) == expected_body
+
+
+def test_build_file_response_unsatisfiable_range(sample_file):
+    response = responses.build_file_response(
+        sample_file,
+        "sample.nc",
+        media_type="application/netcdf",
+        range_header="bytes=50-",
+    )
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */20"
+
+
+@pytest.mark.parametrize(
+    "range_header",
+    [
+        pytest.param("bytes=0-1,5-6", id="multi-range"),
+        pytest.param("bytes=5-3", id="last-before-first"),
+        pytest.param("garbage", id="malformed"),
+    ],
+)
+def test_build_file_response_ignores_invalid_range(sample_file, range_header):
+    response = responses.build_file_response(
+        sample_file,
+        "sample.nc",
+        media_type="application/netcdf",
+        range_header=range_header,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(len(_CONTENT))
@@ -0,0 +1,32 @@
+import anyio
+import httpx
+import pytest
+
+from arpav_ppcv.thredds import client as thredds_client
+from arpav_ppcv.webapp import dependencies
+
+
+@pytest.mark.parametrize(
+    "expose_stats, expected_status",
+    [
+        pytest.param(False, 404, id="disabled"),
+        pytest.param(True, 200, id="enabled"),
+    ],
+)
+def test_get_http_client_pool_info(
+    test_client_v2_app: httpx.Client, settings, expose_stats, expected_status
+):
+    settings.thredds_server.expose_http_client_stats = expose_stats
+    test_client_v2_app.app.dependency_overrides[dependencies.get_settings] = (
+        lambda: settings
+    )
+    thredds_client.get_http_client(settings)
+    response = test_client_v2_app.get(
+        test_client_v2_app.app.url_path_for("get_http_client_pool_info")
+    )
+    assert response.status_code == expected_status
+    if expose_stats:
+        assert response.json()["max_connections"] == (
+            settings.thredds_server.http_client_max_connections
+        )
+    anyio.run(thredds_client.close_http_client)
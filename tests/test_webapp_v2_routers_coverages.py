@@ -2,6 +2,8 @@ import random
 import re
 
 import httpx
+import netCDF4
+import numpy as np
 import pytest_httpx
 import pytest
 
@@ -10,6 +12,7 @@ from arpav_ppcv.schemas import (
     observations,
 )
 from arpav_ppcv import database
+from arpav_ppcv.webapp import dependencies
 
 random.seed(0)
 
@@ -115,6 +118,97 @@ def test_get_time_series(
     assert series_response.status_code == 200
 
 
+def test_get_multi_point_time_series(
+    httpx_mock: pytest_httpx.HTTPXMock,
+    test_client_v2_app: httpx.Client,
+    arpav_db_session,
+    tmp_path,
+):
+    db_cov_conf = coverages.CoverageConfiguration(
+        name="fake_tas",
+        netcdf_main_dataset_name="tas",
+        thredds_url_pattern="fake",
+        palette="fake",
+    )
+    arpav_db_session.add(db_cov_conf)
+    arpav_db_session.commit()
+    arpav_db_session.refresh(db_cov_conf)
+    subset_path = tmp_path / "subset.nc"
+    with netCDF4.Dataset(subset_path, mode="w") as ds:
+        ds.createDimension("time", None)
+        ds.createDimension("lat", 2)
+        ds.createDimension("lon", 2)
+        time_var = ds.createVariable("time", "f8", ("time",))
+        time_var.units = "days since 2000-01-01 00:00:00"
+        time_var[:] = [0, 366]
+        ds.createVariable("lat", "f8", ("lat",))[:] = [44.9, 45.0]
+        ds.createVariable("lon", "f8", ("lon",))[:] = [11.5, 11.6]
+        tas = ds.createVariable("tas", "f4", ("time", "lat", "lon"))
+        tas[:] = np.arange(8, dtype=np.float32).reshape((2, 2, 2))
+    httpx_mock.add_response(
+        url=re.compile(r".*ncss/grid.*"),
+        method="get",
+        content=subset_path.read_bytes(),
+    )
+    cov_id = random.choice(database.generate_coverage_identifiers(db_cov_conf))
+    series_response = test_client_v2_app.get(
+        test_client_v2_app.app.url_path_for(
+            "get_multi_point_time_series", coverage_identifier=cov_id
+        ),
+        params={"coords": "MULTIPOINT((11.5 44.9), (11.6 45.0))"},
+        headers={"accept": "application/json"},
+    )
+    assert series_response.status_code == 200
+    points = series_response.json()["points"]
+    assert [p["coords"] for p in points] == ["POINT (11.5 44.9)", "POINT (11.6 45)"]
+    assert [v["value"] for v in points[0]["series"][0]["values"]] == [0.0, 4.0]
+    assert [v["value"] for v in points[1]["series"][0]["values"]] == [3.0, 7.0]
+    assert len(httpx_mock.get_requests()) == 1
+
+
+def test_get_forecast_data_is_served_from_cache(
+    httpx_mock: pytest_httpx.HTTPXMock,
+    test_client_v2_app: httpx.Client,
+    arpav_db_session,
+    settings,
+    tmp_path,
+):
+    settings.coverage_download_settings.cache_dir = tmp_path
+    test_client_v2_app.app.dependency_overrides[dependencies.get_settings] = (
+        lambda: settings
+    )
+    db_cov_conf = coverages.CoverageConfiguration(
+        name="fake_tas",
+        netcdf_main_dataset_name="tas",
+        thredds_url_pattern="fake",
+        palette="fake",
+    )
+    arpav_db_session.add(db_cov_conf)
+    arpav_db_session.commit()
+    arpav_db_session.refresh(db_cov_conf)
+    content = b"fake netcdf contents"
+    httpx_mock.add_response(
+        url=re.compile(r".*ncss/grid.*"),
+        method="get",
+        content=content,
+    )
+    cov_id = database.generate_coverage_identifiers(db_cov_conf)[0]
+    url = test_client_v2_app.app.url_path_for(
+        "get_forecast_data", coverage_identifier=cov_id
+    )
+    first_response = test_client_v2_app.get(url)
+    assert first_response.status_code == 200
+    assert first_response.content == content
+    second_response = test_client_v2_app.get(url)
+    assert second_response.status_code == 200
+    assert second_response.content == content
+    assert len(httpx_mock.get_requests()) == 1
+    partial_response = test_client_v2_app.get(url, headers={"Range": "bytes=0-3"})
+    assert partial_response.status_code == 206
+    assert partial_response.content == content[:4]
+    assert len(httpx_mock.get_requests()) == 1
+
+
 @pytest.mark.parametrize(
     [
         "include_coverage_data",
@@ -105,6 +105,40 @@ def test_monthly_measurement_list_filter_by_variable_name(
         assert returned_item["variable_name"] == target_variable.name
 
 
+def test_monthly_measurement_list_follows_cursor_links(
+    test_client_v2_app: httpx.Client,
+    sample_monthly_measurements: list[observations.MonthlyMeasurement],
+):
+    url = test_client_v2_app.app.url_path_for("list_monthly_measurements")
+    params = {"limit": 30}
+    seen_ids = []
+    while url is not None:
+        list_response = test_client_v2_app.get(url, params=params)
+        assert list_response.status_code == 200
+        payload = list_response.json()
+        assert payload["meta"]["total_filtered_records"] == len(
+            sample_monthly_measurements
+        )
+        seen_ids.extend(item["url"].rpartition("/")[-1] for item in payload["items"])
+        url = payload["links"]["next"]
+        if url is not None:
+            assert "cursor=" in url
+            assert "offset=" not in url
+        params = None
+    expected = sorted(sample_monthly_measurements, key=lambda m: (m.date, m.id))
+    assert seen_ids == [str(m.id) for m in expected]
+
+
+def test_monthly_measurement_list_rejects_invalid_cursor(
+    test_client_v2_app: httpx.Client,
+):
+    list_response = test_client_v2_app.get(
+        test_client_v2_app.app.url_path_for("list_monthly_measurements"),
+        params={"cursor": "not-a-cursor"},
+    )
+    assert list_response.status_code == 400
+
+
 def test_monthly_measurement_detail(
     test_client_v2_app: httpx.Client,
     sample_monthly_measurements: list[observations.MonthlyMeasurement],